@@ -1,21 +1,25 @@
 # Affiliate Link Manager - Handles all affiliate program integrations
-import requests
 import hashlib
-import sqlite3
 from urllib.parse import urlencode, urlparse, parse_qs, quote
-from datetime import datetime
+from datetime import datetime, timedelta
 from typing import Dict, Optional, List
 from config import Config
+from storage import Database, get_database
+import logging
+import metrics
 import re
 
+logger = logging.getLogger(__name__)
+
 class AffiliateManager:
-    def __init__(self):
+    def __init__(self, database: Database = None):
         self.config = Config()
+        self.db = database or get_database('affiliate')
         self.setup_database()
     
     def setup_database(self):
         """Setup database for affiliate link tracking"""
-        conn = sqlite3.connect('affiliate_links.db')
+        conn = self.db.connect()
         cursor = conn.cursor()
         
         cursor.execute('''
@@ -36,6 +40,12 @@ class AffiliateManager:
             )
         ''')
         
+        # Clicks and reports look links up by the URL that was posted
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_affiliate_links_url
+            ON affiliate_links (affiliate_url)
+        ''')
+        
         conn.commit()
         conn.close()
     
@@ -188,7 +198,7 @@ class AffiliateManager:
                           platform: str, product_data: Dict):
         """Save affiliate link to database"""
         
-        conn = sqlite3.connect('affiliate_links.db')
+        conn = self.db.connect()
         cursor = conn.cursor()
         
         link_id = hashlib.md5(f"{affiliate_url}{datetime.now().isoformat()}".encode()).hexdigest()
@@ -219,7 +229,8 @@ class AffiliateManager:
     def track_click(self, affiliate_url: str):
         """Track affiliate link click"""
         
-        conn = sqlite3.connect('affiliate_links.db')
+        metrics.CLICKS.inc(source='affiliate_manager')
+        conn = self.db.connect()
         cursor = conn.cursor()
         
         cursor.execute('''
@@ -234,7 +245,7 @@ class AffiliateManager:
     def update_conversion(self, affiliate_url: str, sale_amount: float):
         """Update conversion data when sale occurs"""
         
-        conn = sqlite3.connect('affiliate_links.db')
+        conn = self.db.connect()
         cursor = conn.cursor()
         
         # Get commission rate
@@ -260,7 +271,11 @@ class AffiliateManager:
     def get_performance_report(self, days: int = 30) -> Dict:
         """Get affiliate performance report"""
         
-        conn = sqlite3.connect('affiliate_links.db')
+        # created_at is stored in local time, so the cutoff is computed here
+        # rather than with a database-specific date function
+        since = datetime.now() - timedelta(days=days)
+        
+        conn = self.db.connect()
         cursor = conn.cursor()
         
         # Get performance by platform
@@ -273,10 +288,10 @@ class AffiliateManager:
                 SUM(earnings) as total_earnings,
                 AVG(commission_rate) as avg_commission_rate
             FROM affiliate_links 
-            WHERE created_at >= datetime('now', '-{} days')
+            WHERE created_at >= ?
             GROUP BY platform
             ORDER BY total_earnings DESC
-        '''.format(days))
+        ''', (since,))
         
         platform_stats = cursor.fetchall()
         
@@ -290,10 +305,10 @@ class AffiliateManager:
                 earnings,
                 affiliate_url
             FROM affiliate_links 
-            WHERE created_at >= datetime('now', '-{} days')
+            WHERE created_at >= ?
             ORDER BY earnings DESC
             LIMIT 10
-        '''.format(days))
+        ''', (since,))
         
         top_links = cursor.fetchall()
         
@@ -347,6 +362,8 @@ class AffiliateManager:
         }
         
         try:
+            import requests  # deferred: only needed when Bitly is configured
+            
             response = requests.post(
                 "https://api-ssl.bitly.com/v4/shorten",
                 headers=headers,
@@ -356,11 +373,11 @@ class AffiliateManager:
             if response.status_code == 200:
                 return response.json()['link']
             else:
-                print(f"Bitly API Error: {response.text}")
+                logger.warning(f"Bitly API Error: {response.text}")
                 return self.create_custom_short_link(long_url)
                 
         except Exception as e:
-            print(f"Error creating Bitly link: {e}")
+            logger.error(f"Error creating Bitly link: {e}")
             return self.create_custom_short_link(long_url)
     
     def create_custom_short_link(self, long_url: str) -> str:
@@ -374,8 +391,8 @@ class AffiliateManager:
 class ProductProcessor:
     """Processes products and generates affiliate links"""
     
-    def __init__(self):
-        self.affiliate_manager = AffiliateManager()
+    def __init__(self, affiliate_manager: Optional[AffiliateManager] = None):
+        self.affiliate_manager = affiliate_manager or AffiliateManager()
     
     def process_product(self, product_data: Dict) -> Dict:
         """Process a product and add affiliate links"""
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Request-latency benchmark for the SastaSmart API endpoints
+
+By default requests are driven straight through the ASGI app in-process,
+which measures handler + database time without network noise. Pass --url
+to benchmark a running server (e.g. gunicorn -c gunicorn.conf.py main:app).
+
+    python benchmarks/api_latency.py --requests 200
+    python benchmarks/api_latency.py --url http://127.0.0.1:8000 --json results.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+import urllib.request
+
+# Add parent directory to path to import main module
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+ENDPOINTS = [
+    '/health',
+    '/dashboard',
+    '/queue?status=pending&limit=50',
+    '/products?limit=50',
+    '/affiliate/report?days=7',
+]
+
+async def asgi_get(app, path: str) -> int:
+    """Issue one GET through the ASGI interface and return the status code"""
+    raw_path, _, query = path.partition('?')
+    scope = {
+        'type': 'http',
+        'asgi': {'version': '3.0', 'spec_version': '2.3'},
+        'http_version': '1.1',
+        'method': 'GET',
+        'scheme': 'http',
+        'path': raw_path,
+        'raw_path': raw_path.encode(),
+        'query_string': query.encode(),
+        'root_path': '',
+        'headers': [(b'host', b'benchmark')],
+        'client': ('127.0.0.1', 0),
+        'server': ('benchmark', 80),
+    }
+    status = {}
+
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            status['code'] = message['status']
+
+    await app(scope, receive, send)
+    return status.get('code', 0)
+
+def summarize(samples):
+    samples = sorted(samples)
+    count = len(samples)
+    return {
+        'requests': count,
+        'mean_ms': round(statistics.fmean(samples) * 1000, 3),
+        'p50_ms': round(samples[int(count * 0.50)] * 1000, 3),
+        'p95_ms': round(samples[min(count - 1, int(count * 0.95))] * 1000, 3),
+        'p99_ms': round(samples[min(count - 1, int(count * 0.99))] * 1000, 3),
+        'max_ms': round(samples[-1] * 1000, 3),
+    }
+
+async def bench_in_process(requests: int):
+    from main import app, get_master
+    get_master()  # construct the master once, outside the timed loop
+
+    results = {}
+    for endpoint in ENDPOINTS:
+        await asgi_get(app, endpoint)  # warm-up
+        samples, errors = [], 0
+        for _ in range(requests):
+            start = time.perf_counter()
+            code = await asgi_get(app, endpoint)
+            samples.append(time.perf_counter() - start)
+            errors += code >= 400
+        results[endpoint] = {**summarize(samples), 'errors': errors}
+    return results
+
+def bench_server(base_url: str, requests: int):
+    results = {}
+    for endpoint in ENDPOINTS:
+        samples, errors = [], 0
+        for _ in range(requests + 1):
+            start = time.perf_counter()
+            try:
+                with urllib.request.urlopen(base_url.rstrip('/') + endpoint, timeout=30) as response:
+                    response.read()
+            except Exception:
+                errors += 1
+            samples.append(time.perf_counter() - start)
+        results[endpoint] = {**summarize(samples[1:]), 'errors': errors}
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=100, help='requests per endpoint')
+    parser.add_argument('--url', help='benchmark a running server instead of the in-process app')
+    parser.add_argument('--json', help='write results to this JSON file')
+    args = parser.parse_args()
+
+    if args.url:
+        results = bench_server(args.url, args.requests)
+    else:
+        results = asyncio.run(bench_in_process(args.requests))
+
+    print(f"{'endpoint':40} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7}")
+    for endpoint, stats in results.items():
+        print(f"{endpoint:40} {stats['p50_ms']:9.3f} {stats['p95_ms']:9.3f} {stats['p99_ms']:9.3f} {stats['errors']:7d}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'mode': 'server' if args.url else 'in-process', 'results': results}, f, indent=2)
+
+if __name__ == '__main__':
+    main()
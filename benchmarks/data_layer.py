@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+Data-layer benchmark suite for the SastaSmart hot paths
+
+For every dataset size a fresh temporary directory is filled by
+synthetic_data.generate() and the operations below are timed inside it:
+
+    add_product, schedule_product_posts, process_posting_queue (stubbed
+    senders), get_performance_report, get_system_dashboard,
+    get_earnings_dashboard_data, update_daily_summary and two
+    cross-database reports (revenue_by_product, posts_vs_clicks)
+
+Links and clicks scale with the product count (10 and 100 per product by
+default). Results are JSON so runs on two commits can be diffed:
+
+    python benchmarks/data_layer.py --sizes 1000,10000 --json before.json
+    python benchmarks/data_layer.py --sizes 1000,10000 --json after.json --compare before.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+# Add parent directory to path to import main module
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from synthetic_data import generate  # noqa: E402
+
+DUE_POSTS_PER_RUN = 100  # overdue rows queued before each process_posting_queue run
+
+def summarize(samples):
+    samples = sorted(samples)
+    count = len(samples)
+    return {
+        'runs': count,
+        'mean_ms': round(statistics.fmean(samples) * 1000, 3),
+        'p50_ms': round(samples[int(count * 0.50)] * 1000, 3),
+        'p95_ms': round(samples[min(count - 1, int(count * 0.95))] * 1000, 3),
+        'min_ms': round(samples[0] * 1000, 3),
+    }
+
+def timed(func, repeat: int, setup=None):
+    """Run func repeat times (after one warm-up), timing only func itself"""
+    samples = []
+    for run in range(repeat + 1):
+        args = setup(run) if setup else ()
+        start = time.perf_counter()
+        func(*args)
+        elapsed = time.perf_counter() - start
+        if run:
+            samples.append(elapsed)
+    return summarize(samples)
+
+def queue_due_posts(master, count: int):
+    """Insert overdue pending posts directly, keeping the queue counters in step"""
+    conn = sqlite3.connect('sastasmart_master.db')
+    cursor = conn.cursor()
+    cursor.execute('SELECT id FROM products ORDER BY id LIMIT ?', (count,))
+    scheduled = datetime.now() - timedelta(minutes=5)
+    for (product_id,) in cursor.fetchall():
+        cursor.execute('''
+            INSERT INTO posting_queue (product_id, platform, scheduled_time, template_type, status)
+            VALUES (?, 'telegram', ?, 'flash_deal_template', 'pending')
+        ''', (product_id, scheduled))
+        master._update_queue_stats(cursor, 'pending', 'telegram', 1)
+    conn.commit()
+    conn.close()
+
+def bench_size(products: int, repeat: int, links: int = None, clicks: int = None) -> dict:
+    from main import SastaSmartMaster
+    from earnings_tracker import EarningsTracker
+    import logging
+
+    dataset = generate(products, links, clicks)
+    logging.getLogger().setLevel(logging.WARNING)  # per-post INFO lines would dominate the timings
+
+    master = SastaSmartMaster()  # rebuilds the derived counters from the generated rows
+    tracker = EarningsTracker()
+
+    async def stub_send(platform, product_data, template_type):
+        return True
+    master.create_and_post_content = stub_send
+
+    next_index = [products]
+
+    def new_product(run):
+        next_index[0] += 1
+        index = next_index[0]
+        return ({
+            'title': f"Benchmark product {index}",
+            'price': 999,
+            'original_price': 1999,
+            'discount': 50,
+            'amazon_url': f"https://www.amazon.in/dp/B9{index:08d}",
+            'category': 'electronics',
+            'features': ['Benchmark'],
+            'platform': 'amazon',
+        },)
+
+    def scheduled_product(run):
+        return (run + 1, {'discount': 50})
+
+    def due_posts(run):
+        queue_due_posts(master, DUE_POSTS_PER_RUN)
+        return ()
+
+    # Process whatever the generator left overdue so every timed run sees the same backlog
+    master.process_posting_queue()
+
+    operations = {
+        'add_product': timed(master.add_product, repeat, new_product),
+        'schedule_product_posts': timed(master.schedule_product_posts, repeat, scheduled_product),
+        'process_posting_queue': timed(master.process_posting_queue, repeat, due_posts),
+        'get_performance_report': timed(lambda: master.affiliate_manager.get_performance_report(30), repeat),
+        'get_system_dashboard': timed(master.get_system_dashboard, repeat),
+        'get_earnings_dashboard_data': timed(lambda: tracker.get_earnings_dashboard_data(30), repeat),
+        'update_daily_summary': timed(tracker.update_daily_summary, repeat),
+        'report_revenue_by_product': timed(lambda: master.reports.revenue_by_product(30), repeat),
+        'report_posts_vs_clicks': timed(lambda: master.reports.posts_vs_clicks(30), repeat),
+    }
+    operations['process_posting_queue']['posts_per_run'] = DUE_POSTS_PER_RUN
+
+    return {'dataset': dataset, 'operations': operations}
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+def print_comparison(results: dict, baseline: dict):
+    print(f"\n{'size':>8} {'operation':32} {'before ms':>10} {'after ms':>10} {'change':>8}")
+    for size, current in results['sizes'].items():
+        previous = baseline.get('sizes', {}).get(size)
+        if not previous:
+            continue
+        for name, stats in current['operations'].items():
+            before = previous['operations'].get(name, {}).get('p50_ms')
+            if not before:
+                continue
+            change = (stats['p50_ms'] - before) / before * 100
+            print(f"{size:>8} {name:32} {before:10.3f} {stats['p50_ms']:10.3f} {change:+7.1f}%")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='1000,10000', help='comma-separated product counts')
+    parser.add_argument('--links-per-product', type=int, default=10)
+    parser.add_argument('--clicks-per-product', type=int, default=100)
+    parser.add_argument('--repeat', type=int, default=20, help='timed runs per operation')
+    parser.add_argument('--json', help='write results to this JSON file')
+    parser.add_argument('--compare', help='baseline JSON file to compare p50 timings against')
+    args = parser.parse_args()
+
+    results = {
+        'revision': git_revision(),
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'sizes': {}
+    }
+
+    original_cwd = os.getcwd()
+    for size in [int(value) for value in args.sizes.split(',')]:
+        # The components use relative database paths, so each size runs in its own directory
+        with tempfile.TemporaryDirectory(prefix=f'sastasmart-bench-{size}-') as workdir:
+            os.chdir(workdir)
+            try:
+                results['sizes'][str(size)] = bench_size(
+                    size, args.repeat,
+                    links=size * args.links_per_product,
+                    clicks=size * args.clicks_per_product
+                )
+            finally:
+                os.chdir(original_cwd)
+
+        print(f"\n{size} products")
+        for name, stats in results['sizes'][str(size)]['operations'].items():
+            print(f"  {name:32} p50 {stats['p50_ms']:10.3f} ms   p95 {stats['p95_ms']:10.3f} ms")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            print_comparison(results, json.load(f))
+
+if __name__ == '__main__':
+    main()
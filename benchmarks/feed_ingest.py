@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+"""
+Affiliate product feeds: streaming, delta sync and resume
+
+Reads the fixture feeds in benchmarks/fixtures, then builds large
+synthetic feeds (Flipkart-style JSON, plain and gzipped, and CSV) from
+their items with varied ids and prices, and ingests them through
+product_feeds.FeedIngester with a counting stand-in for the ingest
+pipeline:
+
+    python benchmarks/feed_ingest.py
+    python benchmarks/feed_ingest.py --items 200000 --changed 0.01 --json feeds.json
+
+Checks, exiting non-zero if one fails:
+
+    fixtures   every fixture item maps to the expected product, and
+               reading again from any item's offset gives the items after it
+    memory     peak memory of an ingest does not grow with the feed size
+    delta      a second ingest of the feed with --changed of its items
+               modified sends exactly those items to the pipeline
+    unchanged  a feed file already ingested to the end is not read again
+    resume     an ingest stopped halfway resumes at its checkpoint, redoing
+               at most one segment, and ends with every item ingested
+"""
+
+import argparse
+import gzip
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURES = os.path.join(REPO_DIR, 'benchmarks', 'fixtures')
+
+# Add parent directory to path to import the feed ingester
+sys.path.append(REPO_DIR)
+
+# name -> (feed config, expected item ids in order, expected unusable records)
+FIXTURE_FEEDS = {
+    'flipkart': ({'network': 'flipkart', 'path': os.path.join(FIXTURES, 'flipkart_feed.json')},
+                 ['MOBGTAGPTB3VS24W', 'ACNGZ4ZGFHZ4Z9HK', 'SHOGHZ8YHGFZQK7Z', 'HEDGTZQ8FZ9EXRDG'], 1),
+    'amazon': ({'network': 'amazon', 'path': os.path.join(FIXTURES, 'amazon_feed.json'), 'items_key': 'Items'},
+               ['B0CHX1W1XY', 'B09WRMTVBF', 'B0BDRVFDKP'], 1),
+    'csv': ({'network': 'csv', 'path': os.path.join(FIXTURES, 'products_feed.csv')},
+            ['B0D5YCYS1G', 'MOBH2KZQGXZZJ8CX', 'KTLGHZ9YQ8ZTWFQH', 'B0CX59H5W7'], 1),
+}
+
+class CountingPipeline:
+    """Stands in for ProductIngestPipeline: counts the products it is given"""
+
+    def __init__(self, fail_after: int = None, keep: bool = False):
+        self.calls = 0
+        self.products = 0
+        self.fail_after = fail_after
+        self.seen = [] if keep else None
+
+    def __call__(self, products):
+        if self.fail_after is not None and self.calls >= self.fail_after:
+            raise KeyboardInterrupt('stopped halfway')
+        self.calls += 1
+        self.products += len(products)
+        if self.seen is not None:
+            self.seen.extend(product['url'] for product in products)
+        return {'ingested': len(products)}
+
+def check_fixtures(failures):
+    from product_feeds import RECORD_MAPPERS, feed_format, iter_feed
+
+    report = {}
+    for name, (feed, expected_ids, expected_unusable) in FIXTURE_FEEDS.items():
+        feed = dict(feed, name=name)
+        items = list(iter_feed(feed['path'], feed_format(feed), 0, feed.get('items_key')))
+        mapped = [RECORD_MAPPERS[feed['network']](record, feed) for record, _ in items]
+        ids = [item[0] for item in mapped if item]
+        unusable = mapped.count(None)
+        report[name] = {'records': len(items), 'products': len(ids), 'unusable': unusable}
+        if ids != expected_ids or unusable != expected_unusable:
+            failures.append(f"fixtures: {name} gave {ids} and {unusable} unusable records")
+        for _, product in filter(None, mapped):
+            if not (0 < product['price'] <= product['original_price'] and product['title'] and
+                    product[f"{product['platform']}_url"] == product['url']):
+                failures.append(f"fixtures: {name} mapped a bad product {product}")
+        for n, (_, offset) in enumerate(items):
+            rest = [record for record, _ in iter_feed(feed['path'], feed_format(feed), offset, feed.get('items_key'))]
+            if rest != [record for record, _ in items[n + 1:]]:
+                failures.append(f"fixtures: {name} read from the offset of item {n} gave different items")
+                break
+    return report
+
+def synthetic_records(count: int, changed: float = 0.0, seed: int = 1):
+    """Flipkart feed records built from the fixture items; `changed` of them with a new price"""
+
+    with open(os.path.join(FIXTURES, 'flipkart_feed.json'), encoding='utf-8') as f:
+        templates = [record for record in json.load(f)['productInfoList']
+                     if record['productBaseInfoV1'].get('flipkartSellingPrice')]
+    rng = random.Random(seed)
+    changed_rng = random.Random(seed + 1)
+    for n in range(count):
+        record = json.loads(json.dumps(templates[n % len(templates)]))
+        info = record['productBaseInfoV1']
+        info['productId'] = f"SYN{n:09d}"
+        info['title'] = f"{info['title']} #{n}"
+        info['productUrl'] = f"https://dl.flipkart.com/dl/item/p/itm{n:012x}?pid=SYN{n:09d}"
+        price = round(info['flipkartSellingPrice']['amount'] * rng.uniform(0.5, 1.0))
+        if changed and changed_rng.random() < changed:
+            price -= 1
+        info['flipkartSellingPrice'] = {'amount': float(price), 'currency': 'INR'}
+        info.pop('flipkartSpecialPrice', None)
+        yield record
+
+def write_json_feed(path: str, records):
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'wt', encoding='utf-8') as f:
+        f.write('{"nextUrl": null, "validTill": 1760000000000, "productInfoList": [\n')
+        for n, record in enumerate(records):
+            f.write((',\n' if n else '') + json.dumps(record, ensure_ascii=False))
+        f.write('\n]}\n')
+
+def write_csv_feed(path: str, records):
+    import csv
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['product_id', 'title', 'price', 'mrp', 'product_url', 'image_url', 'in_stock',
+                         'platform', 'features'])
+        for record in records:
+            info = record['productBaseInfoV1']
+            writer.writerow([info['productId'], info['title'], info['flipkartSellingPrice']['amount'],
+                             info['maximumRetailPrice']['amount'], info['productUrl'],
+                             next(iter(info['imageUrls'].values())), info['inStock'], 'flipkart',
+                             '|'.join((record.get('categorySpecificInfoV1') or {}).get('keySpecs') or [])])
+
+def changed_count(count: int, changed: float) -> int:
+    rng = random.Random(2)
+    return sum(rng.random() < changed for _ in range(count))
+
+def measured_ingest(ingester, feed, trace: bool = False):
+    if trace:
+        tracemalloc.start()
+    start = time.perf_counter()
+    stats = ingester.ingest(feed)
+    elapsed = time.perf_counter() - start
+    peak = None
+    if trace:
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return stats, elapsed, peak
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--items', type=int, default=60000, help='items in the large synthetic feeds')
+    parser.add_argument('--changed', type=float, default=0.01, help='share of items changed for the delta run')
+    parser.add_argument('--segment', type=int, default=None, help='FEED_SEGMENT_ITEMS (default: the config)')
+    parser.add_argument('--json', help='write results to this JSON file')
+    args = parser.parse_args()
+
+    from config import Config
+    from product_feeds import FeedIngester
+    from storage import reset_databases
+
+    if args.segment:
+        Config.FEED_SEGMENT_ITEMS = args.segment
+    segment = Config.FEED_SEGMENT_ITEMS
+    failures = []
+    report = {'items': args.items, 'segment_items': segment, 'fixtures': check_fixtures(failures), 'runs': {}}
+
+    with tempfile.TemporaryDirectory(prefix='sastasmart-feeds-') as workdir:
+        Config.DATABASE_URL = f"sqlite:///{workdir}"
+        reset_databases()
+        try:
+            small_items = segment * 2
+            paths = {
+                'small.json': (small_items, 0.0),
+                'feed.json': (args.items, 0.0),
+                'feed.json.gz': (args.items, 0.0),
+                'feed.csv': (args.items, 0.0),
+            }
+            for name, (count, changed) in paths.items():
+                path = os.path.join(workdir, name)
+                if name.endswith('.csv'):
+                    write_csv_feed(path, synthetic_records(count, changed))
+                else:
+                    write_json_feed(path, synthetic_records(count, changed))
+
+            # First ingests: every item is new. Memory traced on the small and the large JSON feed
+            for name in paths:
+                path = os.path.join(workdir, name)
+                network = 'csv' if name.endswith('.csv') else 'flipkart'
+                pipeline = CountingPipeline()
+                stats, elapsed, peak = measured_ingest(
+                    FeedIngester(pipeline), {'name': name, 'network': network, 'path': path},
+                    trace=name in ('small.json', 'feed.json'))
+                report['runs'][name] = {
+                    'file_mb': round(os.path.getsize(path) / 1e6, 1),
+                    'records': stats['records'],
+                    'seconds': round(elapsed, 2),
+                    'records_per_second': round(stats['records'] / elapsed),
+                    'to_pipeline': pipeline.products,
+                    'peak_mb': round(peak / 1e6, 1) if peak is not None else None,
+                }
+                expected = paths[name][0]
+                if stats['records'] != expected or pipeline.products != expected:
+                    failures.append(f"first ingest: {name} read {stats['records']} records, "
+                                    f"{pipeline.products} to the pipeline, expected {expected}")
+
+            small, large = report['runs']['small.json'], report['runs']['feed.json']
+            if large['peak_mb'] > small['peak_mb'] * 1.5 + 1:
+                failures.append(f"memory: peak {large['peak_mb']} MB for {args.items} items, "
+                                f"{small['peak_mb']} MB for {small_items}")
+
+            # The same file again: not read at all
+            path = os.path.join(workdir, 'feed.json')
+            feed = {'name': 'feed.json', 'network': 'flipkart', 'path': path}
+            pipeline = CountingPipeline()
+            stats, elapsed, _ = measured_ingest(FeedIngester(pipeline), feed)
+            report['unchanged_file'] = {'seconds': round(elapsed, 3), 'to_pipeline': pipeline.products}
+            if not stats.get('unchanged_file') or pipeline.products:
+                failures.append(f"unchanged: an ingested feed was read again ({stats})")
+
+            # A new download of the feed with some prices changed
+            expected_changed = changed_count(args.items, args.changed)
+            write_json_feed(path, synthetic_records(args.items, args.changed))
+            pipeline = CountingPipeline()
+            stats, elapsed, _ = measured_ingest(FeedIngester(pipeline), feed)
+            report['delta'] = {'seconds': round(elapsed, 2), 'records': stats['records'],
+                               'to_pipeline': pipeline.products, 'expected_changed': expected_changed,
+                               'pipeline_runs': pipeline.calls}
+            if pipeline.products != expected_changed or stats['unchanged'] != args.items - expected_changed:
+                failures.append(f"delta: {pipeline.products} items to the pipeline, "
+                                f"{expected_changed} changed")
+
+            # Stopped halfway through a new feed, then resumed
+            path = os.path.join(workdir, 'resume.json')
+            write_json_feed(path, synthetic_records(args.items, seed=3))
+            feed = {'name': 'resume.json', 'network': 'flipkart', 'path': path}
+            stop_after = max(args.items // segment // 2, 1)
+            first = CountingPipeline(fail_after=stop_after, keep=True)
+            try:
+                FeedIngester(first).ingest(feed)
+                failures.append('resume: the first ingest was not stopped')
+            except KeyboardInterrupt:
+                pass
+            second = CountingPipeline(keep=True)
+            stats, elapsed, _ = measured_ingest(FeedIngester(second), feed)
+            ingested = set(first.seen) | set(second.seen)
+            redone = len(first.seen) + len(second.seen) - len(ingested)
+            report['resume'] = {'first_run': first.products, 'resumed_at_byte': stats['resumed_at'],
+                                'second_run': second.products, 'redone': redone, 'ingested': len(ingested)}
+            if not stats['resumed_at'] or len(ingested) != args.items or redone > segment:
+                failures.append(f"resume: {report['resume']}")
+        finally:
+            reset_databases()
+
+    print(f"fixtures: " + ', '.join(f"{name} {r['products']}/{r['records']} products"
+                                     for name, r in report['fixtures'].items()))
+    print(f"  {'feed':14} {'MB':>7} {'records':>8} {'seconds':>8} {'records/s':>10} {'peak MB':>8}")
+    for name, run in report['runs'].items():
+        peak = f"{run['peak_mb']:8.1f}" if run['peak_mb'] is not None else f"{'':>8}"
+        print(f"  {name:14} {run['file_mb']:7.1f} {run['records']:8d} {run['seconds']:8.2f} "
+              f"{run['records_per_second']:10d} {peak}")
+    print(f"  unchanged file: {report['unchanged_file']['seconds']}s")
+    delta = report['delta']
+    print(f"  delta: {delta['to_pipeline']} of {delta['records']} items to the pipeline "
+          f"({delta['expected_changed']} changed) in {delta['seconds']}s")
+    resume = report['resume']
+    print(f"  resume: {resume['first_run']} items before the stop, resumed at byte {resume['resumed_at_byte']}, "
+          f"{resume['second_run']} after, {resume['redone']} redone")
+
+    for failure in failures:
+        print(f"  FAILED {failure}")
+    if args.json:
+        report['failures'] = failures
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+    if failures:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""
+Crawl frontier: scale of the due-URL queries, and fetches vs caught price changes
+
+Two parts, both on a throwaway SQLite database:
+
+    scale     fills the frontier with --urls product rows and times taking
+              one run's due URLs, the "already tracked?" lookup for one
+              listing page and writing a run's visits back
+    schedule  simulates --days of scheduler ticks (every
+              FRONTIER_TICK) over --products products whose prices
+              change at random, at very different rates, and compares
+              the frontier with revisiting everything every SCRAPE_INTERVAL
+
+    python benchmarks/frontier_schedule.py
+    python benchmarks/frontier_schedule.py --urls 1000000 --products 2000 --days 7 --json frontier.json
+
+A price change counts as caught when some visit sees that price before
+it changes again; the delay is from the change to that visit. The run
+exits non-zero if the frontier catches a smaller share of the volatile
+products' changes than the fixed schedule, fetches more pages, or
+catches less than MIN_CAUGHT of the daily or stable products' changes.
+
+FRONTIER_MAX_INTERVAL and FRONTIER_VISITS_PER_CHANGE trade fetches for
+the slower products' changes caught, and how late. On the defaults above,
+a 24h cap with 4 visits per change fetched 18% of the fixed schedule's
+pages but caught 79% of the daily and 88% of the stable products'
+changes, the stable ones about 9h late; 6h with 8 visits fetches 26% and
+catches 86% and 96%, about 2.5h late.
+"""
+
+import argparse
+import bisect
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Add parent directory to path to import the scrapers
+sys.path.append(REPO_DIR)
+
+# Mean time between price changes, and share of products
+PROFILES = {
+    'lightning': (20 * 60, 0.05),
+    'daily': (8 * 3600, 0.25),
+    'stable': (10 * 86400, 0.70),
+}
+
+# Least share of changes the frontier must catch for the slower profiles
+MIN_CAUGHT = 0.85
+
+def timed(function, *args, repeat: int = 5) -> float:
+    """Best of `repeat` wall-clock runs, in milliseconds"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(*args)
+        best = min(best, time.perf_counter() - start)
+    return round(best * 1000, 2)
+
+def run_scale(frontier, urls: int, limit: int, rng: random.Random) -> dict:
+    from scrapers.frontier import FrontierEntry
+
+    now = time.time()
+    source = {'site': 'amazon', 'category': 'electronics'}
+    start = time.perf_counter()
+    batch = 50000
+    for first in range(0, urls, batch):
+        for n in range(first, min(first + batch, urls)):
+            key = f"amazon:B{n:09d}"
+            entry = frontier.discover(key, f"https://www.amazon.in/dp/B{n:09d}", source)
+            # Mostly in the future, a few overdue, as in steady state
+            entry.next_visit = now + rng.uniform(-0.01, 1) * 86400
+        frontier.flush()
+    fill_seconds = time.perf_counter() - start
+
+    listing_keys = [f"amazon:B{rng.randrange(urls * 2):09d}" for _ in range(50)]
+
+    def pop_and_flush():
+        due = frontier.pop_due(limit, now)
+        for entry in due:
+            frontier.visited(entry, changed=None, price=999.0, now=now)
+        frontier.flush()
+
+    return {
+        'urls': urls,
+        'fill_seconds': round(fill_seconds, 1),
+        'pop_due_ms': timed(lambda: frontier.pop_due(limit, now) and frontier.flush()),
+        'known_50_ms': timed(frontier.known, listing_keys),
+        'pop_visit_flush_ms': timed(pop_and_flush),
+        'database_mb': round(os.path.getsize(frontier.db.path) / 2**20, 1),
+    }
+
+class Product:
+    def __init__(self, key: str, profile: str, mean_gap: float, horizon: float, rng: random.Random):
+        self.key = key
+        self.profile = profile
+        self.changes = []
+        t = rng.expovariate(1 / mean_gap)
+        while t < horizon:
+            self.changes.append(t)
+            t += rng.expovariate(1 / mean_gap)
+        self.seen = set()
+        self.delays = []
+
+    def price_at(self, t: float) -> float:
+        return 1000.0 + bisect.bisect_right(self.changes, t)
+
+    def visit(self, t: float) -> float:
+        state = bisect.bisect_right(self.changes, t)
+        if state and state not in self.seen:
+            self.delays.append(t - self.changes[state - 1])
+        self.seen.add(state)
+        return 1000.0 + state
+
+def score(products, fetches: int) -> dict:
+    report = {'fetches': fetches, 'profiles': {}}
+    for profile in PROFILES:
+        group = [product for product in products if product.profile == profile]
+        changes = sum(len(product.changes) for product in group)
+        caught = sum(len(product.delays) for product in group)
+        delays = sorted(delay for product in group for delay in product.delays)
+        report['profiles'][profile] = {
+            'changes': changes,
+            'caught': caught,
+            'caught_share': round(caught / changes, 3) if changes else None,
+            'median_delay_minutes': round(delays[len(delays) // 2] / 60, 1) if delays else None,
+        }
+    return report
+
+def make_products(count: int, horizon: float, seed: int):
+    rng = random.Random(seed)
+    products = []
+    for n in range(count):
+        profile = rng.choices(list(PROFILES), weights=[share for _, share in PROFILES.values()])[0]
+        products.append(Product(f"amazon:S{n:09d}", profile, PROFILES[profile][0], horizon, rng))
+    return products
+
+def run_schedule(frontier, count: int, days: float, limit: int, seed: int) -> dict:
+    from config import Config
+
+    horizon = days * 86400
+    tick = Config.FRONTIER_TICK
+    source = {'site': 'amazon', 'category': 'electronics'}
+
+    # Fixed schedule: every product every SCRAPE_INTERVAL, no budget
+    products = make_products(count, horizon, seed)
+    fetches = 0
+    t = 0.0
+    while t < horizon:
+        for product in products:
+            product.visit(t)
+            fetches += 1
+        t += Config.SCRAPE_INTERVAL
+    fixed = score(products, fetches)
+
+    # Frontier: the same price histories, `limit` product pages per tick
+    # (frontier times are epoch seconds, so the simulated clock starts today)
+    products = make_products(count, horizon, seed)
+    by_key = {product.key: product for product in products}
+    epoch = time.time()
+    for product in products:
+        frontier.discover(product.key, f"https://www.amazon.in/dp/{product.key[7:]}", source, now=epoch)
+    frontier.flush()
+    fetches = 0
+    backlog = []
+    t = 0.0
+    while t < horizon:
+        due = frontier.pop_due(limit, epoch + t)
+        for entry in due:
+            frontier.visited(entry, changed=None, price=by_key[entry.key].visit(t), now=epoch + t)
+        fetches += len(due)
+        frontier.flush()
+        if t >= 86400:  # past the first day's backlog of never-visited products
+            backlog.append(frontier.summary(epoch + t)['product']['due'])
+        t += tick
+    adaptive = score(products, fetches)
+    adaptive['max_due_backlog'] = max(backlog, default=0)
+
+    return {'products': count, 'days': days, 'limit_per_run': limit, 'tick_seconds': tick,
+            'fixed': fixed, 'frontier': adaptive}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--urls', type=int, default=1000000, help='frontier size for the scale part (0 skips it)')
+    parser.add_argument('--products', type=int, default=2000, help='simulated products')
+    parser.add_argument('--days', type=float, default=7, help='simulated time')
+    parser.add_argument('--limit', type=int, help='product pages per run (default: Config.MAX_PRODUCTS_PER_RUN)')
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--json', help='write results to this JSON file')
+    args = parser.parse_args()
+
+    from config import Config
+    from scrapers.frontier import CrawlFrontier
+    from storage import SQLiteDatabase
+
+    limit = args.limit or Config.MAX_PRODUCTS_PER_RUN
+    random.seed(args.seed)  # interval jitter
+    report = {}
+
+    with tempfile.TemporaryDirectory(prefix='sastasmart-frontier-') as workdir:
+        if args.urls:
+            frontier = CrawlFrontier(SQLiteDatabase(os.path.join(workdir, 'scale.db')))
+            report['scale'] = run_scale(frontier, args.urls, limit, random.Random(args.seed))
+            scale = report['scale']
+            print(f"scale: {scale['urls']} URLs ({scale['database_mb']} MB, filled in {scale['fill_seconds']}s) - "
+                  f"take {limit} due: {scale['pop_due_ms']} ms, tracked lookup of 50: {scale['known_50_ms']} ms, "
+                  f"take + visit + write back: {scale['pop_visit_flush_ms']} ms")
+
+        frontier = CrawlFrontier(SQLiteDatabase(os.path.join(workdir, 'schedule.db')))
+        report['schedule'] = run_schedule(frontier, args.products, args.days, limit, args.seed)
+
+    schedule = report['schedule']
+    print(f"schedule: {schedule['products']} products over {schedule['days']} days, "
+          f"{schedule['limit_per_run']} pages per run every {schedule['tick_seconds']}s")
+    print(f"  {'':10} {'fetches':>9}  " + '  '.join(f"{profile + ' caught':>16} {'delay':>7}" for profile in PROFILES))
+    for name in ('fixed', 'frontier'):
+        result = schedule[name]
+        cells = []
+        for profile in PROFILES:
+            stats = result['profiles'][profile]
+            cells.append(f"{stats['caught']:6d}/{stats['changes']:<6d} {stats['caught_share']:4.0%} "
+                         f"{stats['median_delay_minutes']:6.1f}m")
+        print(f"  {name:10} {result['fetches']:9d}  " + '  '.join(cells))
+    print(f"  most product pages left due after a run (after day one): {schedule['frontier']['max_due_backlog']}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    fixed, adaptive = schedule['fixed'], schedule['frontier']
+    if (adaptive['fetches'] > fixed['fetches']
+            or adaptive['profiles']['lightning']['caught_share'] < fixed['profiles']['lightning']['caught_share']
+            or any(adaptive['profiles'][profile]['caught_share'] < MIN_CAUGHT for profile in ('daily', 'stable'))):
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""
+Adaptive per-host concurrency against a rate-limited stub marketplace
+
+Serves pages from a local keep-alive HTTP server that behaves like a
+marketplace under load: responses slow down as more requests are in
+flight, more than --capacity requests at once get a 503, and requests
+beyond --rate per second get a 429 with Retry-After (or, with --captcha,
+a captcha page). The same URLs are fetched with fixed per-host limits
+and with the AIMD host limits, twice, the second run starting from the
+windows the first one stored:
+
+    python benchmarks/host_throttling.py
+    python benchmarks/host_throttling.py --pages 1000 --rate 60 --capacity 10 --json throttling.json
+    python benchmarks/host_throttling.py --captcha
+
+Checks, exiting non-zero if one fails:
+
+    throttling   the adaptive runs get throttled on under 10% of requests,
+                 and less often than the fixed high limit
+    goodput      the adaptive runs fetch pages at least 75% as fast as the
+                 fastest fixed limit that got every page
+    retry-after  no request reaches the host while a Retry-After it sent
+                 is still running
+    persisted    the second run starts from the window the first ended with
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Add parent directory to path to import the scrapers
+sys.path.append(REPO_DIR)
+
+PRODUCT_PAGE = b'<html><body><span id="productTitle">Stub product</span>' + b'<p>details</p>' * 200 + b'</body></html>'
+CAPTCHA_PAGE = b'<html><body><form action="/errors/validateCaptcha">Type the characters you see</form></body></html>'
+
+# A request this long after a Retry-After went out was sent after it arrived
+RETRY_AFTER_GRACE = 0.1
+
+class StubMarketplace(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, rate: float, capacity: int, latency: float, captcha: bool, retry_after: int):
+        super().__init__(('127.0.0.1', 0), StubHandler)
+        self.rate = rate
+        self.capacity = capacity
+        self.latency = latency
+        self.captcha = captcha
+        self.retry_after = retry_after
+        self.lock = threading.Lock()
+        self.reset()
+
+    def handle_error(self, request, client_address):
+        pass  # clients dropping keep-alive connections at the end of a run
+
+    def reset(self):
+        self.tokens = self.rate / 4  # quarter of a second of burst
+        self.refilled = time.monotonic()
+        self.in_flight = 0
+        self.blocked_from = self.blocked_until = 0.0
+        self.counts = {'ok': 0, '429': 0, '503': 0, 'captcha': 0}
+        self.early = 0  # requests that arrived while a Retry-After was running
+
+    def admit(self) -> str:
+        with self.lock:
+            now = time.monotonic()
+            if self.blocked_from <= now < self.blocked_until:
+                self.early += 1
+            self.tokens = min(self.tokens + (now - self.refilled) * self.rate, self.rate / 4)
+            self.refilled = now
+            if self.in_flight >= self.capacity:
+                outcome = '503'
+            elif self.tokens < 1:
+                outcome = 'captcha' if self.captcha else '429'
+                if not self.captcha and now >= self.blocked_until:
+                    self.blocked_from = now + RETRY_AFTER_GRACE
+                    self.blocked_until = now + self.retry_after
+            else:
+                self.tokens -= 1
+                self.in_flight += 1
+                outcome = 'ok'
+            self.counts[outcome] += 1
+            return outcome
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        outcome = self.server.admit()
+        if outcome == 'ok':
+            # Slower the more requests are being served, like a loaded backend
+            busy = self.server.in_flight / max(self.server.capacity / 2, 1)
+            time.sleep(self.server.latency * max(busy, 1.0))
+            with self.server.lock:
+                self.server.in_flight -= 1
+            self.reply(200, PRODUCT_PAGE)
+        elif outcome == 'captcha':
+            time.sleep(self.server.latency)
+            self.reply(200, CAPTCHA_PAGE)
+        elif outcome == '429':
+            self.reply(429, b'slow down', {'Retry-After': str(self.server.retry_after)})
+        else:
+            self.reply(503, b'busy')
+
+    def reply(self, status: int, body: bytes, headers: dict = None):
+        self.send_response(status)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+async def fetch_all(engine, urls):
+    async with engine._session() as session:
+        pages = await asyncio.gather(*(engine.fetch(session, url, 'amazon') for url in urls))
+    return pages
+
+def run(server, base_url, pages, per_host=None, limits=None):
+    import aiohttp
+    from scrapers.engine import ScrapeEngine
+    from scrapers.parsers import is_blocked
+
+    server.reset()
+    engine = ScrapeEngine(concurrency=64, per_host=per_host, limits=limits)
+    # Every URL is queued at once; aiohttp counts waiting for a pooled connection
+    # against the connect timeout, which the fixed limits would otherwise run into
+    engine.timeout = aiohttp.ClientTimeout(total=600)
+    start_window = None
+    if limits is not None:
+        limits.load()
+        start_window = limits.get('127.0.0.1').limit
+    start = time.perf_counter()
+    fetched = asyncio.run(fetch_all(engine, [f"{base_url}/dp/B0STUB{n:04d}" for n in range(pages)]))
+    elapsed = time.perf_counter() - start
+    if limits is not None:
+        limits.flush()
+
+    ok = sum(1 for page in fetched if page is not None and not is_blocked(page.text))
+    requests = sum(server.counts.values())
+    throttled = requests - server.counts['ok']
+    report = {
+        'pages': pages,
+        'fetched': ok,
+        'elapsed_seconds': round(elapsed, 2),
+        'pages_per_second': round(ok / elapsed, 1),
+        'requests': requests,
+        'throttled': throttled,
+        'throttled_share': round(throttled / requests, 3) if requests else 0,
+        'responses': dict(server.counts),
+        'early_requests': server.early,
+    }
+    if limits is not None:
+        report['start_window'] = round(start_window, 2)
+        report['end_window'] = limits.summary()['127.0.0.1']['concurrency']
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pages', type=int, default=600, help='pages fetched per run')
+    parser.add_argument('--rate', type=float, default=40, help='requests per second the stub allows')
+    parser.add_argument('--capacity', type=int, default=8, help='requests in flight the stub allows')
+    parser.add_argument('--latency-ms', type=float, default=50, help='stub response time when not busy')
+    parser.add_argument('--retry-after', type=int, default=1, help='Retry-After seconds on a 429')
+    parser.add_argument('--captcha', action='store_true', help='answer over-rate requests with a captcha page')
+    parser.add_argument('--fixed-low', type=int, default=2, help='fixed per-host limit, below capacity')
+    parser.add_argument('--fixed-high', type=int, default=16, help='fixed per-host limit, above capacity')
+    parser.add_argument('--json', help='write results to this JSON file')
+    args = parser.parse_args()
+
+    from config import Config
+    from scrapers.host_limits import HostLimits
+    from storage import reset_databases
+
+    server = StubMarketplace(args.rate, args.capacity, args.latency_ms / 1000, args.captcha, args.retry_after)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    runs = {}
+    failures = []
+
+    with tempfile.TemporaryDirectory(prefix='sastasmart-hosts-') as workdir:
+        Config.DATABASE_URL = f"sqlite:///{workdir}"
+        reset_databases()
+        try:
+            runs[f'fixed {args.fixed_low}'] = run(server, base_url, args.pages, per_host=args.fixed_low)
+            runs[f'fixed {args.fixed_high}'] = run(server, base_url, args.pages, per_host=args.fixed_high)
+            limits = HostLimits()
+            runs['adaptive, run 1'] = run(server, base_url, args.pages, limits=limits)
+            runs['adaptive, run 2'] = run(server, base_url, args.pages, limits=limits)
+        finally:
+            server.shutdown()
+            reset_databases()
+
+    print(f"stub: {args.rate:g} requests/s, {args.capacity} in flight, {args.latency_ms:g}ms, "
+          f"over-rate answer: {'captcha' if args.captcha else f'429, Retry-After {args.retry_after}s'}")
+    print(f"  {'limits':16} {'pages/s':>8} {'fetched':>8} {'requests':>9} {'throttled':>10} {'early':>6} {'window':>12}")
+    for name, report in runs.items():
+        window = f"{report['start_window']:g} -> {report['end_window']:g}" if 'end_window' in report else ''
+        print(f"  {name:16} {report['pages_per_second']:8.1f} {report['fetched']:8d} {report['requests']:9d} "
+              f"{report['throttled_share']:10.1%} {report['early_requests']:6d} {window:>12}")
+
+    high = runs[f'fixed {args.fixed_high}']
+    best_fixed = max((report['pages_per_second'] for name, report in runs.items()
+                      if name.startswith('fixed') and report['fetched'] == args.pages), default=0)
+    first, second = runs['adaptive, run 1'], runs['adaptive, run 2']
+    for name in ('adaptive, run 1', 'adaptive, run 2'):
+        report = runs[name]
+        if report['throttled_share'] >= 0.1 or report['throttled_share'] >= high['throttled_share']:
+            failures.append(f"throttling: {name} throttled on {report['throttled_share']:.1%} of requests "
+                            f"(fixed {args.fixed_high}: {high['throttled_share']:.1%})")
+        if report['pages_per_second'] < best_fixed * 0.75:
+            failures.append(f"goodput: {name} {report['pages_per_second']} pages/s, best fixed limit {best_fixed}")
+        if report['early_requests']:
+            failures.append(f"retry-after: {name} sent {report['early_requests']} requests during a Retry-After")
+    if abs(second['start_window'] - first['end_window']) > 0.01:
+        failures.append(f"persisted: run 2 started at {second['start_window']}, run 1 ended at {first['end_window']}")
+
+    for failure in failures:
+        print(f"  FAILED {failure}")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'rate': args.rate, 'capacity': args.capacity, 'latency_ms': args.latency_ms,
+                       'captcha': args.captcha, 'runs': runs, 'failures': failures}, f, indent=2)
+    if failures:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+"""
+Product images for reel renders: per-render download vs the shared image cache
+
+Serves generated product photos (large JPEGs) from a local HTTP server
+with an artificial delay, then has render threads ask for them the way
+the reel renderer does - several renders and reposts of each product -
+first with the old download-and-resize-per-render code, then through
+image_cache.ImageCache:
+
+    python benchmarks/image_renders.py
+    python benchmarks/image_renders.py --products 40 --renders 5 --threads 8 --latency-ms 150 --json images.json
+
+Checks, exiting non-zero if one fails:
+
+    downloads     each image is downloaded once however often it is rendered
+    resizes       each variant of each image is resized once
+    single-flight threads asking for the same image at the same moment
+                  share one download and one resize
+    revalidate    a URL fetched again after its TTL that serves the same
+                  bytes keeps its derivatives (no new resize)
+    eviction      with a small budget the cache stays under it, keeps the
+                  most recently used images and still serves evicted ones
+    hosts         URLs outside IMAGE_HOSTS, directly or through a redirect,
+                  are not fetched
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Add parent directory to path to import the image cache
+sys.path.append(REPO_DIR)
+
+from PIL import Image, ImageDraw
+
+def product_photo(n: int, size: int) -> bytes:
+    """A product-shot-like JPEG: white background, a coloured shape, some texture"""
+    rng = random.Random(n)
+    img = Image.new('RGB', (size, int(size * rng.uniform(0.75, 1.25))), 'white')
+    draw = ImageDraw.Draw(img)
+    for _ in range(60):
+        x, y = rng.randrange(img.width), rng.randrange(img.height)
+        r = rng.randrange(20, size // 4)
+        draw.ellipse((x - r, y - r, x + r, y + r),
+                     fill=(rng.randrange(256), rng.randrange(256), rng.randrange(256)))
+    buffer = BytesIO()
+    img.save(buffer, 'JPEG', quality=92)
+    return buffer.getvalue()
+
+class ImageServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, photos, latency: float):
+        super().__init__(('127.0.0.1', 0), ImageHandler)
+        self.photos = photos
+        self.latency = latency
+        self.requests = 0
+        self.lock = threading.Lock()
+
+    def handle_error(self, request, client_address):
+        pass
+
+class ImageHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        with self.server.lock:
+            self.server.requests += 1
+        if self.path.startswith('/away/'):
+            # Off the allowed hosts: the same server under another name
+            return self.redirect(f"http://localhost:{self.server.server_address[1]}/img/0.jpg")
+        time.sleep(self.server.latency)
+        # /img/<n>.jpg, with any query string (the same picture under several URLs)
+        n = int(self.path.split('?')[0].rsplit('/', 1)[1].split('.')[0])
+        data = self.server.photos[n % len(self.server.photos)]
+        self.send_response(200)
+        self.send_header('Content-Type', 'image/jpeg')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def redirect(self, location: str):
+        self.send_response(302)
+        self.send_header('Location', location)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+def download_and_resize(url: str, path: str) -> str:
+    """What InstagramReelsUploader.download_product_image did before the cache"""
+    import requests
+    response = requests.get(url)
+    response.raise_for_status()
+    with open(path, 'wb') as f:
+        f.write(response.content)
+    with Image.open(path) as img:
+        if img.mode != 'RGB':
+            img = img.convert('RGB')
+        img = img.resize((1080, 1080), Image.Resampling.LANCZOS)
+        img.save(path, 'JPEG', quality=90)
+    return path
+
+def render_jobs(urls, renders: int):
+    jobs = [url for url in urls for _ in range(renders)]
+    random.Random(7).shuffle(jobs)
+    return jobs
+
+def timed_jobs(threads: int, fn, jobs):
+    start = time.perf_counter()
+    with ThreadPoolExecutor(threads) as pool:
+        results = list(pool.map(fn, jobs))
+    return results, time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--products', type=int, default=24)
+    parser.add_argument('--renders', type=int, default=4, help='renders (templates, reposts) per product')
+    parser.add_argument('--threads', type=int, default=6, help='concurrent render jobs')
+    parser.add_argument('--size', type=int, default=1500, help='source photo width in pixels')
+    parser.add_argument('--latency-ms', type=float, default=100, help='server delay per image')
+    parser.add_argument('--json', help='write results to this JSON file')
+    args = parser.parse_args()
+
+    from config import Config
+    from image_cache import VARIANTS, ImageCache
+
+    # The stub server stands in for the marketplace CDNs
+    Config.IMAGE_HOSTS = ('127.0.0.1',)
+    photos = [product_photo(n, args.size) for n in range(args.products)]
+    server = ImageServer(photos, args.latency_ms / 1000)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    urls = [f"{base_url}/img/{n}.jpg" for n in range(args.products)]
+    jobs = render_jobs(urls, args.renders)
+    failures = []
+    report = {'products': args.products, 'renders_per_product': args.renders, 'threads': args.threads,
+              'photo_kb': round(sum(map(len, photos)) / len(photos) / 1024)}
+
+    with tempfile.TemporaryDirectory(prefix='sastasmart-images-') as workdir:
+        # Before: every render downloads and resizes into its own file
+        scratch = os.path.join(workdir, 'scratch')
+        os.makedirs(scratch)
+        counter = iter(range(len(jobs)))
+        requests_before = server.requests
+        _, before_seconds = timed_jobs(
+            args.threads, lambda url: download_and_resize(url, os.path.join(scratch, f"{next(counter)}.jpg")), jobs)
+        report['per_render'] = {'seconds': round(before_seconds, 2), 'downloads': server.requests - requests_before,
+                                'resizes': len(jobs)}
+
+        # After: the shared cache
+        cache = ImageCache(os.path.join(workdir, 'cache'), max_bytes=1 << 30)
+        requests_before = server.requests
+        paths, after_seconds = timed_jobs(args.threads, cache.get, jobs)
+        downloads = server.requests - requests_before
+        report['cached'] = dict(cache.summary(), seconds=round(after_seconds, 2), server_requests=downloads)
+        if None in paths:
+            failures.append('cached: some renders got no image')
+        if downloads != args.products:
+            failures.append(f"downloads: {downloads} downloads for {args.products} images")
+        if cache.stats['resized'] != args.products:
+            failures.append(f"resizes: {cache.stats['resized']} resizes for {args.products} images")
+
+        # Reposts a day later, all three variants: no downloads, one resize per new variant
+        requests_before = server.requests
+        resized_before = cache.stats['resized']
+        _, repost_seconds = timed_jobs(args.threads, cache.prefetch, urls)
+        _, repost_again_seconds = timed_jobs(args.threads, cache.prefetch, urls)
+        new_resizes = cache.stats['resized'] - resized_before
+        report['reposts'] = {'seconds': round(repost_seconds, 2), 'again_seconds': round(repost_again_seconds, 3),
+                             'downloads': server.requests - requests_before, 'resizes': new_resizes}
+        if server.requests != requests_before:
+            failures.append(f"downloads: reposts downloaded {server.requests - requests_before} images again")
+        if new_resizes != args.products * (len(VARIANTS) - 1):
+            failures.append(f"resizes: {new_resizes} resizes for {args.products * (len(VARIANTS) - 1)} new variants")
+
+        # Single flight: many threads, one new image, same moment
+        flight = ImageCache(os.path.join(workdir, 'flight'), max_bytes=1 << 30)
+        requests_before = server.requests
+        barrier = threading.Barrier(args.threads * 2)
+
+        def racing_get(_):
+            barrier.wait()
+            return flight.get(f"{base_url}/img/0.jpg")
+
+        paths, _ = timed_jobs(args.threads * 2, racing_get, range(args.threads * 2))
+        report['single_flight'] = dict(flight.summary(), server_requests=server.requests - requests_before)
+        if len(set(paths)) != 1 or server.requests - requests_before != 1 or flight.stats['resized'] != 1:
+            failures.append(f"single-flight: {server.requests - requests_before} downloads, "
+                            f"{flight.stats['resized']} resizes, {len(set(paths))} paths for one image")
+
+        # Revalidation after the URL TTL: same bytes, so no new derivatives
+        ttl = Config.IMAGE_URL_TTL
+        Config.IMAGE_URL_TTL = -1
+        try:
+            resized_before = cache.stats['resized']
+            requests_before = server.requests
+            for url in urls[:5]:
+                cache.get(url)
+        finally:
+            Config.IMAGE_URL_TTL = ttl
+        report['revalidate'] = {'downloads': server.requests - requests_before,
+                                'resizes': cache.stats['resized'] - resized_before}
+        if report['revalidate']['downloads'] != 5 or report['revalidate']['resizes']:
+            failures.append(f"revalidate: {report['revalidate']}")
+
+        # Eviction: a budget of about a third of the working set
+        per_image = sum(os.path.getsize(os.path.join(root, name))
+                        for root, _, names in os.walk(os.path.join(workdir, 'cache', 'objects'))
+                        for name in names) / args.products
+        budget = int(per_image * args.products / 3)
+        small = ImageCache(os.path.join(workdir, 'small'), max_bytes=budget)
+        for url in urls:
+            small.prefetch(url)
+            time.sleep(0.01)  # distinct mtimes
+        used, _ = small._disk_usage()
+        requests_before = server.requests
+        recent_ok = all(small.get(url) for url in urls[-3:])
+        recent_downloads = server.requests - requests_before
+        evicted_ok = small.get(urls[0]) is not None
+        report['eviction'] = dict(small.summary(), budget=budget, disk_bytes=used,
+                                  recent_redownloads=recent_downloads)
+        if used > budget:
+            failures.append(f"eviction: {used} bytes on disk over a {budget} budget")
+        if not small.stats['evicted']:
+            failures.append('eviction: nothing evicted')
+        if not recent_ok or recent_downloads:
+            failures.append(f"eviction: most recent images downloaded again ({recent_downloads})")
+        if not evicted_ok:
+            failures.append('eviction: an evicted image could not be fetched again')
+
+        # Hosts: another host name, and a redirect to it, are refused without a download
+        guarded = ImageCache(os.path.join(workdir, 'guarded'), max_bytes=1 << 30)
+        requests_before = server.requests
+        refused = [guarded.get(f"http://localhost:{server.server_address[1]}/img/0.jpg"),
+                   guarded.get(f"{base_url}/away/0.jpg")]
+        report['hosts'] = dict(guarded.summary(), server_requests=server.requests - requests_before)
+        if any(refused) or guarded.stats['downloads'] or server.requests - requests_before > 1:
+            failures.append(f"hosts: fetched an image outside IMAGE_HOSTS ({report['hosts']})")
+
+    server.shutdown()
+
+    per_render, cached = report['per_render'], report['cached']
+    print(f"{args.products} products x {args.renders} renders, {args.threads} threads, "
+          f"{report['photo_kb']} KB photos, {args.latency_ms:g}ms per download")
+    print(f"  per-render download: {per_render['seconds']:6.2f}s  downloads {per_render['downloads']:4d}  "
+          f"resizes {per_render['resizes']:4d}")
+    print(f"  image cache:         {cached['seconds']:6.2f}s  downloads {cached['server_requests']:4d}  "
+          f"resizes {cached['resized']:4d}  hits {cached['hits']:4d}  coalesced {cached['coalesced']:3d}")
+    print(f"  reposts, all variants: {report['reposts']['seconds']}s (downloads {report['reposts']['downloads']}, "
+          f"resizes {report['reposts']['resizes']}), again {report['reposts']['again_seconds']}s")
+    print(f"  single flight: {args.threads * 2} threads -> {report['single_flight']['server_requests']} download, "
+          f"{report['single_flight']['resized']} resize")
+    print(f"  eviction: {report['eviction']['disk_bytes'] / 1e6:.1f} MB on disk, budget "
+          f"{budget / 1e6:.1f} MB, {report['eviction']['evicted']} files evicted")
+
+    for failure in failures:
+        print(f"  FAILED {failure}")
+    if args.json:
+        report['failures'] = failures
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+    if failures:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
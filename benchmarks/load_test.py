@@ -0,0 +1,402 @@
+#!/usr/bin/env python3
+"""
+HTTP load generator for the click-tracking and API endpoints
+
+Starts a local server in a temporary directory filled with synthetic data
+(see synthetic_data.py), then drives it from asyncio workers over
+keep-alive connections for a fixed duration:
+
+    python benchmarks/load_test.py --server flask --scenario clicks --concurrency 32 --duration 30
+    python benchmarks/load_test.py --server gunicorn --scenario api --json api.json
+    python benchmarks/load_test.py --url http://127.0.0.1:5000 --db ./earnings.db --scenario clicks
+
+Short codes are drawn from a Zipf distribution over the codes in
+earnings.db, so a few hot deals take most of the traffic. The clicks
+scenario mixes in link-previewer bots (Telegram, Discord, WhatsApp...),
+which fetch every link as soon as it is posted. --mix overrides the
+request mix, e.g. --mix redirect=70,redirect_bot=30.
+"""
+
+import argparse
+import asyncio
+import bisect
+import json
+import os
+import random
+import socket
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from urllib.parse import urlparse
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Add parent directory to path to import main module
+sys.path.append(REPO_DIR)
+
+HUMAN_AGENTS = [
+    'Mozilla/5.0 (Linux; Android 14; SM-S918B) AppleWebKit/537.36 Chrome/124.0 Mobile Safari/537.36',
+    'Mozilla/5.0 (iPhone; CPU iPhone OS 17_4 like Mac OS X) AppleWebKit/605.1.15 Version/17.4 Mobile/15E148 Safari/604.1',
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 Chrome/124.0 Safari/537.36',
+]
+PREVIEWER_AGENTS = [
+    'TelegramBot (like TwitterBot)',
+    'Mozilla/5.0 (compatible; Discordbot/2.0; +https://discordapp.com)',
+    'WhatsApp/2.23.20.0',
+    'facebookexternalhit/1.1 (+http://www.facebook.com/externalhit_uatext.php)',
+    'Twitterbot/1.0',
+    'Slackbot-LinkExpanding 1.0 (+https://api.slack.com/robots)',
+]
+
+SCENARIOS = {
+    # Flask click tracker (earnings_tracker.py)
+    'clicks': {'redirect': 80, 'redirect_bot': 15, 'track_click': 5},
+    'redirects': {'redirect': 100},
+    # FastAPI app (main.py)
+    'api': {'health': 20, 'products': 40, 'queue': 20, 'dashboard': 20},
+}
+
+class ZipfSampler:
+    """Draws items with probability proportional to 1 / rank**exponent"""
+
+    def __init__(self, items, exponent: float, rng: random.Random):
+        self.items = list(items)
+        self.rng = rng
+        self.cumulative = []
+        total = 0.0
+        for rank in range(1, len(self.items) + 1):
+            total += 1.0 / rank ** exponent
+            self.cumulative.append(total)
+
+    def sample(self):
+        return self.items[bisect.bisect_left(self.cumulative, self.rng.random() * self.cumulative[-1])]
+
+class RequestMix:
+    """Builds (method, path, headers, body, kind) tuples for the configured mix"""
+
+    def __init__(self, mix: dict, short_codes, products, zipf_exponent: float, miss_rate: float, seed: int):
+        self.rng = random.Random(seed)
+        self.kinds = list(mix)
+        self.weights = [mix[kind] for kind in self.kinds]
+        self.codes = ZipfSampler(short_codes, zipf_exponent, self.rng) if short_codes else None
+        self.products = ZipfSampler(products, zipf_exponent, self.rng) if products else None
+        self.miss_rate = miss_rate
+
+        if self.codes is None and any(kind.startswith('redirect') for kind in self.kinds):
+            raise SystemExit('redirect requests need short codes: no clicks found in earnings.db')
+
+    def _short_code(self) -> str:
+        if self.rng.random() < self.miss_rate:
+            return f"zz{self.rng.getrandbits(24):06x}"  # unknown code, expected 404
+        return self.codes.sample()
+
+    def next(self):
+        kind = self.rng.choices(self.kinds, self.weights)[0]
+        agent = self.rng.choice(HUMAN_AGENTS)
+
+        if kind == 'redirect':
+            return 'GET', f"/go/{self._short_code()}", {'User-Agent': agent}, b'', kind
+        if kind == 'redirect_bot':
+            return 'GET', f"/go/{self._short_code()}", {'User-Agent': self.rng.choice(PREVIEWER_AGENTS)}, b'', kind
+        if kind == 'track_click':
+            product = self.products.sample()
+            body = json.dumps({
+                'product': product,
+                'platform': 'amazon' if product.get('affiliate_amazon') else 'flipkart'
+            }).encode()
+            return 'POST', '/api/track_click', {
+                'User-Agent': agent, 'Content-Type': 'application/json', 'Referer': 'https://t.me/'
+            }, body, kind
+        if kind == 'health':
+            return 'GET', '/health', {'User-Agent': agent}, b'', kind
+        if kind == 'products':
+            return 'GET', '/products?limit=50', {'User-Agent': agent}, b'', kind
+        if kind == 'queue':
+            return 'GET', '/queue?status=pending&limit=50', {'User-Agent': agent}, b'', kind
+        if kind == 'dashboard':
+            return 'GET', '/dashboard', {'User-Agent': agent}, b'', kind
+        raise SystemExit(f"unknown request kind: {kind}")
+
+class Connection:
+    """Minimal HTTP/1.1 keep-alive client on asyncio streams"""
+
+    def __init__(self, host: str, port: int, timeout: float):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.reader = None
+        self.writer = None
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except Exception:
+                pass
+        self.reader = self.writer = None
+
+    async def request(self, method: str, path: str, headers: dict, body: bytes) -> int:
+        reused = self.writer is not None
+        try:
+            return await self._request(method, path, headers, body)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            if not reused:
+                raise
+            # The server may close an idle keep-alive connection (e.g. a worker
+            # recycled by max_requests); like browsers, retry once on a new one
+            await self.close()
+            return await self._request(method, path, headers, body)
+
+    async def _request(self, method: str, path: str, headers: dict, body: bytes) -> int:
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.wait_for(
+                asyncio.open_connection(self.host, self.port), self.timeout)
+
+        lines = [f"{method} {path} HTTP/1.1", f"Host: {self.host}:{self.port}", f"Content-Length: {len(body)}"]
+        lines += [f"{name}: {value}" for name, value in headers.items()]
+        self.writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + body)
+        await self.writer.drain()
+        return await asyncio.wait_for(self._read_response(), self.timeout)
+
+    async def _read_response(self) -> int:
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise ConnectionError('server closed the connection')
+        version, status = status_line.split(b' ', 2)[:2]
+
+        length, chunked, keep_alive = None, False, version == b'HTTP/1.1'
+        while True:
+            line = await self.reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.partition(b':')
+            name, value = name.strip().lower(), value.strip().lower()
+            if name == b'content-length':
+                length = int(value)
+            elif name == b'transfer-encoding' and b'chunked' in value:
+                chunked = True
+            elif name == b'connection':
+                keep_alive = value == b'keep-alive' or (keep_alive and value != b'close')
+
+        if chunked:
+            while True:
+                size = int((await self.reader.readline()).split(b';')[0], 16)
+                await self.reader.readexactly(size + 2)
+                if size == 0:
+                    break
+        elif length is not None:
+            await self.reader.readexactly(length)
+        else:
+            await self.reader.read()
+            keep_alive = False
+
+        if not keep_alive:
+            await self.close()
+        return int(status)
+
+async def worker(host, port, mix: RequestMix, deadline: float, timeout: float, results: list):
+    connection = Connection(host, port, timeout)
+    while time.perf_counter() < deadline:
+        method, path, headers, body, kind = mix.next()
+        start = time.perf_counter()
+        try:
+            status = await connection.request(method, path, headers, body)
+        except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError) as e:
+            status = type(e).__name__
+            await connection.close()
+        results.append((kind, status, time.perf_counter() - start))
+    await connection.close()
+
+def percentile(sorted_samples, fraction: float) -> float:
+    return sorted_samples[min(len(sorted_samples) - 1, int(len(sorted_samples) * fraction))]
+
+def summarize(samples, elapsed: float) -> dict:
+    latencies = sorted(latency for _, _, latency in samples)
+    statuses = Counter(str(status) for _, status, _ in samples)
+    # 404s for unknown short codes are expected traffic, not failures
+    errors = sum(count for status, count in statuses.items() if not status.isdigit() or int(status) >= 500)
+    if not latencies:
+        return {'requests': 0, 'errors': 0}
+    return {
+        'requests': len(samples),
+        'throughput_rps': round(len(samples) / elapsed, 1),
+        'mean_ms': round(statistics.fmean(latencies) * 1000, 3),
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 3),
+        'p90_ms': round(percentile(latencies, 0.90) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 3),
+        'max_ms': round(latencies[-1] * 1000, 3),
+        'errors': errors,
+        'error_rate': round(errors / len(samples), 4),
+        'status_codes': dict(sorted(statuses.items())),
+    }
+
+async def run_load(host, port, mix: RequestMix, concurrency: int, duration: float,
+                   warmup: float, timeout: float) -> dict:
+    if warmup > 0:
+        await asyncio.gather(*(worker(host, port, mix, time.perf_counter() + warmup, timeout, [])
+                               for _ in range(concurrency)))
+
+    results = []
+    started = time.perf_counter()
+    deadline = started + duration
+    await asyncio.gather(*(worker(host, port, mix, deadline, timeout, results) for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    by_kind = {}
+    for sample in results:
+        by_kind.setdefault(sample[0], []).append(sample)
+    return {
+        'overall': summarize(results, elapsed),
+        'by_kind': {kind: summarize(samples, elapsed) for kind, samples in sorted(by_kind.items())},
+        'elapsed_seconds': round(elapsed, 2),
+    }
+
+def load_targets(db_path: str, limit: int):
+    """Short codes and products ranked by historical clicks (most clicked first)"""
+    if not db_path or not os.path.exists(db_path):
+        return [], []
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+    cursor.execute('''
+        SELECT short_link, product_id, product_name, affiliate_link, platform, MAX(product_price), COUNT(*) AS clicks
+        FROM clicks
+        GROUP BY short_link
+        ORDER BY clicks DESC
+        LIMIT ?
+    ''', (limit,))
+    rows = cursor.fetchall()
+    conn.close()
+
+    codes = [row[0].rsplit('/', 1)[-1] for row in rows if row[0]]
+    products = [{
+        'id': row[1],
+        'title': row[2],
+        'price': row[5] or 0,
+        'affiliate_amazon': row[3] if row[4] == 'amazon' else None,
+        'affiliate_flipkart': row[3] if row[4] != 'amazon' else None,
+    } for row in rows]
+    return codes, products
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def start_server(kind: str, workdir: str, port: int, workers: int) -> subprocess.Popen:
+    env = {**os.environ, 'PYTHONPATH': REPO_DIR + os.pathsep + os.environ.get('PYTHONPATH', ''),
+           'PORT': str(port), 'WEB_CONCURRENCY': str(workers)}
+    if kind == 'flask':
+        command = [sys.executable, '-c',
+                   f"from earnings_tracker import app; app.run(host='127.0.0.1', port={port}, threaded=True)"]
+    elif kind == 'uvicorn':
+        command = [sys.executable, '-m', 'uvicorn', 'main:app', '--host', '127.0.0.1',
+                   '--port', str(port), '--log-level', 'warning']
+    else:
+        command = [sys.executable, '-m', 'gunicorn', '-c', os.path.join(REPO_DIR, 'gunicorn.conf.py'),
+                   '--bind', f'127.0.0.1:{port}', 'main:app']
+    return subprocess.Popen(command, cwd=workdir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+def wait_for_port(port: int, process: subprocess.Popen, timeout: float = 60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise SystemExit(f"server exited with code {process.returncode}")
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=1):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise SystemExit('server did not start listening in time')
+
+def parse_mix(value: str) -> dict:
+    mix = {}
+    for part in value.split(','):
+        kind, _, weight = part.partition('=')
+        mix[kind.strip()] = float(weight or 1)
+    return mix
+
+def print_report(report: dict):
+    print(f"{'kind':14} {'requests':>9} {'rps':>9} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} {'errors':>7}")
+    rows = list(report['by_kind'].items()) + [('overall', report['overall'])]
+    for kind, stats in rows:
+        if not stats['requests']:
+            continue
+        print(f"{kind:14} {stats['requests']:9d} {stats['throughput_rps']:9.1f} {stats['p50_ms']:9.3f} "
+              f"{stats['p90_ms']:9.3f} {stats['p99_ms']:9.3f} {stats['errors']:7d}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--server', choices=['flask', 'uvicorn', 'gunicorn'],
+                        help='server to start locally (default: flask for clicks/redirects, uvicorn for api)')
+    parser.add_argument('--url', help='use an already running server instead of starting one')
+    parser.add_argument('--db', help='earnings.db to read short codes from when --url is given')
+    parser.add_argument('--scenario', choices=sorted(SCENARIOS), default='clicks')
+    parser.add_argument('--mix', help='request mix overriding the scenario, e.g. redirect=90,track_click=10')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=20, help='seconds of measured load')
+    parser.add_argument('--warmup', type=float, default=2, help='seconds of unmeasured load first')
+    parser.add_argument('--timeout', type=float, default=10, help='per-request timeout in seconds')
+    parser.add_argument('--products', type=int, default=2000, help='synthetic dataset size')
+    parser.add_argument('--zipf', type=float, default=1.1, help='Zipf exponent over short codes')
+    parser.add_argument('--miss-rate', type=float, default=0.02, help='share of unknown short codes')
+    parser.add_argument('--workers', type=int, default=2, help='gunicorn workers')
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--json', help='write results to this JSON file')
+    args = parser.parse_args()
+
+    mix = parse_mix(args.mix) if args.mix else SCENARIOS[args.scenario]
+    server_kind = args.server or ('uvicorn' if args.scenario == 'api' else 'flask')
+    process = None
+
+    with tempfile.TemporaryDirectory(prefix='sastasmart-load-') as workdir:
+        try:
+            if args.url:
+                target = urlparse(args.url)
+                host, port = target.hostname, target.port or 80
+                db_path = args.db
+            else:
+                from synthetic_data import generate
+                original_cwd = os.getcwd()
+                os.chdir(workdir)
+                try:
+                    generate(args.products, seed=args.seed)
+                finally:
+                    os.chdir(original_cwd)
+                host, port = '127.0.0.1', free_port()
+                process = start_server(server_kind, workdir, port, args.workers)
+                wait_for_port(port, process)
+                db_path = os.path.join(workdir, 'earnings.db')
+
+            codes, products = load_targets(db_path, limit=50000)
+            request_mix = RequestMix(mix, codes, products, args.zipf, args.miss_rate, args.seed)
+            report = asyncio.run(run_load(host, port, request_mix, args.concurrency,
+                                          args.duration, args.warmup, args.timeout))
+        finally:
+            if process is not None:
+                process.terminate()
+                try:
+                    process.wait(timeout=10)
+                except subprocess.TimeoutExpired:
+                    process.kill()
+
+    report.update({
+        'server': args.url or server_kind,
+        'scenario': args.scenario,
+        'mix': mix,
+        'concurrency': args.concurrency,
+        'zipf_exponent': args.zipf,
+        'short_codes': len(codes),
+    })
+    print_report(report)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Logging overhead in the click and posting paths
+
+Compares the old synchronous setup (basicConfig with FileHandler and
+StreamHandler) against the queued pipeline from logging_setup.py, with
+and without JSON lines and per-call-site sampling. Each path is also run
+with logging disabled, so the overhead is the difference to that baseline.
+
+    python benchmarks/logging_overhead.py --json logging.json
+
+Console output goes to /dev/null while measuring; the log file is real.
+"""
+
+import argparse
+import contextlib
+import json
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+# Add parent directory to path to import main module
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from synthetic_data import generate  # noqa: E402
+from data_layer import queue_due_posts  # noqa: E402
+
+def sync_setup(stream):
+    """What main.py did before logging_setup: every record written inline"""
+    root = logging.getLogger()
+    handlers = [logging.FileHandler(os.path.join('logs', 'sastasmart.log')), logging.StreamHandler(stream)]
+    for handler in handlers:
+        handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+        root.addHandler(handler)
+    root.setLevel(logging.INFO)
+
+    def teardown():
+        for handler in handlers:
+            root.removeHandler(handler)
+            handler.close()
+    return teardown
+
+def queued_setup(json_format: bool, sampled: bool):
+    def setup(stream):
+        import logging_setup
+        from config import Config
+
+        burst = Config.LOG_RATE_LIMIT_BURST
+        if not sampled:
+            Config.LOG_RATE_LIMIT_BURST = 0  # filter passes everything
+        with contextlib.redirect_stdout(stream):
+            logging_setup.configure_logging(level='INFO', json_format=json_format)
+        Config.LOG_RATE_LIMIT_BURST = burst
+        return logging_setup.shutdown_logging
+    return setup
+
+def disabled_setup(stream):
+    logging.getLogger().setLevel(logging.WARNING)
+    return lambda: None
+
+SETUPS = {
+    'disabled': disabled_setup,
+    'sync': sync_setup,
+    'queued': queued_setup(json_format=False, sampled=False),
+    'queued_json': queued_setup(json_format=True, sampled=False),
+    'queued_sampled': queued_setup(json_format=False, sampled=True),
+}
+
+def run_with(setup, func, repeat: int, prepare=None):
+    """Time func under a logging setup; drain_ms includes flushing queued records"""
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+
+    import logging_setup
+
+    samples, drains, dropped = [], [], 0
+    with open(os.devnull, 'w') as devnull:
+        for run in range(repeat + 1):
+            if prepare:
+                prepare()
+            teardown = setup(devnull)
+            start = time.perf_counter()
+            func()
+            caller = time.perf_counter() - start
+            dropped += logging_setup.dropped_records()
+            teardown()  # joins the writer thread for queued setups
+            total = time.perf_counter() - start
+            if run:
+                samples.append(caller)
+                drains.append(total)
+    return {
+        'caller_ms': round(statistics.median(samples) * 1000, 3),
+        'drain_ms': round(statistics.median(drains) * 1000, 3),
+        'dropped_records': dropped,  # queue overflow, summed over all runs
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--messages', type=int, default=20000, help='log calls in the micro benchmark')
+    parser.add_argument('--posts', type=int, default=500, help='due posts per process_posting_queue run')
+    parser.add_argument('--clicks', type=int, default=2000, help='track_click calls per run')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--json', help='write results to this JSON file')
+    args = parser.parse_args()
+
+    original_cwd = os.getcwd()
+    results = {}
+    with tempfile.TemporaryDirectory(prefix='sastasmart-logging-') as workdir:
+        os.chdir(workdir)
+        try:
+            with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+                generate(max(args.posts, 1000), links=1000, clicks=1000)
+                from main import SastaSmartMaster
+                from earnings_tracker import EarningsTracker
+                master = SastaSmartMaster()
+                tracker = EarningsTracker()
+
+                # Importing main configured the queued pipeline; each setup below installs its own
+                import logging_setup
+                logging_setup.shutdown_logging()
+
+            async def stub_send(platform, product_data, template_type):
+                return True
+            master.create_and_post_content = stub_send
+            master.process_posting_queue()
+
+            post_logger = logging.getLogger('main')
+
+            def log_lines():
+                for index in range(args.messages):
+                    post_logger.info(f"✅ Posted telegram content for product: Synthetic product {index}")
+
+            product = {'id': 1, 'title': 'Synthetic product 1', 'price': 999,
+                       'affiliate_amazon': 'https://www.amazon.in/dp/B000000001?tag=smartsasta07-21'}
+            user = {'ip': '10.0.0.1', 'user_agent': 'TelegramBot (like TwitterBot)', 'referrer': 'https://t.me/'}
+
+            def clicks():
+                for _ in range(args.clicks):
+                    tracker.track_click(product, 'amazon', user)
+
+            paths = {
+                'log_call': (log_lines, None),
+                'posting': (master.process_posting_queue, lambda: queue_due_posts(master, args.posts)),
+                'click': (clicks, None),
+            }
+            for path, (func, prepare) in paths.items():
+                results[path] = {name: run_with(setup, func, args.repeat, prepare) for name, setup in SETUPS.items()}
+        finally:
+            os.chdir(original_cwd)
+
+    print(f"{'path':10} {'setup':16} {'caller ms':>11} {'drained ms':>11} {'overhead':>9} {'dropped':>8}")
+    for path, by_setup in results.items():
+        baseline = by_setup['disabled']['caller_ms']
+        for name, stats in by_setup.items():
+            stats['overhead_ms'] = round(stats['caller_ms'] - baseline, 3)
+            print(f"{path:10} {name:16} {stats['caller_ms']:11.3f} {stats['drain_ms']:11.3f} {stats['overhead_ms']:9.3f} {stats['dropped_records']:8d}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'messages': args.messages, 'posts': args.posts, 'clicks': args.clicks,
+                       'results': results}, f, indent=2)
+
+if __name__ == '__main__':
+    main()
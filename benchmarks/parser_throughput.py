@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Product page parser throughput, per core, on the saved fixtures
+
+Parses each product page fixture in benchmarks/fixtures/ repeatedly in
+one thread and reports pages per second of CPU time for:
+
+    beautifulsoup  full tree with html.parser, selectors only (the original parser)
+    lxml-full      full lxml tree, selectors only
+    fast           structured data first, then lxml from the pack's scope (the default)
+
+    python benchmarks/parser_throughput.py
+    python benchmarks/parser_throughput.py --pad-kb 800 --seconds 3 --json parsers.json
+
+Real product pages carry hundreds of KB of inline script and style; the
+fixtures are trimmed, so --pad-kb adds that much inert <script>/<style>
+to the head and body to bring them back to a realistic size. Prices
+from every mode must agree with the baseline, or the run exits non-zero.
+"""
+
+import argparse
+import json
+import os
+import random
+import string
+import sys
+import time
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+# Add parent directory to path to import the scrapers
+sys.path.append(REPO_DIR)
+
+MODES = {
+    'beautifulsoup': {'backend': 'soup', 'structured': False, 'scoped': False},
+    'lxml-full': {'backend': 'lxml', 'structured': False, 'scoped': False},
+    'fast': {},
+}
+COMPARED_FIELDS = ('price', 'original_price', 'discount', 'in_stock')
+
+def filler(kilobytes: int, rng: random.Random) -> str:
+    """Inline script and style blocks like the ones that dominate real pages"""
+    chunks = []
+    size = 0
+    while size < kilobytes * 1024:
+        name = ''.join(rng.choices(string.ascii_letters, k=12))
+        chunks.append(f"<script>window.{name}=function(a,b){{return a&&b?a.concat(b):[{rng.random()}]}};"
+                      f"P.when('A','ready').execute(function(A){{A.declarative('{name}','click',function(e){{}})}});</script>\n"
+                      f"<style>.{name}{{margin:0 {rng.randint(1, 40)}px;display:flex}}.{name} a:hover{{color:#c45500}}</style>\n")
+        size += len(chunks[-1])
+    return ''.join(chunks)
+
+def padded(html: str, kilobytes: int, rng: random.Random) -> str:
+    if kilobytes <= 0:
+        return html
+    head = filler(kilobytes * 2 // 3, rng)
+    body = filler(kilobytes // 3, rng)
+    return html.replace('</head>', head + '</head>', 1).replace('</body>', body + '</body>', 1)
+
+def measure(parse, seconds: float) -> dict:
+    pages = 0
+    start_cpu = time.process_time()
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        parse()
+        pages += 1
+    cpu = time.process_time() - start_cpu
+    return {'pages': pages, 'cpu_seconds': round(cpu, 3), 'pages_per_core_second': round(pages / cpu, 1) if cpu else 0}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--seconds', type=float, default=2, help='measuring time per fixture and mode')
+    parser.add_argument('--pad-kb', type=int, default=500, help='inline script/style added to each page')
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--json', help='write results to this JSON file')
+    args = parser.parse_args()
+
+    from scrapers.parsers import default_backend, extract_product_fields, parse_product
+
+    if default_backend() != 'lxml':
+        raise SystemExit('lxml is not installed: pip install -r requirements.txt')
+
+    rng = random.Random(args.seed)
+    report = {'pad_kb': args.pad_kb, 'fixtures': {}}
+    mismatches = []
+
+    for name in sorted(os.listdir(FIXTURES_DIR)):
+        if not name.endswith('_product.html'):
+            continue
+        site = name.split('_')[0]
+        with open(os.path.join(FIXTURES_DIR, name), encoding='utf-8') as f:
+            html = padded(f.read(), args.pad_kb, rng)
+
+        url = f"https://example.invalid/{name}"
+        baseline = parse_product(site, html, url, **MODES['beautifulsoup'])
+        results = {'page_kb': len(html) // 1024, 'sources': extract_product_fields(site, html)[1]}
+
+        for mode, options in MODES.items():
+            product = parse_product(site, html, url, **options)
+            for field in COMPARED_FIELDS:
+                if (product or {}).get(field) != (baseline or {}).get(field):
+                    mismatches.append(f"{name} {mode}: {field} {product and product.get(field)!r} "
+                                      f"!= {baseline and baseline.get(field)!r}")
+            results[mode] = measure(lambda: parse_product(site, html, url, **options), args.seconds)
+
+        base_rate = results['beautifulsoup']['pages_per_core_second']
+        results['speedup'] = round(results['fast']['pages_per_core_second'] / base_rate, 1) if base_rate else None
+        report['fixtures'][name] = results
+
+    print(f"{'fixture':24} {'KB':>6} {'soup p/s':>10} {'lxml p/s':>10} {'fast p/s':>10} {'speedup':>8}  sources")
+    for name, results in report['fixtures'].items():
+        print(f"{name:24} {results['page_kb']:6d} {results['beautifulsoup']['pages_per_core_second']:10.1f} "
+              f"{results['lxml-full']['pages_per_core_second']:10.1f} {results['fast']['pages_per_core_second']:10.1f} "
+              f"{results['speedup']:7.1f}x  {', '.join(results['sources'])}")
+    for mismatch in mismatches:
+        print(f"  mismatch: {mismatch}")
+
+    if args.json:
+        report['mismatches'] = mismatches
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if mismatches:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
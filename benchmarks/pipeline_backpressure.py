@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Staged pipeline: backpressure, per-stage throughput and failure handling
+
+Runs pipeline.Pipeline with the same shape as the ingest pipeline: a
+fast async source, cheap thread stages, a thread stage that sleeps per
+item as a stand-in for the affiliate/database work, and a batching stage.
+
+    python benchmarks/pipeline_backpressure.py
+    python benchmarks/pipeline_backpressure.py --items 5000 --slow-ms 2 --queue-size 50 --json pipeline.json
+
+Checks, exiting non-zero if one fails:
+
+    bounded    no queue ever held more than its size, and the source
+               was held back: it spent time blocked, and finished no
+               sooner than the slow stage allowed
+    complete   every item came out of the last stage exactly once
+    workers    the slow stage with N workers runs close to N times faster
+    failure    a stage raising halfway stops the whole pipeline promptly
+               and run() re-raises the error
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Add parent directory to path to import the pipeline
+sys.path.append(REPO_DIR)
+
+class Boom(Exception):
+    pass
+
+def build(items: int, slow_seconds: float, workers: int, queue_size: int, fail_at: int = None):
+    from pipeline import Pipeline, Stage
+
+    async def source(_):
+        for n in range(items):
+            if n % 100 == 0:
+                await asyncio.sleep(0)  # like the scraper, which yields to fetches
+            yield {'n': n, 'price': 100 + n % 900, 'discount': n % 70}
+
+    def normalize(records):
+        for record in records:
+            yield dict(record, title=f"product {record['n']}")
+
+    def filter_(records):
+        for record in records:
+            if record['discount'] >= 0:
+                yield record
+
+    def slow(records):
+        for record in records:
+            if fail_at is not None and record['n'] == fail_at:
+                raise Boom(f"failed on item {fail_at}")
+            time.sleep(slow_seconds)
+            yield record
+
+    def batch(records):
+        pending = []
+        for record in records:
+            pending.append(record)
+            if len(pending) == 50:
+                yield from pending
+                pending = []
+        yield from pending
+
+    return Pipeline('benchmark', [
+        Stage('source', source, mode='async', queue_size=queue_size),
+        Stage('normalize', normalize, queue_size=queue_size),
+        Stage('filter', filter_, queue_size=queue_size),
+        Stage('slow', slow, workers=workers, queue_size=queue_size),
+        Stage('batch', batch, queue_size=queue_size),
+    ])
+
+def run_once(items, slow_seconds, workers, queue_size):
+    seen = []
+    pipeline = build(items, slow_seconds, workers, queue_size)
+    start = time.perf_counter()
+    stages = pipeline.run(sink=lambda record: seen.append(record['n']))
+    return stages, seen, time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--items', type=int, default=2000)
+    parser.add_argument('--slow-ms', type=float, default=1.0, help='per-item sleep in the slow stage')
+    parser.add_argument('--workers', type=int, default=4, help='threads for the slow stage in the workers check')
+    parser.add_argument('--queue-size', type=int, default=100)
+    parser.add_argument('--json', help='write results to this JSON file')
+    args = parser.parse_args()
+
+    from pipeline import PipelineAborted
+
+    slow_seconds = args.slow_ms / 1000
+    failures = []
+    report = {'items': args.items, 'slow_ms': args.slow_ms, 'queue_size': args.queue_size}
+
+    stages, seen, elapsed = run_once(args.items, slow_seconds, 1, args.queue_size)
+    report['single_worker'] = {'seconds': round(elapsed, 3), 'stages': stages}
+    print(f"1 slow worker: {args.items} items in {elapsed:.2f}s")
+    print(f"  {'stage':10} {'in':>6} {'out':>6} {'items/s':>9} {'waiting s':>10} {'blocked s':>10} {'inbox max':>10}")
+    for name, stats in stages.items():
+        print(f"  {name:10} {stats['items_in']:6d} {stats['items_out']:6d} {stats['items_per_second']:9.1f} "
+              f"{stats['waiting_seconds']:10.3f} {stats['blocked_seconds']:10.3f} "
+              f"{stats['queue_high_water']:5d}/{stats['queue_size']}")
+
+    if any(stats['queue_high_water'] > stats['queue_size'] for stats in stages.values()):
+        failures.append('bounded: a queue grew past its size')
+    if stages['source']['blocked_seconds'] < elapsed * 0.5:
+        failures.append('bounded: the source was not held back by the slow stage')
+    if elapsed < args.items * slow_seconds:
+        failures.append('bounded: finished faster than the slow stage allows')
+    if sorted(seen) != list(range(args.items)):
+        failures.append(f"complete: {len(seen)} items out, {len(set(seen))} distinct, expected {args.items}")
+
+    stages, seen, parallel_elapsed = run_once(args.items, slow_seconds, args.workers, args.queue_size)
+    speedup = elapsed / parallel_elapsed if parallel_elapsed else 0
+    report['workers'] = {'workers': args.workers, 'seconds': round(parallel_elapsed, 3), 'speedup': round(speedup, 2)}
+    print(f"{args.workers} slow workers: {parallel_elapsed:.2f}s, {speedup:.1f}x")
+    if sorted(seen) != list(range(args.items)):
+        failures.append('complete: items lost or repeated with several workers')
+    if speedup < args.workers * 0.6:
+        failures.append(f"workers: {args.workers} workers only {speedup:.1f}x faster")
+
+    fail_at = args.items // 2
+    pipeline = build(args.items, slow_seconds, 1, args.queue_size, fail_at=fail_at)
+    start = time.perf_counter()
+    try:
+        pipeline.run()
+        failures.append('failure: run() returned despite a failing stage')
+        error = None
+    except Boom as e:
+        error = str(e)
+    except PipelineAborted:
+        error = 'aborted without the original error'
+        failures.append('failure: run() raised PipelineAborted instead of the stage error')
+    stop_seconds = time.perf_counter() - start - fail_at * slow_seconds
+    report['failure'] = {'error': error, 'seconds_after_failure': round(stop_seconds, 3)}
+    print(f"failing stage: run() raised {error!r}, stopped {max(stop_seconds, 0):.2f}s after the failure")
+    if stop_seconds > 1.0:
+        failures.append(f"failure: took {stop_seconds:.2f}s to stop")
+
+    for failure in failures:
+        print(f"  FAILED {failure}")
+    if args.json:
+        report['failures'] = failures
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+    if failures:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
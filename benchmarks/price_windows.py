@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Price history: bulk recording and 7/30-day aggregates on a large table
+
+Fills a throwaway SQLite database with --observations prices spread over
+--products products and the last 40 days, with price_history.PriceHistory:
+
+    record     record_many() of every observation in one transaction
+    cold       window_stats() for a product whose windows are not cached
+               (loaded from the table once)
+    warm       window_stats() on the cached windows, one new observation
+               recorded before each call, as upsert_product does
+    assess     assess_deal() on the cached windows
+
+    python benchmarks/price_windows.py
+    python benchmarks/price_windows.py --observations 1000000 --products 5000 --json prices.json
+
+Exits non-zero when an aggregate differs from a recount of the table,
+when recording takes longer than 10 us per observation, or when the
+median warm lookup is not at least 10 times faster than the cold one.
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Add parent directory to path to import the price history
+sys.path.append(REPO_DIR)
+
+DAY = 86400
+PRICE_POINTS = [0.8, 0.85, 0.9, 0.95, 1.0, 1.05]  # of a product's base price; sale prices repeat
+
+def observations(count: int, products: int, now: int, seed: int):
+    rng = random.Random(seed)
+    base = [rng.randrange(199, 49999) for _ in range(products)]
+    for n in range(count):
+        product_id = n % products + 1
+        yield product_id, now - rng.randrange(40 * DAY), round(base[product_id - 1] * rng.choice(PRICE_POINTS), 2)
+
+def recount(db, product_id: int, days: int, now: int):
+    conn = db.connect()
+    cursor = conn.cursor()
+    cursor.execute('''
+        SELECT price_paise FROM price_history WHERE product_id = ? AND observed_at > ? ORDER BY price_paise
+    ''', (product_id, now - days * DAY))
+    prices = [row[0] for row in cursor.fetchall()]
+    conn.close()
+    if not prices:
+        return None
+    count = len(prices)
+    return {'min': prices[0] / 100, 'max': prices[-1] / 100,
+            'median': (prices[(count - 1) // 2] + prices[count // 2]) / 2 / 100, 'count': count}
+
+def median_us(samples):
+    return round(statistics.median(samples) * 1e6, 1)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--observations', type=int, default=100000)
+    parser.add_argument('--products', type=int, default=1000)
+    parser.add_argument('--lookups', type=int, default=200, help='products looked up cold, warm and assessed')
+    parser.add_argument('--seed', type=int, default=11)
+    parser.add_argument('--json', help='write results to this JSON file')
+    args = parser.parse_args()
+
+    from config import Config
+    from price_history import PriceHistory
+    from storage import get_database, reset_databases
+
+    failures = []
+    with tempfile.TemporaryDirectory(prefix='sastasmart-prices-') as workdir:
+        Config.DATABASE_URL = f"sqlite:///{workdir}"
+        reset_databases()
+        try:
+            db = get_database('master')
+            history = PriceHistory(db)
+            now = int(time.time()) - 1
+
+            start = time.perf_counter()
+            recorded = history.record_many(observations(args.observations, args.products, now, args.seed))
+            record_seconds = time.perf_counter() - start
+
+            rng = random.Random(args.seed + 1)
+            sample = rng.sample(range(1, args.products + 1), min(args.lookups, args.products))
+            cold, warm, assess = [], [], []
+            for product_id in sample:
+                start = time.perf_counter()
+                history.window_stats(product_id, 30)
+                cold.append(time.perf_counter() - start)
+
+                history.record(product_id, rng.randrange(199, 49999), now + 1)
+                start = time.perf_counter()
+                history.window_stats(product_id, 30)
+                warm.append(time.perf_counter() - start)
+
+                start = time.perf_counter()
+                history.assess_deal(product_id, rng.randrange(199, 49999), rng.randrange(199, 49999))
+                assess.append(time.perf_counter() - start)
+
+            check_at = int(time.time())
+            for product_id in sample[:50]:
+                for days in history.windows_days:
+                    expected = recount(db, product_id, days, check_at)
+                    found = history._get_windows(product_id)[days].stats(check_at)
+                    if found != expected:
+                        failures.append(f"aggregates: product {product_id}, {days} days: {found} != {expected}")
+        finally:
+            reset_databases()
+
+    report = {
+        'observations': recorded,
+        'products': args.products,
+        'record_seconds': round(record_seconds, 3),
+        'record_us_per_observation': round(record_seconds / recorded * 1e6, 2),
+        'cold_median_us': median_us(cold),
+        'warm_median_us': median_us(warm),
+        'assess_median_us': median_us(assess),
+    }
+    print(f"record_many: {recorded} observations in {report['record_seconds']}s "
+          f"({report['record_us_per_observation']} us each)")
+    print(f"window_stats: cold {report['cold_median_us']} us, warm {report['warm_median_us']} us; "
+          f"assess_deal {report['assess_median_us']} us (medians over {len(sample)} products)")
+
+    if report['record_us_per_observation'] > 10:
+        failures.append(f"record: {report['record_us_per_observation']} us per observation")
+    if report['warm_median_us'] * 10 > report['cold_median_us']:
+        failures.append(f"warm: {report['warm_median_us']} us warm against {report['cold_median_us']} us cold")
+
+    for failure in failures[:20]:
+        print(f"  FAILED {failure}")
+    if args.json:
+        report['failures'] = failures
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+    if failures:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
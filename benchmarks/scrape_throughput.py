@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+"""
+Scraping engine throughput against saved marketplace pages
+
+Serves the HTML fixtures in benchmarks/fixtures/ from a local keep-alive
+HTTP server with an artificial per-response delay (to stand in for the
+real network), points the scraping engine at it and reports pages per
+second and the parsed products. Every product must come back with a
+title, price and image, so the run doubles as a parser check and exits
+non-zero when one does not:
+
+    python benchmarks/scrape_throughput.py
+    python benchmarks/scrape_throughput.py --limit 100 --latency-ms 200 --concurrency 64
+    python benchmarks/scrape_throughput.py --json scrape.json
+
+Listing pages are served for any page number, with product ids rewritten
+per page so every page links distinct products. They carry an ETag and
+answer If-None-Match with 304; product pages do not, so with --runs 2
+the second run shows both page-cache paths (304 and unchanged content
+hash) and their hit ratios. With --frontier the runs go through the
+crawl frontier, so a second run straight after the first finds nothing
+due. The cache and frontier live in a temporary directory.
+
+--pad-kb makes each product page that much bigger with ordinary nested
+markup, so that parsing rather than the network is the bottleneck;
+compare --parse-workers 1 (in-process) with the default process pool:
+
+    python benchmarks/scrape_throughput.py --latency-ms 5 --pad-kb 300 --no-cache --parse-workers 1
+    python benchmarks/scrape_throughput.py --latency-ms 5 --pad-kb 300 --no-cache --parse-workers 4
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import re
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+# Add parent directory to path to import the scrapers
+sys.path.append(REPO_DIR)
+
+AMAZON_ID = re.compile(r'(/dp/B0[A-Z0-9]{5})[A-Z0-9]{3}')
+FLIPKART_ID = re.compile(r'(/p/itm[0-9a-f]{10})[0-9a-f]{3}(\?pid=[A-Z0-9]{13})[A-Z0-9]{3}')
+
+def load_fixture(name: str) -> str:
+    with open(os.path.join(FIXTURES_DIR, name), encoding='utf-8') as f:
+        return f.read()
+
+def padding(kb: int) -> str:
+    """About `kb` KB of product-grid style markup for the parser to walk through"""
+    block = ('<div class="a-section review"><div class="a-row"><span class="a-size-base">'
+             'Works as described, good value for the price</span><a href="/gp/help">Report</a></div>'
+             '<ul class="a-unordered-list"><li><span>Helpful</span></li><li><span>Share</span></li></ul></div>\n')
+    return block * (kb * 1024 // len(block))
+
+def page_variant(html: str, page: int) -> str:
+    """Rewrite the last characters of each product id so pages list distinct products"""
+    suffix = f"{page:03d}"
+    html = AMAZON_ID.sub(lambda m: f"{m.group(1)}{suffix}", html)
+    return FLIPKART_ID.sub(lambda m: f"{m.group(1)}{suffix}{m.group(2)}{suffix.upper()}", html)
+
+class FixtureServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, latency: float, pad_kb: int = 0):
+        super().__init__(('127.0.0.1', 0), FixtureHandler)
+        self.latency = latency
+        self.pages = {name: load_fixture(name) for name in os.listdir(FIXTURES_DIR) if name.endswith('.html')}
+        if pad_kb:
+            for name in ('amazon_product.html', 'flipkart_product.html'):
+                self.pages[name] = self.pages[name].replace('</body>', padding(pad_kb) + '</body>', 1)
+        self.requests = 0
+        self.connections = 0
+        self.lock = threading.Lock()
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive, like the marketplaces
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        page = int(parse_qs(url.query).get('page', ['1'])[0])
+
+        etag = None
+        if url.path == '/s':
+            body = page_variant(self.server.pages['amazon_listing.html'], page)
+        elif url.path == '/search':
+            body = page_variant(self.server.pages['flipkart_listing.html'], page)
+        elif '/dp/' in url.path:
+            body = self.server.pages['amazon_product.html']
+        elif '/p/itm' in url.path:
+            body = self.server.pages['flipkart_product.html']
+        else:
+            body = None
+
+        if body is not None and url.path in ('/s', '/search'):
+            etag = '"' + hashlib.sha1(body.encode('utf-8')).hexdigest() + '"'
+
+        with self.server.lock:
+            self.server.requests += 1
+        time.sleep(self.server.latency)
+
+        if etag is not None and self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        data = (body or 'not found').encode('utf-8')
+        self.send_response(200 if body is not None else 404)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        if etag is not None:
+            self.send_header('ETag', etag)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+def fixture_sources(base_url: str, pages: int):
+    return [
+        {'site': 'amazon', 'category': 'electronics', 'pages': pages, 'url': f"{base_url}/s?k=electronics+deals"},
+        {'site': 'flipkart', 'category': 'electronics', 'pages': pages, 'url': f"{base_url}/search?q=electronics+offers"},
+    ]
+
+def check_product(product: dict) -> list:
+    problems = []
+    for field in ('title', 'price', 'original_price', 'image_url', 'url', 'category', 'platform'):
+        if not product.get(field):
+            problems.append(f"missing {field}")
+    if product.get('original_price', 0) < product.get('price', 0):
+        problems.append('original_price below price')
+    return problems
+
+async def run_scrape(engine, sources, limit):
+    products = []
+    first_product_at = None
+    start = time.perf_counter()
+    async for product in engine.stream(sources, limit):
+        if first_product_at is None:
+            first_product_at = time.perf_counter() - start
+        products.append(product)
+    return products, time.perf_counter() - start, first_product_at
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--limit', type=int, help='products per run (default: Config.MAX_PRODUCTS_PER_RUN)')
+    parser.add_argument('--pages', type=int, default=3, help='listing pages per source')
+    parser.add_argument('--latency-ms', type=float, default=100, help='server delay per response')
+    parser.add_argument('--concurrency', type=int, help='engine connection limit across hosts')
+    parser.add_argument('--per-host', type=int, help='engine connection limit per host')
+    parser.add_argument('--runs', type=int, default=1, help='scrape runs; later runs revalidate through the page cache')
+    parser.add_argument('--no-cache', action='store_true', help='scrape without the page cache')
+    parser.add_argument('--frontier', action='store_true', help='take due URLs from the crawl frontier')
+    parser.add_argument('--parse-workers', type=int, help='product parse processes; 1 parses in-process '
+                                                           '(default: Config.PARSE_WORKERS)')
+    parser.add_argument('--pad-kb', type=int, default=0, help='extra markup per product page, in KB')
+    parser.add_argument('--json', help='write results to this JSON file')
+    args = parser.parse_args()
+
+    from config import Config
+    from scrapers.engine import ScrapeEngine
+    from scrapers.frontier import CrawlFrontier
+    from scrapers.page_cache import PageCache
+    from storage import reset_databases
+
+    limit = args.limit or Config.MAX_PRODUCTS_PER_RUN
+    # Everything is served from one host here, so the per-host cap is the global one
+    per_host = args.per_host or args.concurrency or Config.SCRAPE_CONCURRENCY
+
+    server = FixtureServer(args.latency_ms / 1000, args.pad_kb)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    runs = []
+    failed = False
+
+    with tempfile.TemporaryDirectory(prefix='sastasmart-scrape-') as workdir:
+        Config.DATABASE_URL = f"sqlite:///{workdir}"
+        reset_databases()
+        cache = None if args.no_cache else PageCache()
+        frontier = CrawlFrontier() if args.frontier else None
+
+        try:
+            for run in range(1, args.runs + 1):
+                requests_before = server.requests
+                engine = ScrapeEngine(concurrency=args.concurrency, per_host=per_host, cache=cache, frontier=frontier,
+                                      parse_workers=args.parse_workers)
+                products, elapsed, first_product_at = asyncio.run(
+                    run_scrape(engine, fixture_sources(base_url, args.pages), limit))
+                pages_fetched = server.requests - requests_before
+
+                problems = {product['url']: check_product(product) for product in products}
+                problems = {url: issues for url, issues in problems.items() if issues}
+                # Later runs only return what changed or fell due; against static fixtures that is nothing
+                expected = limit if run == 1 or (cache is None and frontier is None) else 0
+                failed = failed or bool(problems) or len(products) < expected
+
+                report = {
+                    'run': run,
+                    'products': len(products),
+                    'limit': limit,
+                    'pages_fetched': pages_fetched,
+                    'elapsed_seconds': round(elapsed, 3),
+                    'first_product_seconds': round(first_product_at or 0, 3),
+                    'pages_per_second': round(pages_fetched / elapsed, 1) if elapsed else 0,
+                    'parse_workers': engine.parse_pool.workers if engine.parse_pool is not None else 1,
+                    'by_site': {site: sum(1 for product in products if product['platform'] == site)
+                                for site in ('amazon', 'flipkart')},
+                    'cache': cache.summary() if cache is not None else None,
+                    'frontier': frontier.summary() if frontier is not None else None,
+                    'invalid_products': problems,
+                }
+                runs.append(report)
+
+                print(f"run {run}: {report['products']} products from {report['pages_fetched']} pages in "
+                      f"{report['elapsed_seconds']}s ({report['pages_per_second']} pages/s, "
+                      f"{report['parse_workers']} parse worker(s), "
+                      f"first product after {report['first_product_seconds']}s); by site: {report['by_site']}")
+                for key, stats in (report['cache'] or {}).items():
+                    print(f"  cache {key:18} hit ratio {stats['hit_ratio']:6.1%}  304: {stats['not_modified']:4d}  "
+                          f"same content: {stats['unchanged']:4d}  changed: {stats['changed']:4d}  new: {stats['new']:4d}")
+                for kind, counts in (report['frontier'] or {}).items():
+                    print(f"  frontier {kind:8} tracked: {counts['tracked']:4d}  due: {counts['due']:4d}")
+                for url, issues in problems.items():
+                    print(f"  invalid: {url}: {', '.join(issues)}")
+        finally:
+            server.shutdown()
+            reset_databases()
+
+    print(f"{server.connections} connections opened over {args.runs} run(s)")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({
+                'latency_ms': args.latency_ms,
+                'concurrency': engine.concurrency,
+                'per_host': engine.per_host,
+                'pad_kb': args.pad_kb,
+                'connections_opened': server.connections,
+                'runs': runs,
+            }, f, indent=2)
+
+    if failed:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
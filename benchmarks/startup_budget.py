@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Import-time and cold-start budget check for web workers
+
+Runs `python -X importtime -c "import main"` in a fresh interpreter and
+reports the slowest imports, then measures a cold start of a worker
+(import main + get_master()) with its peak RSS. Exits non-zero when a
+budget is exceeded, so it can gate CI.
+
+    python benchmarks/startup_budget.py
+    python benchmarks/startup_budget.py --cold-start-budget-ms 800 --top 25
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+COLD_START_SNIPPET = '''
+import json, resource, time
+start = time.perf_counter()
+import main
+imported = time.perf_counter()
+main.get_master()
+ready = time.perf_counter()
+heavy = [name for name in ("pandas", "matplotlib", "moviepy", "telegram", "discord", "selenium")
+         if name in __import__("sys").modules]
+print(json.dumps({
+    "import_ms": (imported - start) * 1000,
+    "cold_start_ms": (ready - start) * 1000,
+    "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    "heavy_modules_loaded": heavy,
+}))
+'''
+
+def run_python(args, cwd):
+    env = dict(os.environ, PYTHONPATH=ROOT + os.pathsep + os.environ.get('PYTHONPATH', ''))
+    return subprocess.run([sys.executable] + args, cwd=cwd, env=env,
+                          capture_output=True, text=True, check=True)
+
+def import_time_report(cwd, top: int):
+    """Parse -X importtime output into (cumulative_us, self_us, module) rows"""
+    result = run_python(['-X', 'importtime', '-c', 'import main'], cwd)
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        self_us, cumulative_us, module = line[len('import time:'):].split('|')
+        rows.append((int(cumulative_us), int(self_us), module.rstrip()))
+    total = next((row[0] for row in rows if row[2].strip() == 'main'), 0)
+    return total, sorted(rows, reverse=True)[:top]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--import-budget-ms', type=float, default=500)
+    parser.add_argument('--cold-start-budget-ms', type=float, default=1000)
+    parser.add_argument('--rss-budget-mb', type=float, default=150)
+    parser.add_argument('--top', type=int, default=15, help='slowest imports to list')
+    parser.add_argument('--workdir', default=ROOT, help='directory holding the databases')
+    parser.add_argument('--json', help='write results to this JSON file')
+    args = parser.parse_args()
+
+    total_us, slowest = import_time_report(args.workdir, args.top)
+    print(f"import main (-X importtime): {total_us / 1000:.1f} ms")
+    print(f"{'cumulative ms':>14} {'self ms':>9}  module")
+    for cumulative_us, self_us, module in slowest:
+        print(f"{cumulative_us / 1000:14.1f} {self_us / 1000:9.1f}  {module}")
+
+    cold = json.loads(run_python(['-c', COLD_START_SNIPPET], args.workdir).stdout.strip().splitlines()[-1])
+    print(f"\ncold start (import + get_master): {cold['cold_start_ms']:.1f} ms, "
+          f"peak RSS {cold['max_rss_mb']:.1f} MB")
+    if cold['heavy_modules_loaded']:
+        print(f"heavy modules loaded eagerly: {', '.join(cold['heavy_modules_loaded'])}")
+
+    failures = []
+    if total_us / 1000 > args.import_budget_ms:
+        failures.append(f"import time {total_us / 1000:.1f} ms > {args.import_budget_ms} ms")
+    if cold['cold_start_ms'] > args.cold_start_budget_ms:
+        failures.append(f"cold start {cold['cold_start_ms']:.1f} ms > {args.cold_start_budget_ms} ms")
+    if cold['max_rss_mb'] > args.rss_budget_mb:
+        failures.append(f"RSS {cold['max_rss_mb']:.1f} MB > {args.rss_budget_mb} MB")
+    if cold['heavy_modules_loaded']:
+        failures.append("heavy modules imported during worker start")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'import_ms': total_us / 1000, **cold, 'failures': failures}, f, indent=2)
+
+    if failures:
+        print("\n❌ Budget exceeded: " + "; ".join(failures))
+        sys.exit(1)
+    print("\n✅ Startup within budget")
+
+if __name__ == '__main__':
+    main()
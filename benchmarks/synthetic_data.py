@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+Deterministic synthetic dataset generator for the SastaSmart databases
+
+Fills sastasmart_master.db, affiliate_links.db and earnings.db in the
+current (or --workdir) directory. The same seed and sizes always produce
+the same rows, so benchmark results are comparable between commits.
+
+    python benchmarks/synthetic_data.py --workdir /tmp/bench --products 100000 \\
+        --links 1000000 --clicks 10000000
+
+Never point --workdir at the repository root: existing databases there
+would be extended with synthetic rows.
+"""
+
+import argparse
+import functools
+import hashlib
+import json
+import os
+import random
+import sqlite3
+import sys
+import time
+from datetime import datetime, timedelta
+from urllib.parse import urlencode
+
+# Add parent directory to path to import main module
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+CATEGORIES = ['electronics', 'fashion', 'home_kitchen', 'books', 'sports_fitness',
+              'beauty_personal_care', 'automotive', 'toys_games']
+BRANDS = ['Samsung', 'Apple', 'boAt', 'Noise', 'Prestige', 'Philips', 'Nike', 'Puma',
+          'Lakme', 'Bosch', 'Lego', 'Mi', 'OnePlus', 'Realme', 'Havells', 'Sony']
+NOUNS = ['Smartphone', 'Earbuds', 'Smartwatch', 'Pressure Cooker', 'Air Fryer', 'Running Shoes',
+         'Backpack', 'Trimmer', 'Mixer Grinder', 'Bluetooth Speaker', 'Power Bank', 'Kettle']
+PLATFORMS = ['instagram', 'telegram', 'discord']
+TEMPLATES = ['flash_deal_template', 'product_showcase_template', 'discount_alert_template']
+USER_AGENTS = [
+    'Mozilla/5.0 (Linux; Android 14) AppleWebKit/537.36 Chrome/124.0 Mobile Safari/537.36',
+    'Mozilla/5.0 (iPhone; CPU iPhone OS 17_4 like Mac OS X) AppleWebKit/605.1.15 Mobile/15E148',
+    'TelegramBot (like TwitterBot)',
+    'Mozilla/5.0 (compatible; Discordbot/2.0; +https://discordapp.com)',
+]
+
+HISTORY_DAYS = 60          # clicks, links and products are spread over this window
+BATCH_ROWS = 50000         # rows per executemany call
+
+def _asin(index: int) -> str:
+    return f"B0{index:08d}"
+
+def _batched(rows, size=BATCH_ROWS):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def _fast_connect(path: str) -> sqlite3.Connection:
+    """Bulk-load connection: durability is irrelevant for throwaway benchmark data"""
+    conn = sqlite3.connect(path, timeout=30)
+    # The components keep the files in WAL mode, which cannot be switched off
+    # while their pooled connections are open
+    conn.execute('PRAGMA synchronous = OFF')
+    return conn
+
+@functools.lru_cache(maxsize=1)
+def _affiliate_url_parts():
+    from config import Config
+    params = {'ref_': 'sastasmart_deals', 'psc': '1', **Config.TRACKING_PARAMS}
+    return f"{Config.AMAZON_BASE_URL}/dp/", f"?tag={Config.AMAZON_AFFILIATE_TAG}&" + urlencode(params)
+
+def amazon_affiliate_url(index: int) -> str:
+    """Matches AffiliateManager.generate_amazon_affiliate_link output"""
+    prefix, suffix = _affiliate_url_parts()
+    return f"{prefix}{_asin(index)}{suffix}"
+
+def product_rows(count: int, seed: int, now: datetime):
+    rng = random.Random(seed)
+    for index in range(1, count + 1):
+        original_price = rng.randint(299, 60000)
+        discount = rng.randint(5, 80)
+        price = round(original_price * (100 - discount) / 100)
+        created_at = now - timedelta(seconds=rng.randint(0, HISTORY_DAYS * 86400))
+        title = f"{rng.choice(BRANDS)} {rng.choice(NOUNS)} {rng.choice(['Pro', 'Lite', 'Max', 'Neo', ''])} {index}".replace('  ', ' ')
+        yield (
+            index, title, price, original_price, discount,
+            f"https://www.amazon.in/dp/{_asin(index)}", None,
+            amazon_affiliate_url(index), None,
+            f"https://m.media-amazon.com/images/I/{_asin(index)}.jpg",
+            rng.choice(CATEGORIES), json.dumps(['Synthetic product']), 'amazon',
+            created_at, 'active', 0, 0, 0,
+            f"amazon:{_asin(index)}", 1, created_at, created_at
+        )
+
+def queue_rows(products: int, seed: int, now: datetime, due_fraction: float):
+    """Three posts per product; most finished, a few pending (due_fraction of them overdue)"""
+    rng = random.Random(seed + 1)
+    for product_id in range(1, products + 1):
+        for platform in PLATFORMS:
+            roll = rng.random()
+            if roll < 0.05:
+                status = 'pending'
+                offset = -rng.randint(1, 3600) if rng.random() < due_fraction else rng.randint(60, 86400)
+            else:
+                status = 'completed' if roll < 0.95 else 'failed'
+                offset = -rng.randint(3600, HISTORY_DAYS * 86400)
+            scheduled = now + timedelta(seconds=offset)
+            yield (product_id, platform, scheduled, rng.choice(TEMPLATES), status, scheduled)
+
+def link_rows(count: int, products: int, seed: int, now: datetime):
+    """The first link of each product is its current affiliate URL; the rest are regenerations"""
+    from config import Config
+    rng = random.Random(seed + 2)
+    rate = Config.COMMISSION_RATES['amazon']
+    for index in range(count):
+        product = index + 1 if index < products else rng.randint(1, products)
+        price = rng.randint(299, 50000)
+        clicks = int(rng.paretovariate(1.2)) - 1
+        conversions = sum(rng.random() < 0.04 for _ in range(min(clicks, 50)))
+        yield (
+            hashlib.md5(f"{seed}:{index}".encode()).hexdigest(),
+            f"https://www.amazon.in/dp/{_asin(product)}",
+            amazon_affiliate_url(product),
+            'amazon', str(product), f"Synthetic product {product}",
+            price, rate, price * rate,
+            now - timedelta(seconds=rng.randint(0, HISTORY_DAYS * 86400)),
+            clicks, conversions, round(conversions * price * rate, 2)
+        )
+
+def click_rows(count: int, products: int, seed: int, now: datetime):
+    """Clicks follow a Zipf-like popularity curve over products"""
+    rng = random.Random(seed + 3)
+    for index in range(count):
+        product = min(int(rng.paretovariate(0.8)), products)
+        platform = 'amazon' if rng.random() < 0.7 else 'flipkart'
+        price = rng.randint(299, 50000)
+        rate = 0.08 if platform == 'amazon' else 0.10
+        yield (
+            hashlib.md5(f"{seed}:click:{index}".encode()).hexdigest(),
+            str(product), f"Synthetic product {product}",
+            amazon_affiliate_url(product),
+            f"https://sastasmart.com/go/{hashlib.md5(str(product).encode()).hexdigest()[:8]}",
+            platform,
+            now - timedelta(seconds=rng.randint(0, HISTORY_DAYS * 86400)),
+            f"10.{index >> 16 & 255}.{index >> 8 & 255}.{index & 255}",
+            rng.choice(USER_AGENTS), 'https://t.me/', 'IN',
+            rate, price, price * rate, 'pending'
+        )
+
+def create_schemas():
+    """Let each component create its own tables so the schema never drifts"""
+    from main import SastaSmartMaster
+    from affiliated_manager import AffiliateManager
+    from earnings_tracker import EarningsTracker
+    from storage import reset_databases
+
+    reset_databases()  # pooled connections may still point at a previous working directory
+    SastaSmartMaster()
+    AffiliateManager()
+    EarningsTracker()
+
+def generate(products: int = 10000, links: int = None, clicks: int = None,
+             seed: int = 42, due_fraction: float = 0.2) -> dict:
+    """Fill the three databases in the current directory and return row counts"""
+    links = products * 10 if links is None else links
+    clicks = products * 100 if clicks is None else clicks
+    now = datetime.now().replace(microsecond=0)
+    started = time.perf_counter()
+
+    create_schemas()
+
+    conn = _fast_connect('sastasmart_master.db')
+    with conn:
+        for batch in _batched(product_rows(products, seed, now)):
+            conn.executemany('''
+                INSERT INTO products (
+                    id, title, price, original_price, discount_percent, amazon_url, flipkart_url,
+                    affiliate_amazon, affiliate_flipkart, image_url, category, features, platform,
+                    created_at, status, posted_instagram, posted_telegram, posted_discord,
+                    canonical_key, in_stock, updated_at, last_seen_at
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', batch)
+        for batch in _batched(queue_rows(products, seed, now, due_fraction)):
+            conn.executemany('''
+                INSERT INTO posting_queue (product_id, platform, scheduled_time, template_type, status, created_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', batch)
+        # Derived counters are rebuilt from the raw rows by the next SastaSmartMaster()
+        conn.execute('DELETE FROM posting_queue_stats')
+        conn.execute('DELETE FROM system_counters')
+    conn.close()
+
+    conn = _fast_connect('affiliate_links.db')
+    with conn:
+        for batch in _batched(link_rows(links, products, seed, now)):
+            conn.executemany('INSERT INTO affiliate_links VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', batch)
+    conn.close()
+
+    conn = _fast_connect('earnings.db')
+    with conn:
+        for batch in _batched(click_rows(clicks, products, seed, now)):
+            conn.executemany('INSERT INTO clicks VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', batch)
+    conn.close()
+
+    return {
+        'products': products,
+        'links': links,
+        'clicks': clicks,
+        'seed': seed,
+        'seconds': round(time.perf_counter() - started, 2)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workdir', required=True, help='directory the databases are written to')
+    parser.add_argument('--products', type=int, default=10000)
+    parser.add_argument('--links', type=int, help='default: 10 per product')
+    parser.add_argument('--clicks', type=int, help='default: 100 per product')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    os.makedirs(args.workdir, exist_ok=True)
+    os.chdir(args.workdir)
+    print(json.dumps(generate(args.products, args.links, args.clicks, args.seed), indent=2))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+"""
+Cross-marketplace product matching: lookup time against a large index, and match quality
+
+Builds a synthetic catalogue of phones, earbuds and TVs, titled the way
+Amazon and Flipkart title them (same item, different word order, units
+and selling points), on a throwaway SQLite database:
+
+    index    --products Amazon listings in the LSH buckets
+    lookup   --queries Flipkart listings of indexed items matched and
+             indexed one at a time with ProductMatcher.add(), as the
+             ingest pipeline does; reports per-product latency
+    quality  how many of those found their Amazon listing, and how many
+             Flipkart listings of a different variant (other storage or
+             screen size, never indexed) wrongly matched something
+
+    python benchmarks/title_matching.py
+    python benchmarks/title_matching.py --products 1000000 --queries 2000 --json matching.json
+
+Exits non-zero when recall is under 95%, an item matched the wrong
+listing, more than 5% of the variants matched, or the median lookup
+takes longer than 10 ms. Variant matches grow with --products because
+the generator reuses model numbers: at a million products some
+unrelated items share brand, number and sizes and differ only in the
+line name.
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Add parent directory to path to import the matcher
+sys.path.append(REPO_DIR)
+
+BRANDS = ['Samsung', 'Redmi', 'Realme', 'OnePlus', 'Vivo', 'Oppo', 'Motorola', 'iQOO', 'Poco', 'Nokia',
+          'boAt', 'Noise', 'JBL', 'Sony', 'Boult', 'pTron', 'LG', 'TCL', 'Hisense', 'Acer', 'Xiaomi', 'Panasonic']
+COLORS = ['Black', 'Blue', 'Green', 'Silver', 'Midnight Black', 'Ocean Blue', 'Smoky Teal', 'Lavender',
+          'Bold Black', 'Pearl White', 'Forest Green', 'Ice Blue', 'Graphite', 'Sunset Orange']
+SYLLABLES = ['ga', 'lax', 'no', 'va', 'zen', 'pro', 'ul', 'tra', 'fi', 'ne', 'ar', 'ko', 'mi', 'ro', 'te', 'on']
+PHONE_FEATURES = ['50MP Triple Cam', '6000 mAh Battery', '120Hz AMOLED Display', 'Snapdragon Processor',
+                  '67W Fast Charging', 'Android 14', 'IP54 Rated', 'Segment Fastest Charging']
+EARBUD_FEATURES = ['Low Latency Mode', 'ENx Tech', 'ASAP Charge', 'IPX5', 'Beast Mode', 'Dual Mics',
+                   'Touch Controls', 'BT v5.3', 'Deep Bass']
+TV_SERIES = ['Crystal', 'Bezel-less', 'QLED', 'iSmart', 'Vision', 'Android', 'Google', 'WebOS']
+
+def line_name(rng: random.Random) -> str:
+    return ''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 3))).capitalize()
+
+def model_code(rng: random.Random) -> str:
+    letters = ''.join(rng.choice('ABCDEFGHJKLMNPQRSTUVWXYZ') for _ in range(2))
+    return f"{letters}-{rng.randint(10, 99)}{rng.choice('ABCDEFGHJK')}{rng.randint(100, 999)}"
+
+def make_item(rng: random.Random) -> dict:
+    kind = rng.choice(['phone', 'earbuds', 'tv'])
+    item = {'kind': kind, 'brand': rng.choice(BRANDS), 'line': line_name(rng), 'color': rng.choice(COLORS),
+            'model': model_code(rng), 'number': rng.randint(100, 9999)}
+    if kind == 'phone':
+        item.update(ram=rng.choice([4, 6, 8, 12]), storage=rng.choice([64, 128, 256, 512]),
+                    features=rng.sample(PHONE_FEATURES, 2))
+    elif kind == 'earbuds':
+        item.update(hours=rng.choice([30, 40, 42, 50, 60, 100]), features=rng.sample(EARBUD_FEATURES, 2))
+    else:
+        item.update(inches=rng.choice([32, 43, 50, 55, 65]), series=rng.choice(TV_SERIES))
+    return item
+
+def variant(item: dict, rng: random.Random) -> dict:
+    """The same line in another size: a different item with a near-identical title"""
+    other = dict(item)
+    if item['kind'] == 'phone':
+        other['storage'] = rng.choice([size for size in (64, 128, 256, 512) if size != item['storage']])
+    elif item['kind'] == 'earbuds':
+        other['number'] = item['number'] + rng.randint(1, 9)
+        other['model'] = model_code(rng)
+    else:
+        other['inches'] = rng.choice([size for size in (32, 43, 50, 55, 65) if size != item['inches']])
+        other['model'] = model_code(rng)
+    return other
+
+def amazon_title(item: dict) -> str:
+    if item['kind'] == 'phone':
+        return (f"{item['brand']} {item['line']} {item['number']} 5G ({item['color']}, {item['ram']}GB, "
+                f"{item['storage']}GB Storage) | {item['features'][0]} | {item['features'][1]}")
+    if item['kind'] == 'earbuds':
+        return (f"{item['brand']} {item['line']} {item['number']} Bluetooth TWS Earbuds with {item['hours']}H "
+                f"Playtime, {item['features'][0]}, {item['features'][1]} ({item['color']})")
+    return (f"{item['brand']} {round(item['inches'] * 2.54)} cm ({item['inches']} inches) {item['series']} "
+            f"4K Ultra HD Smart LED TV {item['model']} ({item['color']})")
+
+def flipkart_title(item: dict) -> str:
+    if item['kind'] == 'phone':
+        return (f"{item['brand'].upper()} {item['line']} {item['number']} 5G ({item['color']}, "
+                f"{item['storage']} GB) ({item['ram']} GB RAM)")
+    if item['kind'] == 'earbuds':
+        return (f"{item['brand']} {item['line']} {item['number']} with {item['hours']} Hours Playtime, "
+                f"{item['features'][0]} Bluetooth Headset ({item['color']}, True Wireless)")
+    return (f"{item['brand'].upper()} {item['series']} {round(item['inches'] * 2.54)} cm ({item['inches']} inch) "
+            f"Ultra HD (4K) LED Smart TV ({item['model']})")
+
+def create_products_table(db):
+    conn = db.connect()
+    conn.execute('''
+        CREATE TABLE products (
+            id INTEGER PRIMARY KEY, title TEXT, platform TEXT, price REAL,
+            amazon_url TEXT, flipkart_url TEXT
+        )
+    ''')
+    conn.commit()
+    conn.close()
+
+def fill(db, matcher, items, batch: int = 20000) -> float:
+    """Amazon listings of `items` as products 1..n, bucketed as ProductMatcher.add() would"""
+    from product_matching import title_tokens
+
+    start = time.perf_counter()
+    conn = db.connect()
+    cursor = conn.cursor()
+    for first in range(0, len(items), batch):
+        products, buckets, indexed = [], [], []
+        for offset, item in enumerate(items[first:first + batch]):
+            product_id = first + offset + 1
+            title = amazon_title(item)
+            tokens = title_tokens(title)
+            products.append((product_id, title, 'amazon', 1000.0, f"https://www.amazon.in/dp/B{product_id:09d}"))
+            buckets.extend((bucket, product_id) for bucket in matcher.buckets(tokens))
+            indexed.append((product_id, 0, ' '.join(sorted(tokens))))
+        cursor.execute('BEGIN')
+        cursor.executemany('INSERT INTO products (id, title, platform, price, amazon_url) VALUES (?, ?, ?, ?, ?)',
+                           products)
+        buckets.sort()
+        cursor.executemany('INSERT INTO product_title_buckets (bucket, product_id) VALUES (?, ?)', buckets)
+        cursor.executemany('INSERT INTO product_title_index (product_id, title_hash, title_tokens) VALUES (?, ?, ?)',
+                           indexed)
+        conn.commit()
+    conn.close()
+    return time.perf_counter() - start
+
+def lookup(db, matcher, titles, first_id: int):
+    """ProductMatcher.add() for each Flipkart title in turn; (match or None, seconds) per title"""
+    conn = db.connect()
+    cursor = conn.cursor()
+    results = []
+    for offset, title in enumerate(titles):
+        product_id = first_id + offset
+        product = {'title': title, 'platform': 'flipkart', 'price': 999.0}
+        start = time.perf_counter()
+        cursor.execute('BEGIN')
+        cursor.execute('INSERT INTO products (id, title, platform, price, flipkart_url) VALUES (?, ?, ?, ?, ?)',
+                       (product_id, title, 'flipkart', 999.0, f"https://www.flipkart.com/p/itm{product_id:013x}"))
+        match = matcher.add(cursor, product_id, product)
+        conn.commit()
+        results.append((match, time.perf_counter() - start))
+    conn.close()
+    return results
+
+def percentile(values, share):
+    values = sorted(values)
+    return values[min(int(len(values) * share), len(values) - 1)] if values else 0.0
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--products', type=int, default=200000, help='indexed Amazon listings')
+    parser.add_argument('--queries', type=int, default=1000, help='Flipkart listings matched, and as many variants')
+    parser.add_argument('--seed', type=int, default=11)
+    parser.add_argument('--json', help='write results to this JSON file')
+    args = parser.parse_args()
+
+    from product_matching import ProductMatcher, title_similarity, title_tokens
+    from storage import SQLiteDatabase
+
+    rng = random.Random(args.seed)
+    items = [make_item(rng) for _ in range(args.products)]
+    queried = rng.sample(range(args.products), min(args.queries, args.products))
+
+    with tempfile.TemporaryDirectory(prefix='sastasmart-matching-') as workdir:
+        db = SQLiteDatabase(os.path.join(workdir, 'master.db'))
+        create_products_table(db)
+        matcher = ProductMatcher(db)
+        fill_seconds = fill(db, matcher, items)
+        database_mb = os.path.getsize(db.path) / 2**20
+        print(f"index: {args.products} products in {fill_seconds:.1f}s ({database_mb:.0f} MB)")
+
+        same = lookup(db, matcher, [flipkart_title(items[index]) for index in queried], args.products + 1)
+        variants = lookup(db, matcher, [flipkart_title(variant(items[index], rng)) for index in queried],
+                          args.products + len(queried) + 1)
+
+    found = sum(1 for (match, _), index in zip(same, queried) if match and match['id'] == index + 1)
+    wrong = sum(1 for (match, _), index in zip(same, queried) if match and match['id'] != index + 1)
+    false_variants = sum(1 for match, _ in variants if match)
+    seconds = [elapsed for _, elapsed in same + variants]
+
+    # What a pairwise scan would cost: one similarity check per stored product
+    sample = [title_tokens(amazon_title(item)) for item in items[:20000]]
+    query = title_tokens(flipkart_title(items[queried[0]]))
+    start = time.perf_counter()
+    for tokens in sample:
+        title_similarity(query, tokens)
+    pairwise_ms = (time.perf_counter() - start) / len(sample) * args.products * 1000
+
+    report = {
+        'products': args.products,
+        'queries': len(queried),
+        'fill_seconds': round(fill_seconds, 1),
+        'database_mb': round(database_mb, 1),
+        'recall': round(found / len(queried), 4),
+        'wrong_matches': wrong,
+        'variant_false_matches': false_variants,
+        'lookup_ms': {'p50': round(percentile(seconds, 0.5) * 1000, 2),
+                      'p95': round(percentile(seconds, 0.95) * 1000, 2),
+                      'p99': round(percentile(seconds, 0.99) * 1000, 2)},
+        'pairwise_scan_ms': round(pairwise_ms, 1),
+    }
+    print(f"same item on both: {found}/{len(queried)} found ({report['recall']:.1%}), {wrong} matched the wrong item")
+    print(f"other variant: {false_variants}/{len(queried)} wrongly matched")
+    print(f"match + index per product: p50 {report['lookup_ms']['p50']} ms, p95 {report['lookup_ms']['p95']} ms, "
+          f"p99 {report['lookup_ms']['p99']} ms (a pairwise scan would take ~{report['pairwise_scan_ms']:.0f} ms)")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if (report['recall'] < 0.95 or wrong or false_variants > 0.05 * len(queried)
+            or report['lookup_ms']['p50'] > 10):
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -2,8 +2,11 @@ import discord
 from discord.ext import commands, tasks
 from config import Config
 import asyncio
+import logging
 import sqlite3
 
+logger = logging.getLogger(__name__)
+
 class DiscordBot(commands.Bot):
     def __init__(self):
         intents = discord.Intents.default()
@@ -12,7 +15,7 @@ class DiscordBot(commands.Bot):
         self.config = Config()
         
     async def on_ready(self):
-        print(f'{self.user} is now online!')
+        logger.info(f'{self.user} is now online!')
         # Start the auto-posting task
         self.post_deals.start()
     
@@ -84,7 +87,10 @@ class DiscordBot(commands.Bot):
 
 def run_discord_bot():
     bot = DiscordBot()
-    bot.run(Config.DISCORD_BOT_TOKEN)
+    # log_handler=None keeps discord.py on the shared queued handlers instead of its own
+    bot.run(Config.DISCORD_BOT_TOKEN, log_handler=None)
 
 if __name__ == "__main__":
+    from logging_setup import configure_logging
+    configure_logging()
     run_discord_bot()
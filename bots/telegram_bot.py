@@ -5,8 +5,7 @@ from config import Config
 import sqlite3
 import asyncio
 
-# Enable logging
-logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(message)s', level=logging.INFO)
+logger = logging.getLogger(__name__)
 
 class TelegramBot:
     def __init__(self):
@@ -76,13 +75,15 @@ Flipkart: {product_data.get('affiliate_flipkart', 'N/A')}
             return True
             
         except Exception as e:
-            logging.error(f"Error posting to Telegram: {e}")
+            logger.error(f"Error posting to Telegram: {e}")
             return False
     
     def run(self):
-        print("Starting Telegram Bot...")
+        logger.info("Starting Telegram Bot...")
         self.app.run_polling()
 
 if __name__ == "__main__":
+    from logging_setup import configure_logging
+    configure_logging()
     bot = TelegramBot()
     bot.run()
@@ -2,8 +2,18 @@
 import os
 
 class Config:
-    # Database
-    DATABASE_URL = "sqlite:///sastasmart.db"
+    # Database - postgresql://... on Render; sqlite:///<directory> locally and in tests
+    DATABASE_URL = os.environ.get('DATABASE_URL', "sqlite:///.")
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', '8'))  # connections per process
+    
+    # SQLite file per component (PostgreSQL keeps all tables in one database)
+    SQLITE_FILES = {
+        'master': 'sastasmart_master.db',
+        'affiliate': 'affiliate_links.db',
+        'earnings': 'earnings.db',
+        'reels': 'instagram_reels.db',
+        'pages': 'page_cache.db',
+    }
     
     # ==============================================
     # AFFILIATE PROGRAM LINKS - ADD YOUR LINKS HERE
@@ -74,18 +84,115 @@ class Config:
     # ==============================================
     
     # Scraping Settings
-    SCRAPE_INTERVAL = 1800  # 30 minutes
+    SCRAPE_INTERVAL = 1800  # 30 minutes; without the frontier, and as the first revisit of a new URL
     MAX_PRODUCTS_PER_RUN = 100
     
+    # Scraping engine (scrapers/engine.py) - one keep-alive connection pool per run
+    SCRAPE_CONCURRENCY = int(os.environ.get('SCRAPE_CONCURRENCY', '32'))  # connections across all hosts
+    SCRAPE_PER_HOST_CONCURRENCY = 8   # connections per marketplace host
+    SCRAPE_CONNECT_TIMEOUT = 5        # seconds
+    SCRAPE_TIMEOUT = 20               # seconds per page, including the body
+    SCRAPE_KEEPALIVE_TIMEOUT = 30     # idle pooled connections are closed after this
+    SCRAPE_RETRIES = 2                # extra attempts on 429/5xx and network errors
+    SCRAPE_RETRY_BACKOFF = 0.5        # seconds, doubled per attempt
+    SCRAPE_USER_AGENT = ("Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+                         "(KHTML, like Gecko) Chrome/124.0 Safari/537.36")
+    
+    # Parse pool (scrapers/parse_pool.py) - product pages parsed in worker
+    # processes, so parsing scales with cores instead of sharing the GIL
+    # with the event loop
+    PARSE_WORKERS = int(os.environ.get('PARSE_WORKERS', '0'))  # 0: one per CPU core; 1: parse in-process
+    PARSE_POOL_MIN_BATCH = 8          # product pages in a run below which the pool is not worth starting
+    PARSE_POOL_MIN_BYTES = 16384      # smaller pages are parsed inline; shipping them costs more
+    
+    # Per-host concurrency (scrapers/host_limits.py) - AIMD: about one more request
+    # in flight per window of fast healthy responses, cut on 429, 503 or a captcha
+    # page; Retry-After is honoured and the windows are kept between runs.
+    # SCRAPE_PER_HOST_CONCURRENCY applies only with this off.
+    HOST_LIMITS_ENABLED = True
+    HOST_INITIAL_CONCURRENCY = 2      # window of a host never scraped before
+    HOST_MIN_CONCURRENCY = 1
+    HOST_MAX_CONCURRENCY = 16
+    HOST_DECREASE_FACTOR = 0.5        # window multiplier on throttling
+    HOST_LATENCY_TOLERANCE = 2.0      # slower than this times the host's best latency: stop growing
+    HOST_MAX_RETRY_AFTER = 300        # seconds; longer Retry-After values are capped
+    HOST_PROBE_INTERVAL = 30          # seconds the window stays under one that was throttled
+    
+    # Page cache (scrapers/page_cache.py) - conditional GETs and content hashes;
+    # unchanged product pages are neither parsed nor passed on to add_product
+    PAGE_CACHE_ENABLED = True
+    PAGE_CACHE_MAX_SKIP_HOURS = 24   # parse an unchanged page anyway after this long
+    PAGE_CACHE_MAX_AGE_DAYS = 7      # forget pages not seen for this long
+    
+    # Crawl frontier (scrapers/frontier.py) - each listing and product URL has its
+    # own next visit, sooner the more often its price changed on recent visits.
+    # A run takes only the due URLs (at most MAX_PRODUCTS_PER_RUN product pages)
+    # plus products newly found on listing pages.
+    FRONTIER_ENABLED = True
+    FRONTIER_TICK = 300               # seconds between scheduled runs (instead of SCRAPE_INTERVAL)
+    FRONTIER_MIN_INTERVAL = 600       # seconds; lightning deals
+    FRONTIER_MAX_INTERVAL = 21600     # seconds; prices that never move
+    FRONTIER_VISITS_PER_CHANGE = 8    # revisits per expected price change; more catches more changes
+    FRONTIER_BACKOFF = 2              # most an interval grows per visit without a change
+    FRONTIER_DECAY = 0.85             # weight of older visits in the change rate estimate
+    FRONTIER_JITTER = 0.1             # +/- share of the interval, so URLs do not fall due together
+    FRONTIER_LEASE = 900              # seconds a taken URL is reserved for the run that took it
+    FRONTIER_MAX_FAILURES = 5         # stop tracking a product after this many failed visits in a row
+    
+    # Headless Chrome pool (scrapers/browser_pool.py) - started only for pages
+    # plain HTTP cannot parse, then kept between runs
+    BROWSER_FALLBACK = True           # render pages whose HTML has no product data
+    BROWSER_POOL_SIZE = 2             # concurrent Chrome instances
+    BROWSER_MAX_PAGES = 50            # recycle a driver after this many pages...
+    BROWSER_MAX_MEMORY_MB = 700       # ...or once its process tree uses this much memory
+    BROWSER_PAGE_TIMEOUT = 30         # seconds
+    BROWSER_BLOCKED_URLS = [
+        '*.png', '*.jpg', '*.jpeg', '*.gif', '*.webp', '*.svg', '*.ico',
+        '*.woff', '*.woff2', '*.ttf', '*.otf',
+        '*.mp4', '*.webm', '*.m3u8', '*.mp3',
+    ]
+    
+    # Extra selector packs (JSON, see scrapers/selector_packs.py), tried before the built-in ones
+    SELECTOR_PACKS_FILE = os.environ.get('SELECTOR_PACKS_FILE', '')
+    
+    # Deal listings to crawl; product pages linked from them are scraped.
+    # 'render_js': True sends every page of a source through the browser pool
+    SCRAPE_SOURCES = [
+        {'site': 'amazon', 'category': 'electronics', 'pages': 2,
+         'url': 'https://www.amazon.in/s?k=electronics+deals&i=electronics'},
+        {'site': 'amazon', 'category': 'home_kitchen', 'pages': 1,
+         'url': 'https://www.amazon.in/s?k=kitchen+deals&i=kitchen'},
+        {'site': 'flipkart', 'category': 'electronics', 'pages': 2,
+         'url': 'https://www.flipkart.com/search?q=electronics+offers'},
+        {'site': 'flipkart', 'category': 'fashion', 'pages': 1,
+         'url': 'https://www.flipkart.com/search?q=fashion+offers'},
+    ]
+    
     # File Paths
     TEMP_DIR = "./temp/"
     ASSETS_DIR = "./assets/"
     LOGS_DIR = "./logs/"
     REELS_DIR = "./reels/"
     
-    # Ensure directories exist
-    for directory in [TEMP_DIR, ASSETS_DIR, LOGS_DIR, REELS_DIR]:
-        os.makedirs(directory, exist_ok=True)
+    # Image cache (image_cache.py) - product images downloaded once, resized once
+    # per variant (square, story, thumb) and shared by the ingest pipeline, which
+    # fetches them for newly scheduled posts, and the reel renderer
+    IMAGE_CACHE_DIR = os.environ.get('IMAGE_CACHE_DIR', './cache/images/')
+    IMAGE_CACHE_MAX_BYTES = int(os.environ.get('IMAGE_CACHE_MAX_MB', '512')) * 1024 * 1024
+    IMAGE_URL_TTL = 7 * 24 * 3600     # seconds before a URL is fetched again; unchanged bytes keep their derivatives
+    IMAGE_FETCH_TIMEOUT = 15          # seconds
+    IMAGE_MAX_DOWNLOAD_BYTES = 10 * 1024 * 1024
+    IMAGE_PREFETCH = True             # fetch and resize images of scheduled posts during ingest
+    IMAGE_PREFETCH_WORKERS = 4
+    # Product images are only fetched from the marketplaces' image CDNs (these
+    # domains and their subdomains), redirects included
+    IMAGE_HOSTS = ('media-amazon.com', 'ssl-images-amazon.com', 'flixcart.com', 'flipkart.com')
+    
+    @classmethod
+    def ensure_directories(cls):
+        """Create working directories (called by the components that write to them)"""
+        for directory in [cls.TEMP_DIR, cls.ASSETS_DIR, cls.LOGS_DIR, cls.REELS_DIR]:
+            os.makedirs(directory, exist_ok=True)
     
     # Posting Schedule
     POSTS_PER_DAY = 3
@@ -109,6 +216,45 @@ class Config:
     # Maximum price for products (in INR)
     MAX_PRODUCT_PRICE = 50000
     
+    # Change detection for products seen again on later scrape runs -
+    # links are regenerated and posts rescheduled only past these thresholds
+    PRICE_CHANGE_THRESHOLD_PERCENT = 2.0   # relative price move
+    DISCOUNT_CHANGE_THRESHOLD = 5          # discount points
+    
+    # Price history - rolling windows kept in memory per product
+    PRICE_HISTORY_WINDOWS_DAYS = [7, 30]
+    PRICE_HISTORY_CACHE_SIZE = 10000  # products with cached windows
+    
+    # Cross-marketplace matching (product_matching.py) - MinHash signatures of
+    # normalized title tokens in LSH buckets, candidates verified by token overlap
+    MATCH_ENABLED = True
+    MATCH_BANDS = 20                  # LSH bands; more finds less similar pairs
+    MATCH_ROWS_PER_BAND = 3           # minhashes per band; more makes buckets stricter
+    MATCH_MIN_SIMILARITY = 0.6        # share of the shorter title's tokens in the other title
+    MATCH_MAX_CANDIDATES = 50         # candidates verified per lookup, those sharing most bands
+    MATCH_BUCKET_SCAN = 500           # newest rows read per bucket; generic buckets are cut here
+    MATCH_BACKFILL_BATCH = 20000      # older products indexed per scrape run
+    
+    # Ingest pipeline (pipeline.py, ingest_pipeline.py) - scrape through to the posting queue
+    PIPELINE_QUEUE_SIZE = 100         # items waiting between two stages; a full queue holds back the one before
+    PIPELINE_BATCH_SIZE = 50          # products per lookup / transaction in dedup, persist and schedule
+    PIPELINE_AFFILIATE_WORKERS = 2    # threads generating affiliate links
+    
+    # Bulk NDJSON ingest (POST /products:bulk)
+    BULK_INGEST_BATCH_SIZE = 200          # records committed per transaction
+    BULK_INGEST_MAX_LINE_BYTES = 65536    # longer lines are rejected unparsed
+    
+    # Affiliate product feeds (product_feeds.py) - network catalogue/deal exports
+    # streamed through the ingest pipeline; only items whose content changed since
+    # the last ingest go in. Each feed: {'name': ..., 'network': 'flipkart'|'amazon'|'csv',
+    # 'path' or 'url': ..., optional 'format', 'items_key', 'category', 'platform', 'headers'}
+    PRODUCT_FEEDS = []
+    FEED_INTERVAL = 6 * 3600          # seconds between scheduled feed ingests
+    FEED_DIR = "./feeds/"             # downloaded 'url' feeds
+    FEED_SEGMENT_ITEMS = 5000         # records per checkpoint; a resumed ingest redoes at most one segment
+    FEED_READ_CHUNK = 1 << 20         # bytes read at a time
+    FEED_DOWNLOAD_TIMEOUT = 60        # seconds without data before a feed download fails
+    
     # ==============================================
     # CONTENT GENERATION SETTINGS
     # ==============================================
@@ -159,4 +305,31 @@ class Config:
     RETRY_DELAY = 5  # seconds
     
     # Logging level
-    LOG_LEVEL = "INFO"  # DEBUG, INFO, WARNING, ERROR, CRITICAL
\ No newline at end of file
+    LOG_LEVEL = "INFO"  # DEBUG, INFO, WARNING, ERROR, CRITICAL
+    
+    # Log pipeline (see logging_setup.py) - records are written by a background thread
+    LOG_FORMAT = os.environ.get('LOG_FORMAT', 'text')  # text or json (one object per line)
+    LOG_MAX_BYTES = 10 * 1024 * 1024  # rotate each log file past this size (one file per process: sastasmart.log, sastasmart.1.log...)
+    LOG_ROTATE_WHEN = 'midnight'       # ...and on this schedule
+    LOG_BACKUP_COUNT = 7
+    LOG_QUEUE_SIZE = 10000             # records buffered before new ones are dropped
+    
+    # Per call site: INFO/DEBUG lines beyond the burst in one period are sampled
+    LOG_RATE_LIMIT_BURST = 20
+    LOG_RATE_LIMIT_PERIOD = 60  # seconds
+    LOG_SAMPLE_EVERY = 50       # keep 1 in N once over the burst
+    
+    # Tracing - fraction of pipeline runs recorded as Chrome trace files
+    TRACE_SAMPLE_RATE = float(os.environ.get('TRACE_SAMPLE_RATE', '0.1'))
+    TRACE_DIR = "./logs/traces/"
+    TRACE_FLUSH_SPANS = 1000  # buffered spans per trace file
+    TRACE_FLUSH_INTERVAL = 60  # seconds; completed traces are written at least this often
+    TRACE_MAX_FILES = 200  # oldest trace/profile files are deleted past this many...
+    TRACE_MAX_BYTES = 200 * 1024 * 1024  # ...or this total size
+    TRACE_WRITE_QUEUE = 16  # files waiting for the writer thread; spans past that are dropped
+    
+    # Token for /admin endpoints (profiler, trace flush); empty disables them
+    ADMIN_TOKEN = os.environ.get('SASTASMART_ADMIN_TOKEN', '')
+    # Token for POST /products:bulk (scrapers and partners), in the X-Ingest-Token
+    # header; empty disables the endpoint
+    INGEST_TOKEN = os.environ.get('SASTASMART_INGEST_TOKEN', '')
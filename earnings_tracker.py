@@ -1,20 +1,21 @@
 # Phase 6: Advanced Earnings & Click Tracker System
 import requests
 import json
-import sqlite3
 from datetime import datetime, timedelta
-import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
 from flask import Flask, render_template, request, jsonify
 import schedule
 import time
 import threading
 from dataclasses import dataclass
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Union
 import os
 from urllib.parse import urlparse
 import hashlib
+import logging
+import metrics
+from storage import Database, get_database, open_database, read_dataframe
+
+logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
 
@@ -36,15 +37,15 @@ class ClickData:
     conversion_status: str = "pending"  # pending, converted, failed
 
 class EarningsTracker:
-    def __init__(self, db_path="earnings.db", bitly_token=None):
-        self.db_path = db_path
+    def __init__(self, database: Union[Database, str] = None, bitly_token=None):
+        self.db = open_database(database, 'earnings')
         self.bitly_token = bitly_token
         self.bitly_api_url = "https://api-ssl.bitly.com/v4"
         self.setup_database()
         
     def setup_database(self):
-        """Initialize SQLite database for tracking"""
-        conn = sqlite3.connect(self.db_path)
+        """Initialize database tables for tracking"""
+        conn = self.db.connect()
         cursor = conn.cursor()
         
         # Clicks table
@@ -96,6 +97,13 @@ class EarningsTracker:
             )
         ''')
         
+        # Date-range filters (daily summary, dashboards, cross-database
+        # reports) read only this index, never the click rows themselves
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_clicks_timestamp
+            ON clicks (click_timestamp, product_id, platform, estimated_earning)
+        ''')
+        
         conn.commit()
         conn.close()
     
@@ -125,11 +133,11 @@ class EarningsTracker:
             if response.status_code == 200:
                 return response.json()['link']
             else:
-                print(f"Bitly API Error: {response.text}")
+                logger.warning(f"Bitly API Error: {response.text}")
                 return self.create_manual_short_link(long_url)
                 
         except Exception as e:
-            print(f"Error creating short link: {e}")
+            logger.error(f"Error creating short link: {e}")
             return self.create_manual_short_link(long_url)
     
     def create_manual_short_link(self, long_url: str) -> str:
@@ -140,6 +148,7 @@ class EarningsTracker:
     
     def track_click(self, product_data: Dict, platform: str, user_data: Dict) -> str:
         """Track affiliate link click and return short link"""
+        metrics.CLICKS.inc(source='earnings_tracker')
         click_id = hashlib.md5(
             f"{product_data['id']}{platform}{datetime.now().isoformat()}".encode()
         ).hexdigest()
@@ -177,11 +186,15 @@ class EarningsTracker:
         # Save to database
         self.save_click_data(click_data, short_link)
         
+        # One line per click - the rate-limit filter samples this under load
+        logger.info(f"🖱️ Click on {platform} for product {click_data.product_id}",
+                    extra={'product_id': click_data.product_id, 'platform': platform})
+        
         return short_link
     
     def save_click_data(self, click_data: ClickData, short_link: str):
         """Save click data to database"""
-        conn = sqlite3.connect(self.db_path)
+        conn = self.db.connect()
         cursor = conn.cursor()
         
         cursor.execute('''
@@ -252,14 +265,16 @@ class EarningsTracker:
             return analytics_data
             
         except Exception as e:
-            print(f"Error fetching Bitly analytics: {e}")
+            logger.error(f"Error fetching Bitly analytics: {e}")
             return {"clicks": 0, "countries": {}}
     
     def update_daily_summary(self):
         """Update daily earnings summary"""
         today = datetime.now().date()
+        day_start = datetime.combine(today, datetime.min.time())
+        day_end = day_start + timedelta(days=1)
         
-        conn = sqlite3.connect(self.db_path)
+        conn = self.db.connect()
         cursor = conn.cursor()
         
         # Get today's statistics
@@ -272,8 +287,8 @@ class EarningsTracker:
                 SUM(CASE WHEN platform = 'amazon' THEN estimated_earning ELSE 0 END) as amazon_revenue,
                 SUM(CASE WHEN platform = 'flipkart' THEN estimated_earning ELSE 0 END) as flipkart_revenue
             FROM clicks 
-            WHERE DATE(click_timestamp) = ?
-        ''', (today,))
+            WHERE click_timestamp >= ? AND click_timestamp < ?
+        ''', (day_start, day_end))
         
         stats = cursor.fetchone()
         
@@ -281,11 +296,11 @@ class EarningsTracker:
         cursor.execute('''
             SELECT product_name, COUNT(*) as clicks
             FROM clicks 
-            WHERE DATE(click_timestamp) = ?
+            WHERE click_timestamp >= ? AND click_timestamp < ?
             GROUP BY product_name
             ORDER BY clicks DESC
             LIMIT 1
-        ''', (today,))
+        ''', (day_start, day_end))
         
         top_product_result = cursor.fetchone()
         top_product = top_product_result[0] if top_product_result else "No clicks today"
@@ -295,7 +310,16 @@ class EarningsTracker:
         
         # Insert or update daily summary
         cursor.execute('''
-            INSERT OR REPLACE INTO daily_earnings VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            INSERT INTO daily_earnings VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (date) DO UPDATE SET
+                total_clicks = excluded.total_clicks,
+                amazon_clicks = excluded.amazon_clicks,
+                flipkart_clicks = excluded.flipkart_clicks,
+                total_revenue = excluded.total_revenue,
+                amazon_revenue = excluded.amazon_revenue,
+                flipkart_revenue = excluded.flipkart_revenue,
+                conversion_rate = excluded.conversion_rate,
+                top_product = excluded.top_product
         ''', (
             today,
             stats[0] or 0,  # total_clicks
@@ -313,21 +337,24 @@ class EarningsTracker:
     
     def get_earnings_dashboard_data(self, days: int = 30) -> Dict:
         """Get comprehensive dashboard data"""
-        conn = sqlite3.connect(self.db_path)
+        conn = self.db.connect()
         
         # Get date range
         end_date = datetime.now().date()
         start_date = end_date - timedelta(days=days)
+        # Clicks are filtered on the raw timestamp so an index on it can be used
+        range_start = datetime.combine(start_date, datetime.min.time())
+        range_end = datetime.combine(end_date, datetime.min.time()) + timedelta(days=1)
         
         # Daily earnings
-        daily_df = pd.read_sql_query('''
+        daily_df = read_dataframe(conn, '''
             SELECT * FROM daily_earnings 
             WHERE date >= ? AND date <= ?
             ORDER BY date
-        ''', conn, params=(start_date, end_date))
+        ''', (start_date, end_date))
         
         # Top products
-        top_products_df = pd.read_sql_query('''
+        top_products_df = read_dataframe(conn, '''
             SELECT 
                 product_name,
                 COUNT(*) as clicks,
@@ -335,34 +362,34 @@ class EarningsTracker:
                 AVG(estimated_earning) as avg_earning,
                 platform
             FROM clicks 
-            WHERE DATE(click_timestamp) >= ? AND DATE(click_timestamp) <= ?
+            WHERE click_timestamp >= ? AND click_timestamp < ?
             GROUP BY product_name, platform
             ORDER BY revenue DESC
             LIMIT 10
-        ''', conn, params=(start_date, end_date))
+        ''', (range_start, range_end))
         
         # Platform comparison
-        platform_stats = pd.read_sql_query('''
+        platform_stats = read_dataframe(conn, '''
             SELECT 
                 platform,
                 COUNT(*) as clicks,
                 SUM(estimated_earning) as revenue,
                 AVG(estimated_earning) as avg_earning
             FROM clicks 
-            WHERE DATE(click_timestamp) >= ? AND DATE(click_timestamp) <= ?
+            WHERE click_timestamp >= ? AND click_timestamp < ?
             GROUP BY platform
-        ''', conn, params=(start_date, end_date))
+        ''', (range_start, range_end))
         
         # Hourly click pattern
-        hourly_pattern = pd.read_sql_query('''
+        hourly_pattern = read_dataframe(conn, f'''
             SELECT 
-                strftime('%H', click_timestamp) as hour,
+                {self.db.hour_of('click_timestamp')} as hour,
                 COUNT(*) as clicks
             FROM clicks 
-            WHERE DATE(click_timestamp) >= ? AND DATE(click_timestamp) <= ?
+            WHERE click_timestamp >= ? AND click_timestamp < ?
             GROUP BY hour
             ORDER BY hour
-        ''', conn, params=(start_date, end_date))
+        ''', (range_start, range_end))
         
         conn.close()
         
@@ -482,6 +509,11 @@ class EarningsTracker:
     
     def create_earnings_charts(self, data):
         """Create visualization charts"""
+        import pandas as pd
+        import matplotlib
+        matplotlib.use('Agg')  # render to files, no display needed
+        import matplotlib.pyplot as plt
+        
         plt.style.use('seaborn-v0_8')
         
         # Daily earnings chart
@@ -562,19 +594,25 @@ def earnings_data():
     data = tracker.get_earnings_dashboard_data(days)
     return jsonify(data)
 
+@app.route('/metrics')
+def metrics_endpoint():
+    """Prometheus metrics for the click tracking service"""
+    return metrics.REGISTRY.generate_latest(), 200, {'Content-Type': metrics.CONTENT_TYPE_LATEST}
+
 @app.route('/go/<short_code>')
 def redirect_affiliate(short_code):
     """Redirect short links and track clicks"""
-    conn = sqlite3.connect('earnings.db')
-    cursor = conn.cursor()
-    
-    cursor.execute('''
-        SELECT affiliate_link FROM clicks 
-        WHERE short_link LIKE ?
-    ''', (f'%{short_code}',))
-    
-    result = cursor.fetchone()
-    conn.close()
+    with metrics.REDIRECT_LATENCY.time():
+        conn = get_database('earnings').connect()
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT affiliate_link FROM clicks 
+            WHERE short_link LIKE ?
+        ''', (f'%{short_code}',))
+        
+        result = cursor.fetchone()
+        conn.close()
     
     if result:
         return f'<script>window.location.href = "{result[0]}";</script>'
@@ -603,6 +641,9 @@ def start_background_tasks():
     thread.start()
 
 if __name__ == '__main__':
+    from logging_setup import configure_logging
+    configure_logging()
+    
     # Initialize tracker
     tracker = EarningsTracker(
         bitly_token="YOUR_BITLY_TOKEN_HERE"  # Get from https://app.bitly.com/
@@ -0,0 +1,21 @@
+# Gunicorn settings for the SastaSmart API (main:app is an ASGI app)
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+
+# FastAPI needs an ASGI worker; the default sync worker cannot serve it
+worker_class = "uvicorn.workers.UvicornWorker"
+workers = int(os.environ.get('WEB_CONCURRENCY', min(multiprocessing.cpu_count() * 2 + 1, 4)))
+
+timeout = 60
+graceful_timeout = 30
+keepalive = 5
+
+# Recycle workers now and then to cap slow memory growth
+max_requests = 2000
+max_requests_jitter = 200
+
+accesslog = '-'
+errorlog = '-'
+loglevel = os.environ.get('LOG_LEVEL', 'info').lower()
@@ -0,0 +1,318 @@
+# Image Cache - product images on disk keyed by URL and content hash, with pre-resized derivatives
+import atexit
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import Future
+from io import BytesIO
+from typing import Dict, Iterable, Optional
+from urllib.parse import urljoin, urlparse
+import requests
+from PIL import Image, ImageOps
+from config import Config
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# Derivatives kept for every original: name -> (width, height)
+VARIANTS = {
+    'square': (1080, 1080),   # feed posts and the reel templates
+    'story': (1080, 1920),    # full-screen reels and stories
+    'thumb': (320, 320),      # thumbnails
+}
+
+# Redirects followed per image, each checked against IMAGE_HOSTS
+MAX_REDIRECTS = 5
+
+def allowed_image_url(url: str) -> bool:
+    """An http(s) URL on one of the marketplace image hosts (Config.IMAGE_HOSTS)"""
+    try:
+        parsed = urlparse(url)
+        host = (parsed.hostname or '').lower()
+    except ValueError:
+        return False
+    return parsed.scheme in ('http', 'https') and any(
+        host == domain or host.endswith('.' + domain) for domain in Config.IMAGE_HOSTS)
+
+def render_variant(data: bytes, size) -> Image.Image:
+    """The image fitted inside `size` on a white background, aspect ratio kept"""
+
+    with Image.open(BytesIO(data)) as img:
+        # Decode large JPEGs at a reduced scale straight away; still at least `size`
+        img.draft('RGB', size)
+        img = ImageOps.exif_transpose(img)
+        if img.mode in ('RGBA', 'LA', 'P'):
+            img = img.convert('RGBA')
+            background = Image.new('RGBA', img.size, 'white')
+            img = Image.alpha_composite(background, img)
+        if img.mode != 'RGB':
+            img = img.convert('RGB')
+        return ImageOps.pad(img, size, method=Image.Resampling.LANCZOS, color='white')
+
+class ImageCache:
+    """Product images on disk, downloaded once and resized once per variant
+
+    Under `directory`:
+
+        urls/<sha1 of url>                 content hash the URL served; mtime is when
+        objects/<hash[:2]>/<hash>          the original bytes
+        objects/<hash[:2]>/<hash>.<v>.jpg  derivative v, see VARIANTS
+
+    Files are named by content, so two URLs serving the same picture share
+    one copy and its derivatives, and a URL fetched again after
+    IMAGE_URL_TTL that still serves the same bytes keeps them too. Every
+    file is written under a temporary name and renamed into place, so
+    render jobs and other processes never see half an image. Within a
+    process, concurrent requests for the same URL or derivative wait for
+    the one already fetching or resizing it. Files are evicted least
+    recently used first (their mtime, bumped on every hit) once the total
+    passes max_bytes. Only URLs on IMAGE_HOSTS are fetched: image URLs
+    come from scraped pages, feeds and the bulk ingest API.
+    """
+
+    def __init__(self, directory: str = None, max_bytes: int = None):
+        self.directory = directory or Config.IMAGE_CACHE_DIR
+        self.max_bytes = max_bytes or Config.IMAGE_CACHE_MAX_BYTES
+        self._urls = os.path.join(self.directory, 'urls')
+        self._objects = os.path.join(self.directory, 'objects')
+        os.makedirs(self._urls, exist_ok=True)
+        os.makedirs(self._objects, exist_ok=True)
+        self._session = requests.Session()
+        self._session.headers['User-Agent'] = Config.SCRAPE_USER_AGENT
+        self._lock = threading.Lock()
+        self._inflight: Dict[tuple, Future] = {}
+        self._bytes: Optional[int] = None  # counted on first write
+        self.stats = dict.fromkeys(('hits', 'downloads', 'resized', 'coalesced', 'evicted', 'blocked', 'errors'), 0)
+
+    # ==============================================
+    # LOOKUPS
+    # ==============================================
+
+    def get(self, url: str, variant: str = 'square') -> Optional[str]:
+        """Path of `variant` of the image at `url`, fetched and resized if needed; None if it cannot be had"""
+
+        size = VARIANTS[variant]
+        if not allowed_image_url(url):
+            self._count('blocked')
+            logger.warning(f"⚠️ Not fetching image from a host outside IMAGE_HOSTS: {url[:200]}")
+            return None
+        digest = self._lookup(url)
+        if digest is not None:
+            path = self._variant_path(digest, variant)
+            if self._touch(path):
+                self._count('hits')
+                return path
+            if not self._touch(self._object_path(digest)):
+                digest = None
+        if digest is None:
+            digest = self._single_flight(('url', url), self._download, url)
+            if digest is None:
+                return None
+        try:
+            return self._single_flight(('variant', digest, variant), self._render, digest, variant, size)
+        except (OSError, ValueError, Image.DecompressionBombError) as e:
+            self._count('errors')
+            logger.warning(f"⚠️ Could not resize image {url}: {e}")
+            return None
+
+    def prefetch(self, url: str, variants: Iterable[str] = None) -> bool:
+        """Download `url` and render its derivatives ahead of the posts that need them"""
+        return all(self.get(url, variant) is not None for variant in variants or VARIANTS)
+
+    def owns(self, path: str) -> bool:
+        """Whether `path` is a cache file (not for callers to delete)"""
+        return os.path.abspath(path).startswith(os.path.abspath(self._objects) + os.sep)
+
+    def summary(self) -> Dict:
+        return dict(self.stats, bytes=self._bytes, max_bytes=self.max_bytes)
+
+    # ==============================================
+    # FETCH AND RESIZE
+    # ==============================================
+
+    def _lookup(self, url: str) -> Optional[str]:
+        path = os.path.join(self._urls, hashlib.sha1(url.encode('utf-8')).hexdigest())
+        try:
+            if time.time() - os.path.getmtime(path) > Config.IMAGE_URL_TTL:
+                return None
+            with open(path) as f:
+                return f.read().strip() or None
+        except OSError:
+            return None
+
+    def _download(self, url: str) -> Optional[str]:
+        # Another thread may have finished this URL while we waited for the flight
+        digest = self._lookup(url)
+        if digest is not None and self._touch(self._object_path(digest)):
+            return digest
+
+        start = time.perf_counter()
+        try:
+            with self._fetch(url) as response:
+                response.raise_for_status()
+                data = bytearray()
+                for chunk in response.iter_content(65536):
+                    data += chunk
+                    if len(data) > Config.IMAGE_MAX_DOWNLOAD_BYTES:
+                        raise ValueError(f"larger than {Config.IMAGE_MAX_DOWNLOAD_BYTES} bytes")
+            data = bytes(data)
+            with Image.open(BytesIO(data)) as img:
+                img.verify()
+        except (requests.RequestException, OSError, ValueError, Image.DecompressionBombError) as e:
+            self._count('errors')
+            logger.warning(f"⚠️ Could not download image {url}: {e}")
+            return None
+        finally:
+            metrics.IMAGE_FETCH_TIME.observe(time.perf_counter() - start)
+
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._object_path(digest)
+        if not self._touch(path):
+            self._write(path, data)
+        self._write(os.path.join(self._urls, hashlib.sha1(url.encode('utf-8')).hexdigest()),
+                    digest.encode('ascii'), counted=False)
+        self._count('downloads')
+        return digest
+
+    def _fetch(self, url: str) -> requests.Response:
+        """GET `url`, following redirects only to IMAGE_HOSTS"""
+        for _ in range(MAX_REDIRECTS + 1):
+            if not allowed_image_url(url):
+                raise ValueError(f"redirected outside IMAGE_HOSTS to {url[:200]}")
+            response = self._session.get(url, timeout=Config.IMAGE_FETCH_TIMEOUT, stream=True,
+                                         allow_redirects=False)
+            if not response.is_redirect:
+                return response
+            url = urljoin(url, response.headers['Location'])
+            response.close()
+        raise ValueError(f"more than {MAX_REDIRECTS} redirects")
+
+    def _render(self, digest: str, variant: str, size) -> str:
+        path = self._variant_path(digest, variant)
+        if self._touch(path):
+            return path
+        with open(self._object_path(digest), 'rb') as f:
+            img = render_variant(f.read(), size)
+        buffer = BytesIO()
+        img.save(buffer, 'JPEG', quality=90)
+        self._write(path, buffer.getvalue())
+        self._count('resized')
+        return path
+
+    def _single_flight(self, key: tuple, fn, *args):
+        """fn(*args), or, while another thread is already running it for `key`, its result"""
+
+        with self._lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self._inflight[key] = Future()
+        if not leader:
+            self._count('coalesced')
+            return future.result()
+        try:
+            result = fn(*args)
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[key]
+
+    # ==============================================
+    # FILES
+    # ==============================================
+
+    def _object_path(self, digest: str) -> str:
+        return os.path.join(self._objects, digest[:2], digest)
+
+    def _variant_path(self, digest: str, variant: str) -> str:
+        return os.path.join(self._objects, digest[:2], f"{digest}.{variant}.jpg")
+
+    @staticmethod
+    def _touch(path: str) -> bool:
+        try:
+            os.utime(path)
+            return True
+        except FileNotFoundError:
+            return False
+
+    def _write(self, path: str, data: bytes, counted: bool = True):
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(temp_path, path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+        if counted:
+            with self._lock:
+                self._bytes = (self._disk_usage()[0] if self._bytes is None else self._bytes + len(data))
+                over = self._bytes > self.max_bytes
+            if over:
+                self._evict()
+
+    def _disk_usage(self):
+        total, files = 0, []
+        for root, _, names in os.walk(self._objects):
+            for name in names:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                total += stat.st_size
+                files.append((stat.st_mtime, stat.st_size, path))
+        return total, files
+
+    def _evict(self):
+        """Delete least recently used files until the cache is at 90% of max_bytes
+
+        Rescans the directory, which also corrects the running total for
+        files other processes added or evicted.
+        """
+
+        with self._lock:
+            total, files = self._disk_usage()
+            target = self.max_bytes * 0.9
+            evicted = 0
+            for _, size, path in sorted(files):
+                if total <= target:
+                    break
+                try:
+                    os.unlink(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+                evicted += 1
+            self._bytes = total
+        self._count('evicted', evicted)
+        metrics.IMAGE_CACHE_BYTES.set(total)
+        if evicted:
+            logger.info(f"🧹 Image cache evicted {evicted} files, {total / 1e6:.0f} MB left")
+
+    def _count(self, outcome: str, amount: int = 1):
+        with self._lock:
+            self.stats[outcome] += amount
+        metrics.IMAGE_CACHE.inc(amount, result=outcome)
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_image_cache() -> ImageCache:
+    """The process-wide image cache, shared by the ingest pipeline and the reel renderer"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ImageCache()
+                atexit.register(_cache._session.close)
+    return _cache
@@ -0,0 +1,250 @@
+# Ingest Pipeline - scraped products through to the posting queue, one stage per step
+import logging
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from config import Config
+from pipeline import Pipeline, Stage
+from product_identity import canonical_product_key, validate_product_record
+import tracing
+
+logger = logging.getLogger(__name__)
+
+OUTCOMES = ('new', 'updated', 'unchanged', 'filtered', 'duplicate', 'invalid', 'error')
+# Counted alongside the outcomes: new products not posted because the same
+# item is already stored from the other marketplace at no higher price
+MATCHED = 'matched'
+
+class IngestItem:
+    """A product on its way through the stages, with what the stages learned about it"""
+
+    __slots__ = ('product', 'key', 'existing', 'outcome', 'deal', 'product_id', 'match', 'scheduled')
+
+    def __init__(self, product: Dict, key: Optional[str]):
+        self.product = product
+        self.key = key
+        self.existing: Optional[Tuple] = None  # (id, price, discount_percent, in_stock)
+        self.outcome: Optional[str] = None     # 'new', 'updated' or 'unchanged' once deduplicated
+        self.deal = True                       # meets the discount/price/category filter
+        self.product_id: Optional[int] = None
+        self.match: Optional[Dict] = None      # same item on the other marketplace, once persisted
+        self.scheduled = False                 # posts queued for it this run
+
+def batched(items: Iterator, size: int) -> Iterator[List]:
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def normalize_product(product: Dict) -> Dict:
+    """Tidy a scraped record: whitespace, category case, rounded prices, derived discount"""
+
+    normalized = dict(product)
+    normalized['title'] = ' '.join(str(product.get('title', '')).split())
+    normalized['category'] = str(product.get('category') or '').strip().lower()
+    price = round(float(product['price']), 2)
+    original_price = round(float(product.get('original_price') or price), 2)
+    normalized['price'] = price
+    normalized['original_price'] = max(original_price, price)
+    if not product.get('discount') and normalized['original_price'] > price:
+        normalized['discount'] = int(round((normalized['original_price'] - price) / normalized['original_price'] * 100))
+    normalized['discount'] = int(normalized.get('discount') or 0)
+    normalized['in_stock'] = bool(product.get('in_stock', True))
+    return normalized
+
+class ProductIngestPipeline:
+    """scrape -> normalize -> dedup -> filter -> affiliate -> persist -> images
+
+    The scrape stage is an asyncio task reading the scraping engine's
+    stream; the rest run in threads. Bounded queues between them mean a
+    slow database or affiliate step holds back the scraper instead of
+    piling products up in memory. Dedup and persist work on batches of
+    PIPELINE_BATCH_SIZE: one products lookup per batch and one
+    transaction per batch, with a savepoint per product so one bad record
+    does not lose the rest. Persist queues a product's posts in the same
+    savepoint that stores it. The images stage fetches and resizes the
+    product images of newly scheduled posts into the shared image cache,
+    so rendering them later does no network or resize work.
+
+    With a `source` of product dicts (an affiliate feed) there is no
+    scrape stage; the products go straight to normalize.
+    """
+
+    def __init__(self, master, limit: int = None, batch_size: int = None, source: Iterable[Dict] = None):
+        self.master = master
+        self.limit = limit or Config.MAX_PRODUCTS_PER_RUN
+        self.batch_size = batch_size or Config.PIPELINE_BATCH_SIZE
+        self.source = source
+        self.outcomes = dict.fromkeys(OUTCOMES + (MATCHED,), 0)
+        self._outcomes_lock = threading.Lock()
+
+    def _count(self, outcome: str, amount: int = 1):
+        with self._outcomes_lock:
+            self.outcomes[outcome] += amount
+
+    def build(self) -> Pipeline:
+        stages = [
+            Stage('normalize', self.normalize),
+            Stage('dedup', self.dedup),
+            Stage('filter', self.filter),
+            Stage('affiliate', self.affiliate, workers=Config.PIPELINE_AFFILIATE_WORKERS),
+            Stage('persist', self.persist),
+        ]
+        if self.source is None:
+            stages.insert(0, Stage('scrape', self.scrape, mode='async'))
+        if Config.IMAGE_PREFETCH:
+            stages.append(Stage('images', self.images, workers=Config.IMAGE_PREFETCH_WORKERS))
+        return Pipeline('ingest', stages)
+
+    def run(self) -> Dict:
+        """One scrape run; returns the outcome counts and, under 'stages', per-stage throughput"""
+
+        pipeline = self.build()
+        stages = pipeline.run(source=self.source, sink=lambda item: self._count(item.outcome))
+        for name, stats in stages.items():
+            logger.info(
+                f"🚰 Ingest {name} - in: {stats['items_in']}, out: {stats['items_out']} "
+                f"({stats['items_per_second']}/s), waited {stats['waiting_seconds']}s, "
+                f"blocked {stats['blocked_seconds']}s, queue high water {stats['queue_high_water']}/{stats['queue_size']}"
+            )
+        return dict(self.outcomes, stages=stages)
+
+    # ==============================================
+    # STAGES
+    # ==============================================
+
+    async def scrape(self, items):
+        from scrapers.engine import create_engine, log_run_summary
+
+        engine = create_engine()
+        start = time.perf_counter()
+        scraped = 0
+        async for product in engine.stream(limit=self.limit):
+            scraped += 1
+            yield product
+        log_run_summary(engine, scraped, time.perf_counter() - start)
+
+    def normalize(self, items: Iterator[Dict]) -> Iterator[IngestItem]:
+        for product in items:
+            error = validate_product_record(product)
+            if error:
+                logger.debug(f"Dropping scraped product {product.get('url')}: {error}")
+                self._count('invalid')
+                continue
+            product = normalize_product(product)
+            yield IngestItem(product, canonical_product_key(product))
+
+    def filter(self, items: Iterator[IngestItem]) -> Iterator[IngestItem]:
+        """Minimum discount, maximum price and target categories from Config
+
+        New products that miss them are dropped. Stored ones go on to be
+        updated all the same - otherwise their row, and the posts still
+        pending for them, would keep a deal that has lapsed - but get no
+        new posts.
+        """
+        targets = set(Config.TARGET_CATEGORIES)
+        for item in items:
+            product = item.product
+            if (product['discount'] < Config.MIN_DISCOUNT_PERCENT
+                    or product['price'] > Config.MAX_PRODUCT_PRICE
+                    or (targets and product['category'] not in targets)):
+                if item.outcome == 'new':
+                    self._count('filtered')
+                    continue
+                item.deal = False
+            yield item
+
+    def dedup(self, items: Iterator[IngestItem]) -> Iterator[IngestItem]:
+        """Drop repeats within the run and classify against the stored products"""
+        seen = set()
+        for batch in batched(items, self.batch_size):
+            fresh = []
+            for item in batch:
+                if item.key and item.key in seen:
+                    self._count('duplicate')
+                    continue
+                seen.add(item.key)
+                fresh.append(item)
+
+            conn = self.master.db.connect()
+            try:
+                existing = self.master.find_products(conn.cursor(), [item.key for item in fresh if item.key])
+            finally:
+                conn.close()
+
+            for item in fresh:
+                item.existing = existing.get(item.key)
+                if item.existing is None:
+                    item.outcome = 'new'
+                elif self.master.has_meaningful_change(item.existing[1:], item.product):
+                    item.outcome = 'updated'
+                else:
+                    item.outcome = 'unchanged'
+                yield item
+
+    def affiliate(self, items: Iterator[IngestItem]) -> Iterator[IngestItem]:
+        processor = self.master.product_processor
+        for item in items:
+            if item.outcome != 'unchanged':
+                with tracing.span('process_product', product=item.product['title'][:80]):
+                    item.product = processor.process_product(item.product)
+            yield item
+
+    def persist(self, items: Iterator[IngestItem]) -> Iterator[IngestItem]:
+        """Store each product and queue its posts in one savepoint
+
+        Were the posts queued in a later transaction, a crash or an error
+        in between would leave the new price stored, and the next run
+        would find the product unchanged and never post it.
+        """
+        for batch in batched(items, self.batch_size):
+            written = []
+            now = datetime.now()
+            conn = self.master.db.connect()
+            cursor = conn.cursor()
+            cursor.execute('BEGIN')
+            for item in batch:
+                cursor.execute('SAVEPOINT ingest_record')
+                try:
+                    if item.outcome == 'unchanged':
+                        self.master.touch_product(cursor, item.existing[0], item.product, now)
+                        item.product_id = item.existing[0]
+                    else:
+                        item.product_id, item.outcome = self.master.store_product(
+                            cursor, item.product, item.existing, item.key, now)
+                        item.match = self.master.match_product(cursor, item.product_id, item.product, now)
+                        item.scheduled = self.schedule(cursor, item)
+                    cursor.execute('RELEASE SAVEPOINT ingest_record')
+                    written.append(item)
+                except Exception as e:
+                    cursor.execute('ROLLBACK TO SAVEPOINT ingest_record')
+                    cursor.execute('RELEASE SAVEPOINT ingest_record')
+                    logger.error(f"❌ Error storing product {item.product.get('title', 'Unknown')}: {e}")
+                    self._count('error')
+            conn.commit()
+            conn.close()
+            yield from written
+
+    def schedule(self, cursor, item: IngestItem) -> bool:
+        """Posts for a new or changed deal that is in stock, except a listing already posted elsewhere"""
+        if not item.deal or not item.product.get('in_stock', True):
+            return False
+        if self.master.is_duplicate_listing(item.outcome, item.product, item.match):
+            self._count(MATCHED)
+            return False
+        self.master.schedule_product_posts(item.product_id, item.product, cursor)
+        return True
+
+    def images(self, items: Iterator[IngestItem]) -> Iterator[IngestItem]:
+        from image_cache import get_image_cache
+
+        cache = get_image_cache()
+        for item in items:
+            if item.scheduled and item.product.get('image_url'):
+                cache.prefetch(item.product['image_url'])
+            yield item
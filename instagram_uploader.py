@@ -1,5 +1,4 @@
 # Phase 7: Instagram Auto Reels Uploader System
-from turtle import pd
 import requests
 import json
 import os
@@ -10,7 +9,6 @@ from moviepy.editor import *
 from PIL import Image, ImageDraw, ImageFont
 import textwrap
 from gtts import gTTS
-import sqlite3
 from dataclasses import dataclass
 from typing import List, Dict, Optional
 import schedule
@@ -20,6 +18,12 @@ import subprocess
 from urllib.parse import urlparse
 from io import BytesIO
 import hashlib
+from config import Config
+from image_cache import get_image_cache
+from storage import Database, get_database, read_dataframe
+import logging
+import metrics
+import tracing
 from moviepy.editor import ImageClip, concatenate_videoclips, CompositeVideoClip, TextClip, AudioFileClip
 from gtts import gTTS
 import requests
@@ -28,6 +32,8 @@ from io import BytesIO
 import tempfile
 import os
 
+logger = logging.getLogger(__name__)
+
 @dataclass
 class ReelContent:
     product_id: str
@@ -42,12 +48,15 @@ class ReelContent:
     category: str
 
 class InstagramReelsUploader:
-    def __init__(self, access_token: str, page_id: str, app_id: str, app_secret: str):
+    def __init__(self, access_token: str, page_id: str, app_id: str, app_secret: str,
+                 database: Database = None):
         self.access_token = access_token
         self.page_id = page_id
         self.app_id = app_id
         self.app_secret = app_secret
         self.base_url = "https://graph.facebook.com/v18.0"
+        self.db = database or get_database('reels')
+        Config.ensure_directories()
         self.video_templates = [
             "flash_deal_template",
             "product_showcase_template", 
@@ -58,10 +67,7 @@ class InstagramReelsUploader:
         self.setup_database()
     
     def generate_product_video(self, product: ReelContent):
-        response = requests.get(product.product_image_url)
-        image_path = tempfile.NamedTemporaryFile(delete=False, suffix='.jpg').name
-        with open(image_path, 'wb') as f:
-            f.write(response.content)
+        image_path = self.download_product_image(product.product_image_url, product.product_id)
 
         # Generate voiceover
         tts_text = f"{product.product_name}, only ₹{product.product_price}! Features: " + ", ".join(product.features)
@@ -86,7 +92,7 @@ class InstagramReelsUploader:
     
     def setup_database(self):
         """Setup database for tracking uploaded reels"""
-        conn = sqlite3.connect('instagram_reels.db')
+        conn = self.db.connect()
         cursor = conn.cursor()
         
         cursor.execute('''
@@ -121,6 +127,11 @@ class InstagramReelsUploader:
             )
         ''')
         
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_uploaded_reels_product
+            ON uploaded_reels (product_id)
+        ''')
+        
         conn.commit()
         conn.close()
     
@@ -155,35 +166,17 @@ class InstagramReelsUploader:
             'image_path': image_path
         }
     
-    def download_product_image(self, image_url: str, product_id: str) -> str:
-        """Download and prepare product image"""
-        try:
-            response = requests.get(image_url)
-            response.raise_for_status()
-            
-            # Save image
-            image_path = f"temp/product_{product_id}.jpg"
-            os.makedirs("temp", exist_ok=True)
-            
-            with open(image_path, 'wb') as f:
-                f.write(response.content)
-            
-            # Resize and optimize image
-            with Image.open(image_path) as img:
-                # Convert to RGB if necessary
-                if img.mode != 'RGB':
-                    img = img.convert('RGB')
-                
-                # Resize to 1080x1080 for Instagram
-                img = img.resize((1080, 1080), Image.Resampling.LANCZOS)
-                img.save(image_path, 'JPEG', quality=90)
-            
-            return image_path
-            
-        except Exception as e:
-            print(f"Error downloading image: {e}")
+    def download_product_image(self, image_url: str, product_id: str, variant: str = 'square') -> str:
+        """Product image resized for Instagram (1080x1080), from the shared image cache
+        
+        The returned file belongs to the cache: it is shared with other
+        renders of the same image and must not be modified or deleted.
+        """
+        image_path = get_image_cache().get(image_url, variant) if image_url else None
+        if image_path is None:
             # Return placeholder image
             return self.create_placeholder_image(product_id)
+        return image_path
     
     def create_placeholder_image(self, product_id: str) -> str:
         """Create placeholder image if download fails"""
@@ -233,7 +226,7 @@ class InstagramReelsUploader:
             tts = gTTS(text=narration, lang='en', slow=False)
             tts.save(audio_path)
         except Exception as e:
-            print(f"Error generating audio: {e}")
+            logger.error(f"Error generating audio: {e}")
             # Create silent audio as fallback
             audio_path = self.create_silent_audio(5.0)  # 5 seconds
         
@@ -651,17 +644,17 @@ YOU SAVE: ₹{product.original_price - product.product_price:,}
             publish_response.raise_for_status()
             
             media_id = publish_response.json()['id']
-            print(f"Successfully uploaded to Instagram! Media ID: {media_id}")
+            logger.info(f"Successfully uploaded to Instagram! Media ID: {media_id}")
             
             return media_id
             
         except requests.exceptions.RequestException as e:
-            print(f"Error uploading to Instagram: {e}")
+            logger.error(f"Error uploading to Instagram: {e}")
             if hasattr(e, 'response') and e.response:
-                print(f"Response: {e.response.text}")
+                logger.error(f"Response: {e.response.text}")
             return None
         except Exception as e:
-            print(f"Unexpected error: {e}")
+            logger.error(f"Unexpected error: {e}")
             return None
     
     def schedule_post(self, product: ReelContent, post_time: datetime, template_type: str = None):
@@ -670,7 +663,7 @@ YOU SAVE: ₹{product.original_price - product.product_price:,}
         if not template_type:
             template_type = random.choice(self.video_templates)
         
-        conn = sqlite3.connect('instagram_reels.db')
+        conn = self.db.connect()
         cursor = conn.cursor()
         
         cursor.execute('''
@@ -681,12 +674,12 @@ YOU SAVE: ₹{product.original_price - product.product_price:,}
         conn.commit()
         conn.close()
         
-        print(f"Scheduled post for {product.product_name} at {post_time}")
+        logger.info(f"Scheduled post for {product.product_name} at {post_time}")
     
     def process_scheduled_posts(self):
         """Process pending scheduled posts"""
         
-        conn = sqlite3.connect('instagram_reels.db')
+        conn = self.db.connect()
         cursor = conn.cursor()
         
         now = datetime.now()
@@ -714,14 +707,16 @@ YOU SAVE: ₹{product.original_price - product.product_price:,}
                 cursor.execute('''
                     UPDATE posting_schedule SET status = 'completed' WHERE id = ?
                 ''', (post_id,))
+                conn.commit()  # release the write lock before the next upload records its reel
                 
-                print(f"Successfully posted scheduled reel for product {product_id}")
+                logger.info(f"Successfully posted scheduled reel for product {product_id}")
                 
             except Exception as e:
-                print(f"Error processing scheduled post {post_id}: {e}")
+                logger.error(f"Error processing scheduled post {post_id}: {e}")
                 cursor.execute('''
                     UPDATE posting_schedule SET status = 'failed' WHERE id = ?
                 ''', (post_id,))
+                conn.commit()
         
         conn.commit()
         conn.close()
@@ -750,20 +745,23 @@ YOU SAVE: ₹{product.original_price - product.product_price:,}
         """Complete workflow to create and upload a reel"""
         
         try:
-            print(f"Creating reel for {product.product_name} using {template_type}")
+            logger.info(f"Creating reel for {product.product_name} using {template_type}")
             
             # Generate video content
-            content = self.generate_video_content(product, template_type)
+            with tracing.span('content.render', template=template_type), \
+                    metrics.REEL_RENDER_TIME.time(template=template_type):
+                content = self.generate_video_content(product, template_type)
             
             # Generate caption
             caption = self.generate_caption(product, template_type)
             
             # Upload to Instagram
-            media_id = self.upload_to_instagram(
-                content['video_path'], 
-                content['thumbnail_path'], 
-                caption
-            )
+            with tracing.span('content.upload'), metrics.REEL_UPLOAD_TIME.time():
+                media_id = self.upload_to_instagram(
+                    content['video_path'], 
+                    content['thumbnail_path'], 
+                    caption
+                )
             
             if media_id:
                 # Save to database
@@ -772,21 +770,21 @@ YOU SAVE: ₹{product.original_price - product.product_price:,}
                 # Cleanup temporary files
                 self.cleanup_temp_files(content)
                 
-                print(f"Successfully created and uploaded reel for {product.product_name}")
+                logger.info(f"Successfully created and uploaded reel for {product.product_name}")
                 return True
             else:
-                print(f"Failed to upload reel for {product.product_name}")
+                logger.error(f"Failed to upload reel for {product.product_name}")
                 return False
                 
         except Exception as e:
-            print(f"Error creating reel: {e}")
+            logger.error(f"Error creating reel: {e}")
             return False
     
     def save_uploaded_reel(self, product: ReelContent, template_type: str, 
                           media_id: str, caption: str, content: Dict):
         """Save uploaded reel data to database"""
         
-        conn = sqlite3.connect('instagram_reels.db')
+        conn = self.db.connect()
         cursor = conn.cursor()
         
         reel_id = hashlib.md5(f"{product.product_id}{template_type}{datetime.now().isoformat()}".encode()).hexdigest()
@@ -816,13 +814,14 @@ YOU SAVE: ₹{product.original_price - product.product_price:,}
         conn.close()
     
     def cleanup_temp_files(self, content: Dict):
-        """Clean up temporary files"""
+        """Clean up temporary files (the product image stays in the image cache)"""
         try:
+            image_cache = get_image_cache()
             for file_path in content.values():
-                if os.path.exists(file_path):
+                if os.path.exists(file_path) and not image_cache.owns(file_path):
                     os.remove(file_path)
         except Exception as e:
-            print(f"Error cleaning up files: {e}")
+            logger.error(f"Error cleaning up files: {e}")
     
     def auto_schedule_daily_posts(self, products: List[ReelContent], posts_per_day: int = 3):
         """Automatically schedule daily posts"""
@@ -844,12 +843,11 @@ YOU SAVE: ₹{product.original_price - product.product_price:,}
                 
                 self.schedule_post(product, post_time, template)
         
-        print(f"Scheduled {7 * posts_per_day} posts for the next 7 days")
+        logger.info(f"Scheduled {7 * posts_per_day} posts for the next 7 days")
     
     def get_analytics_summary(self) -> Dict:
         """Get analytics summary for uploaded reels"""
-        
-        conn = sqlite3.connect('instagram_reels.db')
+        conn = self.db.connect()
         
         # Get overall stats
         stats_query = '''
@@ -863,10 +861,10 @@ YOU SAVE: ₹{product.original_price - product.product_price:,}
             FROM uploaded_reels
         '''
         
-        stats_df = pd.read_sql_query(stats_query, conn)
+        stats_df = read_dataframe(conn, stats_query)
         
         # Get performance by template
-        template_performance = pd.read_sql_query('''
+        template_performance = read_dataframe(conn, '''
             SELECT 
                 template_used,
                 COUNT(*) as count,
@@ -876,10 +874,10 @@ YOU SAVE: ₹{product.original_price - product.product_price:,}
             FROM uploaded_reels
             GROUP BY template_used
             ORDER BY avg_engagement DESC
-        ''', conn)
+        ''')
         
         # Get top performing reels
-        top_reels = pd.read_sql_query('''
+        top_reels = read_dataframe(conn, '''
             SELECT 
                 product_name,
                 template_used,
@@ -890,7 +888,7 @@ YOU SAVE: ₹{product.original_price - product.product_price:,}
             FROM uploaded_reels
             ORDER BY engagement_score DESC
             LIMIT 10
-        ''', conn)
+        ''')
         
         conn.close()
         
@@ -913,9 +911,9 @@ def run_instagram_automation():
     
     # Schedule tasks
     schedule.every(10).minutes.do(uploader.process_scheduled_posts)
-    schedule.every().day.at("09:00").do(lambda: print("Daily automation check"))
+    schedule.every().day.at("09:00").do(lambda: logger.info("Daily automation check"))
     
-    print("Instagram automation started...")
+    logger.info("Instagram automation started...")
     
     while True:
         schedule.run_pending()
@@ -923,6 +921,9 @@ def run_instagram_automation():
 
 # Example usage
 if __name__ == "__main__":
+    from logging_setup import configure_logging
+    configure_logging()
+    
     # Initialize uploader
     uploader = InstagramReelsUploader(
         access_token="YOUR_ACCESS_TOKEN_HERE",
@@ -980,10 +981,9 @@ class InstagramReelsUploader:
         self.app_id = app_id
         self.app_secret = app_secret
 def generate_product_video(self, product: ReelContent):
-    response = requests.get(product.product_image_url)
-    image_path = tempfile.NamedTemporaryFile(delete=False, suffix='.jpg').name
-    with open(image_path, 'wb') as f:
-        f.write(response.content)
+    image_path = get_image_cache().get(product.product_image_url)
+    if image_path is None:
+        raise ValueError(f"No image for product {product.product_id}: {product.product_image_url}")
 
     # Generate voiceover
     tts_text = f"{product.product_name}, only ₹{product.product_price}! Features: " + ", ".join(product.features)
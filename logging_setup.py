@@ -0,0 +1,237 @@
+# Logging Setup - non-blocking log pipeline shared by every SastaSmart entry point
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+from datetime import datetime
+from typing import Optional, Tuple
+from config import Config
+
+try:
+    import fcntl
+except ImportError:  # Windows: no flock; one process per log file is up to the caller
+    fcntl = None
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+_EXCEPTION_FORMATTER = logging.Formatter()
+
+# Numbered log files tried before falling back to one named after the pid
+MAX_LOG_SLOTS = 64
+
+# Attributes every LogRecord has; anything else came from extra={...}
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime', 'taskName'}
+
+class SizedTimedRotatingFileHandler(logging.handlers.TimedRotatingFileHandler):
+    """Rotates on a schedule (e.g. midnight) and also whenever the file exceeds max_bytes"""
+
+    def __init__(self, filename: str, max_bytes: int, when: str = 'midnight', backup_count: int = 7):
+        super().__init__(filename, when=when, backupCount=backup_count, encoding='utf-8', delay=True)
+        self.max_bytes = max_bytes
+
+    def shouldRollover(self, record) -> bool:
+        if super().shouldRollover(record):
+            return True
+        if self.max_bytes <= 0:
+            return False
+        if self.stream is None:
+            self.stream = self._open()
+        return self.stream.tell() >= self.max_bytes
+
+    def rotation_filename(self, default_name: str) -> str:
+        # Size-based rollovers can happen several times inside one time period
+        name = super().rotation_filename(default_name)
+        counter = 1
+        candidate = name
+        while os.path.exists(candidate):
+            candidate = f"{name}.{counter}"
+            counter += 1
+        return candidate
+
+def claim_log_file(log_file: str) -> Tuple[str, Optional[int]]:
+    """The file this process may log to, and the descriptor of the lock that reserves it
+
+    Gunicorn workers (and a scheduler sharing the directory) each
+    configure logging, and processes rotating one file between them lose
+    or overwrite records. So each process holds an flock on
+    '<file>.lock' for as long as it runs and writes only that file:
+    log_file itself for the first, then log_file with .1, .2... before
+    the extension. A recycled worker takes over a number its predecessor
+    freed, so there are only ever as many files as processes at once.
+    """
+
+    if fcntl is None:
+        return log_file, None
+    base, extension = os.path.splitext(log_file)
+    for slot in range(MAX_LOG_SLOTS):
+        path = log_file if slot == 0 else f"{base}.{slot}{extension}"
+        fd = os.open(path + '.lock', os.O_WRONLY | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            continue
+        return path, fd
+    return f"{base}.{os.getpid()}{extension}", None
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line; fields passed with extra={...} are included"""
+
+    def format(self, record) -> str:
+        entry = {
+            'ts': datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_info:
+            entry['exc_info'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry['exc_info'] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+class RateLimitFilter(logging.Filter):
+    """Caps repetitive INFO/DEBUG messages per call site
+
+    Each call site (module and line) may log `burst` records per `period`
+    seconds; beyond that only every `sample_every`-th record passes, tagged
+    with how many were dropped. Messages are usually f-strings, so the call
+    site rather than the text identifies "the same message". Warnings and
+    errors always pass.
+    """
+
+    def __init__(self, burst: int, period: float, sample_every: int):
+        super().__init__()
+        self.burst = burst
+        self.period = period
+        self.sample_every = sample_every
+        self._sites = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record) -> bool:
+        if record.levelno >= logging.WARNING or self.burst <= 0:
+            return True
+
+        key = (record.pathname, record.lineno)
+        now = record.created
+        with self._lock:
+            state = self._sites.get(key)
+            if state is None or now - state[0] >= self.period:
+                # [window start, records in window, dropped since last emitted]
+                dropped = state[2] if state else 0
+                state = self._sites[key] = [now, 0, dropped]
+            state[1] += 1
+            count, dropped = state[1], state[2]
+
+            if count <= self.burst or (self.sample_every > 0 and (count - self.burst) % self.sample_every == 0):
+                state[2] = 0
+            else:
+                state[2] += 1
+                return False
+
+        if dropped:
+            record.msg = f"{record.msg} [{dropped} similar suppressed]"
+        return True
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that never blocks the caller; records are dropped when the queue is full"""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def prepare(self, record):
+        # Cheaper than the stdlib version (which formats and copies every
+        # record): only what cannot cross threads safely is resolved here
+        if record.args:
+            record.msg = record.getMessage()
+            record.args = None
+        if record.exc_info:
+            record.exc_text = _EXCEPTION_FORMATTER.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+class _QueueListener(logging.handlers.QueueListener):
+    def enqueue_sentinel(self):
+        # Block rather than fail when the queue is full at shutdown
+        self.queue.put(self._sentinel)
+
+_state = {'pid': None, 'listener': None, 'handler': None, 'lock_fd': None}
+_configure_lock = threading.Lock()
+
+def configure_logging(level: Optional[str] = None, json_format: Optional[bool] = None,
+                      log_file: Optional[str] = None, console: bool = True) -> logging.Logger:
+    """Route all logging through a queue to a background writer thread
+
+    Safe to call from every entry point: only the first call in a process
+    installs handlers (a forked worker gets its own listener thread and
+    its own log file, see claim_log_file).
+    """
+
+    with _configure_lock:
+        root = logging.getLogger()
+        if _state['pid'] == os.getpid():
+            return root
+
+        level = level or Config.LOG_LEVEL
+        json_format = (Config.LOG_FORMAT == 'json') if json_format is None else json_format
+        log_file = log_file or os.path.join(Config.LOGS_DIR, 'sastasmart.log')
+        os.makedirs(os.path.dirname(log_file) or '.', exist_ok=True)
+        if _state['lock_fd'] is not None:
+            # Inherited from the parent: closing our copy leaves its file
+            # locked while it runs, and lets the file go when it exits
+            os.close(_state['lock_fd'])
+            _state['lock_fd'] = None
+        log_file, _state['lock_fd'] = claim_log_file(log_file)
+
+        formatter = JsonFormatter() if json_format else logging.Formatter(TEXT_FORMAT)
+        handlers = [SizedTimedRotatingFileHandler(
+            log_file, Config.LOG_MAX_BYTES, Config.LOG_ROTATE_WHEN, Config.LOG_BACKUP_COUNT
+        )]
+        if console:
+            handlers.append(logging.StreamHandler(sys.stdout))
+        for handler in handlers:
+            handler.setFormatter(formatter)
+
+        # Replace whatever an earlier basicConfig() or the parent process installed
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+
+        queue_handler = _QueueHandler(queue.Queue(maxsize=Config.LOG_QUEUE_SIZE))
+        queue_handler.addFilter(RateLimitFilter(
+            Config.LOG_RATE_LIMIT_BURST, Config.LOG_RATE_LIMIT_PERIOD, Config.LOG_SAMPLE_EVERY
+        ))
+        root.addHandler(queue_handler)
+        root.setLevel(getattr(logging, level))
+
+        listener = _QueueListener(queue_handler.queue, *handlers, respect_handler_level=True)
+        listener.start()
+        atexit.register(shutdown_logging)  # drains the queue before the process exits
+
+        _state.update(pid=os.getpid(), listener=listener, handler=queue_handler)
+        return root
+
+def shutdown_logging():
+    """Flush queued records and stop the writer thread"""
+    with _configure_lock:
+        if _state['listener'] is not None and _state['pid'] == os.getpid():
+            _state['listener'].stop()
+            logging.getLogger().removeHandler(_state['handler'])
+        _state.update(pid=None, listener=None, handler=None)
+
+def dropped_records() -> int:
+    """Records discarded because the queue was full"""
+    handler = _state['handler']
+    return handler.dropped if handler is not None else 0
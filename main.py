@@ -6,13 +6,13 @@ Approved and validated for production use
 """
 
 import asyncio
+import hmac
+import json
 import threading
-import schedule
 import time
 import logging
 from datetime import datetime, timedelta
-from typing import List, Dict, Optional
-import sqlite3
+from typing import List, Dict, Optional, Tuple
 import os
 import sys
 
@@ -20,6 +20,14 @@ import sys
 try:
     from config import Config
     from affiliated_manager import AffiliateManager, ProductProcessor
+    from system_counters import SystemCounters
+    from product_identity import canonical_product_key, validate_product_record
+    from price_history import PriceHistory
+    from product_matching import ProductMatcher
+    from storage import Connection, get_database
+    import metrics
+    import tracing
+    from logging_setup import configure_logging
 except ImportError as e:
     print(f"❌ Import error: {e}")
     sys.exit(1)
@@ -28,8 +36,8 @@ except ImportError as e:
 try:
     from fastapi import FastAPI, Request, HTTPException
     from fastapi.middleware.cors import CORSMiddleware
-    from fastapi.responses import JSONResponse
-    from fastapi.staticfiles import StaticFiles
+    from fastapi.responses import JSONResponse, PlainTextResponse
+    from starlette.concurrency import run_in_threadpool
 except ImportError as e:
     print(f"❌ FastAPI import error: {e}")
     sys.exit(1)
@@ -51,16 +59,8 @@ app.add_middleware(
 )
 
 
-# Configure logging
-log_file_path = os.path.join(Config.LOGS_DIR, 'sastasmart.log')
-logging.basicConfig(
-    level=getattr(logging, Config.LOG_LEVEL),
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler(log_file_path),
-        logging.StreamHandler()
-    ]
-)
+# Configure logging (queued - the posting loop never waits on disk or stdout)
+configure_logging()
 logger = logging.getLogger(__name__)
 
 class SastaSmartMaster:
@@ -68,62 +68,121 @@ class SastaSmartMaster:
     
     def __init__(self):
         self.config = Config()
-        self.affiliate_manager = AffiliateManager()
-        self.product_processor = ProductProcessor()
         
-        # Initialize components
-        self.earnings_tracker = None
-        self.instagram_uploader = None
-        self.telegram_bot = None
-        self.discord_bot = None
+        # Components are created on first use (see the properties below), so
+        # a web worker that only needs the database never imports pandas,
+        # moviepy or the bot SDKs
+        self._components = {}
+        self._components_lock = threading.RLock()
         
-        self.setup_components()
+        self.db = get_database('master')
         self.setup_database()
+        self.counters = SystemCounters(self.db)
+        self.price_history = PriceHistory(self.db)
+        self.product_matcher = ProductMatcher(self.db) if self.config.MATCH_ENABLED else None
+        metrics.QUEUE_DEPTH.set_function(self.get_queue_depth)
+    
+    def _get_component(self, name: str, factory):
+        """Return a component, creating it on first access (None if it fails)"""
+        
+        if name in self._components:
+            return self._components[name]
+        
+        with self._components_lock:
+            if name not in self._components:
+                try:
+                    self._components[name] = factory()
+                except ImportError as e:
+                    logger.error(f"❌ Error importing {name}: {e}")
+                    self._components[name] = None
+                except Exception as e:
+                    logger.error(f"❌ Error initializing {name}: {e}")
+                    self._components[name] = None
+            return self._components[name]
+    
+    @property
+    def affiliate_manager(self):
+        return self._get_component('affiliate_manager', AffiliateManager)
+    
+    @property
+    def product_processor(self):
+        return self._get_component('product_processor', lambda: ProductProcessor(self.affiliate_manager))
+    
+    @property
+    def reports(self):
+        from reporting import Reports
+        return self._get_component('reports', Reports)
+    
+    @property
+    def earnings_tracker(self):
+        if not self.config.PLATFORMS_ENABLED['earnings_tracker']:
+            return None
+        
+        def create():
+            from earnings_tracker import EarningsTracker
+            tracker = EarningsTracker(
+                bitly_token=self.config.BITLY_ACCESS_TOKEN
+            )
+            logger.info("✅ Earnings Tracker initialized")
+            return tracker
+        
+        return self._get_component('earnings_tracker', create)
+    
+    @property
+    def instagram_uploader(self):
+        if not self.config.PLATFORMS_ENABLED['instagram']:
+            return None
+        
+        def create():
+            from instagram_uploader import InstagramReelsUploader
+            uploader = InstagramReelsUploader(
+                access_token=self.config.INSTAGRAM_ACCESS_TOKEN,
+                page_id=self.config.INSTAGRAM_PAGE_ID,
+                app_id=self.config.FACEBOOK_APP_ID,
+                app_secret=self.config.FACEBOOK_APP_SECRET
+            )
+            logger.info("✅ Instagram Uploader initialized")
+            return uploader
+        
+        return self._get_component('instagram_uploader', create)
+    
+    @property
+    def telegram_bot(self):
+        if not self.config.PLATFORMS_ENABLED['telegram']:
+            return None
+        
+        def create():
+            from bots.telegram_bot import TelegramBot
+            bot = TelegramBot()
+            logger.info("✅ Telegram Bot initialized")
+            return bot
+        
+        return self._get_component('telegram_bot', create)
+    
+    @property
+    def discord_bot(self):
+        if not self.config.PLATFORMS_ENABLED['discord']:
+            return None
+        
+        def create():
+            from bots.discord_bot import DiscordBot
+            bot = DiscordBot()
+            logger.info("✅ Discord Bot initialized")
+            return bot
+        
+        return self._get_component('discord_bot', create)
     
     def setup_components(self):
-        """Initialize all components"""
+        """Initialize all components up front (used when running the full system)"""
         
-        try:
-            # Initialize EarningsTracker
-            if self.config.PLATFORMS_ENABLED['earnings_tracker']:
-                from earnings_tracker import EarningsTracker
-                self.earnings_tracker = EarningsTracker(
-                    db_path="earnings.db",
-                    bitly_token=self.config.BITLY_ACCESS_TOKEN
-                )
-                logger.info("✅ Earnings Tracker initialized")
-            
-            # Initialize Instagram Uploader
-            if self.config.PLATFORMS_ENABLED['instagram']:
-                from instagram_uploader import InstagramReelsUploader
-                self.instagram_uploader = InstagramReelsUploader(
-                    access_token=self.config.INSTAGRAM_ACCESS_TOKEN,
-                    page_id=self.config.INSTAGRAM_PAGE_ID,
-                    app_id=self.config.FACEBOOK_APP_ID,
-                    app_secret=self.config.FACEBOOK_APP_SECRET
-                )
-                logger.info("✅ Instagram Uploader initialized")
-            
-            # Initialize Telegram Bot
-            if self.config.PLATFORMS_ENABLED['telegram']:
-                from bots.telegram_bot import TelegramBot
-                self.telegram_bot = TelegramBot()
-                logger.info("✅ Telegram Bot initialized")
-            
-            # Initialize Discord Bot  
-            if self.config.PLATFORMS_ENABLED['discord']:
-                from bots.discord_bot import DiscordBot
-                self.discord_bot = DiscordBot()
-                logger.info("✅ Discord Bot initialized")
-                
-        except ImportError as e:
-            logger.error(f"❌ Error importing components: {e}")
-        except Exception as e:
-            logger.error(f"❌ Error initializing components: {e}")
+        components = [self.earnings_tracker, self.instagram_uploader,
+                      self.telegram_bot, self.discord_bot]
+        ready = sum(1 for component in components if component is not None)
+        logger.info(f"✅ {ready} components ready")
     
     def setup_database(self):
         """Setup master database"""
-        conn = sqlite3.connect('sastasmart_master.db')
+        conn = self.db.connect()
         cursor = conn.cursor()
         
         # Products table
@@ -150,6 +209,36 @@ class SastaSmartMaster:
             )
         ''')
         
+        # Identity and change-tracking columns added after the first release
+        existing_columns = set(self.db.table_columns(cursor, 'products'))
+        for column, definition in [
+            ('canonical_key', 'TEXT'),
+            ('in_stock', 'BOOLEAN DEFAULT 1'),
+            ('updated_at', 'DATETIME'),
+            ('last_seen_at', 'DATETIME'),
+        ]:
+            if column not in existing_columns:
+                cursor.execute(f'ALTER TABLE products ADD COLUMN {column} {definition}')
+        
+        cursor.execute('''
+            CREATE UNIQUE INDEX IF NOT EXISTS idx_products_canonical_key
+            ON products (canonical_key)
+        ''')
+        
+        # Key rows stored before identity tracking; the newest duplicate wins
+        cursor.execute('''
+            SELECT id, amazon_url, flipkart_url FROM products
+            WHERE canonical_key IS NULL
+            ORDER BY id DESC
+        ''')
+        for product_id, amazon_url, flipkart_url in cursor.fetchall():
+            key = canonical_product_key({'amazon_url': amazon_url, 'flipkart_url': flipkart_url})
+            if key:
+                cursor.execute('''
+                    UPDATE products SET canonical_key = ?
+                    WHERE id = ? AND NOT EXISTS (SELECT 1 FROM products WHERE canonical_key = ?)
+                ''', (key, product_id, key))
+        
         # Posting queue table
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS posting_queue (
@@ -164,6 +253,63 @@ class SastaSmartMaster:
             )
         ''')
         
+        # Covering partial index for due work - only pending rows are indexed,
+        # so process_posting_queue never touches finished history
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_posting_queue_pending
+            ON posting_queue (scheduled_time, product_id, platform, template_type)
+            WHERE status = 'pending'
+        ''')
+        
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_posting_queue_pending_product
+            ON posting_queue (product_id)
+            WHERE status = 'pending'
+        ''')
+        
+        # Archive for finished queue rows (moved here by compact_posting_queue)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS posting_history (
+                id INTEGER PRIMARY KEY,
+                product_id INTEGER,
+                platform TEXT,
+                scheduled_time DATETIME,
+                template_type TEXT,
+                status TEXT,
+                created_at DATETIME,
+                archived_at DATETIME DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        
+        # Reports count finished posts per product over a time window
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_posting_history_scheduled
+            ON posting_history (scheduled_time, product_id, platform, status)
+        ''')
+        
+        # Queue counters by status and platform, maintained incrementally
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS posting_queue_stats (
+                status TEXT NOT NULL,
+                platform TEXT NOT NULL,
+                count INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (status, platform)
+            )
+        ''')
+        
+        # One-off backfill for databases created before the counters existed
+        cursor.execute('SELECT 1 FROM posting_queue_stats LIMIT 1')
+        if cursor.fetchone() is None:
+            cursor.execute('''
+                INSERT INTO posting_queue_stats (status, platform, count)
+                SELECT status, platform, COUNT(*) FROM (
+                    SELECT status, platform FROM posting_queue
+                    UNION ALL
+                    SELECT status, platform FROM posting_history
+                ) AS all_posts
+                GROUP BY status, platform
+            ''')
+        
         # System stats table
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS system_stats (
@@ -183,19 +329,106 @@ class SastaSmartMaster:
     def add_product(self, product_data: Dict) -> int:
         """Add new product to system"""
         
-        # Process product to generate affiliate links
-        processed_product = self.product_processor.process_product(product_data)
+        product_id, _ = self.upsert_product(product_data)
+        return product_id
+    
+    def has_meaningful_change(self, existing: Tuple, product_data: Dict) -> bool:
+        """Check whether price, discount or stock moved past the configured thresholds"""
+        
+        old_price, old_discount, old_in_stock = existing
+        new_price = product_data.get('price', 0) or 0
+        new_discount = product_data.get('discount', 0) or 0
+        new_in_stock = bool(product_data.get('in_stock', True))
+        
+        if bool(old_in_stock) != new_in_stock:
+            return True
+        
+        if old_price:
+            price_change = abs(new_price - old_price) / old_price * 100
+            if price_change >= self.config.PRICE_CHANGE_THRESHOLD_PERCENT:
+                return True
+        elif new_price:
+            return True
+        
+        return abs(new_discount - (old_discount or 0)) >= self.config.DISCOUNT_CHANGE_THRESHOLD
+    
+    def upsert_product(self, product_data: Dict, conn: Optional[Connection] = None) -> Tuple[int, str]:
+        """Insert or update a product by canonical key
+        
+        Returns the product id and the outcome: 'new', 'updated' or 'unchanged'.
+        Affiliate links are regenerated and posts scheduled only for new
+        products and for products whose price, discount or stock changed.
+        When a connection is passed the caller owns the transaction.
+        """
         
-        conn = sqlite3.connect('sastasmart_master.db')
+        canonical_key = canonical_product_key(product_data)
+        now = datetime.now()
+        
+        own_connection = conn is None
+        if own_connection:
+            conn = self.db.connect()
         cursor = conn.cursor()
         
+        existing = self.find_products(cursor, [canonical_key]).get(canonical_key) if canonical_key else None
+        
+        if existing and not self.has_meaningful_change(existing[1:], product_data):
+            self.touch_product(cursor, existing[0], product_data, now)
+            if own_connection:
+                conn.commit()
+                conn.close()
+            return existing[0], 'unchanged'
+        
+        # Process product to generate affiliate links
+        with tracing.span('process_product', product=str(product_data.get('title', ''))[:80]):
+            processed_product = self.product_processor.process_product(product_data)
+        
+        product_id, outcome = self.store_product(cursor, processed_product, existing, canonical_key, now)
+        match = self.match_product(cursor, product_id, processed_product, now)
+        
+        # Schedule posts for this product (nothing to promote while out of stock)
+        if processed_product.get('in_stock', True) and not self.is_duplicate_listing(outcome, processed_product, match):
+            self.schedule_product_posts(product_id, processed_product, cursor)
+        
+        if own_connection:
+            conn.commit()
+            conn.close()
+        
+        return product_id, outcome
+    
+    def find_products(self, cursor, canonical_keys: List[str]) -> Dict[str, Tuple]:
+        """(id, price, discount_percent, in_stock) of the stored products with these keys"""
+        
+        found = {}
+        for start in range(0, len(canonical_keys), 500):
+            chunk = canonical_keys[start:start + 500]
+            placeholders = ', '.join('?' for _ in chunk)
+            with metrics.SQLITE_QUERY_TIME.time(operation='product_lookup'):
+                cursor.execute(f'''
+                    SELECT canonical_key, id, price, discount_percent, in_stock FROM products
+                    WHERE canonical_key IN ({placeholders})
+                ''', chunk)
+                for row in cursor.fetchall():
+                    found[row[0]] = tuple(row[1:])
+        return found
+    
+    def touch_product(self, cursor, product_id: int, product_data: Dict, now: datetime):
+        """Seen again without a meaningful change: keep its row, note the sighting and price"""
+        
         cursor.execute('''
-            INSERT INTO products (
-                title, price, original_price, discount_percent,
-                amazon_url, flipkart_url, affiliate_amazon, affiliate_flipkart,
-                image_url, category, features, platform
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
+            UPDATE products SET last_seen_at = ? WHERE id = ?
+        ''', (now, product_id))
+        if product_data.get('price'):
+            self.price_history.record(product_id, product_data['price'], now.timestamp(), cursor)
+    
+    def store_product(self, cursor, processed_product: Dict, existing: Optional[Tuple],
+                      canonical_key: Optional[str], now: datetime) -> Tuple[int, str]:
+        """Write a new or changed product (affiliate links already generated)
+        
+        Pending posts of a changed product are superseded; the caller
+        schedules new ones. Returns the product id and 'new' or 'updated'.
+        """
+        
+        values = (
             processed_product.get('title', ''),
             processed_product.get('price', 0),
             processed_product.get('original_price', 0),
@@ -207,28 +440,138 @@ class SastaSmartMaster:
             processed_product.get('image_url', ''),
             processed_product.get('category', ''),
             str(processed_product.get('features', [])),
-            processed_product.get('platform', '')
-        ))
+            processed_product.get('platform', ''),
+            bool(processed_product.get('in_stock', True)),
+            now,
+            now
+        )
+        
+        if existing:
+            product_id = existing[0]
+            cursor.execute('''
+                UPDATE products SET
+                    title = ?, price = ?, original_price = ?, discount_percent = ?,
+                    amazon_url = ?, flipkart_url = ?, affiliate_amazon = ?, affiliate_flipkart = ?,
+                    image_url = ?, category = ?, features = ?, platform = ?,
+                    in_stock = ?, updated_at = ?, last_seen_at = ?
+                WHERE id = ?
+            ''', values + (product_id,))
+            
+            # Posts queued for the old price are superseded by the new schedule
+            cursor.execute('''
+                SELECT id, platform FROM posting_queue
+                WHERE product_id = ? AND status = 'pending'
+            ''', (product_id,))
+            for queue_id, platform in cursor.fetchall():
+                self._set_queue_status(cursor, queue_id, platform, 'superseded')
+            
+            outcome = 'updated'
+        else:
+            product_id = self.db.insert_returning_id(cursor, '''
+                INSERT INTO products (
+                    title, price, original_price, discount_percent,
+                    amazon_url, flipkart_url, affiliate_amazon, affiliate_flipkart,
+                    image_url, category, features, platform,
+                    in_stock, updated_at, last_seen_at, canonical_key
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', values + (canonical_key,))
+            self.counters.increment(cursor, 'total_products')
+            outcome = 'new'
+        
+        self.counters.increment(cursor, 'products_processed')
+        if processed_product.get('price'):
+            self.price_history.record(product_id, processed_product['price'], now.timestamp(), cursor)
+        
+        if outcome == 'new':
+            logger.info(f"✅ Added product: {processed_product.get('title', 'Unknown')} (ID: {product_id})")
+        else:
+            logger.info(f"🔄 Updated product: {processed_product.get('title', 'Unknown')} (ID: {product_id})")
+        
+        return product_id, outcome
+    
+    def match_product(self, cursor, product_id: int, product_data: Dict, now: datetime) -> Optional[Dict]:
+        """Link a stored product to the same item's listing on the other marketplace
+        
+        Returns the match found (id, title, platform, price, similarity),
+        or None when matching is off, nothing matched or the title was
+        already matched.
+        """
+        
+        if self.product_matcher is None:
+            return None
+        with tracing.span('match_product'):
+            return self.product_matcher.add(cursor, product_id, product_data, now)
+    
+    @staticmethod
+    def is_duplicate_listing(outcome: str, product_data: Dict, match: Optional[Dict]) -> bool:
+        """A newly found listing of an item already stored from the other marketplace at no higher price"""
+        return outcome == 'new' and match is not None and match['price'] <= product_data.get('price', 0)
+    
+    def get_product_matches(self, product_id: int) -> List[Dict]:
+        """The same item on other marketplaces, cheapest first"""
+        if self.product_matcher is None:
+            return []
+        return self.product_matcher.matches(product_id)
+    
+    def get_price_assessment(self, product_id: int) -> Optional[Dict]:
+        """The product's current deal against its own 7/30-day price history; None if unknown"""
         
-        product_id = cursor.lastrowid
-        conn.commit()
+        conn = self.db.connect()
+        cursor = conn.cursor()
+        cursor.execute('SELECT price, original_price FROM products WHERE id = ?', (product_id,))
+        row = cursor.fetchone()
         conn.close()
+        if row is None:
+            return None
+        
+        price, original_price = row
+        assessment = {'has_history': False}
+        if price:
+            assessment = self.price_history.assess_deal(product_id, price, original_price)
+        return dict(assessment, product_id=product_id, price=price, original_price=original_price,
+                    all_time_low=self.price_history.all_time_low(product_id))
+    
+    @tracing.traced('ingest.batch')
+    def ingest_products_batch(self, records: List[Dict]) -> List[Dict]:
+        """Upsert a batch of products in one transaction
         
-        logger.info(f"✅ Added product: {processed_product.get('title', 'Unknown')} (ID: {product_id})")
+        Each record runs inside its own savepoint, so a record that fails
+        is rolled back and reported without losing the rest of the batch.
+        """
         
-        # Schedule posts for this product
-        self.schedule_product_posts(product_id, processed_product)
+        conn = self.db.connect()
+        cursor = conn.cursor()
+        cursor.execute('BEGIN')
+        results = []
         
-        return product_id
+        for record in records:
+            cursor.execute('SAVEPOINT ingest_record')
+            try:
+                product_id, outcome = self.upsert_product(record, conn)
+                cursor.execute('RELEASE SAVEPOINT ingest_record')
+                results.append({'status': outcome, 'id': product_id})
+            except Exception as e:
+                cursor.execute('ROLLBACK TO SAVEPOINT ingest_record')
+                cursor.execute('RELEASE SAVEPOINT ingest_record')
+                logger.error(f"❌ Error ingesting product {record.get('title', 'Unknown')}: {e}")
+                results.append({'status': 'error', 'error': str(e)})
+        
+        conn.commit()
+        conn.close()
+        return results
     
-    def schedule_product_posts(self, product_id: int, product_data: Dict):
+    @tracing.traced('schedule_product_posts')
+    def schedule_product_posts(self, product_id: int, product_data: Dict, cursor=None):
         """Schedule posts for a product across all platforms"""
         
-        conn = sqlite3.connect('sastasmart_master.db')
-        cursor = conn.cursor()
+        own_connection = cursor is None
+        if own_connection:
+            conn = self.db.connect()
+            cursor = conn.cursor()
         
         # Get next available time slots
         now = datetime.now()
+        scheduled = {}
         
         # Schedule Instagram post (every 30 minutes)
         if self.config.PLATFORMS_ENABLED['instagram']:
@@ -237,6 +580,7 @@ class SastaSmartMaster:
                 INSERT INTO posting_queue (product_id, platform, scheduled_time, template_type)
                 VALUES (?, 'instagram', ?, 'flash_deal_template')
             ''', (product_id, instagram_time))
+            scheduled['instagram'] = 1
         
         # Schedule Telegram post (every 5 minutes)
         if self.config.PLATFORMS_ENABLED['telegram']:
@@ -254,6 +598,7 @@ class SastaSmartMaster:
                     INSERT INTO posting_queue (product_id, platform, scheduled_time, template_type)
                     VALUES (?, 'telegram', ?, 'deal_alert')
                 ''', (product_id, telegram_time))
+            scheduled['telegram'] = 6
         
         # Schedule Discord post (every 5 minutes)
         if self.config.PLATFORMS_ENABLED['discord']:
@@ -271,34 +616,71 @@ class SastaSmartMaster:
                     INSERT INTO posting_queue (product_id, platform, scheduled_time, template_type)
                     VALUES (?, 'discord', ?, 'embed_deal')
                 ''', (product_id, discord_time))
+            scheduled['discord'] = 6
         
-        conn.commit()
-        conn.close()
+        for platform, count in scheduled.items():
+            self._update_queue_stats(cursor, 'pending', platform, count)
+        
+        if own_connection:
+            conn.commit()
+            conn.close()
         
         logger.info(f"✅ Scheduled posts for product ID: {product_id}")
     
+    def _update_queue_stats(self, cursor, status: str, platform: str, delta: int):
+        """Adjust the posting_queue_stats counter in the caller's transaction"""
+        
+        cursor.execute('''
+            INSERT INTO posting_queue_stats (status, platform, count) VALUES (?, ?, ?)
+            ON CONFLICT (status, platform) DO UPDATE SET count = posting_queue_stats.count + excluded.count
+        ''', (status, platform, delta))
+    
+    def _set_queue_status(self, cursor, queue_id: int, platform: str, status: str) -> bool:
+        """Move a pending queue row to a final status and keep counters in step
+        
+        False, with the counters untouched, when the row was no longer
+        pending (another processor finished it first).
+        """
+        
+        cursor.execute('''
+            UPDATE posting_queue SET status = ? WHERE id = ? AND status = 'pending'
+        ''', (status, queue_id))
+        if cursor.rowcount != 1:
+            return False
+        self._update_queue_stats(cursor, 'pending', platform, -1)
+        self._update_queue_stats(cursor, status, platform, 1)
+        return True
+    
+    @tracing.traced('process_posting_queue')
     def process_posting_queue(self):
         """Process pending posts in queue"""
         
-        conn = sqlite3.connect('sastasmart_master.db')
+        conn = self.db.connect()
         cursor = conn.cursor()
         
         # Get pending posts that are due
         now = datetime.now()
-        cursor.execute('''
-            SELECT pq.id, pq.product_id, pq.platform, pq.template_type, 
-                   p.title, p.price, p.original_price, p.discount_percent,
-                   p.affiliate_amazon, p.affiliate_flipkart, p.image_url, p.category
-            FROM posting_queue pq
-            JOIN products p ON pq.product_id = p.id
-            WHERE pq.status = 'pending' AND pq.scheduled_time <= ?
-            ORDER BY pq.scheduled_time
-        ''', (now,))
-        
-        pending_posts = cursor.fetchall()
+        with tracing.span('queue.claim'), metrics.SQLITE_QUERY_TIME.time(operation='claim_due_posts'):
+            cursor.execute('''
+                SELECT pq.id, pq.product_id, pq.platform, pq.template_type, 
+                       p.title, p.price, p.original_price, p.discount_percent,
+                       p.affiliate_amazon, p.affiliate_flipkart, p.image_url, p.category,
+                       pq.scheduled_time
+                FROM posting_queue pq
+                JOIN products p ON pq.product_id = p.id
+                WHERE pq.status = 'pending' AND pq.scheduled_time <= ?
+                ORDER BY pq.scheduled_time
+            ''', (now,))
+            
+            pending_posts = cursor.fetchall()
         
         for post in pending_posts:
             queue_id, product_id, platform, template_type = post[:4]
+            try:
+                lag = (datetime.now() - datetime.fromisoformat(str(post[12]))).total_seconds()
+                metrics.SCHEDULING_LAG.observe(max(lag, 0), platform=platform)
+            except ValueError:
+                pass
             product_data = {
                 'id': product_id,
                 'title': post[4],
@@ -313,41 +695,88 @@ class SastaSmartMaster:
             
             try:
                 # Run the async method in a synchronous context
-                import asyncio
-                success = asyncio.run(self.create_and_post_content(platform, product_data, template_type))
+                with metrics.POSTING_LATENCY.time(platform=platform):
+                    success = asyncio.run(self.create_and_post_content(platform, product_data, template_type))
+                metrics.POSTS_SENT.inc(platform=platform, result='success' if success else 'failure')
                 
                 if success:
-                    # Mark as completed
-                    cursor.execute('''
-                        UPDATE posting_queue SET status = 'completed' WHERE id = ?
-                    ''', (queue_id,))
-                    
-                    # Update product posted status
-                    cursor.execute(f'''
-                        UPDATE products SET posted_{platform} = 1 WHERE id = ?
-                    ''', (product_id,))
+                    # Mark as completed; counted once even if another processor also sent it
+                    if self._set_queue_status(cursor, queue_id, platform, 'completed'):
+                        # Update product posted status
+                        cursor.execute(f'''
+                            UPDATE products SET posted_{platform} = 1 WHERE id = ? AND posted_{platform} = 0
+                        ''', (product_id,))
+                        if cursor.rowcount:
+                            self.counters.increment(cursor, f'posted_{platform}')
+                        self.counters.increment(cursor, 'posts_created')
                     
                     logger.info(f"✅ Posted {platform} content for product: {product_data['title']}")
                 else:
                     # Mark as failed
-                    cursor.execute('''
-                        UPDATE posting_queue SET status = 'failed' WHERE id = ?
-                    ''', (queue_id,))
+                    self._set_queue_status(cursor, queue_id, platform, 'failed')
                     
                     logger.error(f"❌ Failed to post {platform} content for product: {product_data['title']}")
                     
             except Exception as e:
                 logger.error(f"❌ Error processing {platform} post: {e}")
-                cursor.execute('''
-                    UPDATE posting_queue SET status = 'error' WHERE id = ?
-                ''', (queue_id,))
+                metrics.POSTS_SENT.inc(platform=platform, result='error')
+                self._set_queue_status(cursor, queue_id, platform, 'error')
         
         conn.commit()
         conn.close()
     
+    def compact_posting_queue(self, batch_size: int = 5000) -> int:
+        """Move finished queue rows into posting_history"""
+        
+        conn = self.db.connect()
+        cursor = conn.cursor()
+        archived = 0
+        
+        # Work in bounded batches so the write lock is never held for long
+        while True:
+            cursor.execute('''
+                SELECT id FROM posting_queue
+                WHERE status != 'pending'
+                ORDER BY id
+                LIMIT ?
+            ''', (batch_size,))
+            ids = [row[0] for row in cursor.fetchall()]
+            if not ids:
+                break
+            
+            placeholders = ','.join('?' * len(ids))
+            cursor.execute(f'''
+                INSERT INTO posting_history (
+                    id, product_id, platform, scheduled_time, template_type, status, created_at
+                )
+                SELECT id, product_id, platform, scheduled_time, template_type, status, created_at
+                FROM posting_queue WHERE id IN ({placeholders})
+                ON CONFLICT (id) DO UPDATE SET
+                    product_id = excluded.product_id,
+                    platform = excluded.platform,
+                    scheduled_time = excluded.scheduled_time,
+                    template_type = excluded.template_type,
+                    status = excluded.status,
+                    created_at = excluded.created_at
+            ''', ids)
+            cursor.execute(f'DELETE FROM posting_queue WHERE id IN ({placeholders})', ids)
+            conn.commit()
+            archived += len(ids)
+        
+        conn.close()
+        
+        if archived:
+            logger.info(f"🗄️ Archived {archived} finished posts to posting_history")
+        return archived
+    
     async def create_and_post_content(self, platform: str, product_data: Dict, template_type: str) -> bool:
         """Create and post content to specified platform"""
         
+        with tracing.span('platform.send', platform=platform, template=template_type,
+                          product_id=product_data.get('id')):
+            return await self._create_and_post_content(platform, product_data, template_type)
+    
+    async def _create_and_post_content(self, platform: str, product_data: Dict, template_type: str) -> bool:
         try:
             if platform == 'instagram' and self.instagram_uploader:
                 from instagram_uploader import ReelContent
@@ -404,71 +833,72 @@ class SastaSmartMaster:
             logger.error(f"Error posting to Discord: {e}")
             return False
     
+    @tracing.traced('ingest')
     def scrape_and_add_products(self):
-        """Scrape products from various sources and add to system"""
+        """Scrape products from various sources and add to system
         
-        # Sample products (replace with actual scraping logic)
-        sample_products = [
-            {
-                'title': 'Samsung Galaxy S24 Ultra 5G (256GB)',
-                'price': 89999,
-                'original_price': 124999,
-                'discount': 28,
-                'amazon_url': 'https://www.amazon.in/dp/B0CMDWTJ5X',
-                'flipkart_url': 'https://www.flipkart.com/samsung-galaxy-s24-ultra',
-                'image_url': 'https://images.unsplash.com/photo-1610945265064-0e34e5519bbf?w=500',
-                'category': 'electronics',
-                'features': ['256GB Storage', '12GB RAM', '200MP Camera', '5000mAh Battery'],
-                'platform': 'amazon'
-            },
-            {
-                'title': 'Apple iPhone 15 Pro Max (512GB)',
-                'price': 134999,
-                'original_price': 159900,
-                'discount': 15,
-                'amazon_url': 'https://www.amazon.in/dp/B0CHX2F5QT',
-                'flipkart_url': 'https://www.flipkart.com/apple-iphone-15-pro-max',
-                'image_url': 'https://images.unsplash.com/photo-1592899677977-9c10ca588bbd?w=500',
-                'category': 'electronics',
-                'features': ['512GB Storage', 'A17 Pro Chip', 'Pro Camera System', 'Titanium Design'],
-                'platform': 'amazon'
-            }
-        ]
+        Runs the staged ingest pipeline (see ingest_pipeline.py): products
+        are filtered, stored and scheduled while the scrape is still going.
+        """
+        
+        from ingest_pipeline import ProductIngestPipeline
+        
+        if self.product_matcher is not None:
+            # Products stored before matching existed, a batch per run
+            indexed = self.product_matcher.backfill()
+            if indexed:
+                logger.info(f"🔗 Indexed {indexed} older products for cross-marketplace matching")
         
-        for product in sample_products:
-            if product['discount'] >= self.config.MIN_DISCOUNT_PERCENT:
-                self.add_product(product)
+        run_stats = ProductIngestPipeline(self, limit=self.config.MAX_PRODUCTS_PER_RUN).run()
+        
+        logger.info(
+            f"🔁 Scrape run - New: {run_stats['new']}, Updated: {run_stats['updated']}, "
+            f"Skipped unchanged: {run_stats['unchanged']}, Filtered: {run_stats['filtered']}, "
+            f"Already posted from the other marketplace: {run_stats['matched']}"
+        )
+        return run_stats
+    
+    @tracing.traced('feed_ingest')
+    def ingest_product_feeds(self):
+        """Ingest the configured affiliate product feeds (see product_feeds.py)
+        
+        Each feed is streamed in segments; the items of a segment that
+        changed since the last ingest go through the ingest pipeline
+        like scraped products.
+        """
+        
+        from ingest_pipeline import ProductIngestPipeline
+        from product_feeds import FeedIngester
+        
+        ingester = FeedIngester(lambda products: ProductIngestPipeline(self, source=products).run())
+        return ingester.ingest_all(self.config.PRODUCT_FEEDS)
     
     def update_system_stats(self):
         """Update daily system statistics"""
         
-        conn = sqlite3.connect('sastasmart_master.db')
-        cursor = conn.cursor()
+        # Today's activity counters are maintained incrementally
+        self.counters.checkpoint()
+        daily = self.counters.get_daily()
+        products_processed = daily['products_processed']
+        posts_created = daily['posts_created']
         
         today = datetime.now().date()
         
-        # Count today's activities
-        cursor.execute('''
-            SELECT COUNT(*) FROM products WHERE DATE(created_at) = ?
-        ''', (today,))
-        products_processed = cursor.fetchone()[0]
-        
-        cursor.execute('''
-            SELECT COUNT(*) FROM posting_queue WHERE DATE(created_at) = ? AND status = 'completed'
-        ''', (today,))
-        posts_created = cursor.fetchone()[0]
-        
         # Get earnings data from affiliate manager
         performance_report = self.affiliate_manager.get_performance_report(1)  # Last 1 day
         total_clicks = sum(platform['total_clicks'] for platform in performance_report['platform_stats'])
         total_earnings = sum(platform['total_earnings'] for platform in performance_report['platform_stats'])
         
-        # Insert or update stats
+        # Insert or update stats (counter and uptime columns are kept as they are)
+        conn = self.db.connect()
+        cursor = conn.cursor()
         cursor.execute('''
-            INSERT OR REPLACE INTO system_stats 
-            (date, products_processed, posts_created, total_clicks, total_earnings, system_uptime_hours)
-            VALUES (?, ?, ?, ?, ?, ?)
-        ''', (today, products_processed, posts_created, total_clicks, total_earnings, 0.0))
+            INSERT INTO system_stats (date, total_clicks, total_earnings)
+            VALUES (?, ?, ?)
+            ON CONFLICT (date) DO UPDATE SET
+                total_clicks = excluded.total_clicks,
+                total_earnings = excluded.total_earnings
+        ''', (today, total_clicks, total_earnings))
         
         conn.commit()
         conn.close()
@@ -478,39 +908,32 @@ class SastaSmartMaster:
     def get_system_dashboard(self) -> Dict:
         """Get system dashboard data"""
         
-        conn = sqlite3.connect('sastasmart_master.db')
+        conn = self.db.connect()
         cursor = conn.cursor()
         
-        # Get overall stats
-        cursor.execute('''
-            SELECT 
-                COUNT(*) as total_products,
-                SUM(CASE WHEN posted_instagram = 1 THEN 1 ELSE 0 END) as instagram_posts,
-                SUM(CASE WHEN posted_telegram = 1 THEN 1 ELSE 0 END) as telegram_posts,
-                SUM(CASE WHEN posted_discord = 1 THEN 1 ELSE 0 END) as discord_posts
-            FROM products
-        ''')
-        
-        stats = cursor.fetchone()
-        
-        # Get recent products
-        cursor.execute('''
-            SELECT title, price, discount_percent, created_at
-            FROM products
-            ORDER BY created_at DESC
-            LIMIT 10
-        ''')
-        
-        recent_products = cursor.fetchall()
-        
-        # Get posting queue status
-        cursor.execute('''
-            SELECT status, COUNT(*)
-            FROM posting_queue
-            GROUP BY status
-        ''')
-        
-        queue_stats = dict(cursor.fetchall())
+        with metrics.SQLITE_QUERY_TIME.time(operation='dashboard'):
+            # Overall stats: the stored counter rows, which every worker and
+            # the scheduler update, rather than anything held in this process
+            totals = self.counters.get_totals(cursor)
+            
+            # Get recent products (rowid order matches insertion order)
+            cursor.execute('''
+                SELECT title, price, discount_percent, created_at
+                FROM products
+                ORDER BY id DESC
+                LIMIT 10
+            ''')
+            
+            recent_products = cursor.fetchall()
+            
+            # Get posting queue status
+            cursor.execute('''
+                SELECT status, SUM(count)
+                FROM posting_queue_stats
+                GROUP BY status
+            ''')
+            
+            queue_stats = dict(cursor.fetchall())
         
         conn.close()
         
@@ -519,10 +942,11 @@ class SastaSmartMaster:
         
         return {
             'system_stats': {
-                'total_products': stats[0],
-                'instagram_posts': stats[1],
-                'telegram_posts': stats[2],
-                'discord_posts': stats[3]
+                'total_products': totals['total_products'],
+                'instagram_posts': totals['posted_instagram'],
+                'telegram_posts': totals['posted_telegram'],
+                'discord_posts': totals['posted_discord'],
+                'uptime_hours': round(self.counters.uptime_hours(), 2)
             },
             'recent_products': [
                 {
@@ -537,11 +961,114 @@ class SastaSmartMaster:
             'affiliate_performance': affiliate_report
         }
     
+    def get_queue_depth(self) -> Dict[Tuple[str], int]:
+        """Pending posts keyed by (platform,), read from posting_queue_stats
+        
+        Only pending rows are queue depth; the completed and failed counts
+        there are running totals, archived rows included.
+        """
+        
+        conn = self.db.connect()
+        cursor = conn.cursor()
+        cursor.execute("SELECT platform, count FROM posting_queue_stats WHERE status = 'pending'")
+        depth = {(platform,): count for platform, count in cursor.fetchall()}
+        conn.close()
+        return depth
+    
+    def get_posting_queue(self, status: str = 'pending', platform: Optional[str] = None,
+                          limit: int = 50) -> List[Dict]:
+        """Inspect queued posts, soonest first"""
+        
+        conn = self.db.connect()
+        cursor = conn.cursor()
+        
+        query = '''
+            SELECT pq.id, pq.product_id, p.title, pq.platform, pq.template_type,
+                   pq.scheduled_time, pq.status
+            FROM posting_queue pq
+            LEFT JOIN products p ON p.id = pq.product_id
+            WHERE pq.status = ?
+        '''
+        params = [status]
+        if platform:
+            query += ' AND pq.platform = ?'
+            params.append(platform)
+        query += ' ORDER BY pq.scheduled_time LIMIT ?'
+        params.append(limit)
+        
+        cursor.execute(query, params)
+        rows = cursor.fetchall()
+        conn.close()
+        
+        return [
+            {
+                'id': row[0],
+                'product_id': row[1],
+                'title': row[2],
+                'platform': row[3],
+                'template_type': row[4],
+                'scheduled_time': row[5],
+                'status': row[6]
+            }
+            for row in rows
+        ]
+    
+    def list_products(self, limit: int = 50, before_id: Optional[int] = None,
+                      category: Optional[str] = None) -> List[Dict]:
+        """List products newest first, paginated by id (keyset, no OFFSET scans)"""
+        
+        conn = self.db.connect()
+        cursor = conn.cursor()
+        
+        query = '''
+            SELECT id, title, price, original_price, discount_percent, category,
+                   affiliate_amazon, affiliate_flipkart, image_url, in_stock, created_at
+            FROM products
+            WHERE 1 = 1
+        '''
+        params = []
+        if before_id is not None:
+            query += ' AND id < ?'
+            params.append(before_id)
+        if category:
+            query += ' AND category = ?'
+            params.append(category)
+        query += ' ORDER BY id DESC LIMIT ?'
+        params.append(limit)
+        
+        cursor.execute(query, params)
+        rows = cursor.fetchall()
+        conn.close()
+        
+        return [
+            {
+                'id': row[0],
+                'title': row[1],
+                'price': row[2],
+                'original_price': row[3],
+                'discount': row[4],
+                'category': row[5],
+                'affiliate_amazon': row[6],
+                'affiliate_flipkart': row[7],
+                'image_url': row[8],
+                'in_stock': bool(row[9]),
+                'created_at': row[10]
+            }
+            for row in rows
+        ]
+    
     def start_scheduler(self):
         """Start all scheduled tasks"""
         
-        # Schedule product scraping
-        schedule.every(30).minutes.do(self.scrape_and_add_products)
+        import schedule
+        
+        # Schedule product scraping; with the crawl frontier each run only takes the due URLs
+        scrape_every = self.config.FRONTIER_TICK if self.config.FRONTIER_ENABLED else self.config.SCRAPE_INTERVAL
+        schedule.every(scrape_every).seconds.do(self.scrape_and_add_products)
+        
+        # Affiliate product feeds, where the networks export what scraping would find
+        if self.config.PRODUCT_FEEDS:
+            schedule.every(self.config.FEED_INTERVAL).seconds.do(self.ingest_product_feeds)
         
         # Schedule posting queue processing (every 5 minutes for Telegram and Discord)
         schedule.every(5).minutes.do(self.process_posting_queue)
@@ -549,6 +1076,9 @@ class SastaSmartMaster:
         # Schedule Instagram posts (every 30 minutes)
         schedule.every(30).minutes.do(self.process_instagram_posts)
         
+        # Archive finished posts so the live queue only holds pending work
+        schedule.every(1).hours.do(self.compact_posting_queue)
+        
         # Schedule stats update
         schedule.every().day.at("23:59").do(self.update_system_stats)
         
@@ -563,7 +1093,7 @@ class SastaSmartMaster:
                 schedule.run_pending()
                 time.sleep(60)
         
-        scheduler_thread = threading.Thread(target=run_scheduler, daemon=True)
+        scheduler_thread = threading.Thread(target=tracing.wrap(run_scheduler), daemon=True)
         scheduler_thread.start()
         
         return scheduler_thread
@@ -595,12 +1125,12 @@ class SastaSmartMaster:
         
         # Start bots in separate threads
         if self.config.PLATFORMS_ENABLED['telegram']:
-            telegram_thread = threading.Thread(target=start_telegram, daemon=True)
+            telegram_thread = threading.Thread(target=tracing.wrap(start_telegram), daemon=True)
             telegram_thread.start()
             logger.info("🤖 Telegram bot started")
         
         if self.config.PLATFORMS_ENABLED['discord']:
-            discord_thread = threading.Thread(target=start_discord, daemon=True)
+            discord_thread = threading.Thread(target=tracing.wrap(start_discord), daemon=True)
             discord_thread.start()
             logger.info("🤖 Discord bot started")
     
@@ -609,6 +1139,9 @@ class SastaSmartMaster:
         
         logger.info("🚀 Starting SastaSmart Master System...")
         
+        Config.ensure_directories()
+        self.setup_components()
+        
         # Start scheduler
         scheduler_thread = self.start_scheduler()
         
@@ -626,16 +1159,277 @@ class SastaSmartMaster:
             # Keep main thread alive
             while True:
                 time.sleep(300)  # Check every 5 minutes
+                self.counters.checkpoint()
                 
                 # Print status
                 dashboard = self.get_system_dashboard()
                 logger.info(f"📈 System Status - Products: {dashboard['system_stats']['total_products']}, Queue: {sum(dashboard['queue_stats'].values())}")
                 
         except KeyboardInterrupt:
+            self.counters.checkpoint()
             logger.info("🛑 SastaSmart system stopped by user")
         except Exception as e:
             logger.error(f"❌ System error: {e}")
 
+# Shared master instance for API requests, created on first use
+_master = None
+_master_lock = threading.Lock()
+
+def get_master() -> SastaSmartMaster:
+    """Return the process-wide SastaSmartMaster used by API routes"""
+    global _master
+    if _master is None:
+        with _master_lock:
+            if _master is None:
+                _master = SastaSmartMaster()
+    return _master
+
+class BulkProductIngestEndpoint:
+    """POST /products:bulk - streamed NDJSON in, per-record NDJSON statuses out
+    
+    Implemented at the ASGI level so the request body can be read while
+    the response is being written: each batch is validated, upserted in one
+    transaction and its statuses flushed before the next batch is read.
+    Memory stays bounded by the batch size and the maximum line length.
+    """
+    
+    OVERSIZED = b'<oversized>'
+    
+    async def __call__(self, scope, receive, send):
+        refused = self.authorize(scope)
+        if refused:
+            status, detail = refused
+            await send({
+                'type': 'http.response.start',
+                'status': status,
+                'headers': [(b'content-type', b'application/json')]
+            })
+            await send({'type': 'http.response.body', 'body': json.dumps({'detail': detail}).encode()})
+            return
+        
+        await send({
+            'type': 'http.response.start',
+            'status': 200,
+            'headers': [(b'content-type', b'application/x-ndjson')]
+        })
+        
+        master = await run_in_threadpool(get_master)
+        summary = {'received': 0, 'new': 0, 'updated': 0, 'unchanged': 0, 'invalid': 0, 'error': 0}
+        batch = []
+        
+        async def flush():
+            results = await run_in_threadpool(master.ingest_products_batch, [record for _, record in batch])
+            lines = []
+            for (line_number, _), result in zip(batch, results):
+                summary[result['status']] += 1
+                lines.append(json.dumps({'line': line_number, **result}))
+            batch.clear()
+            await send_lines(lines)
+        
+        async def send_lines(lines):
+            if lines:
+                body = ('\n'.join(lines) + '\n').encode()
+                await send({'type': 'http.response.body', 'body': body, 'more_body': True})
+        
+        async for line_number, line in self.read_lines(receive):
+            if not line.strip():
+                continue
+            summary['received'] += 1
+            
+            if line is self.OVERSIZED:
+                error = f"line exceeds {Config.BULK_INGEST_MAX_LINE_BYTES} bytes"
+                record = None
+            else:
+                try:
+                    record = json.loads(line)
+                    error = validate_product_record(record)
+                except ValueError as e:
+                    error = f"invalid JSON: {e}"
+            
+            if error:
+                summary['invalid'] += 1
+                await send_lines([json.dumps({'line': line_number, 'status': 'invalid', 'error': error})])
+                continue
+            
+            batch.append((line_number, record))
+            if len(batch) >= Config.BULK_INGEST_BATCH_SIZE:
+                await flush()
+        
+        if batch:
+            await flush()
+        
+        logger.info(f"📥 Bulk ingest - {summary}")
+        await send({
+            'type': 'http.response.body',
+            'body': (json.dumps({'summary': summary}) + '\n').encode(),
+            'more_body': False
+        })
+    
+    @staticmethod
+    def authorize(scope) -> Optional[Tuple[int, str]]:
+        """(status, detail) to refuse the request with, or None if it carries SASTASMART_INGEST_TOKEN
+        
+        Checked before the response starts: products stored here are
+        posted to every channel, so only scrapers and partners holding
+        the token may send them.
+        """
+        
+        if not Config.INGEST_TOKEN:
+            return 403, "bulk ingest is disabled"
+        token = dict(scope.get('headers') or []).get(b'x-ingest-token', b'')
+        if not hmac.compare_digest(token, Config.INGEST_TOKEN.encode()):
+            return 401, "invalid ingest token"
+        return None
+    
+    async def read_lines(self, receive):
+        """Yield (line_number, line) from the request body as chunks arrive"""
+        
+        max_line_bytes = Config.BULK_INGEST_MAX_LINE_BYTES
+        buffer = bytearray()
+        line_number = 0
+        discarding = False  # inside an oversized line, skip to its newline
+        
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                return
+            buffer.extend(message.get('body', b''))
+            
+            while True:
+                newline = buffer.find(b'\n')
+                if newline < 0:
+                    break
+                line = bytes(buffer[:newline])
+                del buffer[:newline + 1]
+                line_number += 1
+                if discarding or len(line) > max_line_bytes:
+                    discarding = False
+                    yield line_number, self.OVERSIZED
+                else:
+                    yield line_number, line
+            
+            if len(buffer) > max_line_bytes:
+                discarding = True
+                buffer.clear()
+            
+            if not message.get('more_body', False):
+                break
+        
+        if discarding:
+            yield line_number + 1, self.OVERSIZED
+        elif buffer:
+            yield line_number + 1, bytes(buffer)
+
+app.router.add_route('/products:bulk', BulkProductIngestEndpoint(), methods=['POST'])
+
+# API routes - SQLite work runs in the threadpool, never on the event loop
+@app.get("/health")
+async def health():
+    return {'status': 'ok'}
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    await run_in_threadpool(get_master)  # registers the queue depth collector
+    body = await run_in_threadpool(metrics.REGISTRY.generate_latest)
+    return PlainTextResponse(body, media_type=metrics.CONTENT_TYPE_LATEST)
+
+def require_admin(request: Request):
+    """Admin endpoints need SASTASMART_ADMIN_TOKEN in the X-Admin-Token header"""
+    if not Config.ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="admin endpoints are disabled")
+    if not hmac.compare_digest(request.headers.get('x-admin-token', ''), Config.ADMIN_TOKEN):
+        raise HTTPException(status_code=401, detail="invalid admin token")
+
+@app.post("/admin/profiler/start")
+async def start_profiler(request: Request, interval_ms: float = 5):
+    require_admin(request)
+    if not 1 <= interval_ms <= 1000:
+        raise HTTPException(status_code=400, detail="interval_ms must be between 1 and 1000")
+    started = tracing.PROFILER.start(interval_ms)
+    return {'running': True, 'started': started}
+
+@app.post("/admin/profiler/stop")
+async def stop_profiler(request: Request):
+    require_admin(request)
+    result = await run_in_threadpool(tracing.PROFILER.stop)
+    if result is None:
+        raise HTTPException(status_code=409, detail="profiler is not running")
+    return result
+
+@app.post("/admin/traces/flush")
+async def flush_traces(request: Request, sample_rate: Optional[float] = None):
+    require_admin(request)
+    if sample_rate is not None:
+        if not 0 <= sample_rate <= 1:
+            raise HTTPException(status_code=400, detail="sample_rate must be between 0 and 1")
+        tracing.TRACER.sample_rate = sample_rate
+    path = await run_in_threadpool(tracing.TRACER.flush)
+    return {'path': path, 'sample_rate': tracing.TRACER.sample_rate}
+
+@app.get("/dashboard")
+async def dashboard():
+    master = await run_in_threadpool(get_master)
+    return await run_in_threadpool(master.get_system_dashboard)
+
+@app.get("/queue")
+async def posting_queue(status: str = 'pending', platform: Optional[str] = None, limit: int = 50):
+    if not 1 <= limit <= 500:
+        raise HTTPException(status_code=400, detail="limit must be between 1 and 500")
+    master = await run_in_threadpool(get_master)
+    items = await run_in_threadpool(master.get_posting_queue, status, platform, limit)
+    return {'items': items}
+
+@app.get("/products")
+async def products(limit: int = 50, before_id: Optional[int] = None, category: Optional[str] = None):
+    if not 1 <= limit <= 500:
+        raise HTTPException(status_code=400, detail="limit must be between 1 and 500")
+    master = await run_in_threadpool(get_master)
+    items = await run_in_threadpool(master.list_products, limit, before_id, category)
+    next_before_id = items[-1]['id'] if len(items) == limit else None
+    return {'items': items, 'next_before_id': next_before_id}
+
+@app.get("/products/{product_id}/matches")
+async def product_matches(product_id: int):
+    """The product's listings on other marketplaces, for price comparison"""
+    master = await run_in_threadpool(get_master)
+    items = await run_in_threadpool(master.get_product_matches, product_id)
+    return {'product_id': product_id, 'items': items}
+
+@app.get("/products/{product_id}/price-history")
+async def product_price_history(product_id: int):
+    """Whether the current price is a real deal: lowest in 7/30 days, drop against the median, inflated MRP"""
+    master = await run_in_threadpool(get_master)
+    assessment = await run_in_threadpool(master.get_price_assessment, product_id)
+    if assessment is None:
+        raise HTTPException(status_code=404, detail=f"unknown product: {product_id}")
+    return assessment
+
+@app.get("/affiliate/report")
+async def affiliate_report(days: int = 30):
+    if not 1 <= days <= 365:
+        raise HTTPException(status_code=400, detail="days must be between 1 and 365")
+    master = await run_in_threadpool(get_master)
+    return await run_in_threadpool(master.affiliate_manager.get_performance_report, days)
+
+@app.get("/reports/{report}")
+async def report(report: str, days: int = 30, limit: int = 50):
+    """Cross-database reports: revenue-by-product, posts-vs-clicks, categories"""
+    if not 1 <= days <= 365:
+        raise HTTPException(status_code=400, detail="days must be between 1 and 365")
+    if not 1 <= limit <= 500:
+        raise HTTPException(status_code=400, detail="limit must be between 1 and 500")
+    master = await run_in_threadpool(get_master)
+    reports = master.reports
+    if report == 'revenue-by-product':
+        items = await run_in_threadpool(reports.revenue_by_product, days, limit)
+    elif report == 'posts-vs-clicks':
+        items = await run_in_threadpool(reports.posts_vs_clicks, days, limit)
+    elif report == 'categories':
+        items = await run_in_threadpool(reports.category_performance, days)
+    else:
+        raise HTTPException(status_code=404, detail=f"unknown report: {report}")
+    return {'items': items}
+
 # Quick setup function
 def quick_setup():
     """Quick setup guide for new users"""
@@ -679,11 +1473,11 @@ if __name__ == "__main__":
     
     # Show current dashboard
     dashboard = master.get_system_dashboard()
-    print(f"\n📊 Current System Status:")
-    print(f"Products: {dashboard['system_stats']['total_products']}")
-    print(f"Instagram Posts: {dashboard['system_stats']['instagram_posts']}")
-    print(f"Telegram Posts: {dashboard['system_stats']['telegram_posts']}")
-    print(f"Discord Posts: {dashboard['system_stats']['discord_posts']}")
+    logger.info(f"📊 Current System Status:")
+    logger.info(f"Products: {dashboard['system_stats']['total_products']}")
+    logger.info(f"Instagram Posts: {dashboard['system_stats']['instagram_posts']}")
+    logger.info(f"Telegram Posts: {dashboard['system_stats']['telegram_posts']}")
+    logger.info(f"Discord Posts: {dashboard['system_stats']['discord_posts']}")
     
     # Start the system
     # master.run()  # Uncomment to start the full system
\ No newline at end of file
@@ -0,0 +1,294 @@
+# Metrics - Prometheus text-format metrics for every pipeline stage
+import bisect
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Tuple
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+class _ShardOwner:
+    """Held only by a thread's thread-local: collected, and its shard retired, when the thread ends"""
+    __slots__ = ('__weakref__',)
+
+class Metric:
+    """Base class: recording writes to a per-thread shard, so hot paths take no lock
+
+    Each thread owns one dict per metric. The registry sums the shards
+    when /metrics is scraped, which is the only place shards are shared.
+    When a thread ends its shard is folded into a retired shard, so
+    short-lived threads (each ingest run starts its own stage threads)
+    do not pile up shards.
+    """
+
+    metric_type = 'untyped'
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._local = threading.local()
+        self._retired = {}
+        self._shards = [self._retired]
+        self._shards_lock = threading.Lock()
+
+    def _shard(self) -> Dict:
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = self._local.shard = {}
+            owner = self._local.owner = _ShardOwner()
+            with self._shards_lock:
+                self._shards.append(shard)
+            weakref.finalize(owner, self._retire, shard)
+        return shard
+
+    def _retire(self, shard: Dict):
+        with self._shards_lock:
+            self._merge(self._retired, list(shard.items()))
+            self._shards = [other for other in self._shards if other is not shard]
+
+    def _merge(self, into: Dict, items: List):
+        raise NotImplementedError
+
+    def _label_values(self, labels: Dict) -> Tuple:
+        return tuple(str(labels.get(name, '')) for name in self.labelnames)
+
+    def _snapshot_shards(self) -> List[List]:
+        # Under the lock, so a shard being retired is counted once
+        snapshots = []
+        with self._shards_lock:
+            for shard in self._shards:
+                # Owner threads may add keys concurrently; retry the copy until stable
+                while True:
+                    try:
+                        snapshots.append(list(shard.items()))
+                        break
+                    except RuntimeError:
+                        continue
+        return snapshots
+
+    def _format_labels(self, values: Tuple, extra: Tuple = ()) -> str:
+        pairs = list(zip(self.labelnames, values)) + list(extra)
+        if not pairs:
+            return ''
+        escaped = (value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+        return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+    def expose(self) -> List[str]:
+        return [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.metric_type}']
+
+class Counter(Metric):
+    metric_type = 'counter'
+
+    def inc(self, amount: float = 1, **labels):
+        shard = self._shard()
+        key = self._label_values(labels)
+        shard[key] = shard.get(key, 0) + amount
+
+    def _merge(self, into: Dict, items: List):
+        for key, value in items:
+            into[key] = into.get(key, 0) + value
+
+    def collect(self) -> Dict[Tuple, float]:
+        totals = {}
+        for items in self._snapshot_shards():
+            self._merge(totals, items)
+        return totals
+
+    def expose(self) -> List[str]:
+        lines = super().expose()
+        for key, value in sorted(self.collect().items()):
+            lines.append(f'{self.name}{self._format_labels(key)} {value}')
+        return lines
+
+class Gauge(Metric):
+    """Last-value metric; a callback can supply all values at scrape time"""
+
+    metric_type = 'gauge'
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values = {}
+        self._callback = None
+
+    def set(self, value: float, **labels):
+        # A single dict assignment is atomic under the GIL
+        self._values[self._label_values(labels)] = value
+
+    def set_function(self, callback: Callable[[], Dict[Tuple, float]]):
+        """Compute values at scrape time: callback returns {label_values: value}"""
+        self._callback = callback
+
+    def collect(self) -> Dict[Tuple, float]:
+        values = dict(self._values)
+        if self._callback is not None:
+            try:
+                values.update(self._callback())
+            except Exception:
+                pass
+        return values
+
+    def expose(self) -> List[str]:
+        lines = super().expose()
+        for key, value in sorted(self.collect().items()):
+            lines.append(f'{self.name}{self._format_labels(key)} {value}')
+        return lines
+
+class Histogram(Metric):
+    metric_type = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                 buckets: Iterable[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        shard = self._shard()
+        key = self._label_values(labels)
+        state = shard.get(key)
+        if state is None:
+            # [per-bucket counts (+Inf last), sum, count]
+            state = shard[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        state[0][bisect.bisect_left(self.buckets, value)] += 1
+        state[1] += value
+        state[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the duration of a with-block"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _merge(self, into: Dict, items: List):
+        for key, (counts, total, count) in items:
+            state = into.setdefault(key, [[0] * (len(self.buckets) + 1), 0.0, 0])
+            for index, bucket_count in enumerate(list(counts)):
+                state[0][index] += bucket_count
+            state[1] += total
+            state[2] += count
+
+    def collect(self) -> Dict[Tuple, List]:
+        merged = {}
+        for items in self._snapshot_shards():
+            self._merge(merged, items)
+        return merged
+
+    def expose(self) -> List[str]:
+        lines = super().expose()
+        for key, (counts, total, count) in sorted(self.collect().items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                le = '+Inf' if bound == float('inf') else repr(float(bound))
+                lines.append(f'{self.name}_bucket{self._format_labels(key, (("le", le),))} {cumulative}')
+            lines.append(f'{self.name}_sum{self._format_labels(key)} {total}')
+            lines.append(f'{self.name}_count{self._format_labels(key)} {count}')
+        return lines
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: Metric) -> Metric:
+        with self._lock:
+            if metric.name in self._metrics:
+                return self._metrics[metric.name]
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labelnames=()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def generate_latest(self) -> str:
+        """Render every metric in the Prometheus text exposition format"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.expose())
+        return '\n'.join(lines) + '\n'
+
+REGISTRY = Registry()
+CONTENT_TYPE_LATEST = 'text/plain; version=0.0.4; charset=utf-8'
+
+# ==============================================
+# PIPELINE METRICS
+# ==============================================
+
+QUEUE_DEPTH = REGISTRY.gauge(
+    'sastasmart_queue_depth', 'Pending posting queue rows by platform', ['platform'])
+POSTING_LATENCY = REGISTRY.histogram(
+    'sastasmart_posting_latency_seconds', 'Time to render and send one post', ['platform'])
+SCHEDULING_LAG = REGISTRY.histogram(
+    'sastasmart_scheduling_lag_seconds', 'Delay between scheduled time and processing', ['platform'],
+    buckets=(1, 5, 15, 30, 60, 120, 300, 600, 1800, 3600, 7200))
+POSTS_SENT = REGISTRY.counter(
+    'sastasmart_posts_total', 'Post attempts by platform and result', ['platform', 'result'])
+CLICKS = REGISTRY.counter(
+    'sastasmart_clicks_total', 'Affiliate clicks ingested', ['source'])
+REDIRECT_LATENCY = REGISTRY.histogram(
+    'sastasmart_redirect_latency_seconds', 'Short-link redirect handling time',
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1))
+SQLITE_QUERY_TIME = REGISTRY.histogram(
+    'sastasmart_sqlite_query_seconds', 'SQLite time per operation', ['operation'],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 5))
+REEL_RENDER_TIME = REGISTRY.histogram(
+    'sastasmart_reel_render_seconds', 'Instagram reel render time', ['template'],
+    buckets=(1, 2.5, 5, 10, 20, 30, 60, 120, 300))
+REEL_UPLOAD_TIME = REGISTRY.histogram(
+    'sastasmart_reel_upload_seconds', 'Instagram reel upload time',
+    buckets=(1, 2.5, 5, 10, 20, 30, 60, 120, 300))
+IMAGE_CACHE = REGISTRY.counter(
+    'sastasmart_image_cache_total', 'Image cache hits, downloads, resizes, coalesced requests, evictions and errors',
+    ['result'])
+IMAGE_CACHE_BYTES = REGISTRY.gauge(
+    'sastasmart_image_cache_bytes', 'Image cache size on disk as of the last eviction pass')
+IMAGE_FETCH_TIME = REGISTRY.histogram(
+    'sastasmart_image_fetch_seconds', 'Product image download time',
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 15))
+FEED_ITEMS = REGISTRY.counter(
+    'sastasmart_feed_items_total', 'Affiliate feed items by feed, changed (ingested) or unchanged', ['feed', 'result'])
+PIPELINE_ITEMS = REGISTRY.counter(
+    'sastasmart_pipeline_items_total', 'Items into and out of each pipeline stage', ['pipeline', 'stage', 'direction'])
+PIPELINE_STAGE_SECONDS = REGISTRY.counter(
+    'sastasmart_pipeline_stage_seconds_total',
+    'Pipeline stage time: busy, waiting for input, or blocked on a full output queue',
+    ['pipeline', 'stage', 'state'])
+SCRAPER_FETCH_TIME = REGISTRY.histogram(
+    'sastasmart_scraper_fetch_seconds', 'Page fetch time', ['site'])
+SCRAPER_PARSE_TIME = REGISTRY.histogram(
+    'sastasmart_scraper_parse_seconds', 'Page parse time', ['site'],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1))
+SCRAPER_PAGES = REGISTRY.counter(
+    'sastasmart_scraper_pages_total', 'Page fetch attempts by site and result', ['site', 'result'])
+PRODUCT_MATCHES = REGISTRY.counter(
+    'sastasmart_product_matches_total', 'Stored products matched to another marketplace listing by title',
+    ['result'])
+SCRAPER_CACHE = REGISTRY.counter(
+    'sastasmart_scraper_cache_total', 'Page cache outcomes: not_modified/unchanged skip parsing',
+    ['site', 'kind', 'result'])
+SCRAPER_HOST_CONCURRENCY = REGISTRY.gauge(
+    'sastasmart_scraper_host_concurrency', 'Adaptive concurrency window per marketplace host', ['host'])
+SCRAPER_THROTTLED = REGISTRY.counter(
+    'sastasmart_scraper_throttled_total', 'Responses asking the scraper to slow down: 429, 503, captcha',
+    ['host', 'reason'])
+SCRAPER_FRONTIER = REGISTRY.gauge(
+    'sastasmart_scraper_frontier_urls', 'Crawl frontier URLs by kind, tracked and due', ['kind', 'state'])
+BROWSER_RENDER_TIME = REGISTRY.histogram(
+    'sastasmart_browser_render_seconds', 'Headless Chrome page render time', ['site'],
+    buckets=(0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60))
+BROWSER_DRIVERS = REGISTRY.gauge(
+    'sastasmart_browser_drivers', 'Headless Chrome drivers currently running')
+BROWSER_RECYCLES = REGISTRY.counter(
+    'sastasmart_browser_recycles_total', 'Chrome drivers quit by reason', ['reason'])
@@ -0,0 +1,309 @@
+# Pipeline - generator stages connected by bounded queues, run in threads or asyncio tasks
+import asyncio
+import logging
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional
+from config import Config
+import metrics
+import tracing
+
+logger = logging.getLogger(__name__)
+
+# End of stream, passed down the queues after the last item
+_END = object()
+
+# How often a blocked put/get checks whether the pipeline is stopping
+_POLL_SECONDS = 0.1
+
+class PipelineAborted(Exception):
+    """Raised in the other stages when one stage failed; the pipeline is stopping"""
+
+class Channel:
+    """Bounded queue between two stages; a full queue blocks the producer"""
+
+    def __init__(self, maxsize: int, abort: threading.Event):
+        self.queue = queue.Queue(maxsize)
+        self.abort = abort
+        self.high_water = 0
+
+    def put(self, item) -> float:
+        """Put an item, waiting while the queue is full; returns the seconds waited"""
+        try:
+            self.queue.put_nowait(item)
+            self.high_water = max(self.high_water, self.queue.qsize())
+            return 0.0
+        except queue.Full:
+            pass
+        start = time.perf_counter()
+        while True:
+            if self.abort.is_set():
+                raise PipelineAborted()
+            try:
+                self.queue.put(item, timeout=_POLL_SECONDS)
+                self.high_water = max(self.high_water, self.queue.qsize())
+                return time.perf_counter() - start
+            except queue.Full:
+                continue
+
+    def get(self):
+        try:
+            return self.queue.get_nowait()
+        except queue.Empty:
+            pass
+        while True:
+            if self.abort.is_set():
+                raise PipelineAborted()
+            try:
+                return self.queue.get(timeout=_POLL_SECONDS)
+            except queue.Empty:
+                continue
+
+    async def aput(self, item) -> float:
+        try:
+            self.queue.put_nowait(item)
+            self.high_water = max(self.high_water, self.queue.qsize())
+            return 0.0
+        except queue.Full:
+            return await asyncio.to_thread(self.put, item)
+
+    async def aget(self):
+        try:
+            return self.queue.get_nowait()
+        except queue.Empty:
+            return await asyncio.to_thread(self.get)
+
+class StageStats:
+    """Items and time of one stage worker; the run merges workers per stage"""
+
+    __slots__ = ('items_in', 'items_out', 'waiting', 'blocked', 'elapsed')
+
+    def __init__(self):
+        self.items_in = 0
+        self.items_out = 0
+        self.waiting = 0.0   # for input: upstream is slower
+        self.blocked = 0.0   # on a full output queue: downstream is slower
+        self.elapsed = 0.0
+
+    def merge(self, other: 'StageStats'):
+        self.items_in += other.items_in
+        self.items_out += other.items_out
+        self.waiting += other.waiting
+        self.blocked += other.blocked
+        self.elapsed = max(self.elapsed, other.elapsed)
+
+class Stage:
+    """One step of a pipeline: a generator function over the items of the previous step
+
+    mode='thread': func(items: Iterator) -> Iterator, run by `workers`
+    threads that share one input queue (so only stateless stages should
+    have more than one). mode='async': func(items: AsyncIterator) ->
+    AsyncIterator, run as a task on the pipeline's event loop. A stage
+    may drop items, emit several per input or batch them; its input is
+    a queue of at most `queue_size` items.
+    """
+
+    def __init__(self, name: str, func: Callable, mode: str = 'thread', workers: int = 1,
+                 queue_size: int = None):
+        if mode not in ('thread', 'async'):
+            raise ValueError(f"Unknown stage mode: {mode!r}")
+        if mode == 'async' and workers != 1:
+            raise ValueError("Async stages run as one task; use concurrency inside the stage")
+        self.name = name
+        self.func = func
+        self.mode = mode
+        self.workers = workers
+        self.queue_size = queue_size or Config.PIPELINE_QUEUE_SIZE
+
+class Pipeline:
+    """Stages connected by bounded queues, each stage running concurrently
+
+    A slow stage fills its input queue, which blocks the stage before it,
+    and so on up to the source: memory stays bounded by the queue sizes
+    and the source produces no faster than the slowest stage consumes.
+    Thread stages each get their own threads; async stages share one
+    event loop in a thread of its own. If a stage raises, the others are
+    stopped and run() re-raises the error.
+    """
+
+    def __init__(self, name: str, stages: List[Stage]):
+        self.name = name
+        self.stages = stages
+        self.stats: Dict[str, StageStats] = {}
+        self.channels: List[Channel] = []
+
+    def run(self, source: Iterable = None, sink: Callable[[Any], None] = None) -> Dict[str, Dict]:
+        """Feed `source` (if any) to the first stage and pass the last stage's items to `sink`
+
+        Returns the per-stage summary().
+        """
+
+        abort = threading.Event()
+        errors = []
+        self.channels = [Channel(stage.queue_size, abort) for stage in self.stages]
+        self.channels.append(Channel(Config.PIPELINE_QUEUE_SIZE, abort))  # last stage -> sink
+        self.stats = {stage.name: StageStats() for stage in self.stages}
+        threads = []
+
+        def guarded(label: str, target: Callable, *args):
+            def run_guarded():
+                try:
+                    target(*args)
+                except PipelineAborted:
+                    pass
+                except BaseException as e:
+                    if not abort.is_set():
+                        logger.error(f"❌ Pipeline {self.name} stage {label} failed: {e}")
+                        errors.append(e)
+                    abort.set()
+            thread = threading.Thread(target=tracing.wrap(run_guarded), name=f"{self.name}-{label}", daemon=True)
+            threads.append(thread)
+
+        with tracing.span('pipeline', pipeline=self.name):
+            guarded('source', self._feed, source, self.channels[0])
+            async_stages = []
+            for index, stage in enumerate(self.stages):
+                if stage.mode == 'async':
+                    async_stages.append(index)
+                    continue
+                finished = [stage.workers]
+                finished_lock = threading.Lock()
+                for worker in range(stage.workers):
+                    guarded(f"{stage.name}-{worker}" if stage.workers > 1 else stage.name,
+                            self._run_thread_worker, index, finished, finished_lock)
+            if async_stages:
+                guarded('async', lambda: asyncio.run(self._run_async_stages(async_stages)))
+            guarded('sink', self._drain, self.channels[-1], sink)
+
+            start = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            elapsed = time.perf_counter() - start
+
+        summary = self.summary(elapsed)
+        if errors:
+            raise errors[0]
+        return summary
+
+    def _feed(self, source: Optional[Iterable], channel: Channel):
+        for item in source or ():
+            channel.put(item)
+        channel.put(_END)
+
+    def _drain(self, channel: Channel, sink: Optional[Callable]):
+        while True:
+            item = channel.get()
+            if item is _END:
+                return
+            if sink is not None:
+                sink(item)
+
+    def _record(self, stage: Stage, worker_stats: StageStats):
+        metrics.PIPELINE_STAGE_SECONDS.inc(worker_stats.waiting, pipeline=self.name, stage=stage.name, state='waiting')
+        metrics.PIPELINE_STAGE_SECONDS.inc(worker_stats.blocked, pipeline=self.name, stage=stage.name, state='blocked')
+        busy = max(worker_stats.elapsed - worker_stats.waiting - worker_stats.blocked, 0)
+        metrics.PIPELINE_STAGE_SECONDS.inc(busy, pipeline=self.name, stage=stage.name, state='busy')
+        self.stats[stage.name].merge(worker_stats)
+
+    def _run_thread_worker(self, index: int, finished: List[int], finished_lock: threading.Lock):
+        stage = self.stages[index]
+        inbox, outbox = self.channels[index], self.channels[index + 1]
+        stats = StageStats()
+        start = time.perf_counter()
+        ended = []
+
+        def items():
+            while True:
+                wait_start = time.perf_counter()
+                item = inbox.get()
+                stats.waiting += time.perf_counter() - wait_start
+                if item is _END:
+                    inbox.put(_END)  # for the other workers of this stage
+                    ended.append(True)
+                    return
+                stats.items_in += 1
+                metrics.PIPELINE_ITEMS.inc(pipeline=self.name, stage=stage.name, direction='in')
+                yield item
+
+        try:
+            with tracing.span('pipeline.stage', pipeline=self.name, stage=stage.name):
+                for output in stage.func(items()):
+                    stats.blocked += outbox.put(output)
+                    stats.items_out += 1
+                    metrics.PIPELINE_ITEMS.inc(pipeline=self.name, stage=stage.name, direction='out')
+                # A stage that stops early must not leave the one before it blocked
+                while not ended:
+                    if inbox.get() is _END:
+                        inbox.put(_END)
+                        ended.append(True)
+        finally:
+            stats.elapsed = time.perf_counter() - start
+            self._record(stage, stats)
+
+        with finished_lock:
+            finished[0] -= 1
+            last = finished[0] == 0
+        if last:
+            outbox.put(_END)
+
+    async def _run_async_stages(self, indexes: List[int]):
+        tasks = [asyncio.ensure_future(self._run_async_stage(index)) for index in indexes]
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def _run_async_stage(self, index: int):
+        stage = self.stages[index]
+        inbox, outbox = self.channels[index], self.channels[index + 1]
+        stats = StageStats()
+        start = time.perf_counter()
+        ended = []
+
+        async def items():
+            while True:
+                wait_start = time.perf_counter()
+                item = await inbox.aget()
+                stats.waiting += time.perf_counter() - wait_start
+                if item is _END:
+                    ended.append(True)
+                    return
+                stats.items_in += 1
+                metrics.PIPELINE_ITEMS.inc(pipeline=self.name, stage=stage.name, direction='in')
+                yield item
+
+        try:
+            with tracing.span('pipeline.stage', pipeline=self.name, stage=stage.name):
+                async for output in stage.func(items()):
+                    stats.blocked += await outbox.aput(output)
+                    stats.items_out += 1
+                    metrics.PIPELINE_ITEMS.inc(pipeline=self.name, stage=stage.name, direction='out')
+                while not ended:
+                    if await inbox.aget() is _END:
+                        ended.append(True)
+        finally:
+            stats.elapsed = time.perf_counter() - start
+            self._record(stage, stats)
+        await outbox.aput(_END)
+
+    def summary(self, elapsed: float = None) -> Dict[str, Dict]:
+        """Per stage: items in and out, items per second, and where its time went"""
+
+        summary = {}
+        for stage, channel in zip(self.stages, self.channels):
+            stats = self.stats[stage.name]
+            seconds = elapsed or stats.elapsed
+            summary[stage.name] = {
+                'items_in': stats.items_in,
+                'items_out': stats.items_out,
+                'items_per_second': round(stats.items_out / seconds, 1) if seconds else 0.0,
+                'waiting_seconds': round(stats.waiting, 3),
+                'blocked_seconds': round(stats.blocked, 3),
+                'queue_high_water': channel.high_water,
+                'queue_size': stage.queue_size,
+            }
+        return summary
@@ -0,0 +1,273 @@
+# Price History - compact per-product price observations with rolling aggregates
+import bisect
+import time
+from collections import OrderedDict, deque
+from typing import Dict, Iterable, Optional, Tuple, Union
+from config import Config
+from storage import Database, open_database
+
+class PriceWindow:
+    """Sliding time window over one product's prices
+
+    Min and max come from monotonic deques (O(1) amortized per sample).
+    The median walks a sorted list of distinct prices with their counts,
+    which stays tiny because product prices take few distinct values.
+    """
+
+    def __init__(self, span_seconds: int):
+        self.span_seconds = span_seconds
+        self.samples = deque()      # (observed_at, price_paise)
+        self.min_queue = deque()    # increasing prices
+        self.max_queue = deque()    # decreasing prices
+        self.price_counts = {}
+        self.distinct_prices = []
+
+    def add(self, observed_at: int, price: int):
+        self.samples.append((observed_at, price))
+
+        while self.min_queue and self.min_queue[-1][1] >= price:
+            self.min_queue.pop()
+        self.min_queue.append((observed_at, price))
+
+        while self.max_queue and self.max_queue[-1][1] <= price:
+            self.max_queue.pop()
+        self.max_queue.append((observed_at, price))
+
+        if price in self.price_counts:
+            self.price_counts[price] += 1
+        else:
+            self.price_counts[price] = 1
+            bisect.insort(self.distinct_prices, price)
+
+    def expire(self, now: int):
+        cutoff = now - self.span_seconds
+        while self.samples and self.samples[0][0] <= cutoff:
+            observed_at, price = self.samples.popleft()
+
+            if self.min_queue and self.min_queue[0][0] == observed_at:
+                self.min_queue.popleft()
+            if self.max_queue and self.max_queue[0][0] == observed_at:
+                self.max_queue.popleft()
+
+            self.price_counts[price] -= 1
+            if not self.price_counts[price]:
+                del self.price_counts[price]
+                del self.distinct_prices[bisect.bisect_left(self.distinct_prices, price)]
+
+    def last_observed_at(self) -> int:
+        return self.samples[-1][0] if self.samples else 0
+
+    def stats(self, now: int) -> Optional[Dict]:
+        self.expire(now)
+        count = len(self.samples)
+        if not count:
+            return None
+
+        # Median from the distinct-price histogram
+        middle = [(count - 1) // 2, count // 2]
+        found = []
+        seen = 0
+        for price in self.distinct_prices:
+            seen += self.price_counts[price]
+            while middle and middle[0] < seen:
+                middle.pop(0)
+                found.append(price)
+            if not middle:
+                break
+
+        return {
+            'min': self.min_queue[0][1] / 100,
+            'max': self.max_queue[0][1] / 100,
+            'median': sum(found) / len(found) / 100,
+            'count': count
+        }
+
+UPSERT_SQL = '''
+    INSERT INTO price_history (product_id, observed_at, price_paise) VALUES (?, ?, ?)
+    ON CONFLICT (product_id, observed_at) DO UPDATE SET price_paise = excluded.price_paise
+'''
+
+class PriceHistory:
+    """Append-only price observations in a narrow WITHOUT ROWID table"""
+
+    def __init__(self, database: Union[Database, str] = None,
+                 windows_days: Iterable[int] = None, cache_size: int = None):
+        self.db = open_database(database, 'master')
+        self.windows_days = tuple(windows_days or Config.PRICE_HISTORY_WINDOWS_DAYS)
+        self.cache_size = cache_size or Config.PRICE_HISTORY_CACHE_SIZE
+        self._windows = OrderedDict()  # product_id -> {days: PriceWindow}, LRU order
+        self.setup_database()
+
+    def setup_database(self):
+        """Create the price history table"""
+        conn = self.db.connect()
+        cursor = conn.cursor()
+
+        # Prices are stored as integer paise and times as unix seconds so
+        # each row is a few bytes inside the primary-key b-tree
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS price_history (
+                product_id INTEGER NOT NULL,
+                observed_at INTEGER NOT NULL,
+                price_paise INTEGER NOT NULL,
+                PRIMARY KEY (product_id, observed_at)
+            ) WITHOUT ROWID
+        ''')
+
+        conn.commit()
+        conn.close()
+
+    def record(self, product_id: int, price: float, observed_at: float = None, cursor=None):
+        """Append one observation, optionally inside the caller's transaction
+
+        The caller's transaction may still roll back, so then the product's
+        cached windows are dropped rather than updated, and rebuilt from
+        the table on the next read.
+        """
+
+        observed_at = int(observed_at if observed_at is not None else time.time())
+        row = (product_id, observed_at, int(round(price * 100)))
+
+        if cursor is not None:
+            cursor.execute(UPSERT_SQL, row)
+            self._windows.pop(product_id, None)
+            return
+
+        conn = self.db.connect()
+        conn.execute(UPSERT_SQL, row)
+        conn.commit()
+        conn.close()
+        self._apply(*row)
+
+    def record_many(self, observations: Iterable[Tuple[int, float, float]], batch_size: int = 10000) -> int:
+        """Bulk-append (product_id, observed_at, price) observations in one transaction"""
+
+        conn = self.db.connect()
+        cursor = conn.cursor()
+        total = 0
+        batch = []
+
+        for product_id, observed_at, price in observations:
+            batch.append((product_id, int(observed_at), int(round(price * 100))))
+            if len(batch) >= batch_size:
+                cursor.executemany(UPSERT_SQL, batch)
+                for row in batch:
+                    self._apply(*row)
+                total += len(batch)
+                batch = []
+
+        if batch:
+            cursor.executemany(UPSERT_SQL, batch)
+            for row in batch:
+                self._apply(*row)
+            total += len(batch)
+
+        conn.commit()
+        conn.close()
+        return total
+
+    def _apply(self, product_id: int, observed_at: int, price: int):
+        """Feed a stored observation into the cached windows of a product"""
+
+        windows = self._windows.get(product_id)
+        if windows is None:
+            # Not cached - it will be loaded from the table on first read
+            return
+
+        if any(observed_at <= window.last_observed_at() for window in windows.values()):
+            # Out-of-order or replaced sample: rebuild from storage on next read
+            del self._windows[product_id]
+            return
+
+        for window in windows.values():
+            window.add(observed_at, price)
+
+    def _get_windows(self, product_id: int) -> Dict[int, PriceWindow]:
+        windows = self._windows.get(product_id)
+        if windows is not None:
+            self._windows.move_to_end(product_id)
+            return windows
+
+        windows = {days: PriceWindow(days * 86400) for days in self.windows_days}
+        since = int(time.time()) - max(self.windows_days) * 86400
+
+        conn = self.db.connect()
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT observed_at, price_paise FROM price_history
+            WHERE product_id = ? AND observed_at > ?
+            ORDER BY observed_at
+        ''', (product_id, since))
+        for observed_at, price in cursor.fetchall():
+            for window in windows.values():
+                window.add(observed_at, price)
+        conn.close()
+
+        self._windows[product_id] = windows
+        if len(self._windows) > self.cache_size:
+            self._windows.popitem(last=False)
+        return windows
+
+    def window_stats(self, product_id: int, days: int) -> Optional[Dict]:
+        """Min, max, median and sample count over the last N days"""
+
+        if days in self.windows_days:
+            return self._get_windows(product_id)[days].stats(int(time.time()))
+
+        conn = self.db.connect()
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT price_paise FROM price_history
+            WHERE product_id = ? AND observed_at > ?
+            ORDER BY price_paise
+        ''', (product_id, int(time.time()) - days * 86400))
+        prices = [row[0] for row in cursor.fetchall()]
+        conn.close()
+
+        if not prices:
+            return None
+        count = len(prices)
+        return {
+            'min': prices[0] / 100,
+            'max': prices[-1] / 100,
+            'median': (prices[(count - 1) // 2] + prices[count // 2]) / 2 / 100,
+            'count': count
+        }
+
+    def is_lowest_price(self, product_id: int, price: float, days: int = 30) -> bool:
+        """True if price is at or below every observation of the last N days"""
+        stats = self.window_stats(product_id, days)
+        return stats is None or price <= stats['min']
+
+    def all_time_low(self, product_id: int) -> Optional[float]:
+        """Lowest price ever observed for a product"""
+        conn = self.db.connect()
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT MIN(price_paise) FROM price_history WHERE product_id = ?
+        ''', (product_id,))
+        low = cursor.fetchone()[0]
+        conn.close()
+        return low / 100 if low is not None else None
+
+    def assess_deal(self, product_id: int, price: float, original_price: float = None) -> Dict:
+        """Compare a listed deal with the product's own recent price history
+
+        real_discount_percent measures the drop against the 30-day median
+        price; mrp_inflated flags a listed original price that the product
+        has not actually sold at in the window.
+        """
+
+        stats = self.window_stats(product_id, 30)
+        if not stats:
+            return {'has_history': False}
+
+        real_discount = (stats['median'] - price) / stats['median'] * 100 if stats['median'] else 0
+        return {
+            'has_history': True,
+            'is_lowest_7_days': self.is_lowest_price(product_id, price, 7),
+            'is_lowest_30_days': price <= stats['min'],
+            'real_discount_percent': round(real_discount, 2),
+            'mrp_inflated': bool(original_price and original_price > stats['max']),
+            'stats_30_days': stats
+        }
@@ -0,0 +1,469 @@
+# Product Feeds - affiliate catalogue/deal feeds streamed into the ingest pipeline, changed items only
+import codecs
+import csv
+import gzip
+import hashlib
+import json
+import logging
+import os
+import time
+from datetime import datetime
+from typing import BinaryIO, Callable, Dict, Iterator, List, Optional, Tuple
+import requests
+from config import Config
+from scrapers.parsers import discount_percent, parse_price
+from storage import Database, get_database
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# ==============================================
+# STREAMING READERS
+# ==============================================
+# Each yields (record, byte offset just past it) and can start again from
+# such an offset, so an interrupted ingest resumes where it stopped. Only
+# the current record and one read buffer are held in memory.
+
+def open_feed(path: str) -> BinaryIO:
+    return gzip.open(path, 'rb') if path.endswith('.gz') else open(path, 'rb')
+
+def _byte_length(text: str) -> int:
+    return len(text) if text.isascii() else len(text.encode('utf-8'))
+
+def _find_items_array(stream: BinaryIO, decoder, items_key: Optional[str]) -> Tuple[str, int, int]:
+    """Read up to the '[' that opens the items array
+
+    The items array is the first array in the document, or with
+    `items_key` the first one stored under that key. Returns the unread
+    rest of the buffer, the position in it just past the '[' and the
+    byte offset of the buffer's start.
+    """
+
+    buf, base, pos = '', 0, 0
+    in_string = escaped = False
+    last_string, string_start = None, 0
+    while True:
+        chunk = stream.read(Config.FEED_READ_CHUNK)
+        buf += decoder.decode(chunk, final=not chunk)
+        while pos < len(buf):
+            char = buf[pos]
+            if in_string:
+                if escaped:
+                    escaped = False
+                elif char == '\\':
+                    escaped = True
+                elif char == '"':
+                    in_string = False
+                    last_string = buf[string_start:pos]
+            elif char == '"':
+                in_string, string_start = True, pos + 1
+            elif char == '[' and (items_key is None or last_string == items_key):
+                return buf, pos + 1, base
+            pos += 1
+        if not chunk:
+            raise ValueError(f"no items array{f' under {items_key!r}' if items_key else ''} in feed")
+        if not in_string:
+            # Keep nothing already scanned; the last key is remembered
+            base += _byte_length(buf)
+            buf, pos = '', 0
+
+def iter_json_items(stream: BinaryIO, offset: int = 0, items_key: str = None) -> Iterator[Tuple[Dict, int]]:
+    """Objects of a JSON feed's items array (see _find_items_array), one at a time
+
+    Strictly UTF-8: a replaced bad byte would throw the offsets off. A
+    byte order mark decodes to one character and is counted as its 3 bytes.
+    """
+
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    parser = json.JSONDecoder()
+    if offset:
+        stream.seek(offset)
+        buf, pos = '', 0
+    else:
+        buf, pos, base = _find_items_array(stream, decoder, items_key)
+        offset = base + _byte_length(buf[:pos])
+    mark = pos  # buf[mark] is at byte `offset`
+    eof = False
+
+    while True:
+        # Past separators; a ']' ends the array
+        while pos < len(buf) and buf[pos] in ' \t\r\n,':
+            pos += 1
+        if pos < len(buf) and buf[pos] == ']':
+            return
+        if pos < len(buf):
+            try:
+                record, end = parser.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+            else:
+                # A record ending right at the end of the buffer may be a number cut short
+                if end < len(buf) or eof:
+                    offset += _byte_length(buf[mark:end])
+                    mark = pos = end
+                    if isinstance(record, dict):
+                        yield record, offset
+                    continue
+        elif eof:
+            raise ValueError('feed ended inside the items array')
+
+        # Need more input: drop what has been consumed, then read
+        buf, pos, mark = buf[mark:], pos - mark, 0
+        chunk = stream.read(Config.FEED_READ_CHUNK)
+        eof = not chunk
+        buf += decoder.decode(chunk, final=eof)
+
+def iter_jsonl_items(stream: BinaryIO, offset: int = 0) -> Iterator[Tuple[Dict, int]]:
+    """One JSON object per line"""
+    if offset:
+        stream.seek(offset)
+    for line in stream:
+        offset += len(line)
+        if line.strip():
+            record = json.loads(line.decode('utf-8-sig' if offset == len(line) else 'utf-8'))
+            if isinstance(record, dict):
+                yield record, offset
+
+def iter_csv_rows(stream: BinaryIO, offset: int = 0) -> Iterator[Tuple[Dict, int]]:
+    """Rows of a CSV feed with a header line, as dicts"""
+
+    position = [0]
+
+    def lines():
+        # csv asks for one line at a time, and for more only inside a
+        # quoted field, so after each row `position` is just past it
+        for line in stream:
+            position[0] += len(line)
+            yield line.decode('utf-8-sig' if position[0] == len(line) else 'utf-8', errors='replace')
+
+    reader = csv.reader(lines())
+    header = next(reader, None)
+    if header is None:
+        return
+    header = [name.strip().lower() for name in header]
+    if offset > position[0]:
+        stream.seek(offset)
+        position[0] = offset
+    for row in reader:
+        if row:
+            yield dict(zip(header, row)), position[0]
+
+def iter_feed(path: str, format: str, offset: int = 0, items_key: str = None) -> Iterator[Tuple[Dict, int]]:
+    with open_feed(path) as stream:
+        if format == 'csv':
+            yield from iter_csv_rows(stream, offset)
+        elif format == 'jsonl':
+            yield from iter_jsonl_items(stream, offset)
+        elif format == 'json':
+            yield from iter_json_items(stream, offset, items_key)
+        else:
+            raise ValueError(f"Unknown feed format: {format!r}")
+
+def feed_format(feed: Dict) -> str:
+    if feed.get('format'):
+        return feed['format']
+    name = (feed.get('path') or feed.get('url') or '').split('?')[0].lower()
+    if name.endswith('.gz'):
+        name = name[:-3]
+    for suffix, format in (('.csv', 'csv'), ('.jsonl', 'jsonl'), ('.ndjson', 'jsonl'), ('.json', 'json')):
+        if name.endswith(suffix):
+            return format
+    raise ValueError(f"Feed {feed.get('name')}: set 'format' (json, jsonl or csv)")
+
+# ==============================================
+# RECORD MAPPERS
+# ==============================================
+# Feed record -> (item id, product dict shaped like a scraped product), or
+# None when the record has no usable product
+
+def _product(site: str, title, url, price, original_price, image_url, category, in_stock, features) -> Optional[Dict]:
+    price = parse_price(price)
+    if not title or not url or not price:
+        return None
+    original_price = max(parse_price(original_price) or price, price)
+    return {
+        'title': ' '.join(str(title).split()),
+        'price': price,
+        'original_price': original_price,
+        'discount': discount_percent(price, original_price),
+        'image_url': image_url or '',
+        'features': [str(feature) for feature in (features or []) if feature][:5],
+        'in_stock': bool(in_stock),
+        'url': url,
+        f'{site}_url': url,
+        'category': category or '',
+        'platform': site,
+    }
+
+def flipkart_record(record: Dict, feed: Dict) -> Optional[Tuple[str, Dict]]:
+    """A productInfoList entry of the Flipkart affiliate product feed API"""
+
+    info = record.get('productBaseInfoV1') or record
+    item_id = info.get('productId')
+    prices = [info.get(key) or {} for key in ('flipkartSpecialPrice', 'flipkartSellingPrice')]
+    price = next((p.get('amount') for p in prices if p.get('amount')), None)
+    images = info.get('imageUrls') or {}
+    image_url = images.get('800x800') or images.get('400x400') or next(iter(images.values()), '')
+    specs = (record.get('categorySpecificInfoV1') or {}).get('keySpecs') or []
+    product = _product('flipkart', info.get('title'), info.get('productUrl'), price,
+                       (info.get('maximumRetailPrice') or {}).get('amount'), image_url,
+                       feed.get('category'), info.get('inStock', True), specs)
+    return (str(item_id), product) if item_id and product else None
+
+def amazon_record(record: Dict, feed: Dict) -> Optional[Tuple[str, Dict]]:
+    """An item of a Product Advertising API response (ItemsResult.Items / SearchResult.Items)"""
+
+    item_info = record.get('ItemInfo') or {}
+    listing = next(iter((record.get('Offers') or {}).get('Listings') or []), {})
+    availability = (listing.get('Availability') or {}).get('Type', 'Now')
+    image = ((record.get('Images') or {}).get('Primary') or {}).get('Large') or {}
+    product = _product('amazon', (item_info.get('Title') or {}).get('DisplayValue'), record.get('DetailPageURL'),
+                       (listing.get('Price') or {}).get('Amount'), (listing.get('SavingBasis') or {}).get('Amount'),
+                       image.get('URL'), feed.get('category'), availability != 'OutOfStock',
+                       (item_info.get('Features') or {}).get('DisplayValues'))
+    return (str(record['ASIN']), product) if record.get('ASIN') and product else None
+
+# Accepted CSV column names, first match wins
+CSV_COLUMNS = {
+    'id': ('product_id', 'id', 'sku', 'asin', 'pid'),
+    'title': ('title', 'product_name', 'name'),
+    'price': ('price', 'selling_price', 'special_price', 'sale_price'),
+    'original_price': ('mrp', 'original_price', 'list_price', 'maximum_retail_price'),
+    'url': ('product_url', 'url', 'link', 'deeplink'),
+    'image_url': ('image_url', 'image', 'imageurl'),
+    'category': ('category',),
+    'in_stock': ('in_stock', 'availability', 'stock'),
+    'features': ('features', 'key_specs'),
+    'platform': ('platform', 'network', 'store'),
+}
+
+def csv_record(row: Dict, feed: Dict) -> Optional[Tuple[str, Dict]]:
+    """A row of a CSV export; features separated by '|'"""
+
+    def column(field):
+        return next((row[name].strip() for name in CSV_COLUMNS[field] if row.get(name, '').strip()), '')
+
+    site = (column('platform') or feed.get('platform') or '').lower()
+    if site not in ('amazon', 'flipkart'):
+        return None
+    stock = column('in_stock').lower()
+    product = _product(site, column('title'), column('url'), column('price'), column('original_price'),
+                       column('image_url'), column('category') or feed.get('category'),
+                       stock not in ('0', 'false', 'no', 'out of stock', 'outofstock'),
+                       column('features').split('|'))
+    item_id = column('id') or column('url')
+    return (item_id, product) if item_id and product else None
+
+RECORD_MAPPERS = {
+    'flipkart': flipkart_record,
+    'amazon': amazon_record,
+    'csv': csv_record,
+}
+
+def item_hash(product: Dict) -> str:
+    """Content hash of the fields a feed item is stored and posted with"""
+    fields = {key: product.get(key) for key in ('title', 'price', 'original_price', 'image_url', 'features',
+                                                'in_stock', 'url', 'category')}
+    return hashlib.blake2b(json.dumps(fields, sort_keys=True).encode('utf-8'), digest_size=16).hexdigest()
+
+# ==============================================
+# INGESTER
+# ==============================================
+
+class FeedIngester:
+    """Streams feeds into `process` (a list of products -> outcome counts), changed items only
+
+    A feed is read in segments of FEED_SEGMENT_ITEMS records. The items
+    of a segment whose content hash differs from the one stored for their
+    id go to `process` - normally one run of the ingest pipeline - and
+    once it has returned, the segment's hashes and the byte offset past
+    it are committed together. A feed interrupted halfway resumes after
+    the last committed segment, redoing at most one segment, which the
+    pipeline's own dedup sees as unchanged. A feed file that was ingested
+    to the end and has not changed since is not read again.
+    """
+
+    def __init__(self, process: Callable[[List[Dict]], Dict], database: Database = None):
+        self.process = process
+        self.db = database or get_database('pages')
+        self.setup_database()
+
+    def setup_database(self):
+        conn = self.db.connect()
+        cursor = conn.cursor()
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS feed_items (
+                feed TEXT NOT NULL,
+                item_id TEXT NOT NULL,
+                content_hash TEXT NOT NULL,
+                updated_at DATETIME,
+                PRIMARY KEY (feed, item_id)
+            ) WITHOUT ROWID
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS feed_checkpoints (
+                feed TEXT PRIMARY KEY,
+                path TEXT NOT NULL,
+                size BIGINT NOT NULL,
+                modified BIGINT NOT NULL,
+                byte_offset BIGINT NOT NULL,
+                records BIGINT NOT NULL,
+                status TEXT NOT NULL,
+                updated_at DATETIME
+            )
+        ''')
+        conn.commit()
+        conn.close()
+
+    def ingest_all(self, feeds: List[Dict] = None) -> Dict[str, Dict]:
+        results = {}
+        for feed in Config.PRODUCT_FEEDS if feeds is None else feeds:
+            try:
+                results[feed['name']] = self.ingest(feed)
+            except Exception as e:
+                logger.error(f"❌ Feed {feed.get('name')} failed: {e}")
+                results[feed.get('name')] = {'error': str(e)}
+        return results
+
+    def ingest(self, feed: Dict) -> Dict:
+        """Ingest one feed: {'name', 'network': 'flipkart'|'amazon'|'csv', 'path' or 'url', ...}
+
+        Optional keys: 'format' (json, jsonl or csv; default from the
+        file name), 'items_key' (JSON key of the items array), 'category'
+        and, for CSV feeds without a platform column, 'platform'.
+        """
+
+        name = feed['name']
+        mapper = RECORD_MAPPERS[feed['network']]
+        format = feed_format(feed)
+        path = self._local_path(feed)
+        stat = os.stat(path)
+        stats = dict(records=0, changed=0, unchanged=0, skipped=0, segments=0, resumed_at=0, outcomes={})
+
+        checkpoint = self._checkpoint(name)
+        offset = 0
+        if checkpoint is not None and checkpoint[:3] == (path, stat.st_size, stat.st_mtime_ns):
+            if checkpoint[5] == 'done':
+                logger.info(f"📦 Feed {name} unchanged since its last ingest")
+                return dict(stats, unchanged_file=True)
+            offset = stats['resumed_at'] = checkpoint[3]
+            stats['records'] = checkpoint[4]
+            logger.info(f"📦 Resuming feed {name} at byte {offset} ({checkpoint[4]} records done)")
+
+        start = time.perf_counter()
+        segment: List[Tuple[str, Dict]] = []
+        for record, end in iter_feed(path, format, offset, feed.get('items_key')):
+            stats['records'] += 1
+            mapped = mapper(record, feed)
+            if mapped is None:
+                stats['skipped'] += 1
+            else:
+                segment.append(mapped)
+            offset = end
+            if stats['records'] % Config.FEED_SEGMENT_ITEMS == 0:
+                self._commit_segment(name, segment, path, stat, offset, stats, 'running')
+                segment = []
+        self._commit_segment(name, segment, path, stat, offset, stats, 'done')
+
+        elapsed = time.perf_counter() - start
+        stats['seconds'] = round(elapsed, 2)
+        logger.info(
+            f"📦 Feed {name} - {stats['records']} records in {elapsed:.1f}s, changed: {stats['changed']}, "
+            f"unchanged: {stats['unchanged']}, unusable: {stats['skipped']}"
+        )
+        return stats
+
+    def _commit_segment(self, name: str, segment: List[Tuple[str, Dict]], path: str, stat,
+                        offset: int, stats: Dict, status: str):
+        hashes = {item_id: item_hash(product) for item_id, product in segment}
+        stored = self._stored_hashes(name, list(hashes))
+        changed = {}
+        for item_id, product in segment:
+            if stored.get(item_id) != hashes[item_id]:
+                changed[item_id] = product  # the last record wins if an id repeats
+        stats['changed'] += len(changed)
+        stats['unchanged'] += len(segment) - len(changed)
+        stats['segments'] += 1
+        metrics.FEED_ITEMS.inc(len(changed), feed=name, result='changed')
+        metrics.FEED_ITEMS.inc(len(segment) - len(changed), feed=name, result='unchanged')
+
+        if changed:
+            outcomes = self.process(list(changed.values())) or {}
+            for outcome, count in outcomes.items():
+                if isinstance(count, int):
+                    stats['outcomes'][outcome] = stats['outcomes'].get(outcome, 0) + count
+
+        now = datetime.now()
+        conn = self.db.connect()
+        cursor = conn.cursor()
+        cursor.execute('BEGIN')
+        cursor.executemany('''
+            INSERT INTO feed_items (feed, item_id, content_hash, updated_at)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT (feed, item_id) DO UPDATE SET
+                content_hash = excluded.content_hash,
+                updated_at = excluded.updated_at
+        ''', [(name, item_id, hashes[item_id], now) for item_id in changed])
+        cursor.execute('''
+            INSERT INTO feed_checkpoints (feed, path, size, modified, byte_offset, records, status, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (feed) DO UPDATE SET
+                path = excluded.path,
+                size = excluded.size,
+                modified = excluded.modified,
+                byte_offset = excluded.byte_offset,
+                records = excluded.records,
+                status = excluded.status,
+                updated_at = excluded.updated_at
+        ''', (name, path, stat.st_size, stat.st_mtime_ns, offset, stats['records'], status, now))
+        conn.commit()
+        conn.close()
+
+    def _stored_hashes(self, name: str, item_ids: List[str]) -> Dict[str, str]:
+        found = {}
+        conn = self.db.connect()
+        cursor = conn.cursor()
+        for start in range(0, len(item_ids), 500):
+            chunk = item_ids[start:start + 500]
+            placeholders = ', '.join('?' for _ in chunk)
+            cursor.execute(f'''
+                SELECT item_id, content_hash FROM feed_items
+                WHERE feed = ? AND item_id IN ({placeholders})
+            ''', [name] + chunk)
+            found.update(cursor.fetchall())
+        conn.close()
+        return found
+
+    def _checkpoint(self, name: str) -> Optional[Tuple]:
+        """(path, size, modified, byte_offset, records, status) of the feed's last ingest"""
+        conn = self.db.connect()
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT path, size, modified, byte_offset, records, status FROM feed_checkpoints WHERE feed = ?
+        ''', (name,))
+        row = cursor.fetchone()
+        conn.close()
+        return tuple(row) if row else None
+
+    def _local_path(self, feed: Dict) -> str:
+        """The feed file; a 'url' feed is downloaded unless an ingest of the last download is unfinished"""
+
+        if feed.get('path'):
+            return feed['path']
+        suffix = feed['url'].split('?')[0].rsplit('/', 1)[-1]
+        path = os.path.join(Config.FEED_DIR, f"{feed['name']}-{suffix}")
+        checkpoint = self._checkpoint(feed['name'])
+        if checkpoint is not None and checkpoint[0] == path and checkpoint[5] == 'running' and os.path.exists(path):
+            return path
+
+        os.makedirs(Config.FEED_DIR, exist_ok=True)
+        partial = path + '.part'
+        with requests.get(feed['url'], headers=feed.get('headers'), stream=True,
+                          timeout=Config.FEED_DOWNLOAD_TIMEOUT) as response:
+            response.raise_for_status()
+            with open(partial, 'wb') as f:
+                for chunk in response.iter_content(Config.FEED_READ_CHUNK):
+                    f.write(chunk)
+        os.replace(partial, path)
+        return path
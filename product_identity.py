@@ -0,0 +1,88 @@
+# Product Identity - canonical keys used to deduplicate products across runs
+import re
+from typing import Dict, Optional
+from urllib.parse import urlparse, parse_qs
+
+AMAZON_ASIN_PATTERNS = [
+    re.compile(r'/dp/([A-Z0-9]{10})'),
+    re.compile(r'/gp/product/([A-Z0-9]{10})'),
+]
+FLIPKART_ITEM_PATTERN = re.compile(r'/p/(itm[0-9a-z]+)', re.IGNORECASE)
+
+def extract_asin(url: str) -> Optional[str]:
+    """Extract the ASIN from an Amazon product URL"""
+    for pattern in AMAZON_ASIN_PATTERNS:
+        match = pattern.search(url or '')
+        if match:
+            return match.group(1)
+    return None
+
+def extract_flipkart_pid(url: str) -> Optional[str]:
+    """Extract the product id from a Flipkart URL (pid query param or itm path id)"""
+    if not url:
+        return None
+
+    pid = parse_qs(urlparse(url).query).get('pid')
+    if pid and pid[0]:
+        return pid[0].upper()
+
+    match = FLIPKART_ITEM_PATTERN.search(url)
+    if match:
+        return match.group(1).lower()
+    return None
+
+def canonicalize_url(url: str) -> str:
+    """Normalize a product URL: lower-case host, no www, query, fragment or trailing slash"""
+    parsed = urlparse(url.strip())
+    host = parsed.netloc.lower()
+    if host.startswith('www.'):
+        host = host[4:]
+    path = parsed.path.rstrip('/') or '/'
+    return f"{host}{path}"
+
+def canonical_product_key(product_data: Dict) -> Optional[str]:
+    """Return the unique identity of a product: ASIN, Flipkart PID or canonical URL"""
+
+    amazon_url = product_data.get('amazon_url') or ''
+    flipkart_url = product_data.get('flipkart_url') or ''
+    other_url = product_data.get('url') or ''
+
+    asin = extract_asin(amazon_url) or extract_asin(other_url)
+    if asin:
+        return f"amazon:{asin}"
+
+    pid = extract_flipkart_pid(flipkart_url) or (
+        extract_flipkart_pid(other_url) if 'flipkart.' in other_url.lower() else None
+    )
+    if pid:
+        return f"flipkart:{pid}"
+
+    for url in (amazon_url, flipkart_url, other_url):
+        if url:
+            return f"url:{canonicalize_url(url)}"
+
+    return None
+
+def validate_product_record(record) -> Optional[str]:
+    """Return an error message if a raw product record cannot be ingested"""
+
+    if not isinstance(record, dict):
+        return "record must be a JSON object"
+
+    title = record.get('title')
+    if not isinstance(title, str) or not title.strip():
+        return "title is required"
+
+    for field in ('price', 'original_price', 'discount'):
+        value = record.get(field)
+        if value is not None and (isinstance(value, bool) or not isinstance(value, (int, float))):
+            return f"{field} must be a number"
+
+    if not record.get('price') or record['price'] <= 0:
+        return "price must be positive"
+
+    if not any(isinstance(record.get(field), str) and record.get(field)
+               for field in ('amazon_url', 'flipkart_url', 'url')):
+        return "one of amazon_url, flipkart_url or url is required"
+
+    return None
@@ -0,0 +1,394 @@
+# Product Matching - the same item's Amazon and Flipkart listings, found by MinHash/LSH on titles
+import functools
+import hashlib
+import random
+import re
+import struct
+from datetime import datetime
+from typing import Dict, FrozenSet, Iterable, List, Optional, Sequence, Tuple
+from config import Config
+from storage import Database, get_database
+import metrics
+
+# Sizes and units written the same way on both marketplaces: "128 GB" -> "128gb"
+UNIT_ALIASES = {
+    'gb': 'gb', 'tb': 'tb', 'mb': 'mb', 'mah': 'mah', 'w': 'w', 'watt': 'w', 'watts': 'w',
+    'inch': 'in', 'inches': 'in', '"': 'in', 'cm': 'cm', 'mm': 'mm', 'hz': 'hz', 'mp': 'mp',
+    'l': 'l', 'litre': 'l', 'litres': 'l', 'liter': 'l', 'liters': 'l', 'ml': 'ml',
+    'kg': 'kg', 'g': 'g', 'ton': 'ton', 'tons': 'ton', 'star': 'star',
+    'h': 'h', 'hr': 'h', 'hrs': 'h', 'hour': 'h', 'hours': 'h',
+}
+UNIT_PATTERN = re.compile(
+    r'(\d+(?:\.\d+)?)\s*(' + '|'.join(sorted(map(re.escape, UNIT_ALIASES), key=len, reverse=True)) + r')(?![a-z])')
+SPEC_PATTERN = re.compile(r'^(\d+(?:\.\d+)?)([a-z]+)$')
+# Model numbers: letters and digits together, hyphens and slashes dropped ("SM-M146B" -> "smm146b"),
+# or a bare number of three digits or more ("Airdopes 141")
+MODEL_PATTERN = re.compile(r'^(?=.*[a-z])(?=.*\d)[a-z0-9]{3,}$|^\d{3,}$')
+TOKEN_PATTERN = re.compile(r'[a-z0-9]+(?:[-/.][a-z0-9]+)*')
+
+# Marketing words and category nouns that say nothing about which item it is;
+# left in, every TV would share a bucket with every other TV
+STOPWORDS = frozenset('''
+    a an and the of for with to by on at from in or
+    new latest edition pack combo set free offer deal sale best buy online india
+    ram storage rom memory variant version model colour color
+    smartphone mobile phone tv television led smart hd ultra full display screen
+    earbuds earphones headphones headset bluetooth wireless true tws playtime
+    battery camera cam processor charging fast mode
+'''.split())
+
+# A listing with one of these and one without are a device and its accessory
+ACCESSORY_WORDS = frozenset('''
+    case cover protector tempered guard skin charger cable adapter stand holder
+    mount strap pouch sleeve refill replacement
+'''.split())
+
+# Model numbers go into the signature this many times, so listings with
+# the same model land together ahead of the many that only share a brand
+# and a size
+MODEL_WEIGHT = 3
+
+# MinHash: h_i(x) = (a_i * x + b_i) mod a Mersenne prime, from a fixed seed so
+# signatures stay comparable across processes and releases
+_PRIME = (1 << 61) - 1
+_MAX_BUCKET = (1 << 63) - 1
+
+def _permutations(count: int) -> List[Tuple[int, int]]:
+    rng = random.Random(0x5A57A)
+    return [(rng.randrange(1, _PRIME), rng.randrange(0, _PRIME)) for _ in range(count)]
+
+_perms_cache: Dict[int, List[Tuple[int, int]]] = {}
+
+def _perms(count: int) -> List[Tuple[int, int]]:
+    perms = _perms_cache.get(count)
+    if perms is None:
+        perms = _perms_cache[count] = _permutations(count)
+    return perms
+
+def _spec(match) -> str:
+    number = match.group(1)
+    if '.' in number:
+        number = number.rstrip('0').rstrip('.')
+    return f"{number}{UNIT_ALIASES[match.group(2)]} "
+
+def title_tokens(title: str) -> FrozenSet[str]:
+    """Normalized tokens of a product title: lower case, units joined to sizes, no filler words"""
+
+    text = UNIT_PATTERN.sub(_spec, (title or '').lower().replace('″', '"'))
+    tokens = set()
+    for raw in TOKEN_PATTERN.findall(text):
+        token = raw.replace('-', '').replace('/', '') if not SPEC_PATTERN.match(raw) else raw
+        if token and token not in STOPWORDS and not (len(token) == 1 and not token.isdigit()):
+            tokens.add(token)
+    return frozenset(tokens)
+
+def title_brand(title: str) -> str:
+    """First word of a title, which both marketplaces use for the brand"""
+    match = TOKEN_PATTERN.search((title or '').lower())
+    return match.group(0) if match else ''
+
+def spec_tokens(tokens: Iterable[str]) -> Dict[str, FrozenSet[str]]:
+    """Size tokens by unit ({'gb': {'6gb', '128gb'}}); two listings of one item agree on these"""
+
+    specs: Dict[str, set] = {}
+    for token in tokens:
+        match = SPEC_PATTERN.match(token) if token[0].isdigit() else None
+        if match and match.group(2) in UNIT_ALIASES.values():
+            specs.setdefault(match.group(2), set()).add(token)
+    return {unit: frozenset(values) for unit, values in specs.items()}
+
+def model_tokens(tokens: Iterable[str]) -> FrozenSet[str]:
+    return frozenset(token for token in tokens if MODEL_PATTERN.match(token) and not SPEC_PATTERN.match(token))
+
+def shingles(tokens: FrozenSet[str]) -> FrozenSet[str]:
+    """Tokens plus extra copies of the model numbers, for the MinHash signature"""
+    models = model_tokens(tokens)
+    if not models:
+        return tokens
+    return tokens | {f"{model}#{copy}" for model in models for copy in range(1, MODEL_WEIGHT)}
+
+def _shingle_hash(token: str) -> int:
+    return int.from_bytes(hashlib.blake2b(token.encode('utf-8'), digest_size=8).digest(), 'big')
+
+@functools.lru_cache(maxsize=65536)
+def _token_hashes(token: str, num_perm: int) -> Tuple[int, ...]:
+    # Titles share a small vocabulary, so each token's permutations are computed once
+    h = _shingle_hash(token)
+    return tuple((a * h + b) % _PRIME for a, b in _perms(num_perm))
+
+def minhash(tokens: Iterable[str], num_perm: int) -> List[int]:
+    """MinHash signature of a token set; equal positions estimate the Jaccard similarity"""
+
+    rows = [_token_hashes(token, num_perm) for token in tokens]
+    if not rows:
+        return []
+    return list(map(min, *rows)) if len(rows) > 1 else list(rows[0])
+
+def band_buckets(signature: Sequence[int], bands: int, rows: int) -> List[int]:
+    """One LSH bucket per band: a 63-bit key of the band number and its rows"""
+
+    buckets = []
+    for band in range(bands):
+        chunk = signature[band * rows:(band + 1) * rows]
+        digest = hashlib.blake2b(struct.pack(f'>H{len(chunk)}Q', band, *chunk), digest_size=8).digest()
+        buckets.append(int.from_bytes(digest, 'big') & _MAX_BUCKET)
+    return buckets
+
+def _title_hash(tokens: FrozenSet[str]) -> int:
+    return _shingle_hash(' '.join(sorted(tokens))) & _MAX_BUCKET
+
+def title_similarity(left: FrozenSet[str], right: FrozenSet[str]) -> float:
+    """Share of the shorter title's tokens found in the other, or 0 when they name different items
+
+    One marketplace often has the bare name and the other the same name
+    plus selling points, so the shorter title is measured, not the union.
+    Titles that differ in a size of the same unit (128gb vs 256gb), in
+    model numbers (neither title's models contain the other's), or in naming an
+    accessory, or that share fewer than three tokens, are different items
+    however similar otherwise.
+    """
+
+    left_specs, right_specs = spec_tokens(left), spec_tokens(right)
+    for unit in left_specs.keys() & right_specs.keys():
+        if left_specs[unit] != right_specs[unit]:
+            return 0.0
+    left_models, right_models = model_tokens(left), model_tokens(right)
+    if left_models and right_models and not (left_models <= right_models or right_models <= left_models):
+        return 0.0
+    if bool(left & ACCESSORY_WORDS) != bool(right & ACCESSORY_WORDS):
+        return 0.0
+    shared = len(left & right)
+    if shared < 3:
+        return 0.0
+    return shared / min(len(left), len(right))
+
+class ProductMatcher:
+    """LSH index over product titles, and the matches it found across marketplaces
+
+    Each indexed product has MATCH_BANDS bucket rows in a WITHOUT ROWID
+    table keyed by bucket, so finding candidates for a title is one
+    indexed `bucket IN (...)` query however many products there are.
+    Products sharing any band are candidates; only candidates from the
+    other marketplace whose title_similarity() reaches
+    MATCH_MIN_SIMILARITY are matches. With 20 bands of 3 rows, titles
+    with a token Jaccard of 0.5 share a band 93% of the time, 0.7 over
+    99.9%, and 0.2 about 15%.
+    """
+
+    def __init__(self, database: Database = None, bands: int = None, rows: int = None):
+        self.db = database or get_database('master')
+        self.bands = bands or Config.MATCH_BANDS
+        self.rows = rows or Config.MATCH_ROWS_PER_BAND
+        self.setup_database()
+
+    def setup_database(self):
+        """Create the bucket, index-state and match tables"""
+        conn = self.db.connect()
+        cursor = conn.cursor()
+
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS product_title_buckets (
+                bucket BIGINT NOT NULL,
+                product_id INTEGER NOT NULL,
+                PRIMARY KEY (bucket, product_id)
+            ) WITHOUT ROWID
+        ''')
+
+        # Which title each product was indexed under, so a retitled product is re-indexed
+        # and the buckets of its old title can be found again and removed
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS product_title_index (
+                product_id INTEGER PRIMARY KEY,
+                title_hash BIGINT NOT NULL,
+                title_tokens TEXT
+            )
+        ''')
+        if 'title_tokens' not in self.db.table_columns(cursor, 'product_title_index'):
+            cursor.execute('ALTER TABLE product_title_index ADD COLUMN title_tokens TEXT')
+
+        # Stored in both directions so a product's matches are one primary-key range
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS product_matches (
+                product_id INTEGER NOT NULL,
+                matched_id INTEGER NOT NULL,
+                similarity REAL NOT NULL,
+                matched_at DATETIME,
+                PRIMARY KEY (product_id, matched_id)
+            ) WITHOUT ROWID
+        ''')
+
+        conn.commit()
+        conn.close()
+
+    def signature(self, tokens: FrozenSet[str]) -> List[int]:
+        return minhash(shingles(tokens), self.bands * self.rows)
+
+    def buckets(self, tokens: FrozenSet[str]) -> List[int]:
+        signature = self.signature(tokens)
+        return band_buckets(signature, self.bands, self.rows) if signature else []
+
+    def index(self, cursor, product_id: int, tokens: FrozenSet[str], buckets: List[int] = None,
+              previous: Optional[Tuple] = None):
+        """Put a product's title tokens in the LSH buckets, inside the caller's transaction
+
+        `previous` is the product's (title_hash, title_tokens) row when it
+        was indexed before: the buckets of that title are removed, so a
+        retitled product is found only by its current title.
+        """
+
+        buckets = self.buckets(tokens) if buckets is None else buckets
+        if previous is not None:
+            self._unindex(cursor, product_id, previous[1], buckets)
+        cursor.executemany('''
+            INSERT INTO product_title_buckets (bucket, product_id) VALUES (?, ?)
+            ON CONFLICT (bucket, product_id) DO NOTHING
+        ''', [(bucket, product_id) for bucket in buckets])
+        cursor.execute('''
+            INSERT INTO product_title_index (product_id, title_hash, title_tokens) VALUES (?, ?, ?)
+            ON CONFLICT (product_id) DO UPDATE SET
+                title_hash = excluded.title_hash, title_tokens = excluded.title_tokens
+        ''', (product_id, _title_hash(tokens), ' '.join(sorted(tokens))))
+
+    def _unindex(self, cursor, product_id: int, old_tokens: Optional[str], keep: List[int]):
+        if old_tokens is None:
+            # Indexed before the tokens were stored: the table has no index on
+            # product_id, so this scans it, once per such product
+            cursor.execute('DELETE FROM product_title_buckets WHERE product_id = ?', (product_id,))
+            return
+        stale = set(self.buckets(frozenset(old_tokens.split()))) - set(keep)
+        cursor.executemany('''
+            DELETE FROM product_title_buckets WHERE bucket = ? AND product_id = ?
+        ''', [(bucket, product_id) for bucket in stale])
+
+    def candidates(self, cursor, buckets: List[int], exclude: int = None) -> List[Tuple]:
+        """(id, title, platform, price) of products sharing a bucket, most shared buckets first
+
+        At most MATCH_MAX_CANDIDATES; sharing more bands means a higher
+        estimated similarity, so a cut drops the least likely ones. Only
+        the newest MATCH_BUCKET_SCAN rows of each bucket are read: buckets
+        of generic words grow with the catalogue, while the ones that
+        identify an item stay small and are read whole.
+        """
+
+        if not buckets:
+            return []
+        scans = ' UNION ALL '.join(
+            f'''SELECT * FROM (
+                    SELECT product_id FROM product_title_buckets WHERE bucket = ?
+                    ORDER BY product_id DESC LIMIT ?
+                ) b{index}''' for index in range(len(buckets)))
+        params = []
+        for bucket in buckets:
+            params.extend((bucket, Config.MATCH_BUCKET_SCAN))
+        with metrics.SQLITE_QUERY_TIME.time(operation='match_candidates'):
+            cursor.execute(f'''
+                SELECT p.id, p.title, p.platform, p.price FROM (
+                    SELECT product_id, COUNT(*) AS shared FROM ({scans}) scanned
+                    WHERE product_id != ?
+                    GROUP BY product_id
+                    ORDER BY shared DESC
+                    LIMIT ?
+                ) c JOIN products p ON p.id = c.product_id
+                ORDER BY c.shared DESC
+            ''', params + [exclude if exclude is not None else -1, Config.MATCH_MAX_CANDIDATES])
+            return cursor.fetchall()
+
+    def find_match(self, cursor, product: Dict, exclude: int = None, tokens: FrozenSet[str] = None,
+                   buckets: List[int] = None) -> Optional[Dict]:
+        """The best verified match for a product among the other marketplace's listings"""
+
+        tokens = title_tokens(product.get('title', '')) if tokens is None else tokens
+        buckets = self.buckets(tokens) if buckets is None else buckets
+        platform = product.get('platform')
+        brand = title_brand(product.get('title', ''))
+        best = None
+        for candidate_id, title, candidate_platform, price in self.candidates(cursor, buckets, exclude):
+            if platform and candidate_platform == platform:
+                continue
+            if brand != title_brand(title):
+                continue
+            similarity = title_similarity(tokens, title_tokens(title))
+            if similarity >= Config.MATCH_MIN_SIMILARITY and (best is None or similarity > best['similarity']):
+                best = {'id': candidate_id, 'title': title, 'platform': candidate_platform,
+                        'price': price, 'similarity': round(similarity, 3)}
+        return best
+
+    def add(self, cursor, product_id: int, product: Dict, now: datetime = None) -> Optional[Dict]:
+        """Match a stored product against the index, record the match and index the product
+
+        Runs inside the caller's transaction; returns the match, if any. A
+        product already indexed under the same title is left alone and
+        returns None.
+        """
+
+        tokens = title_tokens(product.get('title', ''))
+        cursor.execute('''
+            SELECT title_hash, title_tokens FROM product_title_index WHERE product_id = ?
+        ''', (product_id,))
+        row = cursor.fetchone()
+        if row is not None and row[0] == _title_hash(tokens):
+            return None
+
+        buckets = self.buckets(tokens)
+        match = self.find_match(cursor, product, exclude=product_id, tokens=tokens, buckets=buckets)
+        self.index(cursor, product_id, tokens, buckets, previous=row)
+        metrics.PRODUCT_MATCHES.inc(result='matched' if match else 'unmatched')
+        if match:
+            self._record(cursor, product_id, match['id'], match['similarity'], now or datetime.now())
+        return match
+
+    def _record(self, cursor, product_id: int, matched_id: int, similarity: float, now: datetime):
+        cursor.executemany('''
+            INSERT INTO product_matches (product_id, matched_id, similarity, matched_at) VALUES (?, ?, ?, ?)
+            ON CONFLICT (product_id, matched_id) DO UPDATE SET
+                similarity = excluded.similarity, matched_at = excluded.matched_at
+        ''', [(product_id, matched_id, similarity, now), (matched_id, product_id, similarity, now)])
+
+    def backfill(self, limit: int = None, batch_size: int = 2000) -> int:
+        """Index up to `limit` stored products that are not indexed yet, matching as it goes
+
+        For products stored before matching existed; returns how many were
+        indexed, so callers can spread a large backlog over several runs.
+        """
+
+        limit = limit or Config.MATCH_BACKFILL_BATCH
+        done = 0
+        conn = self.db.connect()
+        try:
+            cursor = conn.cursor()
+            while done < limit:
+                cursor.execute('''
+                    SELECT p.id, p.title, p.platform FROM products p
+                    LEFT JOIN product_title_index i ON i.product_id = p.id
+                    WHERE i.product_id IS NULL
+                    ORDER BY p.id
+                    LIMIT ?
+                ''', (min(batch_size, limit - done),))
+                rows = cursor.fetchall()
+                if not rows:
+                    break
+                cursor.execute('BEGIN')
+                now = datetime.now()
+                for product_id, title, platform in rows:
+                    self.add(cursor, product_id, {'title': title, 'platform': platform}, now)
+                conn.commit()
+                done += len(rows)
+        finally:
+            conn.close()
+        return done
+
+    def matches(self, product_id: int) -> List[Dict]:
+        """The product's listings on other marketplaces, cheapest first, for price comparison"""
+
+        conn = self.db.connect()
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT p.id, p.title, p.platform, p.price, p.amazon_url, p.flipkart_url, m.similarity
+            FROM product_matches m JOIN products p ON p.id = m.matched_id
+            WHERE m.product_id = ?
+            ORDER BY p.price
+        ''', (product_id,))
+        rows = cursor.fetchall()
+        conn.close()
+        return [{'id': row[0], 'title': row[1], 'platform': row[2], 'price': row[3],
+                 'url': row[4] or row[5], 'similarity': row[6]} for row in rows]
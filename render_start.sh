@@ -1,4 +1,4 @@
 #!/bin/bash
 python -m pip install --upgrade pip
 pip install -r requirements.txt
-gunicorn main:app --bind 0.0.0.0:$PORT
+gunicorn -c gunicorn.conf.py main:app
@@ -0,0 +1,167 @@
+# Reporting - joined queries across products, posts, affiliate links, clicks and reels
+from datetime import datetime, timedelta
+from typing import Dict, List
+from storage import Database, get_database
+
+# Table -> component database it lives in (one schema each when SQLite files are ATTACHed)
+TABLES = {
+    'products': 'master',
+    'posting_queue': 'master',
+    'posting_history': 'master',
+    'affiliate_links': 'affiliate',
+    'clicks': 'earnings',
+    'uploaded_reels': 'reels',
+}
+
+# Stand-ins for tables of components that have never run (e.g. no Instagram
+# uploader), so reports still answer with zeros for that source
+EMPTY_SOURCES = {
+    'affiliate_links': '''(SELECT CAST(NULL AS TEXT) AS id, CAST(NULL AS TEXT) AS affiliate_url,
+                                  0 AS conversions, 0 AS earnings WHERE 1 = 0)''',
+    'clicks': '''(SELECT CAST(NULL AS TEXT) AS product_id, CAST(NULL AS TEXT) AS platform,
+                         CAST(NULL AS TIMESTAMP) AS click_timestamp, 0 AS estimated_earning WHERE 1 = 0)''',
+    'uploaded_reels': '''(SELECT CAST(NULL AS TEXT) AS product_id, CAST(NULL AS TIMESTAMP) AS upload_timestamp,
+                                 0 AS views, 0 AS likes WHERE 1 = 0)''',
+}
+
+# Each source is aggregated once in a CTE and the results are joined, so
+# every report is a single pass over each table inside the database.
+# clicks and uploaded_reels keep product ids as text; {text_product_id}
+# converts them so every join is on integer ids.
+
+REVENUE_BY_PRODUCT_SQL = '''
+    WITH click_totals AS (
+        SELECT {text_product_id} AS product_id, platform,
+               COUNT(*) AS clicks, SUM(estimated_earning) AS estimated_revenue
+        FROM {clicks} c
+        WHERE click_timestamp >= ?
+        GROUP BY 1, platform
+    ),
+    top_products AS (
+        SELECT p.id, p.title, p.category, ct.platform, ct.clicks, ct.estimated_revenue,
+               CASE ct.platform WHEN 'flipkart' THEN p.affiliate_flipkart ELSE p.affiliate_amazon END AS affiliate_url
+        FROM {products} p
+        JOIN click_totals ct ON ct.product_id = p.id
+        ORDER BY ct.estimated_revenue DESC
+        LIMIT ?
+    )
+    SELECT tp.id, tp.title, tp.category, tp.platform, tp.clicks, tp.estimated_revenue,
+           COUNT(al.id) AS links, COALESCE(SUM(al.conversions), 0) AS conversions,
+           COALESCE(SUM(al.earnings), 0) AS earnings
+    FROM top_products tp
+    LEFT JOIN {affiliate_links} al ON al.affiliate_url = tp.affiliate_url
+    GROUP BY tp.id, tp.title, tp.category, tp.platform, tp.clicks, tp.estimated_revenue
+    ORDER BY tp.estimated_revenue DESC
+'''
+
+POST_TOTALS_CTE = '''
+    posts AS (
+        SELECT product_id, platform FROM {posting_queue} pq
+        WHERE status = 'completed' AND scheduled_time >= ?
+        UNION ALL
+        SELECT product_id, platform FROM {posting_history} ph
+        WHERE status = 'completed' AND scheduled_time >= ?
+    ),
+    post_totals AS (
+        SELECT product_id,
+               COUNT(*) AS posts,
+               SUM(CASE WHEN platform = 'instagram' THEN 1 ELSE 0 END) AS instagram_posts,
+               SUM(CASE WHEN platform = 'telegram' THEN 1 ELSE 0 END) AS telegram_posts,
+               SUM(CASE WHEN platform = 'discord' THEN 1 ELSE 0 END) AS discord_posts
+        FROM posts
+        GROUP BY product_id
+    ),
+    click_totals AS (
+        SELECT {text_product_id} AS product_id, COUNT(*) AS clicks, SUM(estimated_earning) AS estimated_revenue
+        FROM {clicks} c
+        WHERE click_timestamp >= ?
+        GROUP BY 1
+    )
+'''
+
+POSTS_VS_CLICKS_SQL = 'WITH' + POST_TOTALS_CTE + ''',
+    reel_totals AS (
+        SELECT {text_product_id} AS product_id, COUNT(*) AS reels,
+               SUM(views) AS reel_views, SUM(likes) AS reel_likes
+        FROM {uploaded_reels} r
+        WHERE upload_timestamp >= ?
+        GROUP BY 1
+    )
+    SELECT p.id, p.title, p.category,
+           pt.posts, pt.instagram_posts, pt.telegram_posts, pt.discord_posts,
+           COALESCE(ct.clicks, 0) AS clicks, COALESCE(ct.estimated_revenue, 0) AS estimated_revenue,
+           COALESCE(rt.reels, 0) AS reels, COALESCE(rt.reel_views, 0) AS reel_views,
+           COALESCE(rt.reel_likes, 0) AS reel_likes
+    FROM post_totals pt
+    JOIN {products} p ON p.id = pt.product_id
+    LEFT JOIN click_totals ct ON ct.product_id = p.id
+    LEFT JOIN reel_totals rt ON rt.product_id = p.id
+    ORDER BY clicks DESC, pt.posts DESC
+    LIMIT ?
+'''
+
+CATEGORY_PERFORMANCE_SQL = 'WITH' + POST_TOTALS_CTE + '''
+    SELECT p.category,
+           COUNT(*) AS products,
+           COALESCE(SUM(pt.posts), 0) AS posts,
+           COALESCE(SUM(ct.clicks), 0) AS clicks,
+           COALESCE(SUM(ct.estimated_revenue), 0) AS estimated_revenue
+    FROM {products} p
+    LEFT JOIN post_totals pt ON pt.product_id = p.id
+    LEFT JOIN click_totals ct ON ct.product_id = p.id
+    WHERE pt.product_id IS NOT NULL OR ct.product_id IS NOT NULL
+    GROUP BY p.category
+    ORDER BY estimated_revenue DESC
+'''
+
+class Reports:
+    """Cross-component reports, each answered by one query on the reporting database"""
+
+    def __init__(self, database: Database = None):
+        self.db = database or get_database('reporting')
+        self._present = set()
+
+    def _sources(self, conn) -> Dict[str, str]:
+        """Table name for every source, or an empty stand-in if it does not exist yet"""
+        sources = {}
+        for name, component in TABLES.items():
+            table = self.db.table(component, name)
+            if name not in self._present and name in EMPTY_SOURCES:
+                try:
+                    conn.execute(f'SELECT 1 FROM {table} WHERE 1 = 0').fetchall()
+                    self._present.add(name)
+                except Exception:  # no such table: sqlite3 and psycopg2 raise different types
+                    conn.rollback()
+                    table = EMPTY_SOURCES[name]
+            sources[name] = table
+        return sources
+
+    def _query(self, sql: str, params) -> List[Dict]:
+        conn = self.db.connect()
+        try:
+            names = self._sources(conn)
+            names['text_product_id'] = self.db.text_to_id('product_id')
+            cursor = conn.cursor()
+            cursor.execute(sql.format(**names), params)
+            columns = [column[0] for column in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+        finally:
+            conn.close()
+
+    def revenue_by_product(self, days: int = 30, limit: int = 50) -> List[Dict]:
+        """Clicks and estimated revenue per product and retailer, with the affiliate link totals"""
+        since = datetime.now() - timedelta(days=days)
+        return self._query(REVENUE_BY_PRODUCT_SQL, (since, limit))
+
+    def posts_vs_clicks(self, days: int = 30, limit: int = 50) -> List[Dict]:
+        """Completed posts per channel against clicks and reel views, per product"""
+        since = datetime.now() - timedelta(days=days)
+        rows = self._query(POSTS_VS_CLICKS_SQL, (since, since, since, since, limit))
+        for row in rows:
+            row['clicks_per_post'] = round(row['clicks'] / row['posts'], 2) if row['posts'] else 0
+        return rows
+
+    def category_performance(self, days: int = 30) -> List[Dict]:
+        """Posts, clicks and estimated revenue per product category"""
+        since = datetime.now() - timedelta(days=days)
+        return self._query(CATEGORY_PERFORMANCE_SQL, (since, since, since))
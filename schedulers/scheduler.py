@@ -1,9 +1,12 @@
 import sys
 import os
+import logging
 
 # Add parent directory to path to import main module
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+logger = logging.getLogger(__name__)
+
 def run_sastasmart_system():
     """Run the main SastaSmart system"""
     try:
@@ -11,14 +14,17 @@ def run_sastasmart_system():
         master = SastaSmartMaster()
         master.run()
     except Exception as e:
-        print(f"Error running SastaSmart system: {e}")
+        logger.error(f"Error running SastaSmart system: {e}")
         return False
     return True
 
 if __name__ == "__main__":
-    print("🚀 Starting SastaSmart Scheduler...")
+    from logging_setup import configure_logging
+    configure_logging()
+    
+    logger.info("🚀 Starting SastaSmart Scheduler...")
     success = run_sastasmart_system()
     if success:
-        print("✅ SastaSmart system started successfully")
+        logger.info("✅ SastaSmart system started successfully")
     else:
-        print("❌ Failed to start SastaSmart system")
+        logger.error("❌ Failed to start SastaSmart system")
@@ -0,0 +1,213 @@
+# Browser Pool - headless Chrome for the pages plain HTTP cannot parse
+import asyncio
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional
+from config import Config
+import metrics
+import tracing
+
+logger = logging.getLogger(__name__)
+
+def process_tree_rss_mb(root_pid: int) -> float:
+    """Resident memory of a process and all its descendants (0 where /proc is unavailable)"""
+
+    children = {}
+    rss_pages = {}
+    try:
+        entries = os.listdir('/proc')
+    except OSError:
+        return 0.0
+
+    for entry in entries:
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as f:
+                # comm may contain spaces; the fields after it are fixed
+                fields = f.read().rsplit(')', 1)[1].split()
+        except (OSError, IndexError):
+            continue
+        pid = int(entry)
+        children.setdefault(int(fields[1]), []).append(pid)
+        rss_pages[pid] = int(fields[21])
+
+    total = 0
+    pending = [root_pid]
+    while pending:
+        pid = pending.pop()
+        total += rss_pages.get(pid, 0)
+        pending.extend(children.get(pid, []))
+    return total * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+
+class PooledDriver:
+    """A Chrome driver plus the bookkeeping used to decide when to recycle it"""
+
+    def __init__(self, driver):
+        self.driver = driver
+        self.pages = 0
+        self.started_at = time.time()
+
+    @property
+    def pid(self) -> Optional[int]:
+        process = getattr(getattr(self.driver, 'service', None), 'process', None)
+        return process.pid if process is not None else None
+
+    def memory_mb(self) -> float:
+        return process_tree_rss_mb(self.pid) if self.pid else 0.0
+
+    def quit(self):
+        try:
+            self.driver.quit()
+        except Exception as e:
+            logger.debug(f"Error quitting Chrome driver: {e}")
+
+class BrowserPool:
+    """Bounded pool of headless Chrome drivers, started on first use
+
+    Nothing is launched until a page actually needs rendering; after that
+    drivers stay open between scrape runs. Images, fonts and media are
+    blocked. A driver is quit and replaced after `max_pages` pages or when
+    Chrome's processes grow past `max_memory_mb`.
+    """
+
+    def __init__(self, size: int = None, max_pages: int = None, max_memory_mb: float = None):
+        self.size = size or Config.BROWSER_POOL_SIZE
+        self.max_pages = max_pages or Config.BROWSER_MAX_PAGES
+        self.max_memory_mb = max_memory_mb or Config.BROWSER_MAX_MEMORY_MB
+        self._idle = queue.LifoQueue()  # most recently used first: its caches are warm
+        self._slots = threading.BoundedSemaphore(self.size)
+        self._lock = threading.Lock()
+        self._drivers = 0
+        self._executor = None
+        self._closed = False
+
+    def _create_driver(self) -> PooledDriver:
+        from selenium import webdriver
+        from selenium.webdriver.chrome.options import Options
+
+        chrome_options = Options()
+        chrome_options.add_argument("--headless=new")
+        chrome_options.add_argument("--no-sandbox")
+        chrome_options.add_argument("--disable-dev-shm-usage")
+        chrome_options.add_argument("--disable-gpu")
+        chrome_options.add_argument("--disable-extensions")
+        chrome_options.add_argument("--blink-settings=imagesEnabled=false")
+        chrome_options.add_argument(f"--user-agent={Config.SCRAPE_USER_AGENT}")
+        chrome_options.add_experimental_option("prefs", {
+            "profile.managed_default_content_settings.images": 2,
+            "profile.managed_default_content_settings.media_stream": 2,
+        })
+        # Return once the DOM is ready; prices are rendered by then
+        chrome_options.page_load_strategy = 'eager'
+
+        driver = webdriver.Chrome(options=chrome_options)
+        driver.set_page_load_timeout(Config.BROWSER_PAGE_TIMEOUT)
+        # Fonts, media and any image requests the settings above let through
+        driver.execute_cdp_cmd('Network.enable', {})
+        driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': Config.BROWSER_BLOCKED_URLS})
+
+        with self._lock:
+            self._drivers += 1
+            metrics.BROWSER_DRIVERS.set(self._drivers)
+        logger.info(f"🌐 Started headless Chrome ({self._drivers}/{self.size})")
+        return PooledDriver(driver)
+
+    def _retire(self, pooled: PooledDriver, reason: str):
+        pooled.quit()
+        with self._lock:
+            self._drivers -= 1
+            metrics.BROWSER_DRIVERS.set(self._drivers)
+        metrics.BROWSER_RECYCLES.inc(reason=reason)
+        logger.info(f"♻️ Recycled Chrome driver after {pooled.pages} pages ({reason})")
+
+    def acquire(self) -> PooledDriver:
+        if self._closed:
+            raise RuntimeError('browser pool is closed')
+        self._slots.acquire()
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        try:
+            return self._create_driver()
+        except Exception:
+            self._slots.release()
+            raise
+
+    def release(self, pooled: PooledDriver, broken: bool = False):
+        try:
+            if broken:
+                self._retire(pooled, 'error')
+            elif pooled.pages >= self.max_pages:
+                self._retire(pooled, 'pages')
+            elif self.max_memory_mb and pooled.memory_mb() >= self.max_memory_mb:
+                self._retire(pooled, 'memory')
+            elif self._closed:
+                self._retire(pooled, 'shutdown')
+            else:
+                self._idle.put(pooled)
+        finally:
+            self._slots.release()
+
+    def render(self, url: str, site: str = '') -> Optional[str]:
+        """Load a page in a pooled driver and return the rendered HTML (None on failure)"""
+
+        pooled = self.acquire()
+        broken = False
+        start = time.perf_counter()
+        try:
+            with tracing.span('scrape.render', site=site, url=url):
+                pooled.pages += 1
+                pooled.driver.get(url)
+                return pooled.driver.page_source
+        except Exception as e:
+            from selenium.common.exceptions import TimeoutException
+            # A timed-out page leaves the driver usable; anything else may not
+            broken = not isinstance(e, TimeoutException)
+            logger.warning(f"⚠️ Browser render failed for {url}: {e}")
+            return None
+        finally:
+            metrics.BROWSER_RENDER_TIME.observe(time.perf_counter() - start, site=site)
+            self.release(pooled, broken)
+
+    async def render_async(self, url: str, site: str = '') -> Optional[str]:
+        """render() on the pool's own threads, so the scraping event loop keeps going"""
+
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.size, thread_name_prefix='browser')
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, tracing.wrap(self.render), url, site)
+
+    def stats(self) -> Dict:
+        return {'size': self.size, 'drivers': self._drivers, 'idle': self._idle.qsize()}
+
+    def close(self):
+        self._closed = True
+        while True:
+            try:
+                pooled = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._retire(pooled, 'shutdown')
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+
+# Process-wide pool, shared by every scrape run
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_browser_pool() -> BrowserPool:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = BrowserPool()
+                atexit.register(_pool.close)
+    return _pool
@@ -0,0 +1,414 @@
+# Scraping Engine - async HTTP crawl of deal listings and product pages
+import asyncio
+import logging
+import os
+import time
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+from urllib.parse import urlparse, urlencode, parse_qsl, urlunparse
+import aiohttp
+from config import Config
+from product_identity import canonical_product_key
+from scrapers.frontier import CrawlFrontier, FrontierEntry
+from scrapers.host_limits import HostLimits, parse_retry_after
+from scrapers.page_cache import CacheEntry, PageCache
+from scrapers.parse_pool import ParsePool, get_parse_pool, product_from_values
+from scrapers.parsers import content_hash, is_blocked, parse_listing, parse_product
+import metrics
+import tracing
+
+logger = logging.getLogger(__name__)
+
+# Worth another attempt: throttling and transient server errors
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# load() result for a product page that has not changed since the last run
+UNCHANGED = object()
+
+class FetchedPage:
+    """A fetched page as raw bytes; decoded only if parsed in this process"""
+
+    __slots__ = ('status', 'body', 'encoding', 'etag', 'last_modified')
+
+    def __init__(self, status: int, body: bytes = b'', encoding: str = 'utf-8',
+                 etag: str = None, last_modified: str = None):
+        self.status = status
+        self.body = body
+        self.encoding = encoding
+        self.etag = etag
+        self.last_modified = last_modified
+
+    @property
+    def text(self) -> str:
+        return self.body.decode(self.encoding, errors='replace')
+
+def listing_page_urls(source: Dict) -> List[str]:
+    """URLs of the first `pages` pages of a listing source (page=N query param)"""
+
+    urls = []
+    parsed = urlparse(source['url'])
+    for page in range(1, source.get('pages', 1) + 1):
+        query = [(key, value) for key, value in parse_qsl(parsed.query) if key != 'page']
+        if page > 1:
+            query.append(('page', str(page)))
+        urls.append(urlunparse(parsed._replace(query=urlencode(query))))
+    return urls
+
+class ScrapeEngine:
+    """Fetches listing pages, then the product pages they link to, concurrently
+
+    One aiohttp session per run holds a keep-alive connection pool capped
+    at `concurrency` connections overall and `per_host` per host, so a
+    run reuses a handful of TLS connections per marketplace. Products are
+    yielded as soon as their page is parsed, in completion order.
+
+    With a crawl frontier only the URLs it says are due are fetched, and
+    products a listing links to are fetched only when the frontier has
+    not seen them before; known ones come up on their own schedule.
+
+    With more than one parse worker, product pages are hashed and parsed
+    in the shared process pool while the event loop keeps fetching; runs
+    of fewer than PARSE_POOL_MIN_BATCH product pages parse in-process.
+
+    With host limits, requests in flight to each host follow its adaptive
+    window instead of the fixed `per_host` cap, which then only bounds
+    the connection pool at HOST_MAX_CONCURRENCY.
+    """
+
+    def __init__(self, concurrency: int = None, per_host: int = None,
+                 timeout: float = None, retries: int = None, render_fallback: bool = None,
+                 cache: Optional[PageCache] = None, frontier: Optional[CrawlFrontier] = None,
+                 parse_workers: int = None, limits: Optional[HostLimits] = None):
+        self.concurrency = concurrency or Config.SCRAPE_CONCURRENCY
+        self.limits = limits
+        self.per_host = per_host or (Config.HOST_MAX_CONCURRENCY if limits else Config.SCRAPE_PER_HOST_CONCURRENCY)
+        self.timeout = aiohttp.ClientTimeout(
+            total=timeout or Config.SCRAPE_TIMEOUT,
+            connect=Config.SCRAPE_CONNECT_TIMEOUT
+        )
+        self.retries = Config.SCRAPE_RETRIES if retries is None else retries
+        self.render_fallback = Config.BROWSER_FALLBACK if render_fallback is None else render_fallback
+        self.cache = cache
+        self.frontier = frontier
+        workers = Config.PARSE_WORKERS if parse_workers is None else parse_workers
+        self.parse_workers = workers or os.cpu_count() or 1
+        self.parse_pool: Optional[ParsePool] = None
+
+    def _session(self) -> aiohttp.ClientSession:
+        connector = aiohttp.TCPConnector(
+            limit=self.concurrency,
+            limit_per_host=self.per_host,
+            keepalive_timeout=Config.SCRAPE_KEEPALIVE_TIMEOUT,
+            ttl_dns_cache=300
+        )
+        return aiohttp.ClientSession(
+            connector=connector,
+            timeout=self.timeout,
+            headers={
+                'User-Agent': Config.SCRAPE_USER_AGENT,
+                'Accept': 'text/html,application/xhtml+xml;q=0.9,*/*;q=0.8',
+                'Accept-Language': 'en-IN,en;q=0.9',
+            }
+        )
+
+    async def fetch(self, session: aiohttp.ClientSession, url: str, site: str,
+                    headers: Dict[str, str] = None) -> Optional[FetchedPage]:
+        """GET a page, retrying throttling, 5xx and network errors; None on failure
+
+        A 304 answer to conditional headers comes back as a page with no body.
+        With host limits each attempt waits for a slot in the host's window
+        and reports back how the host answered; a captcha page still comes
+        back as a page, for load() to deal with.
+        """
+
+        host_limit = self.limits.get(urlparse(url).hostname) if self.limits else None
+        for attempt in range(self.retries + 1):
+            if host_limit is not None:
+                await host_limit.acquire()
+            start = time.perf_counter()
+            result = 'error'
+            retry_after = None
+            try:
+                with tracing.span('scrape.fetch', site=site, url=url):
+                    async with session.get(url, headers=headers) as response:
+                        if response.status in (200, 304):
+                            result = 'ok' if response.status == 200 else 'not_modified'
+                            body = await response.read() if response.status == 200 else b''
+                            encoding = response.charset or 'utf-8'
+                            if body and is_blocked(body[:20000].decode(encoding, errors='replace')):
+                                result = 'captcha'
+                            return FetchedPage(response.status, body, encoding,
+                                               response.headers.get('ETag'), response.headers.get('Last-Modified'))
+                        result = str(response.status)
+                        retry_after = parse_retry_after(response.headers.get('Retry-After'))
+                        if response.status not in RETRY_STATUSES:
+                            logger.warning(f"⚠️ {site} page returned {response.status}: {url}")
+                            return None
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                result = type(e).__name__
+                logger.debug(f"Fetch failed ({result}) for {url}: {e}")
+            finally:
+                elapsed = time.perf_counter() - start
+                metrics.SCRAPER_FETCH_TIME.observe(elapsed, site=site)
+                metrics.SCRAPER_PAGES.inc(site=site, result=result)
+                if host_limit is not None:
+                    host_limit.release(result, elapsed, retry_after)
+
+            if attempt < self.retries:
+                await asyncio.sleep(Config.SCRAPE_RETRY_BACKOFF * 2 ** attempt)
+
+        logger.warning(f"⚠️ Giving up on {site} page after {self.retries + 1} attempts: {url}")
+        return None
+
+    async def render(self, url: str, site: str) -> Optional[str]:
+        """Rendered HTML from the shared browser pool (started on first call)"""
+
+        from scrapers.browser_pool import get_browser_pool
+        try:
+            return await get_browser_pool().render_async(url, site)
+        except Exception as e:
+            logger.warning(f"⚠️ Browser unavailable, skipping {url}: {e}")
+            return None
+
+    async def load(self, session: aiohttp.ClientSession, source: Dict, url: str,
+                   parse: Callable[[str], Any], kind: str = 'product'):
+        """Fetch and parse a page over plain HTTP, rendering it only when the HTML has no data
+
+        With a page cache the request is conditional. A 304, or a product
+        page whose content hash matches the last run, is not parsed: a
+        listing returns its cached links and a product returns UNCHANGED.
+        Sources marked 'render_js' always go through the browser and are
+        not cached. Pages that failed to fetch or are bot checks are not
+        rendered. With the parse pool running, product pages are hashed
+        and parsed there and `parse` is only used for rendered HTML.
+        """
+
+        site = source['site']
+        if source.get('render_js'):
+            html = await self.render(url, site)
+            return parse(html) if html is not None else None
+
+        entry = self.cache.get(url) if self.cache else None
+        page = await self.fetch(session, url, site, self.cache.conditional_headers(entry) if self.cache else None)
+        if page is None:
+            return None
+        if page.status == 304:
+            if entry is None:
+                return None
+            return self._cache_hit(entry, site, kind, 'not_modified')
+
+        digest = None
+        outcome = 'new'
+        pooled = kind == 'product' and self.parse_pool is not None
+        if pooled:
+            skip_hash = entry.content_hash if self.cache and entry is not None and self.cache.is_fresh(entry) else None
+            with tracing.span('scrape.parse_product', site=site, pooled=True):
+                digest, values, seconds = await self.parse_pool.parse_product(
+                    site, page.body, page.encoding, url, bool(self.cache), skip_hash)
+            metrics.SCRAPER_PARSE_TIME.observe(seconds, site=site)
+        elif self.cache and kind == 'product':
+            digest = content_hash(site, page.text)
+        if self.cache and kind == 'product':
+            if entry is not None and entry.content_hash == digest:
+                if self.cache.is_fresh(entry):
+                    return self._cache_hit(entry, site, kind, 'unchanged')
+                outcome = 'stale'
+            elif entry is not None:
+                outcome = 'changed'
+
+        if pooled:
+            result = product_from_values(site, url, source.get('category', ''), values) if values else None
+        else:
+            result = parse(page.text)
+        if result:
+            if self.cache:
+                if kind == 'listing' and entry is not None:
+                    outcome = 'unchanged' if entry.extracted == result else 'changed'
+                self.cache.record(f"{site}/{kind}", outcome)
+                metrics.SCRAPER_CACHE.inc(site=site, kind=kind, result=outcome)
+                self.cache.store(url, page.etag, page.last_modified, digest,
+                                 result if kind == 'listing' else None)
+            return result
+        if not self.render_fallback or is_blocked(page.text):
+            return result
+
+        html = await self.render(url, site)
+        return parse(html) if html is not None else None
+
+    def _cache_hit(self, entry: CacheEntry, site: str, kind: str, result: str):
+        self.cache.touch(entry.url)
+        self.cache.record(f"{site}/{kind}", result)
+        metrics.SCRAPER_CACHE.inc(site=site, kind=kind, result=result)
+        if kind == 'listing':
+            return entry.extracted or []
+        return UNCHANGED
+
+    def _parse_listing(self, site: str, html: str, url: str) -> List[str]:
+        with metrics.SCRAPER_PARSE_TIME.time(site=site), tracing.span('scrape.parse_listing', site=site):
+            return parse_listing(site, html, url)
+
+    def _parse_product(self, site: str, html: str, url: str, category: str) -> Optional[Dict]:
+        with metrics.SCRAPER_PARSE_TIME.time(site=site), tracing.span('scrape.parse_product', site=site):
+            return parse_product(site, html, url, category)
+
+    async def stream(self, sources: List[Dict] = None, limit: int = None) -> AsyncIterator[Dict]:
+        """Yield normalized products from the listing sources, at most `limit` of them
+
+        Each source is {'site': 'amazon'|'flipkart', 'category': ..., 'url': ..., 'pages': N}.
+        Product pages are scheduled as soon as the listing that links them
+        arrives, and products repeated across listings are fetched once.
+        """
+
+        sources = Config.SCRAPE_SOURCES if sources is None else sources
+        limit = limit or Config.MAX_PRODUCTS_PER_RUN
+        results = asyncio.Queue()
+        seen = set()
+        started = set()  # product pages fetched this run, due or newly found; at most `limit`
+        tasks = set()
+        done = object()
+
+        if self.cache:
+            self.cache.load()
+        if self.limits:
+            self.limits.load()
+        if self.parse_workers > 1 and limit >= Config.PARSE_POOL_MIN_BATCH:
+            self.parse_pool = get_parse_pool(self.parse_workers)
+        if self.frontier:
+            self.frontier.sync_listings((url, source) for source in sources for url in listing_page_urls(source))
+            due = self.frontier.pop_due(limit)
+        else:
+            due = None
+
+        async with self._session() as session:
+
+            def spawn(coro):
+                task = asyncio.ensure_future(coro)
+                tasks.add(task)
+                task.add_done_callback(finished)
+
+            def finished(task):
+                tasks.discard(task)
+                if not task.cancelled() and task.exception() is not None:
+                    logger.error(f"❌ Scrape task failed: {task.exception()}")
+                if not tasks:
+                    results.put_nowait(done)
+
+            async def crawl_listing(source: Dict, url: str, entry: FrontierEntry = None):
+                product_urls = await self.load(
+                    session, source, url, lambda html: self._parse_listing(source['site'], html, url), 'listing')
+                if entry is not None and product_urls is None:
+                    self.frontier.failed(entry)
+
+                found = []
+                for product_url in product_urls or []:
+                    key = canonical_product_key({'url': product_url})
+                    if key not in seen:
+                        seen.add(key)
+                        found.append((key, product_url))
+                if entry is not None:
+                    # Only products the frontier has never seen; it schedules the rest
+                    known = await asyncio.to_thread(self.frontier.known, [key for key, _ in found])
+                    found = [(key, product_url) for key, product_url in found if key not in known]
+                    if product_urls is not None:
+                        self.frontier.visited(entry, changed=bool(found))
+
+                for key, product_url in found[:max(limit - len(started), 0)]:
+                    started.add(key)
+                    product_entry = self.frontier.discover(key, product_url, source) if entry is not None else None
+                    spawn(crawl_product(source, product_url, product_entry))
+
+            async def crawl_product(source: Dict, url: str, entry: FrontierEntry = None):
+                product = await self.load(
+                    session, source, url,
+                    lambda html: self._parse_product(source['site'], html, url, source.get('category', '')))
+                if entry is not None:
+                    if product is None:
+                        self.frontier.failed(entry)
+                    elif product is UNCHANGED:
+                        self.frontier.visited(entry, changed=False)
+                    else:
+                        self.frontier.visited(entry, changed=None, price=product.get('price'))
+                if product is UNCHANGED:
+                    return
+                if product is None:
+                    logger.warning(f"⚠️ No product scraped from {url}")
+                    return
+                await results.put(product)
+
+            if due is None:
+                for source in sources:
+                    for url in listing_page_urls(source):
+                        spawn(crawl_listing(source, url))
+            else:
+                for entry in due:
+                    if entry.kind == 'listing':
+                        spawn(crawl_listing(entry.source, entry.url, entry))
+                    else:
+                        seen.add(entry.key)
+                        started.add(entry.key)
+                        spawn(crawl_product(entry.source, entry.url, entry))
+            if not tasks:
+                if self.frontier:
+                    self.frontier.flush()
+                return
+
+            try:
+                while True:
+                    product = await results.get()
+                    if product is done:
+                        break
+                    yield product
+            finally:
+                for task in list(tasks):
+                    task.cancel()
+                if tasks:
+                    await asyncio.gather(*tasks, return_exceptions=True)
+                if self.cache:
+                    self.cache.flush()
+                if self.frontier:
+                    self.frontier.flush()
+                if self.limits:
+                    self.limits.flush()
+
+    async def collect(self, sources: List[Dict] = None, limit: int = None) -> List[Dict]:
+        return [product async for product in self.stream(sources, limit)]
+
+def create_engine(sources: List[Dict] = None) -> ScrapeEngine:
+    """Engine with the page cache, crawl frontier and host limits as configured
+
+    The crawl frontier schedules the configured sources only; a run over
+    explicit sources crawls all of their pages.
+    """
+
+    cache = PageCache() if Config.PAGE_CACHE_ENABLED else None
+    frontier = CrawlFrontier() if Config.FRONTIER_ENABLED and sources is None else None
+    limits = HostLimits() if Config.HOST_LIMITS_ENABLED else None
+    return ScrapeEngine(cache=cache, frontier=frontier, limits=limits)
+
+def log_run_summary(engine: ScrapeEngine, products: int, seconds: float):
+    logger.info(f"🕷️ Scraped {products} changed products in {seconds:.1f}s")
+    if engine.cache is not None:
+        for key, stats in engine.cache.summary().items():
+            logger.info(
+                f"🗃️ Page cache {key} - hit ratio {stats['hit_ratio']:.0%} "
+                f"(304: {stats['not_modified']}, same content: {stats['unchanged']}, "
+                f"changed: {stats['changed']}, new: {stats['new']}, stale: {stats['stale']})"
+            )
+    if engine.frontier is not None:
+        for kind, counts in engine.frontier.summary().items():
+            logger.info(f"🗓️ Frontier {kind} pages - tracked: {counts['tracked']}, still due: {counts['due']}")
+    if engine.limits is not None:
+        for host, stats in engine.limits.summary().items():
+            logger.info(
+                f"🚦 {host} - concurrency {stats['concurrency']}, latency {stats['latency_ms']}ms "
+                f"(healthy: {stats['healthy']}, throttled: {stats['throttled']}, errors: {stats['errors']})"
+            )
+
+def scrape_products(sources: List[Dict] = None, limit: int = None) -> List[Dict]:
+    """Run one scrape from synchronous code (scheduler thread, CLI)"""
+
+    with tracing.span('scrape', sources=len(Config.SCRAPE_SOURCES if sources is None else sources)):
+        start = time.perf_counter()
+        engine = create_engine(sources)
+        products = asyncio.run(engine.collect(sources, limit))
+        log_run_summary(engine, len(products), time.perf_counter() - start)
+        return products
@@ -0,0 +1,295 @@
+# Crawl Frontier - per-URL revisit schedule that adapts to how often prices change
+import math
+import random
+import threading
+import time
+from typing import Dict, Iterable, List, Set, Tuple
+from config import Config
+from storage import Database, get_database
+import metrics
+
+# Keys per IN (...) lookup; well under SQLite's bound-parameter limit
+LOOKUP_CHUNK = 500
+
+class FrontierEntry:
+    __slots__ = ('key', 'url', 'kind', 'site', 'category', 'render_js', 'interval', 'next_visit',
+                 'last_visit', 'last_price', 'visits', 'changes', 'observed', 'failures')
+
+    def __init__(self, key: str, url: str, kind: str, site: str, category: str = '', render_js: bool = False,
+                 interval: float = None, next_visit: float = 0, last_visit: float = 0, last_price: float = None,
+                 visits: float = 0, changes: float = 0, observed: float = 0, failures: int = 0):
+        self.key = key
+        self.url = url
+        self.kind = kind
+        self.site = site
+        self.category = category
+        self.render_js = render_js
+        self.interval = interval or Config.SCRAPE_INTERVAL
+        self.next_visit = next_visit
+        self.last_visit = last_visit
+        self.last_price = last_price
+        self.visits = visits
+        self.changes = changes
+        self.observed = observed
+        self.failures = failures
+
+    @property
+    def source(self) -> Dict:
+        """The engine's source dict for this URL"""
+        return {'site': self.site, 'category': self.category, 'render_js': self.render_js}
+
+    def change_rate(self) -> float:
+        """Estimated price changes per second over the recent (decayed) visits
+
+        A visit only tells whether the price changed at least once since
+        the last one, so the share of visits that saw no change is turned
+        into a Poisson rate instead of counting changes per second, which
+        would top out at one per visit interval.
+        """
+        if not self.visits or not self.observed:
+            return 0.0
+        unchanged = max(self.visits - self.changes, 0)
+        mean_gap = self.observed / self.visits
+        return -math.log((unchanged + 0.5) / (self.visits + 0.5)) / mean_gap
+
+def next_interval(entry: FrontierEntry) -> float:
+    """Revisit interval from the estimated change rate, within the configured bounds
+
+    FRONTIER_VISITS_PER_CHANGE visits per expected change catch most of
+    them; more catch more, for more fetches. A page that has not changed
+    recently backs off by at most FRONTIER_BACKOFF per visit, so one
+    quiet visit does not push a deal out to the maximum.
+    """
+
+    rate = entry.change_rate()
+    if rate > 0:
+        interval = min(1 / (Config.FRONTIER_VISITS_PER_CHANGE * rate), entry.interval * Config.FRONTIER_BACKOFF)
+    else:
+        interval = entry.interval * Config.FRONTIER_BACKOFF
+    return max(Config.FRONTIER_MIN_INTERVAL, min(Config.FRONTIER_MAX_INTERVAL, interval))
+
+class CrawlFrontier:
+    """Every listing and product URL the scraper tracks, ordered by next visit
+
+    Rows live in the 'pages' database with an index on (kind, next_visit),
+    so taking the due URLs is an index range scan whatever the table size;
+    nothing is loaded up front. Entries taken or discovered during a run
+    are kept in memory and written back in one transaction by flush().
+    Taken URLs are leased for FRONTIER_LEASE seconds, so a run that dies
+    gives them back without a second run picking them up meanwhile.
+    """
+
+    def __init__(self, database: Database = None):
+        self.db = database or get_database('pages')
+        self._entries: Dict[str, FrontierEntry] = {}
+        self._dropped: Set[str] = set()
+        self._lock = threading.Lock()
+        self.setup_database()
+
+    def setup_database(self):
+        conn = self.db.connect()
+        cursor = conn.cursor()
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS crawl_frontier (
+                key TEXT PRIMARY KEY, -- canonical product key, or the URL of a listing page
+                url TEXT NOT NULL,
+                kind TEXT NOT NULL, -- 'listing' or 'product'
+                site TEXT NOT NULL,
+                category TEXT,
+                render_js BOOLEAN DEFAULT 0,
+                revisit_seconds REAL,
+                next_visit REAL,
+                last_visit REAL,
+                last_price REAL,
+                visits REAL DEFAULT 0, -- decayed count of revisits
+                changes REAL DEFAULT 0, -- decayed count of revisits that saw a change
+                observed REAL DEFAULT 0, -- decayed seconds covered by those revisits
+                failures INTEGER DEFAULT 0
+            )
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_crawl_frontier_due
+            ON crawl_frontier (kind, next_visit)
+        ''')
+        conn.commit()
+        conn.close()
+
+    def sync_listings(self, pages: Iterable[Tuple[str, Dict]], now: float = None):
+        """Track exactly these (url, source) listing pages; new ones are due at once"""
+
+        now = time.time() if now is None else now
+        pages = list(pages)
+        conn = self.db.connect()
+        cursor = conn.cursor()
+        cursor.execute('BEGIN')
+        cursor.executemany('''
+            INSERT INTO crawl_frontier (key, url, kind, site, category, render_js, revisit_seconds, next_visit)
+            VALUES (?, ?, 'listing', ?, ?, ?, ?, ?)
+            ON CONFLICT (key) DO UPDATE SET
+                site = excluded.site,
+                category = excluded.category,
+                render_js = excluded.render_js
+        ''', [
+            (url, url, source['site'], source.get('category', ''), bool(source.get('render_js')),
+             Config.SCRAPE_INTERVAL, now)
+            for url, source in pages
+        ])
+        placeholders = ', '.join('?' for _ in pages) or 'NULL'
+        cursor.execute(f'''
+            DELETE FROM crawl_frontier WHERE kind = 'listing' AND key NOT IN ({placeholders})
+        ''', [url for url, _ in pages])
+        conn.commit()
+        conn.close()
+
+    def pop_due(self, limit: int, now: float = None) -> List[FrontierEntry]:
+        """Lease the due listing pages and up to `limit` due product pages, most overdue first"""
+
+        now = time.time() if now is None else now
+        conn = self.db.connect()
+        cursor = conn.cursor()
+        cursor.execute('BEGIN')
+        due = []
+        for kind, kind_limit in (('listing', None), ('product', limit)):
+            query = '''
+                SELECT key, url, kind, site, category, render_js, revisit_seconds, next_visit,
+                       last_visit, last_price, visits, changes, observed, failures
+                FROM crawl_frontier
+                WHERE kind = ? AND next_visit <= ?
+                ORDER BY next_visit
+            '''
+            params = [kind, now]
+            if kind_limit is not None:
+                query += ' LIMIT ?'
+                params.append(kind_limit)
+            cursor.execute(query, params)
+            for row in cursor.fetchall():
+                due.append(FrontierEntry(*row[:5], bool(row[5]), *row[6:10],
+                                         row[10] or 0, row[11] or 0, row[12] or 0, row[13] or 0))
+
+        cursor.executemany('''
+            UPDATE crawl_frontier SET next_visit = ? WHERE key = ?
+        ''', [(now + Config.FRONTIER_LEASE, entry.key) for entry in due])
+        conn.commit()
+        conn.close()
+
+        with self._lock:
+            for entry in due:
+                self._entries[entry.key] = entry
+        return due
+
+    def known(self, keys: List[str]) -> Set[str]:
+        """Which of these keys are already tracked (in memory or on disk)"""
+
+        with self._lock:
+            found = {key for key in keys if key in self._entries}
+        remaining = [key for key in keys if key not in found]
+        if not remaining:
+            return found
+
+        conn = self.db.connect()
+        cursor = conn.cursor()
+        for start in range(0, len(remaining), LOOKUP_CHUNK):
+            chunk = remaining[start:start + LOOKUP_CHUNK]
+            placeholders = ', '.join('?' for _ in chunk)
+            cursor.execute(f'SELECT key FROM crawl_frontier WHERE key IN ({placeholders})', chunk)
+            found.update(row[0] for row in cursor.fetchall())
+        conn.close()
+        return found
+
+    def discover(self, key: str, url: str, source: Dict, now: float = None) -> FrontierEntry:
+        """Start tracking a product found on a listing page; due now until visited"""
+
+        now = time.time() if now is None else now
+        entry = FrontierEntry(key, url, 'product', source['site'], source.get('category', ''),
+                              bool(source.get('render_js')), next_visit=now)
+        with self._lock:
+            self._entries.setdefault(key, entry)
+            return self._entries[key]
+
+    def visited(self, entry: FrontierEntry, changed: bool, price: float = None, now: float = None):
+        """Record a successful visit and schedule the next one
+
+        For product pages `changed` is normally worked out from `price`
+        against the last price seen; pass changed=None to do that.
+        """
+
+        now = time.time() if now is None else now
+        with self._lock:
+            if changed is None:
+                changed = entry.last_price is not None and price is not None and price != entry.last_price
+            if entry.last_visit:
+                decay = Config.FRONTIER_DECAY
+                entry.visits = entry.visits * decay + 1
+                entry.changes = entry.changes * decay + (1 if changed else 0)
+                entry.observed = entry.observed * decay + (now - entry.last_visit)
+                entry.interval = next_interval(entry)
+            if price is not None:
+                entry.last_price = price
+            entry.last_visit = now
+            entry.failures = 0
+            jitter = random.uniform(1 - Config.FRONTIER_JITTER, 1 + Config.FRONTIER_JITTER)
+            entry.next_visit = now + entry.interval * jitter
+
+    def failed(self, entry: FrontierEntry, now: float = None):
+        """A visit that got no page: retry after the minimum interval, or give up on the URL"""
+
+        now = time.time() if now is None else now
+        with self._lock:
+            entry.failures += 1
+            if entry.failures >= Config.FRONTIER_MAX_FAILURES and entry.kind == 'product':
+                self._dropped.add(entry.key)
+            entry.next_visit = now + Config.FRONTIER_MIN_INTERVAL * entry.failures
+
+    def flush(self):
+        """Write back every entry taken or discovered this run (unvisited ones keep their due time)"""
+
+        with self._lock:
+            dropped = self._dropped
+            rows = [entry for key, entry in self._entries.items() if key not in dropped]
+            self._entries = {}
+            self._dropped = set()
+
+        conn = self.db.connect()
+        cursor = conn.cursor()
+        cursor.execute('BEGIN')
+        cursor.executemany('''
+            INSERT INTO crawl_frontier (key, url, kind, site, category, render_js, revisit_seconds, next_visit,
+                                        last_visit, last_price, visits, changes, observed, failures)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (key) DO UPDATE SET
+                url = excluded.url,
+                revisit_seconds = excluded.revisit_seconds,
+                next_visit = excluded.next_visit,
+                last_visit = excluded.last_visit,
+                last_price = excluded.last_price,
+                visits = excluded.visits,
+                changes = excluded.changes,
+                observed = excluded.observed,
+                failures = excluded.failures
+        ''', [
+            (entry.key, entry.url, entry.kind, entry.site, entry.category, entry.render_js, entry.interval,
+             entry.next_visit, entry.last_visit or None, entry.last_price, entry.visits, entry.changes,
+             entry.observed, entry.failures)
+            for entry in rows
+        ])
+        cursor.executemany('DELETE FROM crawl_frontier WHERE key = ?', [(key,) for key in dropped])
+        conn.commit()
+        conn.close()
+
+    def summary(self, now: float = None) -> Dict[str, Dict[str, int]]:
+        """Tracked and currently due URLs per kind; also exported as a gauge"""
+
+        now = time.time() if now is None else now
+        conn = self.db.connect()
+        cursor = conn.cursor()
+        summary = {}
+        for kind in ('listing', 'product'):
+            cursor.execute('SELECT COUNT(*) FROM crawl_frontier WHERE kind = ?', (kind,))
+            tracked = cursor.fetchone()[0]
+            cursor.execute('SELECT COUNT(*) FROM crawl_frontier WHERE kind = ? AND next_visit <= ?', (kind, now))
+            due = cursor.fetchone()[0]
+            summary[kind] = {'tracked': tracked, 'due': due}
+            metrics.SCRAPER_FRONTIER.set(tracked, kind=kind, state='tracked')
+            metrics.SCRAPER_FRONTIER.set(due, kind=kind, state='due')
+        conn.close()
+        return summary
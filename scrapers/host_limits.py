@@ -0,0 +1,211 @@
+# Host Limits - per-host AIMD concurrency for the scraper, kept between runs
+import asyncio
+import time
+from collections import deque
+from datetime import datetime
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional
+from config import Config
+from storage import Database, get_database
+import metrics
+
+# Responses that mean the host wants fewer requests
+THROTTLE_RESULTS = {'429', '503', 'captcha'}
+# Responses that mean it is fine with the current number
+HEALTHY_RESULTS = {'ok', 'not_modified'}
+
+def parse_retry_after(value: Optional[str], now: float = None) -> Optional[float]:
+    """Seconds to wait from a Retry-After header (delay seconds or an HTTP date)"""
+
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(when.timestamp() - (now if now is not None else time.time()), 0.0)
+
+class HostLimit:
+    """Concurrency window of one host, grown additively and cut multiplicatively
+
+    Each healthy response adds 1/limit, so the window grows by about one
+    request per window's worth of responses, but only while responses
+    stay within HOST_LATENCY_TOLERANCE of the fastest recent latency: a
+    host that slows down is queueing, and more requests would make it
+    worse. A 429, a 503 or a captcha page multiplies the window by
+    HOST_DECREASE_FACTOR, at most once per round trip so one burst of
+    rejections counts as one signal, and the window that was throttled
+    becomes a ceiling the window stays under for HOST_PROBE_INTERVAL:
+    a rate limit does not show in latency, and probing it again on every
+    round trip would mean a rejection (and a Retry-After) every few
+    seconds. A Retry-After stops all requests to the host until it has
+    passed.
+    """
+
+    __slots__ = ('host', 'limit', 'base_latency', 'latency', 'blocked_until', 'ceiling', 'last_cut',
+                 'in_flight', 'healthy', 'throttled', 'errors', '_waiters')
+
+    def __init__(self, host: str, limit: float = None, base_latency: float = 0.0, latency: float = 0.0,
+                 blocked_until: float = 0.0, ceiling: float = 0.0, last_cut: float = 0.0):
+        self.host = host
+        self.limit = limit or Config.HOST_INITIAL_CONCURRENCY
+        self.base_latency = base_latency   # fastest recent response, drifting up slowly
+        self.latency = latency             # moving average
+        self.blocked_until = blocked_until
+        self.ceiling = ceiling             # window last throttled
+        self.last_cut = last_cut
+        self.in_flight = 0
+        self.healthy = 0
+        self.throttled = 0
+        self.errors = 0
+        self._waiters = deque()
+
+    def window(self) -> int:
+        return max(int(self.limit), Config.HOST_MIN_CONCURRENCY)
+
+    async def acquire(self):
+        """Wait for a free slot in the window and for any Retry-After to pass"""
+        loop = asyncio.get_running_loop()
+        while True:
+            delay = self.blocked_until - time.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+                continue
+            if self.in_flight < self.window():
+                self.in_flight += 1
+                return
+            waiter = loop.create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            finally:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+
+    def release(self, result: str, latency: float, retry_after: float = None):
+        """Free the slot and adjust the window to how the host answered"""
+
+        self.in_flight -= 1
+        now = time.time()
+        if result in THROTTLE_RESULTS:
+            self.throttled += 1
+            metrics.SCRAPER_THROTTLED.inc(host=self.host, reason=result)
+            if now - self.last_cut > max(self.latency, 0.1):
+                self.ceiling = self.window()
+                self.limit = max(self.limit * Config.HOST_DECREASE_FACTOR, Config.HOST_MIN_CONCURRENCY)
+                self.last_cut = now
+            if retry_after:
+                self.blocked_until = max(self.blocked_until, now + min(retry_after, Config.HOST_MAX_RETRY_AFTER))
+        elif result in HEALTHY_RESULTS:
+            self.healthy += 1
+            self.latency = latency if not self.latency else self.latency * 0.8 + latency * 0.2
+            self.base_latency = min(self.base_latency * 1.01, latency) if self.base_latency else latency
+            if latency <= self.base_latency * Config.HOST_LATENCY_TOLERANCE:
+                cap = Config.HOST_MAX_CONCURRENCY
+                if now - self.last_cut < Config.HOST_PROBE_INTERVAL:
+                    cap = max(self.ceiling - 0.01, self.limit)
+                self.limit = min(self.limit + 1 / self.limit, cap)
+        else:
+            # Timeouts and other errors hold the window where it is
+            self.errors += 1
+        metrics.SCRAPER_HOST_CONCURRENCY.set(self.limit, host=self.host)
+        self._wake()
+
+    def _wake(self):
+        free = self.window() - self.in_flight
+        while free > 0 and self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                free -= 1
+
+class HostLimits:
+    """Per-host windows for one scraper, loaded at the start of a run and written back at the end
+
+    A run starts each host at the window the last run ended with, so it
+    does not have to find the host's capacity again, nor trip its rate
+    limit again on the way.
+    """
+
+    def __init__(self, database: Database = None):
+        self.db = database or get_database('pages')
+        self._hosts: Dict[str, HostLimit] = {}
+        self.setup_database()
+
+    def setup_database(self):
+        conn = self.db.connect()
+        cursor = conn.cursor()
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS host_limits (
+                host TEXT PRIMARY KEY,
+                concurrency REAL NOT NULL,
+                base_latency REAL,
+                latency REAL,
+                blocked_until REAL,
+                ceiling REAL,
+                last_cut REAL,
+                updated_at DATETIME
+            )
+        ''')
+        conn.commit()
+        conn.close()
+
+    def load(self):
+        """Read the stored windows and reset the run counts"""
+        conn = self.db.connect()
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT host, concurrency, base_latency, latency, blocked_until, ceiling, last_cut FROM host_limits
+        ''')
+        hosts = {
+            row[0]: HostLimit(row[0], row[1], *(value or 0.0 for value in row[2:]))
+            for row in cursor.fetchall()
+        }
+        conn.close()
+        self._hosts = hosts
+
+    def get(self, host: str) -> HostLimit:
+        limit = self._hosts.get(host)
+        if limit is None:
+            limit = self._hosts[host] = HostLimit(host)
+        return limit
+
+    def flush(self):
+        now = datetime.now()
+        conn = self.db.connect()
+        cursor = conn.cursor()
+        cursor.executemany('''
+            INSERT INTO host_limits (host, concurrency, base_latency, latency, blocked_until, ceiling, last_cut,
+                                     updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (host) DO UPDATE SET
+                concurrency = excluded.concurrency,
+                base_latency = excluded.base_latency,
+                latency = excluded.latency,
+                blocked_until = excluded.blocked_until,
+                ceiling = excluded.ceiling,
+                last_cut = excluded.last_cut,
+                updated_at = excluded.updated_at
+        ''', [
+            (limit.host, limit.limit, limit.base_latency, limit.latency, limit.blocked_until, limit.ceiling,
+             limit.last_cut, now)
+            for limit in self._hosts.values()
+        ])
+        conn.commit()
+        conn.close()
+
+    def summary(self) -> Dict[str, Dict]:
+        return {
+            host: {
+                'concurrency': round(limit.limit, 2),
+                'latency_ms': round(limit.latency * 1000, 1),
+                'healthy': limit.healthy,
+                'throttled': limit.throttled,
+                'errors': limit.errors,
+                'blocked_seconds': round(max(limit.blocked_until - time.time(), 0), 1),
+            }
+            for host, limit in self._hosts.items()
+        }
@@ -0,0 +1,158 @@
+# Page Cache - conditional GET validators and content hashes for scraped pages
+import json
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+from config import Config
+from storage import Database, get_database
+
+class CacheEntry:
+    __slots__ = ('url', 'etag', 'last_modified', 'content_hash', 'extracted', 'parsed_at', 'checked_at')
+
+    def __init__(self, url: str, etag: str = None, last_modified: str = None, content_hash: str = None,
+                 extracted=None, parsed_at: float = 0, checked_at: float = 0):
+        self.url = url
+        self.etag = etag
+        self.last_modified = last_modified
+        self.content_hash = content_hash
+        self.extracted = extracted
+        self.parsed_at = parsed_at
+        self.checked_at = checked_at
+
+class PageCache:
+    """Per-URL ETag, Last-Modified and content hash, kept on disk between runs
+
+    The whole table is read at the start of a scrape run and changed rows
+    are written back in one transaction at the end, so the event loop
+    never waits on the database. Only validators, hashes and the links
+    extracted from listing pages are stored, never page bodies. An entry
+    older than PAGE_CACHE_MAX_SKIP_HOURS since its last full parse stops
+    short-circuiting, so unchanged products are still re-seen now and then.
+    """
+
+    RESULTS = ('new', 'changed', 'not_modified', 'unchanged', 'stale')
+
+    def __init__(self, database: Database = None):
+        self.db = database or get_database('pages')
+        self.max_skip_seconds = Config.PAGE_CACHE_MAX_SKIP_HOURS * 3600
+        self._entries: Dict[str, CacheEntry] = {}
+        self._dirty = set()
+        self._lock = threading.Lock()
+        self.stats = {}
+        self.setup_database()
+
+    def setup_database(self):
+        conn = self.db.connect()
+        cursor = conn.cursor()
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS page_cache (
+                url TEXT PRIMARY KEY,
+                etag TEXT,
+                last_modified TEXT,
+                content_hash TEXT,
+                extracted TEXT, -- JSON: product links of a listing page
+                parsed_at REAL,
+                checked_at REAL
+            )
+        ''')
+        conn.commit()
+        conn.close()
+
+    def load(self):
+        """Read every entry and reset the run statistics"""
+        conn = self.db.connect()
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT url, etag, last_modified, content_hash, extracted, parsed_at, checked_at FROM page_cache
+        ''')
+        entries = {}
+        for url, etag, last_modified, content_hash, extracted, parsed_at, checked_at in cursor.fetchall():
+            entries[url] = CacheEntry(url, etag, last_modified, content_hash,
+                                      json.loads(extracted) if extracted else None,
+                                      parsed_at or 0, checked_at or 0)
+        conn.close()
+
+        with self._lock:
+            self._entries = entries
+            self._dirty = set()
+            self.stats = {}
+
+    def get(self, url: str) -> Optional[CacheEntry]:
+        return self._entries.get(url)
+
+    def conditional_headers(self, entry: Optional[CacheEntry]) -> Dict[str, str]:
+        if entry is None:
+            return {}
+        headers = {}
+        if entry.etag:
+            headers['If-None-Match'] = entry.etag
+        if entry.last_modified:
+            headers['If-Modified-Since'] = entry.last_modified
+        return headers
+
+    def is_fresh(self, entry: Optional[CacheEntry]) -> bool:
+        """Whether an unchanged page may still be skipped without parsing"""
+        return entry is not None and time.time() - entry.parsed_at < self.max_skip_seconds
+
+    def record(self, key: str, result: str):
+        """Count a revalidation outcome under key (e.g. 'amazon/product')"""
+        with self._lock:
+            key_stats = self.stats.setdefault(key, dict.fromkeys(self.RESULTS, 0))
+            key_stats[result] += 1
+
+    def touch(self, url: str):
+        """Revalidated without a change: remember when it was last checked"""
+        entry = self._entries.get(url)
+        if entry is not None:
+            entry.checked_at = time.time()
+            self._dirty.add(url)
+
+    def store(self, url: str, etag: str, last_modified: str, content_hash: str, extracted=None):
+        now = time.time()
+        with self._lock:
+            self._entries[url] = CacheEntry(url, etag, last_modified, content_hash, extracted, now, now)
+            self._dirty.add(url)
+
+    def hit_ratio(self, key: str = None) -> float:
+        """Share of pages that needed no parsing (304 or same content)"""
+        stats = [self.stats[key]] if key else list(self.stats.values())
+        hits = sum(s['not_modified'] + s['unchanged'] for s in stats)
+        total = sum(sum(s.values()) for s in stats)
+        return hits / total if total else 0.0
+
+    def flush(self):
+        """Write entries touched this run and drop those not checked for PAGE_CACHE_MAX_AGE_DAYS"""
+
+        with self._lock:
+            rows = [self._entries[url] for url in self._dirty]
+            self._dirty = set()
+
+        conn = self.db.connect()
+        cursor = conn.cursor()
+        cursor.executemany('''
+            INSERT INTO page_cache (url, etag, last_modified, content_hash, extracted, parsed_at, checked_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (url) DO UPDATE SET
+                etag = excluded.etag,
+                last_modified = excluded.last_modified,
+                content_hash = excluded.content_hash,
+                extracted = excluded.extracted,
+                parsed_at = excluded.parsed_at,
+                checked_at = excluded.checked_at
+        ''', [
+            (entry.url, entry.etag, entry.last_modified, entry.content_hash,
+             json.dumps(entry.extracted) if entry.extracted is not None else None,
+             entry.parsed_at, entry.checked_at)
+            for entry in rows
+        ])
+        expired_before = (datetime.now() - timedelta(days=Config.PAGE_CACHE_MAX_AGE_DAYS)).timestamp()
+        cursor.execute('DELETE FROM page_cache WHERE checked_at < ?', (expired_before,))
+        conn.commit()
+        conn.close()
+
+    def summary(self) -> Dict[str, Dict]:
+        return {
+            key: dict(key_stats, hit_ratio=round(self.hit_ratio(key), 3))
+            for key, key_stats in self.stats.items()
+        }
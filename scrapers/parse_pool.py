@@ -0,0 +1,98 @@
+# Parse Pool - product pages hashed and parsed in worker processes, off the event loop's GIL
+import asyncio
+import atexit
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Optional, Tuple
+from config import Config
+from scrapers.parsers import compiled_packs, content_hash, parse_product
+
+logger = logging.getLogger(__name__)
+
+# Order of the values in a parsed product tuple; everything else in the
+# product dict is known to the caller already (url, site, category)
+PRODUCT_FIELDS = ('title', 'price', 'original_price', 'discount', 'image_url', 'features', 'in_stock')
+
+def _warm_worker():
+    # Compile the selector packs once per worker instead of on its first page
+    for site in ('amazon', 'flipkart'):
+        compiled_packs(site)
+
+def parse_product_page(site: str, body: bytes, encoding: str, url: str, hash_content: bool = False,
+                       skip_hash: Optional[str] = None) -> Tuple[Optional[str], Optional[tuple], float]:
+    """Decode, hash and parse one product page, in a worker process or inline
+
+    Returns (content hash, product tuple, parse seconds). The hash is None
+    unless hash_content is set; when it equals skip_hash the page is not
+    parsed and the tuple is None, as it is when the page has no product.
+    Only the raw bytes go in and a short tuple comes back, so neither the
+    page text nor the parsed tree crosses the process boundary.
+    """
+
+    start = time.perf_counter()
+    html = body.decode(encoding or 'utf-8', errors='replace')
+    digest = content_hash(site, html) if hash_content else None
+    if digest is not None and digest == skip_hash:
+        return digest, None, time.perf_counter() - start
+
+    product = parse_product(site, html, url)
+    values = None
+    if product is not None:
+        values = tuple(tuple(product[field]) if field == 'features' else product[field]
+                       for field in PRODUCT_FIELDS)
+    return digest, values, time.perf_counter() - start
+
+def product_from_values(site: str, url: str, category: str, values: tuple) -> Dict:
+    """The product dict parse_product would have returned, from a parsed product tuple"""
+
+    product = dict(zip(PRODUCT_FIELDS, values))
+    product['features'] = list(product['features'])
+    product.update({'url': url, f'{site}_url': url, 'category': category, 'platform': site})
+    return product
+
+class ParsePool:
+    """Process pool for product page parsing, sized to the CPU cores
+
+    Workers come from a forkserver that has already imported the parsers,
+    so starting one is cheap and never forks the scraper's own threads
+    (the browser pool, the pipeline stages). Pages smaller than
+    PARSE_POOL_MIN_BYTES are parsed inline: shipping them to a worker
+    costs more than parsing them.
+    """
+
+    def __init__(self, workers: int = None):
+        self.workers = workers or Config.PARSE_WORKERS or os.cpu_count() or 1
+        context = multiprocessing.get_context('forkserver')
+        context.set_forkserver_preload(['scrapers.parse_pool'])
+        self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=context,
+                                             initializer=_warm_worker)
+
+    async def parse_product(self, site: str, body: bytes, encoding: str, url: str, hash_content: bool = False,
+                            skip_hash: Optional[str] = None) -> Tuple[Optional[str], Optional[tuple], float]:
+        """parse_product_page in a worker; pages under PARSE_POOL_MIN_BYTES are parsed inline"""
+        if len(body) < Config.PARSE_POOL_MIN_BYTES:
+            return parse_product_page(site, body, encoding, url, hash_content, skip_hash)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, parse_product_page,
+                                          site, body, encoding, url, hash_content, skip_hash)
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_parse_pool(workers: int = None) -> ParsePool:
+    """The process-wide parse pool, started on first use with `workers` processes"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ParsePool(workers)
+                atexit.register(_pool.close)
+                logger.info(f"⚙️ Parse pool started with {_pool.workers} worker processes")
+    return _pool
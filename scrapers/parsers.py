@@ -0,0 +1,406 @@
+# Page parsers - product links from deal listings and product details from product pages
+import hashlib
+import html as html_entities
+import json
+import re
+import threading
+from typing import Dict, Iterator, List, Optional, Tuple
+from urllib.parse import urljoin, urlparse, parse_qs
+from product_identity import extract_asin, extract_flipkart_pid
+from scrapers.selector_packs import load_selector_packs
+
+# lxml builds the tree in C; without it the packs run on BeautifulSoup
+try:
+    from lxml import html as lxml_html
+    from lxml.cssselect import CSSSelector
+except ImportError:
+    lxml_html = None
+
+PRICE_PATTERN = re.compile(r'[\d,]+(?:\.\d+)?')
+HREF_PATTERN = re.compile(r'<a\s[^>]*?href\s*=\s*["\']([^"\']+)["\']', re.IGNORECASE)
+META_TAG_PATTERN = re.compile(r'<meta\s[^>]*>', re.IGNORECASE)
+ATTRIBUTE_PATTERN = re.compile(r'([\w:-]+)\s*=\s*["\']([^"\']*)["\']')
+JSON_LD_PATTERN = re.compile(
+    r'<script[^>]*type\s*=\s*["\']application/ld\+json["\'][^>]*>(.*?)</script>',
+    re.IGNORECASE | re.DOTALL
+)
+
+# Dropped before hashing: they change between requests without the product changing
+VOLATILE_PATTERN = re.compile(r'<(script|style|noscript)\b[^>]*>.*?</\1>|<!--.*?-->', re.IGNORECASE | re.DOTALL)
+
+BLOCK_MARKERS = ('/errors/validatecaptcha', 'captcha', 'are you a human', 'access denied')
+LIST_PRICE_TYPES = ('listprice', 'strikethroughprice', 'msrp')
+
+def is_blocked(html: str) -> bool:
+    """Bot-check or captcha page - rendering it in a browser would not help"""
+    head = html[:20000].lower()
+    return any(marker in head for marker in BLOCK_MARKERS)
+
+def parse_price(text) -> Optional[float]:
+    """Parse a displayed price such as '₹1,23,999.00' (or a number) into a float"""
+    if isinstance(text, (int, float)) and not isinstance(text, bool):
+        return float(text)
+    if not text:
+        return None
+    match = PRICE_PATTERN.search(str(text))
+    if not match:
+        return None
+    try:
+        return float(match.group(0).replace(',', ''))
+    except ValueError:
+        return None
+
+def discount_percent(price: Optional[float], original_price: Optional[float]) -> int:
+    if not price or not original_price or original_price <= price:
+        return 0
+    return int(round((1 - price / original_price) * 100))
+
+def _clean(text: Optional[str]) -> Optional[str]:
+    return ' '.join(html_entities.unescape(text).split()) if text else None
+
+def meta_content(html: str, prop: str) -> Optional[str]:
+    """content of a <meta property|name=prop> tag, found without building a tree"""
+    head_end = html.find('</head>')
+    for tag in META_TAG_PATTERN.findall(html[:head_end] if head_end > 0 else html):
+        attributes = dict(ATTRIBUTE_PATTERN.findall(tag))
+        if attributes.get('property') == prop or attributes.get('name') == prop:
+            return html_entities.unescape(attributes.get('content', '')) or None
+    return None
+
+# ==============================================
+# STRUCTURED DATA
+# ==============================================
+
+def _json_ld_nodes(data) -> Iterator[Dict]:
+    if isinstance(data, list):
+        for item in data:
+            yield from _json_ld_nodes(item)
+    elif isinstance(data, dict):
+        yield data
+        if '@graph' in data:
+            yield from _json_ld_nodes(data['@graph'])
+
+def _is_product(node: Dict) -> bool:
+    node_type = node.get('@type')
+    types = node_type if isinstance(node_type, list) else [node_type]
+    return 'Product' in types
+
+def _first(value):
+    return value[0] if isinstance(value, list) and value else value
+
+def extract_json_ld(html: str) -> Dict:
+    """Product fields from schema.org Product JSON-LD (empty if there is none)"""
+
+    for block in JSON_LD_PATTERN.findall(html):
+        try:
+            data = json.loads(block.strip())
+        except ValueError:
+            continue
+        for node in _json_ld_nodes(data):
+            if not _is_product(node):
+                continue
+
+            fields = {'title': _clean(node.get('name'))}
+            image = _first(node.get('image'))
+            fields['image_url'] = image.get('url') if isinstance(image, dict) else image
+
+            offer = _first(node.get('offers')) or {}
+            if isinstance(offer, dict):
+                fields['price'] = parse_price(offer.get('price') or offer.get('lowPrice'))
+                availability = str(offer.get('availability', ''))
+                if availability:
+                    fields['in_stock'] = 'InStock' in availability or 'LimitedAvailability' in availability
+                specifications = offer.get('priceSpecification') or []
+                if not isinstance(specifications, list):
+                    specifications = [specifications]
+                for specification in specifications:
+                    if not isinstance(specification, dict):
+                        continue
+                    price_type = str(specification.get('priceType', '')).lower()
+                    if any(list_type in price_type for list_type in LIST_PRICE_TYPES):
+                        fields['original_price'] = parse_price(specification.get('price'))
+            return {key: value for key, value in fields.items() if value not in (None, '')}
+    return {}
+
+def _find_path(data, path: List[str]):
+    """Value at `path` below the first object (depth-first) that has path[0]"""
+
+    stack = [data]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, dict):
+            if path[0] in node:
+                value = node
+                for key in path:
+                    value = value.get(key) if isinstance(value, dict) else None
+                if value is not None:
+                    return value
+            stack.extend(reversed(list(node.values())))
+        elif isinstance(node, list):
+            stack.extend(reversed(node))
+    return None
+
+def extract_initial_state(html: str, state: Dict) -> Dict:
+    """Product fields from the page's initial-state JSON (window.__INITIAL_STATE__ = {...})"""
+
+    position = html.find(state['assignment'])
+    if position < 0:
+        return {}
+    start = html.find('{', position)
+    if start < 0:
+        return {}
+    try:
+        data, _ = json.JSONDecoder().raw_decode(html, start)
+    except ValueError:
+        return {}
+
+    fields = {}
+    for field, paths in state['fields'].items():
+        for path in paths:
+            value = _find_path(data, path)
+            if value is not None:
+                fields[field] = parse_price(value) if field in ('price', 'original_price') else value
+                break
+    return fields
+
+# ==============================================
+# SELECTOR PACKS
+# ==============================================
+
+class CompiledPack:
+    """A selector pack with its CSS selectors compiled to XPath once"""
+
+    def __init__(self, site: str, pack: Dict):
+        self.site = site
+        self.layout = pack.get('layout', '')
+        self.marker = pack.get('marker')
+        self.scope = pack.get('scope')
+        self.state = pack.get('state')
+        self.fields = pack['fields']
+        self.image_attrs = pack.get('image_attrs', ['src'])
+        self.selectors = {}
+        if lxml_html is not None:
+            self.selectors = {
+                field: [CSSSelector(selector) for selector in selectors]
+                for field, selectors in self.fields.items()
+            }
+
+    def applies(self, html: str) -> bool:
+        return not self.marker or self.marker in html
+
+    def scoped(self, html: str) -> str:
+        """The document from the tag containing `scope` onwards"""
+        if not self.scope:
+            return html
+        position = html.find(self.scope)
+        if position < 0:
+            return html
+        return html[html.rfind('<', 0, position + 1):]
+
+    def extract(self, html: str, backend: str = None, scoped: bool = True) -> Dict:
+        """Raw field values for this layout (strings; features as a list)"""
+
+        document = self.scoped(html) if scoped else html
+        if (backend or default_backend()) == 'lxml':
+            root = lxml_html.document_fromstring(document)
+
+            def select(field):
+                for selector in self.selectors.get(field, []):
+                    elements = selector(root)
+                    if elements:
+                        return elements
+                return []
+
+            def text(element):
+                return element.text_content()
+        else:
+            from bs4 import BeautifulSoup
+            root = BeautifulSoup(document, 'html.parser')
+
+            def select(field):
+                for selector in self.fields.get(field, []):
+                    elements = root.select(selector)
+                    if elements:
+                        return elements
+                return []
+
+            def text(element):
+                return element.get_text(' ')
+
+        fields = {}
+        for field in ('title', 'price', 'original_price', 'availability'):
+            for element in select(field):
+                value = ' '.join(text(element).split())
+                if value:
+                    fields[field] = value
+                    break
+
+        for element in select('image'):
+            image_url = next((element.get(attr) for attr in self.image_attrs if element.get(attr)), None)
+            if image_url:
+                fields['image_url'] = image_url
+                break
+
+        features = [' '.join(text(element).split()) for element in select('features')]
+        fields['features'] = [feature for feature in features if feature]
+        return fields
+
+_packs = None
+_packs_lock = threading.Lock()
+
+def compiled_packs(site: str) -> List[CompiledPack]:
+    global _packs
+    if _packs is None:
+        with _packs_lock:
+            if _packs is None:
+                _packs = {
+                    pack_site: [CompiledPack(pack_site, pack) for pack in site_packs]
+                    for pack_site, site_packs in load_selector_packs().items()
+                }
+    return _packs.get(site, [])
+
+def default_backend() -> str:
+    return 'lxml' if lxml_html is not None else 'soup'
+
+def content_hash(site: str, html: str) -> str:
+    """Hash of the part of a product page the parser reads, computed without parsing
+
+    Covers the JSON-LD blocks and the markup from the first applicable
+    pack's scope onwards, minus scripts, styles and comments. A page whose
+    hash matches the previous run's has nothing new to extract.
+    """
+
+    site_packs = compiled_packs(site)
+    pack = next((pack for pack in site_packs if pack.applies(html)), None)
+    region = pack.scoped(html) if pack is not None else html
+    digest = hashlib.sha256()
+    for block in JSON_LD_PATTERN.findall(html):
+        digest.update(' '.join(block.split()).encode('utf-8'))
+    digest.update(' '.join(VOLATILE_PATTERN.sub('', region).split()).encode('utf-8'))
+    return digest.hexdigest()
+
+# ==============================================
+# PAGE PARSERS
+# ==============================================
+
+def amazon_product_url(base_url: str, asin: str) -> str:
+    return urljoin(base_url, f'/dp/{asin}')
+
+def flipkart_product_url(base_url: str, href: str) -> str:
+    """Absolute product URL keeping only the pid query param (tracking params dropped)"""
+    absolute = urljoin(base_url, href)
+    parsed = urlparse(absolute)
+    pid = parse_qs(parsed.query).get('pid')
+    url = f"{parsed.scheme}://{parsed.netloc}{parsed.path}"
+    return f"{url}?pid={pid[0]}" if pid else url
+
+def parse_listing(site: str, html: str, base_url: str) -> List[str]:
+    """Product page URLs linked from a deal or search listing page, in page order"""
+
+    urls = []
+    seen = set()
+
+    # Only the links matter, so they are matched without building a tree
+    for href in HREF_PATTERN.findall(html):
+        href = html_entities.unescape(href)
+        if site == 'amazon':
+            asin = extract_asin(href)
+            if not asin or asin in seen:
+                continue
+            seen.add(asin)
+            urls.append(amazon_product_url(base_url, asin))
+        elif site == 'flipkart':
+            if '/p/itm' not in href:
+                continue
+            url = flipkart_product_url(base_url, href)
+            key = extract_flipkart_pid(url) or url
+            if key in seen:
+                continue
+            seen.add(key)
+            urls.append(url)
+
+    return urls
+
+def extract_product_fields(site: str, html: str, backend: str = None, structured: bool = True,
+                           scoped: bool = True) -> Tuple[Dict, List[str]]:
+    """Product fields from a page and the sources that supplied them
+
+    Structured data (JSON-LD, then initial-state JSON) is read first. A
+    tree is built only when the price or list price is still missing,
+    and by default only from the pack's scope onwards. Packs whose
+    marker is on the page are tried in order; the first that yields a
+    price wins.
+    """
+
+    fields = {}
+    sources = []
+    site_packs = compiled_packs(site)
+    packs = [pack for pack in site_packs if pack.applies(html)] or site_packs
+
+    if structured:
+        json_ld = extract_json_ld(html)
+        if json_ld:
+            fields.update(json_ld)
+            sources.append('json-ld')
+        for pack in packs:
+            if pack.state:
+                state = extract_initial_state(html, pack.state)
+                if state:
+                    for field, value in state.items():
+                        fields.setdefault(field, value)
+                    sources.append('initial-state')
+                break
+
+    if not (fields.get('title') and fields.get('price') and fields.get('original_price')):
+        for pack in packs:
+            dom = pack.extract(html, backend, scoped)
+            if not dom.get('price'):
+                continue
+            for field, value in dom.items():
+                if field in ('price', 'original_price'):
+                    value = parse_price(value)
+                if value and not fields.get(field):
+                    fields[field] = value
+            sources.append(f'selectors:{pack.layout}')
+            break
+
+    if not fields.get('title'):
+        fields['title'] = _clean(meta_content(html, 'og:title'))
+    if not fields.get('image_url'):
+        fields['image_url'] = meta_content(html, 'og:image')
+    return fields, sources
+
+def parse_product(site: str, html: str, url: str, category: str = '', **options) -> Optional[Dict]:
+    """Normalized product from a product page, or None when title or price is missing
+
+    options are passed to extract_product_fields (backend, structured, scoped).
+    """
+
+    fields, _ = extract_product_fields(site, html, **options)
+    title = fields.get('title')
+    price = parse_price(fields.get('price'))
+    if not title or not price:
+        return None
+
+    original_price = parse_price(fields.get('original_price'))
+    if not original_price or original_price < price:
+        original_price = price
+
+    in_stock = fields.get('in_stock')
+    if in_stock is None:
+        availability = (fields.get('availability') or '').lower()
+        in_stock = not any(phrase in availability for phrase in ('unavailable', 'out of stock', 'sold out'))
+
+    return {
+        'title': title,
+        'price': price,
+        'original_price': original_price,
+        'discount': discount_percent(price, original_price),
+        'image_url': fields.get('image_url') or '',
+        'url': url,
+        f'{site}_url': url,
+        'category': category,
+        'features': (fields.get('features') or [])[:5],
+        'platform': site,
+        'in_stock': in_stock,
+    }
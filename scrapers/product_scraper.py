@@ -1,25 +1,29 @@
 import requests
 from bs4 import BeautifulSoup
 import json
-import sqlite3
 from datetime import datetime
 import time
 import random
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
+import logging
 from config import Config
+from storage import get_database
+from scrapers.engine import scrape_products
+
+logger = logging.getLogger(__name__)
 
 class ProductScraper:
     def __init__(self):
+        # Headless Chrome is started by the engine's browser pool only for
+        # pages that plain HTTP cannot parse (see scrapers/browser_pool.py)
         self.setup_database()
-        self.setup_selenium()
     
     def setup_database(self):
-        conn = sqlite3.connect('../database/products.db')
+        # Raw scrape results live next to the curated products table
+        conn = get_database('master').connect()
         cursor = conn.cursor()
         
         cursor.execute('''
-            CREATE TABLE IF NOT EXISTS products (
+            CREATE TABLE IF NOT EXISTS scraped_products (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 name TEXT,
                 price REAL,
@@ -40,30 +44,46 @@ class ProductScraper:
         conn.commit()
         conn.close()
     
-    def setup_selenium(self):
-        chrome_options = Options()
-        chrome_options.add_argument("--headless")
-        chrome_options.add_argument("--no-sandbox")
-        chrome_options.add_argument("--disable-dev-shm-usage")
-        self.driver = webdriver.Chrome(options=chrome_options)
-    
     def scrape_amazon_deals(self):
         """Scrape Amazon deals"""
-        print("Scraping Amazon deals...")
-        # Add your Amazon scraping logic here
-        pass
+        logger.info("Scraping Amazon deals...")
+        return self.scrape_site('amazon')
     
     def scrape_flipkart_deals(self):
         """Scrape Flipkart deals"""
-        print("Scraping Flipkart deals...")
-        # Add your Flipkart scraping logic here
-        pass
+        logger.info("Scraping Flipkart deals...")
+        return self.scrape_site('flipkart')
+    
+    def scrape_site(self, site, limit=None):
+        """Scrape the configured listing sources of one site and store the results"""
+        sources = [source for source in Config.SCRAPE_SOURCES if source['site'] == site]
+        products = scrape_products(sources, limit)
+        self.save_products(products)
+        return products
+    
+    def save_products(self, products):
+        conn = get_database('master').connect()
+        cursor = conn.cursor()
+        cursor.executemany('''
+            INSERT INTO scraped_products (
+                name, price, original_price, discount, image_url,
+                product_url, platform, category, features
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', [
+            (product['title'], product['price'], product['original_price'], product['discount'],
+             product['image_url'], product['url'], product['platform'], product['category'],
+             json.dumps(product['features']))
+            for product in products
+        ])
+        conn.commit()
+        conn.close()
     
     def scrape_all_platforms(self):
-        """Scrape all platforms"""
-        self.scrape_amazon_deals()
-        self.scrape_flipkart_deals()
-        print("✅ Scraping completed!")
+        """Scrape all platforms in one run (shared connection pool)"""
+        products = scrape_products(limit=Config.MAX_PRODUCTS_PER_RUN)
+        self.save_products(products)
+        logger.info("✅ Scraping completed!")
+        return products
 
 if __name__ == "__main__":
     scraper = ProductScraper()
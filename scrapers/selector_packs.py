@@ -0,0 +1,136 @@
+# Selector Packs - where product fields live on each site, per page layout
+import json
+import logging
+import os
+from typing import Dict, List
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# Packs are tried in order. A pack applies when its marker occurs in the raw
+# HTML; parsing starts at `scope` (the tag containing that text), so the
+# script- and style-heavy <head> is never turned into a tree. Each field
+# lists CSS selectors in order of preference.
+#
+# 'state' describes the page's initial-state JSON: the script assignment
+# to look for and, per field, key paths searched anywhere in that JSON.
+SELECTOR_PACKS = {
+    'amazon': [
+        {
+            'layout': 'core-price-desktop',
+            'marker': 'corePriceDisplay_desktop_feature_div',
+            'scope': 'id="dp-container"',
+            'fields': {
+                'title': ['#productTitle'],
+                'price': ['#corePriceDisplay_desktop_feature_div .priceToPay .a-offscreen',
+                          '#corePriceDisplay_desktop_feature_div .a-price .a-offscreen'],
+                'original_price': ['#corePriceDisplay_desktop_feature_div .basisPrice .a-offscreen',
+                                   '#corePriceDisplay_desktop_feature_div .a-text-price .a-offscreen'],
+                'image': ['#landingImage', '#imgBlkFront'],
+                'features': ['#feature-bullets li span.a-list-item'],
+                'availability': ['#availability'],
+            },
+            'image_attrs': ['data-old-hires', 'src'],
+        },
+        {
+            'layout': 'core-price',
+            'marker': 'corePrice_feature_div',
+            'scope': 'id="dp-container"',
+            'fields': {
+                'title': ['#productTitle'],
+                'price': ['#corePrice_feature_div .priceToPay .a-offscreen',
+                          '#corePrice_feature_div .a-price .a-offscreen'],
+                'original_price': ['#corePrice_feature_div .basisPrice .a-offscreen',
+                                   '#corePrice_feature_div .a-text-price .a-offscreen'],
+                'image': ['#landingImage', '#imgBlkFront'],
+                'features': ['#feature-bullets li span.a-list-item'],
+                'availability': ['#availability'],
+            },
+            'image_attrs': ['data-old-hires', 'src'],
+        },
+        {
+            'layout': 'priceblock-legacy',
+            'marker': 'priceblock_',
+            'scope': '<body',
+            'fields': {
+                'title': ['#productTitle', '#title'],
+                'price': ['#priceblock_dealprice', '#priceblock_ourprice'],
+                'original_price': ['.priceBlockStrikePriceString'],
+                'image': ['#landingImage', '#imgBlkFront'],
+                'features': ['#feature-bullets li span.a-list-item'],
+                'availability': ['#availability'],
+            },
+            'image_attrs': ['data-old-hires', 'src'],
+        },
+    ],
+    'flipkart': [
+        {
+            'layout': '2024',
+            'marker': 'Nx9bqj',
+            'scope': '<body',
+            'state': {
+                'assignment': 'window.__INITIAL_STATE__',
+                'fields': {
+                    'price': [['pricing', 'finalPrice', 'value']],
+                    'original_price': [['pricing', 'mrp', 'value']],
+                    'features': [['keySpecs']],
+                },
+            },
+            'fields': {
+                'title': ['span.VU-ZEz', 'h1'],
+                'price': ['div.Nx9bqj.CxhGGd', 'div.Nx9bqj'],
+                'original_price': ['div.yRaY8j.A6\\+E6v', 'div.yRaY8j'],
+                'image': ['img.DByuf4'],
+                'features': ['li._7eSDEz'],
+                'availability': ['div.Z8JjpR'],
+            },
+            'image_attrs': ['src'],
+        },
+        {
+            'layout': '2022',
+            'marker': '_30jeq3',
+            'scope': '<body',
+            'state': {
+                'assignment': 'window.__INITIAL_STATE__',
+                'fields': {
+                    'price': [['pricing', 'finalPrice', 'value']],
+                    'original_price': [['pricing', 'mrp', 'value']],
+                    'features': [['keySpecs']],
+                },
+            },
+            'fields': {
+                'title': ['span.B_NuCI', 'h1'],
+                'price': ['div._30jeq3._16Jk6d', 'div._30jeq3'],
+                'original_price': ['div._3I9_wc._2p6lqe', 'div._3I9_wc'],
+                'image': ['img._396cs4', 'img._2r_T1I'],
+                'features': ['li._21Ahn-'],
+                'availability': ['div._16FRp0'],
+            },
+            'image_attrs': ['src'],
+        },
+    ],
+}
+
+def load_selector_packs() -> Dict[str, List[Dict]]:
+    """Built-in packs, with packs from Config.SELECTOR_PACKS_FILE tried first
+
+    The file holds {"site": [pack, ...]} in the format above, so a
+    changed layout can be handled without a release.
+    """
+
+    packs = {site: list(site_packs) for site, site_packs in SELECTOR_PACKS.items()}
+    path = Config.SELECTOR_PACKS_FILE
+    if not path or not os.path.exists(path):
+        return packs
+
+    try:
+        with open(path) as f:
+            overrides = json.load(f)
+    except (OSError, ValueError) as e:
+        logger.error(f"❌ Ignoring selector packs in {path}: {e}")
+        return packs
+
+    for site, site_packs in overrides.items():
+        packs[site] = list(site_packs) + packs.get(site, [])
+    logger.info(f"✅ Loaded selector packs from {path}")
+    return packs
@@ -0,0 +1,351 @@
+# Storage - database access for every component, SQLite or PostgreSQL by DATABASE_URL
+import os
+import queue
+import re
+import sqlite3
+import threading
+from typing import Dict, List, Optional, Sequence, Union
+from urllib.parse import urlparse
+from config import Config
+
+# SQLite-flavoured DDL written by the components, rewritten for PostgreSQL
+_DDL_REWRITES = [
+    (re.compile(r'\bINTEGER PRIMARY KEY AUTOINCREMENT\b', re.I), 'BIGSERIAL PRIMARY KEY'),
+    (re.compile(r'\bDATETIME\b', re.I), 'TIMESTAMP'),
+    (re.compile(r'\bREAL\b', re.I), 'DOUBLE PRECISION'),
+    (re.compile(r'\bBOOLEAN\b', re.I), 'SMALLINT'),  # keeps the 0/1 comparisons working
+    (re.compile(r'\)\s*WITHOUT ROWID', re.I), ')'),
+]
+
+# String literals are skipped when rewriting placeholders
+_PLACEHOLDER_PATTERN = re.compile(r"('(?:[^']|'')*')|(\?)|(%)")
+
+def _to_pyformat(sql: str) -> str:
+    """Rewrite qmark placeholders as psycopg2 %s, escaping literal percent signs"""
+    def replace(match):
+        if match.group(1):
+            return match.group(1).replace('%', '%%')
+        return '%s' if match.group(2) else '%%'
+    return _PLACEHOLDER_PATTERN.sub(replace, sql)
+
+def _adapt_params(params):
+    # BOOLEAN columns are SMALLINT in PostgreSQL, which does not accept True/False
+    if params is None:
+        return None
+    if isinstance(params, dict):
+        return {key: int(value) if isinstance(value, bool) else value for key, value in params.items()}
+    return [int(value) if isinstance(value, bool) else value for value in params]
+
+class Cursor:
+    """DB-API cursor that accepts the components' SQLite-style SQL on either backend"""
+
+    def __init__(self, database: 'Database', raw_cursor):
+        self.database = database
+        self.raw = raw_cursor
+
+    def execute(self, sql: str, params: Sequence = ()):
+        sql = self.database.translate(sql)
+        if sql is None:
+            return self
+        if self.database.dialect == 'postgresql':
+            self.raw.execute(sql, _adapt_params(params) or None)
+        else:
+            self.raw.execute(sql, params)
+        return self
+
+    def executemany(self, sql: str, seq_of_params):
+        sql = self.database.translate(sql)
+        if self.database.dialect == 'postgresql':
+            seq_of_params = [_adapt_params(params) for params in seq_of_params]
+        self.raw.executemany(sql, seq_of_params)
+        return self
+
+    def __iter__(self):
+        return iter(self.raw)
+
+    def __getattr__(self, name):
+        # fetchone, fetchall, fetchmany, rowcount, description...
+        return getattr(self.raw, name)
+
+class Connection:
+    """Pooled connection; close() hands it back to the pool instead of closing it"""
+
+    def __init__(self, database: 'Database', raw_connection):
+        self.database = database
+        self.raw = raw_connection
+
+    def cursor(self) -> Cursor:
+        return Cursor(self.database, self.raw.cursor())
+
+    def execute(self, sql: str, params: Sequence = ()) -> Cursor:
+        return self.cursor().execute(sql, params)
+
+    def executemany(self, sql: str, seq_of_params) -> Cursor:
+        return self.cursor().executemany(sql, seq_of_params)
+
+    def commit(self):
+        self.raw.commit()
+
+    def rollback(self):
+        self.raw.rollback()
+
+    def close(self):
+        if self.raw is not None:
+            self.database.release(self.raw)
+            self.raw = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.commit()
+        self.close()
+        return False
+
+class Database:
+    """Connection pool plus the few dialect differences the components need"""
+
+    dialect = 'sqlite'
+
+    def translate(self, sql: str) -> Optional[str]:
+        return sql
+
+    def connect(self) -> Connection:
+        raise NotImplementedError
+
+    def release(self, raw_connection):
+        raise NotImplementedError
+
+    def insert_returning_id(self, cursor: Cursor, sql: str, params: Sequence = ()) -> int:
+        """Run an INSERT into a table with an integer id and return the new id"""
+        raise NotImplementedError
+
+    def table_columns(self, cursor: Cursor, table: str) -> List[str]:
+        raise NotImplementedError
+
+    def hour_of(self, column: str) -> str:
+        """SQL expression for the two-digit hour of a timestamp column"""
+        raise NotImplementedError
+
+    def text_to_id(self, column: str) -> str:
+        """SQL expression for an integer id stored as text; never matches when not numeric"""
+        raise NotImplementedError
+
+    def table(self, component: str, name: str) -> str:
+        """Table name as seen from this database; one schema unless attached"""
+        return name
+
+class SQLiteDatabase(Database):
+    """One database file; WAL mode so readers never block the writer"""
+
+    dialect = 'sqlite'
+
+    def __init__(self, path: str, pool_size: int = 8):
+        self.path = path
+        self.pool_size = pool_size
+        self._idle = queue.LifoQueue()
+        self._pid = os.getpid()
+
+    def _create(self) -> sqlite3.Connection:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        conn.execute('PRAGMA journal_mode = WAL')
+        conn.execute('PRAGMA synchronous = NORMAL')  # durable at checkpoints; safe with WAL
+        conn.execute('PRAGMA foreign_keys = OFF')
+        return conn
+
+    def connect(self) -> Connection:
+        if self._pid != os.getpid():
+            # Connections must not cross a fork; start a fresh pool in the child
+            self._idle = queue.LifoQueue()
+            self._pid = os.getpid()
+        try:
+            raw = self._idle.get_nowait()
+        except queue.Empty:
+            raw = self._create()
+        return Connection(self, raw)
+
+    def release(self, raw_connection):
+        if raw_connection.in_transaction:
+            raw_connection.rollback()  # uncommitted work is discarded, as with sqlite3 close()
+        if self._pid == os.getpid() and self._idle.qsize() < self.pool_size:
+            self._idle.put(raw_connection)
+        else:
+            raw_connection.close()
+
+    def insert_returning_id(self, cursor: Cursor, sql: str, params: Sequence = ()) -> int:
+        cursor.execute(sql, params)
+        return cursor.lastrowid
+
+    def table_columns(self, cursor: Cursor, table: str) -> List[str]:
+        cursor.execute(f'PRAGMA table_info({table})')
+        return [row[1] for row in cursor.fetchall()]
+
+    def hour_of(self, column: str) -> str:
+        return f"strftime('%H', {column})"
+
+    def text_to_id(self, column: str) -> str:
+        return f'CAST({column} AS INTEGER)'  # 0 when not numeric; ids start at 1
+
+class AttachedSQLiteDatabase(SQLiteDatabase):
+    """Master file with the other component files ATTACHed, for cross-database reports
+
+    Read-only: reporting never writes, and query_only guards against a
+    stray statement taking the write lock on several files at once.
+    """
+
+    def __init__(self, path: str, attached: Dict[str, str], pool_size: int = 8):
+        super().__init__(path, pool_size)
+        self.attached = attached
+
+    def _create(self) -> sqlite3.Connection:
+        conn = super()._create()
+        for schema, path in self.attached.items():
+            conn.execute(f'ATTACH DATABASE ? AS {schema}', (path,))
+        conn.execute('PRAGMA query_only = ON')
+        return conn
+
+    def table(self, component: str, name: str) -> str:
+        return f'{component}.{name}' if component in self.attached else name
+
+class PostgresDatabase(Database):
+    """All components share one PostgreSQL database through a per-process pool"""
+
+    dialect = 'postgresql'
+
+    def __init__(self, url: str, pool_size: int = 8):
+        self.url = url
+        self.pool_size = pool_size
+        self._pool = None
+        self._slots = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _get_pool(self):
+        if self._pool is None or self._pid != os.getpid():
+            with self._lock:
+                if self._pool is None or self._pid != os.getpid():
+                    from psycopg2.pool import ThreadedConnectionPool  # optional dependency
+                    self._pool = ThreadedConnectionPool(1, self.pool_size, self.url)
+                    self._slots = threading.BoundedSemaphore(self.pool_size)
+                    self._pid = os.getpid()
+        return self._pool
+
+    def translate(self, sql: str) -> Optional[str]:
+        stripped = sql.strip()
+        if stripped.upper() == 'BEGIN':
+            return None  # psycopg2 opens the transaction itself
+        if stripped.upper().startswith(('CREATE TABLE', 'ALTER TABLE')):
+            for pattern, replacement in _DDL_REWRITES:
+                sql = pattern.sub(replacement, sql)
+        return _to_pyformat(sql)
+
+    def connect(self) -> Connection:
+        pool = self._get_pool()
+        self._slots.acquire()  # wait for a free connection instead of raising PoolError
+        try:
+            return Connection(self, pool.getconn())
+        except Exception:
+            self._slots.release()
+            raise
+
+    def release(self, raw_connection):
+        if self._pid != os.getpid():
+            return  # belongs to the parent process's pool
+        try:
+            raw_connection.rollback()
+        except Exception:
+            self._pool.putconn(raw_connection, close=True)
+        else:
+            self._pool.putconn(raw_connection)
+        self._slots.release()
+
+    def insert_returning_id(self, cursor: Cursor, sql: str, params: Sequence = ()) -> int:
+        cursor.execute(sql.rstrip().rstrip(';') + ' RETURNING id', params)
+        return cursor.fetchone()[0]
+
+    def table_columns(self, cursor: Cursor, table: str) -> List[str]:
+        cursor.execute('''
+            SELECT column_name FROM information_schema.columns
+            WHERE table_schema = current_schema() AND table_name = ?
+            ORDER BY ordinal_position
+        ''', (table,))
+        return [row[0] for row in cursor.fetchall()]
+
+    def hour_of(self, column: str) -> str:
+        return f"to_char({column}, 'HH24')"
+
+    def text_to_id(self, column: str) -> str:
+        return f"CASE WHEN {column} ~ '^[0-9]+$' THEN CAST({column} AS BIGINT) END"
+
+def read_dataframe(conn: Connection, sql: str, params: Sequence = ()):
+    """pandas.read_sql_query on a pooled connection, with the SQL translated"""
+    import pandas as pd  # deferred: only the reporting paths need pandas
+    return pd.read_sql_query(conn.database.translate(sql), conn.raw, params=params or None)
+
+_databases: Dict[str, Database] = {}
+_databases_lock = threading.Lock()
+
+def _create_database(name: str) -> Database:
+    url = Config.DATABASE_URL
+    scheme = urlparse(url).scheme
+
+    if scheme in ('postgres', 'postgresql'):
+        # Render hands out postgres:// URLs; libpq accepts both spellings
+        return PostgresDatabase(url, Config.DB_POOL_SIZE)
+
+    if scheme == 'sqlite':
+        if name == 'reporting':
+            attached = {component: _sqlite_path(component) for component in Config.SQLITE_FILES
+                        if component != 'master'}
+            return AttachedSQLiteDatabase(_sqlite_path('master'), attached, Config.DB_POOL_SIZE)
+        return SQLiteDatabase(_sqlite_path(name), Config.DB_POOL_SIZE)
+
+    raise ValueError(f"Unsupported DATABASE_URL scheme: {scheme!r}")
+
+def _sqlite_path(name: str) -> str:
+    # sqlite:///<directory>: each component keeps its own file in that directory
+    # (a sqlite:///name.db URL means the directory that file is in)
+    directory = Config.DATABASE_URL[len('sqlite:///'):] or '.'
+    if directory.endswith('.db'):
+        directory = os.path.dirname(directory) or '.'
+    return os.path.join(directory, Config.SQLITE_FILES[name])
+
+def get_database(name: str) -> Database:
+    """Database for a component: 'master', 'affiliate', 'earnings', 'reels' or 'pages'
+
+    With PostgreSQL every name maps to the same database; with SQLite each
+    has its own file, as before, so existing data stays where it was.
+    'reporting' is a read-only view of all of them: the master file with
+    the others ATTACHed, so joins across components run as one query.
+    """
+    if name not in _databases:
+        with _databases_lock:
+            if name not in _databases:
+                database = _create_database(name)
+                if database.dialect == 'postgresql':
+                    # One pool per process, whichever component asks first
+                    database = next(
+                        (existing for existing in _databases.values() if existing.dialect == 'postgresql'),
+                        database
+                    )
+                _databases[name] = database
+    return _databases[name]
+
+def open_database(database: Union[Database, str, None], name: str) -> Database:
+    """A component's database: the one passed in, get_database(name) for None,
+    or a SQLite file for a path (the db_path components took before DATABASE_URL)
+    """
+    if database is None:
+        return get_database(name)
+    if isinstance(database, str):
+        return SQLiteDatabase(database, Config.DB_POOL_SIZE)
+    return database
+
+def reset_databases():
+    """Forget cached pools, e.g. after changing Config.DATABASE_URL"""
+    with _databases_lock:
+        _databases.clear()
@@ -0,0 +1,129 @@
+# System Counters - O(1) dashboard and daily stats for the master system
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Union
+from storage import Database, open_database
+
+class SystemCounters:
+    """Counters kept in the master database
+
+    Every increment is written in the caller's transaction, so it is
+    stored exactly when the product or post it counts is, and a record
+    rolled back to its savepoint takes its increments with it. Reads go
+    to the stored rows - a handful of primary-key lookups - so every
+    process sees the same committed values. Uptime is accumulated per
+    day and checkpointed into system_stats.
+    """
+
+    TOTAL_COUNTERS = ('total_products', 'posted_instagram', 'posted_telegram', 'posted_discord')
+    DAILY_COUNTERS = ('products_processed', 'posts_created')
+
+    def __init__(self, database: Union[Database, str] = None):
+        self.db = open_database(database, 'master')
+        self.started_at = time.time()
+        self._last_checkpoint = self.started_at
+        self._lock = threading.Lock()
+        self.setup_database()
+
+    def setup_database(self):
+        """Create the totals table and seed it once from existing products"""
+        conn = self.db.connect()
+        cursor = conn.cursor()
+
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS system_counters (
+                name TEXT PRIMARY KEY,
+                value INTEGER NOT NULL DEFAULT 0
+            )
+        ''')
+
+        cursor.execute('SELECT 1 FROM system_counters LIMIT 1')
+        if cursor.fetchone() is None:
+            # Databases created before the counters existed need one full scan
+            cursor.execute('''
+                SELECT
+                    COUNT(*),
+                    SUM(CASE WHEN posted_instagram = 1 THEN 1 ELSE 0 END),
+                    SUM(CASE WHEN posted_telegram = 1 THEN 1 ELSE 0 END),
+                    SUM(CASE WHEN posted_discord = 1 THEN 1 ELSE 0 END)
+                FROM products
+            ''')
+            row = cursor.fetchone()
+            cursor.executemany('''
+                INSERT INTO system_counters (name, value) VALUES (?, ?)
+            ''', [(name, value or 0) for name, value in zip(self.TOTAL_COUNTERS, row)])
+
+        conn.commit()
+        conn.close()
+
+    def increment(self, cursor, name: str, amount: int = 1):
+        """Increment a counter inside the caller's open transaction"""
+
+        if name in self.TOTAL_COUNTERS:
+            cursor.execute('''
+                INSERT INTO system_counters (name, value) VALUES (?, ?)
+                ON CONFLICT (name) DO UPDATE SET value = system_counters.value + excluded.value
+            ''', (name, amount))
+
+        elif name in self.DAILY_COUNTERS:
+            today = datetime.now().date().isoformat()
+            cursor.execute(f'''
+                INSERT INTO system_stats (date, {name}) VALUES (?, ?)
+                ON CONFLICT (date) DO UPDATE SET {name} = system_stats.{name} + excluded.{name}
+            ''', (today, amount))
+
+        else:
+            raise KeyError(f"Unknown system counter: {name}")
+
+    def get_totals(self, cursor=None) -> Dict:
+        """Committed totals, read on `cursor` when the caller already has a connection open"""
+        conn = None
+        if cursor is None:
+            conn = self.db.connect()
+            cursor = conn.cursor()
+        cursor.execute('SELECT name, value FROM system_counters')
+        stored = dict(cursor.fetchall())
+        if conn is not None:
+            conn.close()
+        return {name: stored.get(name) or 0 for name in self.TOTAL_COUNTERS}
+
+    def get_daily(self) -> Dict:
+        """Today's committed counters"""
+        conn = self.db.connect()
+        cursor = conn.cursor()
+        cursor.execute(f'''
+            SELECT {', '.join(self.DAILY_COUNTERS)} FROM system_stats WHERE date = ?
+        ''', (datetime.now().date().isoformat(),))
+        row = cursor.fetchone() or (0, 0)
+        conn.close()
+        return dict(zip(self.DAILY_COUNTERS, (value or 0 for value in row)))
+
+    def uptime_hours(self) -> float:
+        """Hours since this process started"""
+        return (time.time() - self.started_at) / 3600
+
+    def checkpoint(self):
+        """Add uptime accrued since the last checkpoint to system_stats"""
+
+        with self._lock:
+            start, end = self._last_checkpoint, time.time()
+            self._last_checkpoint = end
+
+        # Split the interval at midnight so each day gets its own share
+        increments = []
+        while start < end:
+            day = datetime.fromtimestamp(start).date()
+            next_midnight = datetime.combine(day + timedelta(days=1), datetime.min.time()).timestamp()
+            segment_end = min(end, next_midnight)
+            increments.append((day.isoformat(), (segment_end - start) / 3600))
+            start = segment_end
+
+        conn = self.db.connect()
+        conn.executemany('''
+            INSERT INTO system_stats (date, system_uptime_hours) VALUES (?, ?)
+            ON CONFLICT (date) DO UPDATE SET
+                system_uptime_hours = system_stats.system_uptime_hours + excluded.system_uptime_hours
+        ''', increments)
+        conn.commit()
+        conn.close()
@@ -0,0 +1,42 @@
+# Test setup - repo modules on the path; databases, logs and caches in temporary directories
+import os
+import sys
+import tempfile
+
+import pytest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURES = os.path.join(REPO_DIR, 'benchmarks', 'fixtures')
+
+sys.path.insert(0, REPO_DIR)
+sys.path.insert(0, os.path.join(REPO_DIR, 'benchmarks'))
+
+from config import Config  # noqa: E402
+
+# Importing main configures file logging; none of it should land in the repo
+_scratch = tempfile.mkdtemp(prefix='sastasmart-tests-')
+Config.LOGS_DIR = os.path.join(_scratch, 'logs')
+Config.TRACE_DIR = os.path.join(_scratch, 'traces')
+Config.IMAGE_CACHE_DIR = os.path.join(_scratch, 'images')
+Config.FEED_DIR = os.path.join(_scratch, 'feeds')
+
+@pytest.fixture
+def database(tmp_path, monkeypatch):
+    """Every component database as a SQLite file under tmp_path"""
+    from storage import reset_databases
+
+    monkeypatch.setattr(Config, 'DATABASE_URL', f"sqlite:///{tmp_path}")
+    reset_databases()
+    yield tmp_path
+    reset_databases()
+
+@pytest.fixture
+def master(database, monkeypatch):
+    """A fresh SastaSmartMaster on the temporary databases, also the one the API routes use"""
+    pytest.importorskip('fastapi')  # main.py exits without it
+    import main
+
+    monkeypatch.setattr(main, '_master', None)
+    monkeypatch.setattr(Config, 'IMAGE_PREFETCH', False)
+    yield main.get_master()
+    main._master = None
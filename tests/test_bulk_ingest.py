@@ -0,0 +1,82 @@
+import asyncio
+import json
+
+import pytest
+
+pytest.importorskip('fastapi')
+
+import main  # noqa: E402
+from config import Config  # noqa: E402
+from image_cache import allowed_image_url  # noqa: E402
+
+PRODUCT = {
+    'title': 'Samsung Galaxy M34 5G (Midnight Blue, 6GB, 128GB Storage)',
+    'price': 15999,
+    'original_price': 24499,
+    'url': 'https://www.amazon.in/dp/B0CHX1W1XY',
+    'amazon_url': 'https://www.amazon.in/dp/B0CHX1W1XY',
+    'image_url': 'https://m.media-amazon.com/images/I/91Xk0RwTjWL._SL1500_.jpg',
+    'platform': 'amazon',
+}
+
+def post_bulk(lines, headers=()):
+    """Run the ASGI endpoint on an NDJSON body; (status, response lines)"""
+
+    scope = {'type': 'http', 'method': 'POST', 'path': '/products:bulk',
+             'headers': [(name.lower().encode(), value.encode()) for name, value in headers]}
+    body = ''.join(json.dumps(line) + '\n' for line in lines).encode()
+    messages = [{'type': 'http.request', 'body': body, 'more_body': False}]
+    sent = []
+
+    async def receive():
+        return messages.pop(0) if messages else {'type': 'http.disconnect'}
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(main.BulkProductIngestEndpoint()(scope, receive, send))
+    body = b''.join(message.get('body', b'') for message in sent[1:])
+    return sent[0]['status'], [json.loads(line) for line in body.decode().splitlines()]
+
+def stored_products():
+    conn = main.get_master().db.connect()
+    try:
+        return conn.execute('SELECT COUNT(*) FROM products').fetchone()[0]
+    finally:
+        conn.close()
+
+def test_bulk_ingest_disabled_without_a_token(master, monkeypatch):
+    monkeypatch.setattr(Config, 'INGEST_TOKEN', '')
+    status, body = post_bulk([PRODUCT])
+    assert status == 403
+    assert stored_products() == 0
+
+@pytest.mark.parametrize('headers', [(), [('X-Ingest-Token', 'wrong')], [('X-Admin-Token', 'partner-secret')]])
+def test_bulk_ingest_rejects_a_missing_or_wrong_token(master, monkeypatch, headers):
+    monkeypatch.setattr(Config, 'INGEST_TOKEN', 'partner-secret')
+    status, body = post_bulk([PRODUCT], headers)
+    assert status == 401
+    assert body == [{'detail': 'invalid ingest token'}]
+    assert stored_products() == 0
+
+def test_bulk_ingest_with_the_token(master, monkeypatch):
+    monkeypatch.setattr(Config, 'INGEST_TOKEN', 'partner-secret')
+    status, body = post_bulk([PRODUCT, {'title': 'no price'}], [('X-Ingest-Token', 'partner-secret')])
+    assert status == 200
+    assert body[-1]['summary']['new'] == 1
+    assert body[-1]['summary']['invalid'] == 1
+    assert stored_products() == 1
+
+@pytest.mark.parametrize('url, allowed', [
+    ('https://m.media-amazon.com/images/I/91Xk0RwTjWL._SL1500_.jpg', True),
+    ('https://images-na.ssl-images-amazon.com/images/I/61P6DgVXOZL.jpg', True),
+    ('https://rukminim2.flixcart.com/image/416/416/kettle.jpeg', True),
+    ('http://169.254.169.254/latest/meta-data/', False),
+    ('http://localhost:8000/metrics', False),
+    ('https://evilflixcart.com/image.jpg', False),
+    ('https://m.media-amazon.com.attacker.example/x.jpg', False),
+    ('file:///etc/passwd', False),
+    ('ftp://m.media-amazon.com/x.jpg', False),
+])
+def test_image_hosts(url, allowed):
+    assert allowed_image_url(url) is allowed
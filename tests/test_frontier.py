@@ -0,0 +1,35 @@
+# Crawl frontier revisit intervals - within the configured bounds, backing off gradually
+import pytest
+
+from config import Config
+from scrapers.frontier import FrontierEntry, next_interval
+
+def entry(interval, visits, changes, observed):
+    return FrontierEntry('amazon:B0CHX1W1XY', 'https://www.amazon.in/dp/B0CHX1W1XY', 'product', 'amazon',
+                         interval=interval, visits=visits, changes=changes, observed=observed)
+
+@pytest.mark.parametrize('visits, changes', [(10, 10), (10, 5), (10, 1), (10, 0), (0, 0)])
+@pytest.mark.parametrize('interval', [60, 600, 3600, 21600, 86400])
+def test_interval_stays_within_the_bounds(interval, visits, changes):
+    result = next_interval(entry(interval, visits, changes, observed=visits * interval))
+    assert Config.FRONTIER_MIN_INTERVAL <= result <= Config.FRONTIER_MAX_INTERVAL
+
+def test_price_changing_on_every_visit_goes_to_the_minimum():
+    assert next_interval(entry(1800, 10, 10, observed=10 * 1800)) == Config.FRONTIER_MIN_INTERVAL
+
+@pytest.mark.parametrize('changes', [0, 0.2])
+def test_quiet_page_backs_off_by_at_most_the_backoff_factor(changes):
+    interval = Config.FRONTIER_MIN_INTERVAL
+    for _ in range(30):
+        # Few or no changes over visits made at the last interval
+        previous = interval
+        interval = next_interval(entry(previous, 20, changes, observed=20 * previous))
+        assert interval <= max(previous * Config.FRONTIER_BACKOFF, Config.FRONTIER_MIN_INTERVAL)
+    assert interval == Config.FRONTIER_MAX_INTERVAL  # and does get there
+
+def test_rate_sets_visits_per_expected_change(monkeypatch):
+    monkeypatch.setattr(Config, 'FRONTIER_MAX_INTERVAL', 10 ** 9)
+    monkeypatch.setattr(Config, 'FRONTIER_MIN_INTERVAL', 1)
+    quiet = entry(10 ** 6, 20, 2, observed=20 * 3600)
+    rate = quiet.change_rate()
+    assert next_interval(quiet) == pytest.approx(1 / (Config.FRONTIER_VISITS_PER_CHANGE * rate))
@@ -0,0 +1,68 @@
+# Per-host AIMD windows - Retry-After, and windows kept between runs
+import threading
+import time
+from email.utils import formatdate
+
+import pytest
+
+pytest.importorskip('aiohttp')
+
+from host_throttling import StubMarketplace, run
+
+@pytest.fixture
+def stub():
+    server = StubMarketplace(rate=10, capacity=8, latency=0.01, captcha=False, retry_after=1)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server, f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+
+@pytest.mark.parametrize('value, expected', [
+    ('3', 3.0),
+    (' 120 ', 120.0),
+    ('', None),
+    ('soon', None),
+])
+def test_parse_retry_after_seconds(value, expected):
+    from scrapers.host_limits import parse_retry_after
+
+    assert parse_retry_after(value) == expected
+
+def test_parse_retry_after_http_date():
+    from scrapers.host_limits import parse_retry_after
+
+    now = time.time()
+    assert parse_retry_after(formatdate(now + 30, usegmt=True), now=now) == pytest.approx(30, abs=1)
+    assert parse_retry_after(formatdate(now - 30, usegmt=True), now=now) == 0.0
+
+def test_throttled_response_cuts_the_window_and_blocks_the_host(database):
+    from config import Config
+    from scrapers.host_limits import HostLimit
+
+    limit = HostLimit('www.amazon.in', limit=8)
+    limit.in_flight = 1
+    limit.release('429', 0.05, retry_after=2)
+
+    assert limit.limit == pytest.approx(8 * Config.HOST_DECREASE_FACTOR)
+    assert limit.ceiling == 8
+    assert limit.blocked_until == pytest.approx(time.time() + 2, abs=0.5)
+
+def test_no_request_reaches_the_host_during_its_retry_after(database, stub):
+    from scrapers.host_limits import HostLimits
+
+    server, base_url = stub
+    report = run(server, base_url, pages=15, limits=HostLimits())
+
+    assert report['responses']['429'] > 0  # the stub's rate limit was reached
+    assert report['early_requests'] == 0
+    assert report['end_window'] < report['start_window']
+
+def test_next_run_starts_from_the_stored_window(database, stub):
+    from scrapers.host_limits import HostLimits
+
+    server, base_url = stub
+    first = run(server, base_url, pages=10, limits=HostLimits())
+    assert first['end_window'] != first['start_window']
+    # A fresh instance, as in the next scheduler run, reads the window back from the database
+    second = run(server, base_url, pages=5, limits=HostLimits())
+
+    assert second['start_window'] == pytest.approx(first['end_window'], abs=0.01)
@@ -0,0 +1,80 @@
+import pytest
+
+from config import Config
+from ingest_pipeline import ProductIngestPipeline
+
+def deal(n: int, price: float = 999, original_price: float = 1999, **fields):
+    url = f"https://www.amazon.in/dp/B0TEST{n:04d}"
+    return dict({'title': f"Test Product {n} (Black, 128 GB)", 'price': price, 'original_price': original_price,
+                 'url': url, 'amazon_url': url, 'platform': 'amazon', 'category': 'electronics',
+                 'in_stock': True}, **fields)
+
+def run(master, products):
+    return ProductIngestPipeline(master, source=products).run()
+
+def stored(master, n: int):
+    conn = master.db.connect()
+    row = conn.execute('SELECT id, price FROM products WHERE amazon_url = ?',
+                       (f"https://www.amazon.in/dp/B0TEST{n:04d}",)).fetchone()
+    conn.close()
+    return row
+
+def posts(master, product_id: int, status: str = 'pending') -> int:
+    conn = master.db.connect()
+    count = conn.execute('SELECT COUNT(*) FROM posting_queue WHERE product_id = ? AND status = ?',
+                         (product_id, status)).fetchone()[0]
+    conn.close()
+    return count
+
+def test_products_are_stored_with_their_posts(master):
+    outcomes = run(master, [deal(1), deal(2)])
+    assert outcomes['new'] == 2
+    for n in (1, 2):
+        assert posts(master, stored(master, n)[0]) > 0
+
+def test_a_product_whose_posts_fail_is_not_stored(master, monkeypatch):
+    run(master, [deal(1)])
+    schedule = master.schedule_product_posts
+
+    def failing(product_id, product_data, cursor=None):
+        if product_data['title'].startswith('Test Product 1 '):
+            raise RuntimeError('posting queue unavailable')
+        return schedule(product_id, product_data, cursor)
+
+    monkeypatch.setattr(master, 'schedule_product_posts', failing)
+    outcomes = run(master, [deal(1, price=799), deal(2)])
+    assert outcomes['error'] == 1 and outcomes['new'] == 1
+    # The price drop was rolled back with its posts...
+    assert stored(master, 1)[1] == 999
+    assert posts(master, stored(master, 2)[0]) > 0
+
+    # ...so the next run still sees it as a change and posts it
+    monkeypatch.setattr(master, 'schedule_product_posts', schedule)
+    outcomes = run(master, [deal(1, price=799)])
+    assert outcomes['updated'] == 1
+    product_id, price = stored(master, 1)
+    assert price == 799
+    assert posts(master, product_id, 'superseded') > 0 and posts(master, product_id) > 0
+
+def test_new_products_below_the_discount_are_filtered(master):
+    outcomes = run(master, [deal(1, price=1900, original_price=1999)])
+    assert outcomes['filtered'] == 1
+    assert stored(master, 1) is None
+
+def test_a_stored_deal_that_lapses_is_updated_and_its_posts_superseded(master):
+    run(master, [deal(1)])
+    product_id = stored(master, 1)[0]
+    pending = posts(master, product_id)
+    assert pending > 0
+
+    outcomes = run(master, [deal(1, price=1900, original_price=1999)])
+    assert outcomes['updated'] == 1 and outcomes['filtered'] == 0
+    assert stored(master, 1)[1] == 1900
+    assert posts(master, product_id) == 0
+    assert posts(master, product_id, 'superseded') == pending
+
+def test_unchanged_products_below_the_discount_are_still_seen(master, monkeypatch):
+    run(master, [deal(1)])
+    monkeypatch.setattr(Config, 'MIN_DISCOUNT_PERCENT', 90)
+    outcomes = run(master, [deal(1)])
+    assert outcomes['unchanged'] == 1 and outcomes['filtered'] == 0
@@ -0,0 +1,52 @@
+# Log file ownership - one writing (and rotating) process per file
+import logging
+import multiprocessing
+import os
+
+import pytest
+
+import logging_setup
+
+pytestmark = pytest.mark.skipif(logging_setup.fcntl is None, reason='needs flock')
+
+def test_second_claim_gets_the_next_file_and_a_released_one_is_reused(tmp_path):
+    log_file = str(tmp_path / 'app.log')
+
+    first, first_fd = logging_setup.claim_log_file(log_file)
+    second, second_fd = logging_setup.claim_log_file(log_file)
+    assert first == log_file
+    assert second == str(tmp_path / 'app.1.log')
+
+    os.close(first_fd)
+    again, again_fd = logging_setup.claim_log_file(log_file)
+    assert again == log_file
+    os.close(second_fd)
+    os.close(again_fd)
+
+def _log_from_worker(log_file, ready, done):
+    logging_setup.configure_logging(log_file=log_file, console=False, json_format=False)
+    logging.getLogger('worker').warning('hello from %d', os.getpid())
+    ready.set()
+    done.wait(30)  # hold the file until every worker has claimed one
+    logging_setup.shutdown_logging()
+
+def test_each_worker_process_writes_its_own_file(tmp_path):
+    log_file = str(tmp_path / 'app.log')
+    context = multiprocessing.get_context('fork')
+    done = context.Event()
+    workers = []
+    for _ in range(3):
+        ready = context.Event()
+        worker = context.Process(target=_log_from_worker, args=(log_file, ready, done))
+        worker.start()
+        assert ready.wait(30)
+        workers.append(worker)
+    done.set()
+    for worker in workers:
+        worker.join(30)
+
+    files = sorted(name for name in os.listdir(tmp_path) if name.endswith('.log'))
+    assert files == ['app.1.log', 'app.2.log', 'app.log']
+    for worker in workers:
+        writes = [name for name in files if f"hello from {worker.pid}" in (tmp_path / name).read_text()]
+        assert len(writes) == 1
@@ -0,0 +1,48 @@
+import threading
+
+from metrics import Counter, Histogram
+
+def run_threads(count: int, target):
+    threads = [threading.Thread(target=target) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+def test_shards_of_finished_threads_are_folded_in():
+    counter = Counter('test_items_total', 'items', ['stage'])
+    histogram = Histogram('test_seconds', 'seconds', buckets=(0.1, 1))
+
+    def work():
+        for _ in range(100):
+            counter.inc(stage='persist')
+            histogram.observe(0.5)
+
+    for _ in range(5):  # like five ingest runs, each with fresh stage threads
+        run_threads(20, work)
+
+    assert len(counter._shards) == 1 and len(histogram._shards) == 1
+    assert counter.collect() == {('persist',): 10000}
+    counts, total, count = histogram.collect()[()]
+    assert counts == [0, 10000, 0] and count == 10000 and total == 5000
+
+def test_live_threads_keep_their_own_shards():
+    counter = Counter('test_live_total', 'items')
+    started, release = threading.Barrier(4), threading.Event()
+
+    def work():
+        counter.inc(2)
+        started.wait()
+        release.wait()
+
+    threads = [threading.Thread(target=work) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    started.wait()
+    assert len(counter._shards) == 4 and counter.collect() == {(): 6}
+    release.set()
+    for thread in threads:
+        thread.join()
+    counter.inc()
+    assert counter.collect() == {(): 7}
+    assert len(counter._shards) == 2  # the retired shard and this thread's
@@ -0,0 +1,64 @@
+# Posting queue status changes and the posting_queue_stats counters kept beside them
+PRODUCT = {
+    'title': 'boAt Airdopes 141 Bluetooth TWS Earbuds with 42H Playtime (Bold Black)',
+    'price': 1099,
+    'original_price': 4490,
+    'url': 'https://www.amazon.in/dp/B09N3ZNHTY',
+    'amazon_url': 'https://www.amazon.in/dp/B09N3ZNHTY',
+    'platform': 'amazon',
+}
+
+def pending_rows(master):
+    conn = master.db.connect()
+    cursor = conn.cursor()
+    cursor.execute("SELECT id, platform FROM posting_queue WHERE status = 'pending' ORDER BY id")
+    rows = cursor.fetchall()
+    conn.close()
+    return rows
+
+def queue_stats(master):
+    conn = master.db.connect()
+    cursor = conn.cursor()
+    cursor.execute('SELECT status, platform, count FROM posting_queue_stats')
+    stats = {(status, platform): count for status, platform, count in cursor.fetchall()}
+    conn.close()
+    return stats
+
+def test_a_row_finished_twice_is_counted_once(master):
+    product_id, _ = master.upsert_product(PRODUCT)
+    master.schedule_product_posts(product_id, PRODUCT)
+    queue_id, platform = pending_rows(master)[0]
+    pending = queue_stats(master)[('pending', platform)]
+
+    conn = master.db.connect()
+    cursor = conn.cursor()
+    cursor.execute('BEGIN')
+    assert master._set_queue_status(cursor, queue_id, platform, 'completed')
+    # A second processor finishing the same row, or the row re-marked
+    assert not master._set_queue_status(cursor, queue_id, platform, 'completed')
+    assert not master._set_queue_status(cursor, queue_id, platform, 'failed')
+    conn.commit()
+    conn.close()
+
+    stats = queue_stats(master)
+    assert stats[('pending', platform)] == pending - 1
+    assert stats[('completed', platform)] == 1
+    assert stats.get(('failed', platform), 0) == 0
+
+def test_queue_depth_gauge_counts_only_pending_rows(master):
+    import metrics
+
+    product_id, _ = master.upsert_product(PRODUCT)
+    master.schedule_product_posts(product_id, PRODUCT)
+    rows = pending_rows(master)
+    queue_id, platform = rows[0]
+    conn = master.db.connect()
+    cursor = conn.cursor()
+    cursor.execute('BEGIN')
+    master._set_queue_status(cursor, queue_id, platform, 'completed')
+    conn.commit()
+    conn.close()
+
+    depth = metrics.QUEUE_DEPTH.collect()
+    assert sum(depth.values()) == len(rows) - 1
+    assert depth[(platform,)] == sum(1 for _, other in rows[1:] if other == platform)
@@ -0,0 +1,106 @@
+# Price history - rolling aggregates against a brute-force recount, and the deal assessment
+import asyncio
+import random
+import time
+
+import pytest
+
+from price_history import PriceHistory
+from storage import get_database
+
+DAY = 86400
+
+def brute_force(observations, product_id, days, now):
+    prices = sorted(round(price * 100) for pid, observed_at, price in observations
+                    if pid == product_id and observed_at > now - days * DAY)
+    if not prices:
+        return None
+    count = len(prices)
+    return {'min': prices[0] / 100, 'max': prices[-1] / 100,
+            'median': (prices[(count - 1) // 2] + prices[count // 2]) / 2 / 100, 'count': count}
+
+@pytest.fixture
+def history(database):
+    return PriceHistory(get_database('master'), windows_days=[7, 30], cache_size=2)
+
+def test_windows_match_a_recount_as_observations_arrive(history):
+    rng = random.Random(4)
+    now = int(time.time())
+    observations = [(product_id, now - rng.randrange(40 * DAY), rng.choice([499, 549.5, 599, 649, 699]))
+                    for product_id in range(1, 6) for _ in range(400)]
+    history.record_many(observations)
+
+    for product_id in range(1, 6):
+        for days in (7, 30, 14):  # 14 is not a cached window and goes to the table
+            assert history.window_stats(product_id, days) == brute_force(observations, product_id, days, now)
+
+    # New observations update cached windows in place; an older one forces a rebuild
+    late = [(1, now + 1, 459.0), (1, now - 3 * DAY, 399.0), (2, now + 1, 999.0)]
+    for product_id, observed_at, price in late:
+        history.record(product_id, price, observed_at)
+    observations += late
+    now = int(time.time()) + 1
+    for product_id in (1, 2):
+        for days in (7, 30):
+            assert history.window_stats(product_id, days) == brute_force(observations, product_id, days, now)
+
+def test_rolled_back_observation_leaves_the_windows_alone(history):
+    now = int(time.time())
+    observations = [(1, now - day * DAY, price) for day, price in [(20, 1999), (9, 1899), (3, 1949), (1, 1899)]]
+    history.record_many(observations)
+    assert history.window_stats(1, 30) == brute_force(observations, 1, 30, now)  # windows now cached
+
+    conn = history.db.connect()
+    cursor = conn.cursor()
+    cursor.execute('BEGIN')
+    cursor.execute('SAVEPOINT ingest_record')
+    history.record(1, 999, now, cursor)
+    cursor.execute('ROLLBACK TO SAVEPOINT ingest_record')
+    cursor.execute('RELEASE SAVEPOINT ingest_record')
+    history.record(1, 1849, now + 1, cursor)  # later than the rolled-back one, so applied in order
+    conn.commit()
+    conn.close()
+
+    observations.append((1, now + 1, 1849))
+    now = int(time.time())
+    for days in (7, 30):
+        assert history.window_stats(1, days) == brute_force(observations, 1, days, now)
+    assert history.is_lowest_price(1, 1849)
+    assert not history.is_lowest_price(1, 1850)
+
+def test_assess_deal_against_the_products_own_history(history):
+    now = time.time()
+    history.record_many([(1, now - day * DAY, price) for day, price in
+                         [(25, 1999), (20, 1899), (12, 1999), (5, 1799), (2, 1899)]])
+
+    assert history.is_lowest_price(1, 1799, days=7)
+    assert not history.is_lowest_price(1, 1800, days=7)
+    assert history.all_time_low(1) == 1799
+
+    deal = history.assess_deal(1, 1499, original_price=3999)
+    assert deal['is_lowest_7_days'] and deal['is_lowest_30_days']
+    assert deal['real_discount_percent'] == pytest.approx((1899 - 1499) / 1899 * 100, abs=0.01)
+    assert deal['mrp_inflated']  # never sold anywhere near 3999
+    assert not history.assess_deal(1, 1899, original_price=1999)['mrp_inflated']
+    assert history.assess_deal(2, 999) == {'has_history': False}
+
+def test_price_history_route_assesses_the_stored_price(master):
+    fastapi = pytest.importorskip('fastapi')
+    import main
+
+    product_id, _ = master.upsert_product({
+        'title': 'Prestige Iris 750 Watt Mixer Grinder with 3 Stainless Steel Jars',
+        'price': 2499, 'original_price': 5295, 'url': 'https://www.amazon.in/dp/B0BDRVFDKP',
+        'amazon_url': 'https://www.amazon.in/dp/B0BDRVFDKP', 'platform': 'amazon',
+    })
+    now = time.time()
+    master.price_history.record_many([(product_id, now - 10 * DAY, 2999), (product_id, now - 20 * DAY, 3199)])
+
+    assessment = asyncio.run(main.product_price_history(product_id))
+    assert assessment['price'] == 2499
+    assert assessment['is_lowest_30_days']
+    assert assessment['mrp_inflated']
+    assert assessment['all_time_low'] == 2499
+
+    with pytest.raises(fastapi.HTTPException):
+        asyncio.run(main.product_price_history(product_id + 1))
@@ -0,0 +1,75 @@
+# Affiliate feeds - mapping the fixture feeds, delta sync and resume
+import json
+import shutil
+
+import pytest
+
+from feed_ingest import FIXTURES, CountingPipeline, check_fixtures, synthetic_records, write_json_feed
+
+def test_fixture_feeds_map_to_the_expected_products():
+    failures = []
+    check_fixtures(failures)
+    assert failures == []
+
+@pytest.fixture
+def flipkart_feed(database, tmp_path):
+    path = tmp_path / 'flipkart_feed.json'
+    shutil.copy(f"{FIXTURES}/flipkart_feed.json", path)
+    return {'name': 'flipkart', 'network': 'flipkart', 'path': str(path)}
+
+def reprice(path, product_id, amount):
+    with open(path, encoding='utf-8') as f:
+        feed = json.load(f)
+    for record in feed['productInfoList']:
+        info = record['productBaseInfoV1']
+        if info['productId'] == product_id:
+            info.pop('flipkartSpecialPrice', None)
+            info['flipkartSellingPrice'] = {'amount': amount, 'currency': 'INR'}
+            url = info['productUrl']
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(feed, f)
+    return url
+
+def test_delta_sync_sends_only_changed_items(flipkart_feed):
+    from product_feeds import FeedIngester
+
+    first = CountingPipeline(keep=True)
+    stats = FeedIngester(first).ingest(flipkart_feed)
+    assert first.products == stats['changed'] == 4
+
+    url = reprice(flipkart_feed['path'], 'ACNGZ4ZGFHZ4Z9HK', 1234.0)
+    second = CountingPipeline(keep=True)
+    stats = FeedIngester(second).ingest(flipkart_feed)
+
+    assert second.seen == [url]
+    assert stats['unchanged'] == 3
+
+def test_unchanged_feed_file_is_not_read_again(flipkart_feed):
+    from product_feeds import FeedIngester
+
+    FeedIngester(CountingPipeline()).ingest(flipkart_feed)
+    pipeline = CountingPipeline()
+    stats = FeedIngester(pipeline).ingest(flipkart_feed)
+
+    assert stats.get('unchanged_file')
+    assert pipeline.calls == 0
+
+def test_stopped_ingest_resumes_at_its_checkpoint(database, tmp_path, monkeypatch):
+    from config import Config
+    from product_feeds import FeedIngester
+
+    monkeypatch.setattr(Config, 'FEED_SEGMENT_ITEMS', 10)
+    path = tmp_path / 'feed.json'
+    write_json_feed(str(path), synthetic_records(55))
+    feed = {'name': 'synthetic', 'network': 'flipkart', 'path': str(path)}
+
+    first = CountingPipeline(fail_after=2, keep=True)
+    with pytest.raises(KeyboardInterrupt):
+        FeedIngester(first).ingest(feed)
+    second = CountingPipeline(keep=True)
+    stats = FeedIngester(second).ingest(feed)
+
+    assert stats['resumed_at'] > 0
+    assert set(first.seen) | set(second.seen) == {f"https://dl.flipkart.com/dl/item/p/itm{n:012x}?pid=SYN{n:09d}"
+                                                  for n in range(55)}
+    assert len(first.seen) + len(second.seen) - 55 <= 10  # at most one segment redone
@@ -0,0 +1,96 @@
+# Cross-marketplace matching - the vetoes that keep a different item from suppressing a post
+import pytest
+
+from config import Config
+from product_matching import ACCESSORY_WORDS, title_similarity, title_tokens
+
+M34_AMAZON = ('Samsung Galaxy M34 5G (Midnight Blue, 6GB, 128GB Storage) | 120Hz sAMOLED Display | '
+              '50MP Triple No Shake Cam | 6000 mAh Battery')
+M34_FLIPKART = 'SAMSUNG Galaxy M34 5G (Midnight Blue, 128 GB) (6 GB RAM)'
+AIRDOPES_AMAZON = 'boAt Airdopes 141 Bluetooth TWS Earbuds with 42H Playtime, Low Latency Mode for Gaming, ENx Tech (Bold Black)'
+TV_AMAZON = 'Samsung 108 cm (43 inches) Crystal iSmart 4K Ultra HD Smart LED TV UA43CUE60AKLXL (Black)'
+
+def similarity(left, right):
+    return title_similarity(title_tokens(left), title_tokens(right))
+
+@pytest.mark.parametrize('amazon, flipkart', [
+    (M34_AMAZON, M34_FLIPKART),
+    (AIRDOPES_AMAZON, 'boAt Airdopes 141 with 42 Hours Playback, Beast Mode & ENx Tech Bluetooth Headset '
+                      '(Bold Black, True Wireless)'),
+    (TV_AMAZON, 'SAMSUNG Crystal iSmart 108 cm (43 inch) Ultra HD (4K) LED Smart Tizen TV 2023 Edition '
+                '(UA43CUE60AKLXL)'),
+])
+def test_same_item_on_both_marketplaces_matches(amazon, flipkart):
+    assert similarity(amazon, flipkart) >= Config.MATCH_MIN_SIMILARITY
+
+@pytest.mark.parametrize('amazon, flipkart', [
+    # 8 GB RAM against 6 GB
+    (M34_AMAZON.replace('6GB', '8GB'), M34_FLIPKART),
+    # 55 against 43 inches (and a different model number)
+    ('Samsung 138 cm (55 inches) Crystal iSmart 4K Ultra HD Smart LED TV UA55CUE60AKLXL (Black)', TV_AMAZON),
+    # 256 GB against 128 GB, nothing else differs
+    (M34_AMAZON.replace('128GB', '256GB'), M34_FLIPKART),
+])
+def test_size_mismatch_vetoes(amazon, flipkart):
+    assert similarity(amazon, flipkart) == 0.0
+
+@pytest.mark.parametrize('amazon, flipkart', [
+    (AIRDOPES_AMAZON, 'boAt Airdopes 161 with 40 Hours Playback, ASAP Charge & 10mm Drivers Bluetooth Headset '
+                      '(Pebble Black, True Wireless)'),
+    # The 2023 CUE70 against the CUE60: same size, series and brand
+    (TV_AMAZON, 'SAMSUNG Crystal iSmart 108 cm (43 inch) Ultra HD (4K) LED Smart Tizen TV 2023 Edition '
+                '(UA43CUE70AKLXL)'),
+])
+def test_model_number_mismatch_vetoes(amazon, flipkart):
+    assert similarity(amazon, flipkart) == 0.0
+
+@pytest.mark.parametrize('device, accessory', [
+    (M34_FLIPKART, 'Samsung Galaxy M34 5G Silicone Cover (Midnight Blue)'),
+    ('Apple iPhone 15 (128 GB) - Black', 'Apple iPhone 15 Tempered Glass Screen Protector (Black)'),
+    ('OnePlus Nord CE 3 Lite 5G (Pastel Lime, 8GB RAM, 128GB Storage)',
+     'OnePlus SUPERVOOC 80W Type-A to Type-C Charger Cable for Nord CE 3 Lite 5G'),
+])
+def test_accessory_listing_never_matches_the_device(device, accessory):
+    left, right = title_tokens(device), title_tokens(accessory)
+    assert title_similarity(left, right) == 0.0
+    assert title_similarity(left, right - ACCESSORY_WORDS) > 0  # it is the accessory word that vetoes
+
+def test_matcher_links_listings_and_leaves_the_accessory_out(master):
+    def store(title, platform, price, url):
+        product_id, _ = master.upsert_product({'title': title, 'price': price, 'original_price': price * 2,
+                                               'url': url, f"{platform}_url": url, 'platform': platform})
+        return product_id
+
+    amazon = store(M34_AMAZON, 'amazon', 16999, 'https://www.amazon.in/dp/B0C7VN3ZNW')
+    flipkart = store(M34_FLIPKART, 'flipkart', 15999,
+                     'https://www.flipkart.com/samsung-galaxy-m34/p/itm1234567890ab?pid=MOBGTAGPTB3VS24W')
+    cover = store('Samsung Galaxy M34 5G Silicone Cover (Midnight Blue)', 'flipkart', 299,
+                  'https://www.flipkart.com/m34-cover/p/itmabcdef123456?pid=ACCGTAGPTB3VS24W')
+
+    assert [match['id'] for match in master.get_product_matches(amazon)] == [flipkart]
+    assert master.get_product_matches(cover) == []
+
+@pytest.mark.parametrize('tokens_stored', [True, False])
+def test_retitled_product_is_no_longer_found_by_its_old_title(master, tokens_stored):
+    matcher = master.product_matcher
+    product_id, _ = master.upsert_product({'title': M34_AMAZON, 'price': 16999, 'original_price': 24999,
+                                           'url': 'https://www.amazon.in/dp/B0C7VN3ZNW',
+                                           'amazon_url': 'https://www.amazon.in/dp/B0C7VN3ZNW', 'platform': 'amazon'})
+    old_buckets = matcher.buckets(title_tokens(M34_AMAZON))
+    new_title = 'Samsung Galaxy M35 5G (Moonlight Blue, 8GB RAM, 256GB Storage) | 6000mAh Battery'
+
+    conn = master.db.connect()
+    cursor = conn.cursor()
+    if not tokens_stored:  # indexed by a release that did not store them
+        cursor.execute('UPDATE product_title_index SET title_tokens = NULL')
+        conn.commit()
+    cursor.execute('BEGIN')
+    matcher.add(cursor, product_id, {'title': new_title, 'platform': 'amazon'})
+    cursor.execute('UPDATE products SET title = ? WHERE id = ?', (new_title, product_id))
+    conn.commit()
+
+    assert [row[0] for row in matcher.candidates(cursor, old_buckets)] == []
+    assert [row[0] for row in matcher.candidates(cursor, matcher.buckets(title_tokens(new_title)))] == [product_id]
+    cursor.execute('SELECT COUNT(*) FROM product_title_buckets WHERE product_id = ?', (product_id,))
+    assert cursor.fetchone()[0] == len(set(matcher.buckets(title_tokens(new_title))))
+    conn.close()
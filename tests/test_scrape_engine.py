@@ -0,0 +1,54 @@
+# Scraping engine against the saved marketplace pages on a local keep-alive server
+import asyncio
+import threading
+
+import pytest
+
+pytest.importorskip('aiohttp')
+pytest.importorskip('bs4')
+
+from scrape_throughput import FixtureServer, check_product, fixture_sources, run_scrape
+
+@pytest.fixture
+def server():
+    server = FixtureServer(latency=0.005)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+
+def scrape(server, limit, pages=1, cache=None):
+    from scrapers.engine import ScrapeEngine
+
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    engine = ScrapeEngine(per_host=8, cache=cache, parse_workers=1)
+    products, _, _ = asyncio.run(run_scrape(engine, fixture_sources(base_url, pages), limit))
+    return products
+
+def test_every_product_comes_back_complete_from_both_marketplaces(database, server):
+    products = scrape(server, limit=1000)
+
+    assert {product['platform'] for product in products} == {'amazon', 'flipkart'}
+    assert {product['url']: check_product(product) for product in products} == \
+        {product['url']: [] for product in products}
+
+def test_stops_at_the_limit_and_fetches_each_page_once(database, server):
+    products = scrape(server, limit=12, pages=3)
+
+    assert len(products) == 12
+    assert len({product['url'] for product in products}) == 12
+    assert server.requests <= 2 * 3 + 12  # listing pages plus one fetch per product
+
+def test_second_run_through_the_page_cache_finds_nothing_new(database, server):
+    from scrapers.page_cache import PageCache
+
+    cache = PageCache()
+    # A limit above the fixture count, so both runs see every product whichever listing answers first
+    first = scrape(server, limit=1000, cache=cache)
+    by_site = {site: sum(1 for product in first if product['platform'] == site) for site in ('amazon', 'flipkart')}
+    assert all(by_site.values())
+    assert scrape(server, limit=1000, cache=cache) == []
+
+    summary = cache.summary()
+    for site, count in by_site.items():
+        assert summary[f"{site}/listing"]['not_modified'] == 1
+        assert summary[f"{site}/product"]['unchanged'] == count
@@ -0,0 +1,34 @@
+# Component constructors - a Database, the configured default, or a SQLite file path as before
+import pytest
+
+from storage import SQLiteDatabase, get_database, open_database
+
+def test_open_database(database, tmp_path):
+    given = SQLiteDatabase(str(tmp_path / 'given.db'))
+    assert open_database(given, 'master') is given
+    assert open_database(None, 'master') is get_database('master')
+    path = open_database(str(tmp_path / 'legacy.db'), 'master')
+    assert isinstance(path, SQLiteDatabase) and path.path == str(tmp_path / 'legacy.db')
+
+def test_earnings_tracker_still_takes_a_file_path(database, tmp_path):
+    pytest.importorskip('flask')
+    pytest.importorskip('schedule')
+    import earnings_tracker
+
+    path = tmp_path / 'earnings.db'
+    tracker = earnings_tracker.EarningsTracker(str(path))  # positional, as the old db_path
+    conn = tracker.db.connect()
+    cursor = conn.cursor()
+    cursor.execute('SELECT COUNT(*) FROM clicks')
+    assert cursor.fetchone()[0] == 0
+    conn.close()
+    assert path.exists()
+
+def test_price_history_still_takes_a_file_path(database, tmp_path):
+    from price_history import PriceHistory
+
+    path = str(tmp_path / 'master.db')
+    history = PriceHistory(path)
+    history.record(1, 499.0)
+    assert history.all_time_low(1) == 499.0
+    assert PriceHistory(path).window_stats(1, 7)['count'] == 1
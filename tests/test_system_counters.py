@@ -0,0 +1,81 @@
+import pytest
+
+from storage import get_database
+from system_counters import SystemCounters
+
+@pytest.fixture
+def counters(database):
+    db = get_database('master')
+    conn = db.connect()
+    conn.execute('''
+        CREATE TABLE products (
+            id INTEGER PRIMARY KEY, posted_instagram BOOLEAN, posted_telegram BOOLEAN, posted_discord BOOLEAN
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE system_stats (
+            date DATE PRIMARY KEY, products_processed INTEGER DEFAULT 0, posts_created INTEGER DEFAULT 0,
+            system_uptime_hours REAL DEFAULT 0
+        )
+    ''')
+    conn.commit()
+    conn.close()
+    return SystemCounters(db)
+
+def test_increments_count_once_committed(counters):
+    conn = counters.db.connect()
+    cursor = conn.cursor()
+    cursor.execute('BEGIN')
+    counters.increment(cursor, 'total_products')
+    counters.increment(cursor, 'products_processed', 3)
+    conn.commit()
+    conn.close()
+
+    assert counters.get_totals()['total_products'] == 1
+    assert counters.get_daily() == {'products_processed': 3, 'posts_created': 0}
+
+def test_rolled_back_savepoint_leaves_totals_alone(counters):
+    conn = counters.db.connect()
+    cursor = conn.cursor()
+    cursor.execute('BEGIN')
+    for fails in (False, True, False):
+        cursor.execute('SAVEPOINT ingest_record')
+        counters.increment(cursor, 'total_products')
+        counters.increment(cursor, 'products_processed')
+        if fails:
+            cursor.execute('ROLLBACK TO SAVEPOINT ingest_record')
+        cursor.execute('RELEASE SAVEPOINT ingest_record')
+    conn.commit()
+    conn.close()
+
+    assert counters.get_totals()['total_products'] == 2
+    assert counters.get_daily()['products_processed'] == 2
+
+def test_uncommitted_increments_are_not_reported(counters):
+    conn = counters.db.connect()
+    cursor = conn.cursor()
+    cursor.execute('BEGIN')
+    counters.increment(cursor, 'posted_telegram')
+    conn.rollback()
+    conn.close()
+
+    assert counters.get_totals()['posted_telegram'] == 0
+
+def test_every_process_reports_the_same_totals(counters):
+    # Two gunicorn workers and the scheduler each hold their own SystemCounters
+    worker, scheduler = counters, SystemCounters(counters.db)
+    assert worker.get_totals() == scheduler.get_totals()
+
+    conn = scheduler.db.connect()
+    cursor = conn.cursor()
+    cursor.execute('BEGIN')
+    scheduler.increment(cursor, 'posted_discord')
+    scheduler.increment(cursor, 'posts_created')
+    conn.commit()
+    conn.close()
+
+    assert worker.get_totals()['posted_discord'] == 1
+    assert worker.get_daily()['posts_created'] == 1
+    conn = worker.db.connect()
+    assert worker.get_totals(conn.cursor()) == scheduler.get_totals()
+    conn.close()
@@ -0,0 +1,52 @@
+import os
+import threading
+import time
+
+from tracing import Span, Tracer
+
+def wait_for(condition, timeout: float = 5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, 'timed out'
+        time.sleep(0.01)
+
+def finished_span(name: str) -> Span:
+    span = Span(name, None, True, {})
+    span.start_us, span.end_us = 1000, 2000
+    return span
+
+def trace_files(directory):
+    return sorted(name for name in os.listdir(directory) if name.startswith('trace-'))
+
+def test_due_files_are_written_off_the_recording_thread(tmp_path, monkeypatch):
+    tracer = Tracer(sample_rate=1, export_dir=str(tmp_path), flush_spans=3)
+    writers = []
+    write = tracer._write
+
+    def recording_write(spans):
+        writers.append(threading.get_ident())
+        return write(spans)
+
+    monkeypatch.setattr(tracer, '_write', recording_write)
+    for _ in range(6):
+        tracer.record(finished_span('stage'))
+
+    wait_for(lambda: len(trace_files(tmp_path)) == 2)
+    assert threading.get_ident() not in writers
+    tracer.close()
+
+def test_old_files_are_deleted_past_the_limits(tmp_path):
+    tracer = Tracer(sample_rate=1, export_dir=str(tmp_path), flush_spans=1000)
+    tracer.max_files = 3
+    for n in range(6):
+        tracer.record(finished_span('run'))
+        path = tracer.flush()
+        os.utime(path, (n, n))  # distinct ages
+    assert len(trace_files(tmp_path)) == 3
+    assert os.path.exists(path)
+
+    tracer.max_files, tracer.max_bytes = 100, os.path.getsize(path) * 2
+    tracer.record(finished_span('run'))
+    newest = tracer.flush()
+    remaining = trace_files(tmp_path)
+    assert len(remaining) == 2 and os.path.basename(newest) in remaining
@@ -0,0 +1,305 @@
+# Tracing - lightweight spans with Chrome trace export and a sampling profiler
+import atexit
+import contextvars
+import functools
+import inspect
+import itertools
+import json
+import os
+import queue
+import random
+import sys
+import threading
+import time
+from collections import Counter as StackCounter
+from datetime import datetime
+from typing import Callable, Dict, Optional
+from config import Config
+
+_current_span = contextvars.ContextVar('sastasmart_current_span', default=None)
+_span_ids = itertools.count(1)
+
+class Span:
+    __slots__ = ('name', 'trace_id', 'span_id', 'parent_id', 'sampled',
+                 'start_us', 'end_us', 'thread_id', 'attributes', '_token')
+
+    def __init__(self, name: str, parent: Optional['Span'], sampled: bool, attributes: Dict):
+        self.name = name
+        self.sampled = sampled
+        self.span_id = next(_span_ids)
+        self.parent_id = parent.span_id if parent else None
+        self.trace_id = parent.trace_id if parent else f"{os.getpid():x}-{self.span_id:x}"
+        self.attributes = attributes
+        self.thread_id = threading.get_ident()
+        self.start_us = 0
+        self.end_us = 0
+        self._token = None
+
+    def set_attribute(self, key: str, value):
+        self.attributes[key] = value
+
+    def __enter__(self):
+        self._token = _current_span.set(self)
+        if self.sampled:
+            self.start_us = time.perf_counter_ns() // 1000
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        _current_span.reset(self._token)
+        if self.sampled:
+            self.end_us = time.perf_counter_ns() // 1000
+            if exc_type is not None:
+                self.attributes['error'] = f"{exc_type.__name__}: {exc}"
+            TRACER.record(self)
+        return False
+
+class Tracer:
+    """Collects finished spans and writes them as Chrome trace JSON files
+
+    The sampling decision is made once per trace at its root span, and
+    children inherit it through contextvars. asyncio tasks copy the context
+    automatically; use wrap() for callables handed to threads or executors.
+
+    Files due while spans are being recorded are written by a background
+    thread, so the thread closing a span - possibly the event loop - never
+    waits on disk. After each write the oldest files in the directory are
+    deleted beyond TRACE_MAX_FILES or TRACE_MAX_BYTES.
+    """
+
+    def __init__(self, sample_rate: float = None, export_dir: str = None, flush_spans: int = None):
+        self.sample_rate = Config.TRACE_SAMPLE_RATE if sample_rate is None else sample_rate
+        self.export_dir = export_dir or Config.TRACE_DIR
+        self.flush_spans = flush_spans or Config.TRACE_FLUSH_SPANS
+        self.flush_interval = Config.TRACE_FLUSH_INTERVAL
+        self.max_files = Config.TRACE_MAX_FILES
+        self.max_bytes = Config.TRACE_MAX_BYTES
+        self.dropped = 0  # spans discarded because the writer had fallen behind
+        self._last_flush = time.monotonic()
+        self._finished = []
+        self._lock = threading.Lock()
+        self._writes = None
+        self._writer = None
+        self._writer_pid = None
+        # perf_counter has an arbitrary origin; anchor it to wall time once
+        self._epoch_offset_us = int(time.time() * 1_000_000) - time.perf_counter_ns() // 1000
+
+    def span(self, name: str, **attributes) -> Span:
+        parent = _current_span.get()
+        if parent is not None:
+            sampled = parent.sampled
+        else:
+            sampled = self.sample_rate > 0 and random.random() < self.sample_rate
+        return Span(name, parent, sampled, attributes)
+
+    def record(self, span: Span):
+        spans = None
+        with self._lock:
+            self._finished.append(span)
+            if len(self._finished) >= self.flush_spans or (
+                # a finished root span closes a trace; write it out if the file is due
+                span.parent_id is None and time.monotonic() - self._last_flush >= self.flush_interval
+            ):
+                spans, self._finished = self._finished, []
+                self._last_flush = time.monotonic()
+        if spans:
+            self._write_later(spans)
+
+    def flush(self) -> Optional[str]:
+        """Write buffered spans to a new Chrome trace file now and return its path"""
+
+        with self._lock:
+            spans, self._finished = self._finished, []
+            self._last_flush = time.monotonic()
+        return self._write(spans) if spans else None
+
+    def close(self):
+        """Write everything queued and buffered; run at exit"""
+        if self._writer_pid == os.getpid():
+            try:
+                self._writes.put(None, timeout=5)
+                self._writer.join(timeout=30)
+            except queue.Full:
+                pass
+        self.flush()
+
+    def _write_later(self, spans):
+        if self._writer_pid != os.getpid():
+            with self._lock:
+                if self._writer_pid != os.getpid():
+                    # Started lazily, and again in a forked worker
+                    self._writes = queue.Queue(maxsize=Config.TRACE_WRITE_QUEUE)
+                    self._writer = threading.Thread(target=self._run_writer, args=(self._writes,),
+                                                    name='trace-writer', daemon=True)
+                    self._writer.start()
+                    if self._writer_pid is None:
+                        atexit.register(self.close)
+                    self._writer_pid = os.getpid()
+        try:
+            self._writes.put_nowait(spans)
+        except queue.Full:
+            self.dropped += len(spans)
+
+    def _run_writer(self, writes: queue.Queue):
+        while True:
+            spans = writes.get()
+            if spans is None:
+                return
+            try:
+                self._write(spans)
+            except OSError:
+                self.dropped += len(spans)
+
+    def _write(self, spans) -> str:
+        events = []
+        for span in spans:
+            events.append({
+                'name': span.name,
+                'cat': 'sastasmart',
+                'ph': 'X',
+                'ts': span.start_us + self._epoch_offset_us,
+                'dur': max(span.end_us - span.start_us, 0),
+                'pid': os.getpid(),
+                'tid': span.thread_id,
+                'args': {
+                    'trace_id': span.trace_id,
+                    'span_id': span.span_id,
+                    'parent_id': span.parent_id,
+                    **{key: str(value) for key, value in span.attributes.items()}
+                }
+            })
+
+        os.makedirs(self.export_dir, exist_ok=True)
+        path = os.path.join(
+            self.export_dir,
+            f"trace-{datetime.now().strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{spans[0].span_id}.json"
+        )
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+        self._prune(path)
+        return path
+
+    def _prune(self, keep: str):
+        """Delete the oldest trace and profile files beyond max_files or max_bytes"""
+
+        files = []
+        for entry in os.scandir(self.export_dir):
+            if entry.name.startswith(('trace-', 'profile-')) and entry.path != keep:
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, entry.path))
+
+        count, total = 1, os.path.getsize(keep)
+        for _, size, path in sorted(files, reverse=True):
+            count += 1
+            total += size
+            if count > self.max_files or total > self.max_bytes:
+                try:
+                    os.unlink(path)
+                except FileNotFoundError:
+                    pass
+
+TRACER = Tracer()
+
+def span(name: str, **attributes) -> Span:
+    """Context manager for one pipeline stage: with span('schedule', product_id=1): ..."""
+    return TRACER.span(name, **attributes)
+
+def traced(name: str = None):
+    """Decorator form of span() for sync and async functions"""
+
+    def decorator(func):
+        span_name = name or func.__qualname__
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with TRACER.span(span_name):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with TRACER.span(span_name):
+                return func(*args, **kwargs)
+        return wrapper
+
+    return decorator
+
+def wrap(func: Callable) -> Callable:
+    """Bind func to the current trace context so spans continue in another thread"""
+    context = contextvars.copy_context()
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        return context.run(func, *args, **kwargs)
+    return wrapper
+
+class SamplingProfiler:
+    """Samples every thread's stack on an interval and writes collapsed stacks
+
+    Output is one 'frame;frame;frame count' line per distinct stack, the
+    input format of flamegraph.pl and speedscope.
+    """
+
+    def __init__(self, output_dir: str = None):
+        self.output_dir = output_dir or Config.TRACE_DIR
+        self._thread = None
+        self._stop = threading.Event()
+        self._stacks = StackCounter()
+        self._started_at = None
+        self.interval = 0.005
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, interval_ms: float = 5) -> bool:
+        if self.running:
+            return False
+        self.interval = interval_ms / 1000
+        self._stacks = StackCounter()
+        self._stop.clear()
+        self._started_at = time.time()
+        self._thread = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+        self._thread.start()
+        return True
+
+    def _run(self):
+        own_ident = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_ident:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                    frame = frame.f_back
+                self._stacks[';'.join(reversed(stack))] += 1
+
+    def stop(self) -> Optional[Dict]:
+        """Stop sampling and write the collapsed-stack file"""
+        if not self.running:
+            return None
+        self._stop.set()
+        self._thread.join()
+
+        os.makedirs(self.output_dir, exist_ok=True)
+        path = os.path.join(self.output_dir, f"profile-{datetime.now().strftime('%Y%m%d-%H%M%S')}-{os.getpid()}.collapsed")
+        with open(path, 'w') as f:
+            for stack, count in self._stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+        return {
+            'path': path,
+            'duration_seconds': round(time.time() - self._started_at, 2),
+            'samples': sum(self._stacks.values()),
+            'top_stacks': [
+                {'stack': stack.split(';')[-3:], 'samples': count}
+                for stack, count in self._stacks.most_common(10)
+            ]
+        }
+
+PROFILER = SamplingProfiler()